@@ -5,6 +5,7 @@ from Human_Resources.api.serializers.recruitment_list import (
 )
 
 from hr_workflows.models import RecruitmentEvaluation
+from jobs.domain_events import domain_events
 
 
 class RecruitmentDetailSerializer(RecruitmentListSerializer):
@@ -23,7 +24,7 @@ class RecruitmentDetailSerializer(RecruitmentListSerializer):
         ]
 
     def get_transition_logs(self, obj):
-        logs = obj.transition_logs.order_by("created_at")
+        logs = domain_events.transition_logs(obj)
         result = []
         prev_time = obj.created_at
 
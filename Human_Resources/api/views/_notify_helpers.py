@@ -8,20 +8,25 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
+HR_MANAGER_ROLES = ["HR_ADMIN", "BELT_HR_OVERSEER"]
+
+
+def hr_manager_ids(excluding=None):
+    """
+    Ids of active employees with an HR authority role, from the cached
+    role directory (no query on a warm cache). Pass straight to notify_many.
+    """
+    from notifications.directory import role_directory
+    return role_directory.user_ids(HR_MANAGER_ROLES, excluding=excluding)
+
+
 def get_hr_managers(excluding=None):
     """
     Returns all active employees with an HR authority role assignment.
     Excludes `excluding` user if provided (e.g. the actor themselves).
     """
-    from Human_Resources.models.authority import AuthorityAssignment
-    qs = User.objects.filter(
-        is_active=True,
-        authority_assignments__is_active=True,
-        authority_assignments__role__code__in=["HR_ADMIN", "BELT_HR_OVERSEER"],
-    ).distinct()
-    if excluding:
-        qs = qs.exclude(pk=excluding.pk)
-    return list(qs)
+    ids = hr_manager_ids(excluding=excluding)
+    return list(User.objects.filter(pk__in=ids)) if ids else []
 
 
 def get_branch_manager(branch):
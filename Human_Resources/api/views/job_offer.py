@@ -10,7 +10,7 @@ from Human_Resources.recruitment_services.exceptions import InvalidTransition
 from Human_Resources.recruitment_services.permissions import RecruitmentPermissions
 from Human_Resources.api.views.recruitment_transition import user_has_recruitment_permission
 from Human_Resources.api.serializers.recruitment_detail import RecruitmentDetailSerializer
-from Human_Resources.api.views._notify_helpers import get_hr_managers, user_display
+from Human_Resources.api.views._notify_helpers import hr_manager_ids, user_display
 from notifications.services import notify_many
 
 
@@ -67,7 +67,7 @@ class ExtendOfferAPI(APIView):
 
         # --- Notify HR managers ---
         notify_many(
-            recipients=get_hr_managers(excluding=request.user),
+            recipients=hr_manager_ids(excluding=request.user),
             verb="offer_extended",
             message=(
                 f"{user_display(request.user)} extended an offer to "
@@ -9,7 +9,7 @@ from hr_workflows.models import RecruitmentApplication
 from hr_workflows.models.onboarding_record import OnboardingRecord, OnboardingStatus
 from hr_workflows.onboarding_engine import OnboardingEngine, OnboardingError
 from Human_Resources.services.query_scope import scoped_recruitment_queryset
-from Human_Resources.api.views._notify_helpers import get_hr_managers, user_display
+from Human_Resources.api.views._notify_helpers import hr_manager_ids, user_display
 from notifications.services import notify_many
 
 
@@ -117,7 +117,7 @@ class OnboardingPhaseThreeAPI(APIView):
         applicant_name = str(record.application.applicant)
         role           = record.application.role_applied_for
         notify_many(
-            recipients=get_hr_managers(excluding=request.user),
+            recipients=hr_manager_ids(excluding=request.user),
             verb="onboarding_completed",
             message=(
                 f"Onboarding for {applicant_name} ({role}) has been completed "
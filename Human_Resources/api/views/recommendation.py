@@ -11,23 +11,13 @@ from hr_workflows.models.recruitment_application import RecruitmentApplication,
 from Human_Resources.constants import RecruitmentSource
 from branches.models import Branch
 from Human_Resources.models.job_position import JobPosition
+from Human_Resources.api.views._notify_helpers import hr_manager_ids
 from notifications.services import notify_many
 
 
 logger = logging.getLogger(__name__)
 
 
-def _hr_managers(excluding=None):
-    from employees.models import Employee
-    qs = Employee.objects.filter(
-        is_active=True,
-        authority_assignments__is_active=True,
-        authority_assignments__role__code__in=["HR_ADMIN", "BELT_HR_OVERSEER"],
-    ).distinct()
-    if excluding:
-        qs = qs.exclude(pk=excluding.pk)
-    return list(qs)
-
 class RecommendCandidateAPI(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -113,7 +103,7 @@ class RecommendCandidateAPI(APIView):
         # --- Notify HR managers ---
         branch_label = branch.name if branch else "a branch"
         notify_many(
-            recipients = _hr_managers(excluding=request.user),
+            recipients = hr_manager_ids(excluding=request.user),
             verb       = "recommendation_submitted",
             message    = (
                 f"{user_display(request.user)} recommended {applicant.first_name} {applicant.last_name} "
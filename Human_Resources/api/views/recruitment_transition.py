@@ -11,7 +11,7 @@ from Human_Resources.recruitment_services.transitions import RecruitmentEngine
 from Human_Resources.recruitment_services.exceptions import InvalidTransition
 from Human_Resources.recruitment_services.permissions import RecruitmentPermissions
 from Human_Resources.api.serializers.recruitment_detail import RecruitmentDetailSerializer
-from Human_Resources.api.views._notify_helpers import get_hr_managers, user_display
+from Human_Resources.api.views._notify_helpers import hr_manager_ids, user_display
 from notifications.services import notify, notify_many
 
 
@@ -100,18 +100,23 @@ class RecruitmentTransitionAPI(APIView):
         message        = f"{applicant_name} has been {action_label} by {user_display(request.user)}."
         link           = f"/hr/api/applications/{application.pk}/"
 
-        recipients = get_hr_managers(excluding=request.user)
+        recipients = hr_manager_ids(excluding=request.user)
 
         # Also notify assigned reviewer if different from actor
         reviewer = application.assigned_reviewer
         if reviewer and reviewer.pk != request.user.pk:
-            recipients.append(reviewer)
+            recipients.append(reviewer.pk)
 
+        # A burst of the same action folds into one digest per recipient,
+        # which links to the list of applications in the resulting stage
         notify_many(
             recipients=recipients,
             verb="stage_changed",
+            group=action,
             message=message,
+            digest=f"{{count}} applications {action_label}",
             link=link,
+            digest_link=f"/hr/api/applications/?status={application.status}",
             actor=request.user,
         )
 
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-17 08:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Human_Resources', '0007_add_job_position'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # create the composite indexes first; MySQL keeps the FK-backing index until then
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['content_type', 'object_id', 'timestamp'], name='auditlog_object_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', 'timestamp'], name='auditlog_user_ts_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='Human_Resou_content_85ef98_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='Human_Resou_user_id_3b6e0d_idx',
+        ),
+    ]
@@ -44,8 +44,8 @@ class AuditLog(models.Model):
     class Meta:
         ordering = ["-timestamp"]
         indexes = [
-            models.Index(fields=["content_type", "object_id"]),
-            models.Index(fields=["user"]),
+            models.Index(fields=["content_type", "object_id", "timestamp"], name="auditlog_object_ts_idx"),
+            models.Index(fields=["user", "timestamp"], name="auditlog_user_ts_idx"),
             models.Index(fields=["timestamp"]),
         ]
 
@@ -3,8 +3,6 @@
 from django.db import transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.contrib.contenttypes.models import ContentType
-from hr_workflows.models import RecruitmentTransitionLog
 
 from hr_workflows.models import (
     RecruitmentApplication,
@@ -13,7 +11,7 @@ from hr_workflows.models import (
 )
 from hr_workflows.models.recruitment_application import RecruitmentDecision
 from Human_Resources.recruitment_services.exceptions import InvalidTransition
-from Human_Resources.models.audit import AuditLog
+from jobs.domain_events import RECRUITMENT_TRANSITION, domain_events
 
 
 class RecruitmentEngine:
@@ -58,24 +56,23 @@ class RecruitmentEngine:
         application.stage_updated_at = timezone.now()
         application.save()
 
-        RecruitmentTransitionLog.objects.create(
-            application=application,
-            action=action,
-            performed_by=actor,
-            previous_stage=previous_stage,
-            new_stage=application.current_stage,
-            previous_status=previous_status,
-            new_status=application.status,
-            payload_snapshot=payload if payload else None,
-        )
-
-        # Write immutable audit trail
-        AuditLog.objects.create(
-            user=actor,
-            action=action,
-            content_type=ContentType.objects.get_for_model(application),
-            object_id=application.pk,
-            details=str(payload) if payload else "",
+        # The only record of the transition: written (and numbered) in this
+        # transaction, under the row lock application.save() just took
+        domain_events.record(
+            "RecruitmentApplication",
+            application.pk,
+            RECRUITMENT_TRANSITION,
+            {
+                "action": action,
+                "previous_stage": previous_stage,
+                "new_stage": application.current_stage,
+                "previous_status": previous_status,
+                "new_status": application.status,
+                "payload_snapshot": payload if payload else None,
+            },
+            branch_id=getattr(application, "recommended_branch_id", None),
+            actor={"user_id": getattr(actor, "pk", None)},
+            immediate=True,
         )
 
         return application
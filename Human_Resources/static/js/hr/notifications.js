@@ -1,12 +1,19 @@
 /* =========================================================
    NOTIFICATIONS MODULE
    Live bell icon, grouped dropdown (Today / Earlier), caret rotation.
+   The badge follows the server-sent event stream; when the stream is
+   unavailable (WSGI deployments, old browsers) it polls instead, and the
+   ETag on the count endpoint turns idle polls into 304s.
 ========================================================= */
 
 const API_LIST          = '/notifications/api/';
 const API_UNREAD_COUNT  = '/notifications/api/unread-count/';
 const API_MARK_READ     = (id) => `/notifications/api/${id}/read/`;
 const API_MARK_ALL_READ = '/notifications/api/mark-all-read/';
+const API_STREAM        = '/notifications/api/stream/';
+const POLL_INTERVAL_MS  = 60000;
+
+let pollTimer = null;
 
 function getCSRF() {
   const match = document.cookie.match(/csrftoken=([^;]+)/);
@@ -20,6 +27,49 @@ function getCSRF() {
 export function initNotifications() {
   refreshUnreadCount();
   bindDropdownOpen();
+  openStream();
+}
+
+
+/* -----------------------------------------
+ * PUSH STREAM (falls back to polling)
+ * ----------------------------------------- */
+function openStream() {
+  if (!window.EventSource) {
+    startPolling();
+    return;
+  }
+
+  const stream = new EventSource(API_STREAM);
+
+  stream.addEventListener('unread', (e) => {
+    stopPolling();
+    setBadge(JSON.parse(e.data).unread || 0);
+  });
+
+  stream.addEventListener('notification', (e) => {
+    setBadge(JSON.parse(e.data).unread || 0);
+    if (document.getElementById('notificationDropdown')?.classList.contains('open')) {
+      loadNotificationList();
+    }
+  });
+
+  // EventSource reconnects by itself; CLOSED means the server refused the stream
+  stream.addEventListener('error', () => {
+    if (stream.readyState === EventSource.CLOSED) startPolling();
+  });
+}
+
+function startPolling() {
+  if (pollTimer) return;
+  pollTimer = setInterval(() => {
+    if (!document.hidden) refreshUnreadCount();
+  }, POLL_INTERVAL_MS);
+}
+
+function stopPolling() {
+  clearInterval(pollTimer);
+  pollTimer = null;
 }
 
 
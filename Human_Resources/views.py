@@ -9,6 +9,7 @@ from django.core.mail import send_mail
 from django.conf import settings
 from employees.models import Employee
 from services.services import EmployeeService, MetricsService
+from services.tasks import send_registration_link
 from django.contrib import messages
 from .RecommendationForm import RecommendationForm
 from .models import AuditLog, Role
@@ -56,26 +57,22 @@ def human_resource(request):
                 reverse('complete_registration', args=[recommendation.token])
             )
 
-            # Send the link via email using EmployeeService
-            employee_service = EmployeeService()
-            email_sent = employee_service.send_registration_link(
+            # Queue the link email; the task retries if the mail server is unavailable
+            send_registration_link.delay(
                 email=recommendation.email,
                 link=registration_link,
                 first_name=recommendation.first_name,
-                last_name=recommendation.last_name
+                last_name=recommendation.last_name,
             )
 
-            if email_sent:
-                # Log the action
-                AuditLog.objects.create(
-                    action='recommendation_approved',
-                    user=request.user,
-                    recommendation=recommendation,
-                    details=f"Recommendation for {recommendation.first_name} {recommendation.last_name} approved by {request.user.employee_email}"
-                )
-                messages.success(request, f"Recommendation for {recommendation.first_name} {recommendation.last_name} approved. Registration link sent.")
-            else:
-                messages.error(request, f"Recommendation approved, but failed to send email to {recommendation.email}.")
+            # Log the action
+            AuditLog.objects.create(
+                action='recommendation_approved',
+                user=request.user,
+                recommendation=recommendation,
+                details=f"Recommendation for {recommendation.first_name} {recommendation.last_name} approved by {request.user.employee_email}"
+            )
+            messages.success(request, f"Recommendation for {recommendation.first_name} {recommendation.last_name} approved. Registration link will be emailed shortly.")
         except Recommendation.DoesNotExist:
             messages.error(request, "Recommendation not found or already processed.")
         return redirect('human_resources')
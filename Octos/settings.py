@@ -75,6 +75,7 @@ INSTALLED_APPS = [
     'jobs',
     'hr_workflows',
     'notifications',
+    'analytics',
 ]
 
 # Tailwind / NPM config
@@ -110,6 +111,8 @@ MIDDLEWARE = [
     'django_browser_reload.middleware.BrowserReloadMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'employees.middleware.ForcePasswordChangeMiddleware',
+    'jobs.daysheet_cache.DaySheetCacheMiddleware',
+    'jobs.audit_buffer.AuditBufferMiddleware',
 ]
 
 # CORS: restrictable via .env
@@ -239,4 +242,120 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = f'Farhat Printing Press <{env("EMAIL_HOST_USER", default="")}>'
-EMAIL_TIMEOUT = 10
\ No newline at end of file
+EMAIL_TIMEOUT = 10
+# -----------------------
+# Jobs / branch operations tuning
+# -----------------------
+# How often each worker compares its pricing index with the shared (database)
+# version, and the age after which it rebuilds the index regardless
+PRICING_INDEX_VERSION_CHECK_SECONDS = env.int('PRICING_INDEX_VERSION_CHECK_SECONDS', default=5)
+PRICING_INDEX_MAX_AGE_SECONDS = env.int('PRICING_INDEX_MAX_AGE_SECONDS', default=600)
+# Retention window for client Idempotency-Key rows (purged by purge_idempotency_keys)
+IDEMPOTENCY_KEY_TTL_HOURS = env.int('IDEMPOTENCY_KEY_TTL_HOURS', default=24)
+# How long an unfinished Idempotency-Key claim blocks retries before one may take it over
+IDEMPOTENCY_LEASE_SECONDS = env.int('IDEMPOTENCY_LEASE_SECONDS', default=120)
+# DaySheet counter slots per sheet; 1 = classic single-row totals, >1 = sharded
+DAYSHEET_COUNTER_SHARDS = env.int('DAYSHEET_COUNTER_SHARDS', default=1)
+# Process-level cache lifetime for resolved open DaySheets (0 = request scope only)
+DAYSHEET_CACHE_TTL_SECONDS = env.int('DAYSHEET_CACHE_TTL_SECONDS', default=30)
+# Parallel production lanes per branch used for queue ETAs
+JOB_QUEUE_LANES = env.int('JOB_QUEUE_LANES', default=1)
+# Production-time estimator: persistence interval, samples before trusting a
+# branch/service estimate, and the quantile used for ETAs
+PRODUCTION_ESTIMATE_FLUSH_SECONDS = env.int('PRODUCTION_ESTIMATE_FLUSH_SECONDS', default=300)
+PRODUCTION_ESTIMATE_MIN_SAMPLES = env.int('PRODUCTION_ESTIMATE_MIN_SAMPLES', default=5)
+PRODUCTION_ESTIMATE_QUANTILE = env.float('PRODUCTION_ESTIMATE_QUANTILE', default=0.8)
+# Lifetime of the per-process cached branch queue summary (the worker that
+# changes a queued job drops its copy at once; other workers within this TTL)
+QUEUE_SUMMARY_CACHE_SECONDS = env.int('QUEUE_SUMMARY_CACHE_SECONDS', default=15)
+# HQ shadow-event outbox: ingest endpoint (empty = local no-op client), HMAC
+# signing secret, batch size, claim lease, retry backoff and attempt limit
+HQ_INGEST_URL = env('HQ_INGEST_URL', default='')
+SHADOW_EVENT_SIGNING_SECRET = env('SHADOW_EVENT_SIGNING_SECRET', default='')
+# Per-branch signing keys ("<branch_id>=<key>,..."). Branches sign with their
+# own key; HQ ingest accepts a branch's events only under that branch's key
+SHADOW_EVENT_BRANCH_SECRETS = env.dict('SHADOW_EVENT_BRANCH_SECRETS', default={})
+SHADOW_OUTBOX_BATCH_SIZE = env.int('SHADOW_OUTBOX_BATCH_SIZE', default=200)
+SHADOW_OUTBOX_LEASE_SECONDS = env.int('SHADOW_OUTBOX_LEASE_SECONDS', default=60)
+SHADOW_OUTBOX_RETRY_BASE_SECONDS = env.float('SHADOW_OUTBOX_RETRY_BASE_SECONDS', default=5)
+SHADOW_OUTBOX_RETRY_MAX_SECONDS = env.float('SHADOW_OUTBOX_RETRY_MAX_SECONDS', default=3600)
+SHADOW_OUTBOX_MAX_ATTEMPTS = env.int('SHADOW_OUTBOX_MAX_ATTEMPTS', default=10)
+SHADOW_OUTBOX_HTTP_TIMEOUT = env.float('SHADOW_OUTBOX_HTTP_TIMEOUT', default=10)
+# Period of the dispatch_shadow_events task (workers drain the outbox each slot)
+SHADOW_OUTBOX_DISPATCH_SECONDS = env.int('SHADOW_OUTBOX_DISPATCH_SECONDS', default=30)
+# HQ ingest endpoint limits per batch (decompressed bytes / events)
+HQ_INGEST_MAX_BYTES = env.int('HQ_INGEST_MAX_BYTES', default=16 * 1024 * 1024)
+HQ_INGEST_MAX_EVENTS = env.int('HQ_INGEST_MAX_EVENTS', default=5000)
+# Buffer StatusLog / AuditLog / RecruitmentTransitionLog rows and bulk-write them on commit
+AUDIT_BUFFER_ENABLED = env.bool('AUDIT_BUFFER_ENABLED', default=True)
+# How often buffered audit rows that failed to write are replayed from the spool
+AUDIT_SPOOL_REPLAY_SECONDS = env.int('AUDIT_SPOOL_REPLAY_SECONDS', default=300)
+# Log retention: hot-table horizon per table (days) before rows move to the
+# gzip JSONL cold archive, the archive directory, and rows per archive chunk
+RETENTION_STATUS_LOG_DAYS = env.int('RETENTION_STATUS_LOG_DAYS', default=90)
+RETENTION_SHADOW_EVENT_DAYS = env.int('RETENTION_SHADOW_EVENT_DAYS', default=90)
+RETENTION_AUDIT_LOG_DAYS = env.int('RETENTION_AUDIT_LOG_DAYS', default=365)
+RETENTION_DOMAIN_EVENT_DAYS = env.int('RETENTION_DOMAIN_EVENT_DAYS', default=365)
+RETENTION_ARCHIVE_DIR = env('RETENTION_ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
+RETENTION_CHUNK_SIZE = env.int('RETENTION_CHUNK_SIZE', default=1000)
+# Sales projection replay: DomainEvent ids re-scanned before each checkpoint
+# (covers events committed out of id order), and how long a day sheet must
+# have been closed before its totals are checked against its jobs
+PROJECTION_REPLAY_OVERLAP = env.int('PROJECTION_REPLAY_OVERLAP', default=1000)
+PROJECTION_SETTLE_SECONDS = env.int('PROJECTION_SETTLE_SECONDS', default=600)
+# Analytics job-facts store: column files directory, jobs per export chunk,
+# and how old a job must be before it is exported (late-commit safety)
+ANALYTICS_FACTS_DIR = env('ANALYTICS_FACTS_DIR', default=str(BASE_DIR / 'analytics_facts'))
+ANALYTICS_FACTS_CHUNK_SIZE = env.int('ANALYTICS_FACTS_CHUNK_SIZE', default=5000)
+ANALYTICS_FACTS_LAG_SECONDS = env.int('ANALYTICS_FACTS_LAG_SECONDS', default=300)
+# How often the refresh_job_facts task appends new jobs to the store
+ANALYTICS_FACTS_REFRESH_SECONDS = env.int('ANALYTICS_FACTS_REFRESH_SECONDS', default=3600)
+# Anomaly detection thresholds (online detectors and the scan_anomalies sweep)
+ANOMALY_DUPLICATE_WINDOW_SECONDS = env.int('ANOMALY_DUPLICATE_WINDOW_SECONDS', default=120)
+ANOMALY_FREE_JOB_RATIO = env.float('ANOMALY_FREE_JOB_RATIO', default=0.2)
+ANOMALY_CASH_TOLERANCE = env('ANOMALY_CASH_TOLERANCE', default='10.00')
+ANOMALY_REPEATED_CORRECTIONS = env.int('ANOMALY_REPEATED_CORRECTIONS', default=3)
+# scan_anomalies period (slots start at UTC midnight for the daily default)
+ANOMALY_SCAN_INTERVAL_SECONDS = env.int('ANOMALY_SCAN_INTERVAL_SECONDS', default=86400)
+# How often send_job_alerts mails branches about jobs due within 10 minutes
+JOB_ALERT_INTERVAL_SECONDS = env.int('JOB_ALERT_INTERVAL_SECONDS', default=300)
+# Background task queue (manage.py run_workers): claim lease, idle poll,
+# retry backoff and default worker pool size
+TASK_LEASE_SECONDS = env.int('TASK_LEASE_SECONDS', default=300)
+TASK_POLL_SECONDS = env.float('TASK_POLL_SECONDS', default=1.0)
+TASK_RETRY_BASE_SECONDS = env.float('TASK_RETRY_BASE_SECONDS', default=10)
+TASK_RETRY_MAX_SECONDS = env.float('TASK_RETRY_MAX_SECONDS', default=3600)
+TASK_WORKER_CONCURRENCY = env.int('TASK_WORKER_CONCURRENCY', default=4)
+# Hours finished periodic-slot rows ("periodic:<name>:<slot>") are kept
+TASK_PERIODIC_KEEP_HOURS = env.int('TASK_PERIODIC_KEEP_HOURS', default=24)
+# Stale shift / day sheet auto-close sweep (jobs.auto_close): how often it
+# runs, minutes after a branch's closing time before its sheet is closed,
+# closing time for branches without opening hours, and the longest a shift
+# may stay open before it is closed on its own
+AUTO_CLOSE_INTERVAL_SECONDS = env.int('AUTO_CLOSE_INTERVAL_SECONDS', default=300)
+AUTO_CLOSE_GRACE_MINUTES = env.int('AUTO_CLOSE_GRACE_MINUTES', default=60)
+AUTO_CLOSE_DEFAULT_CLOSING = env('AUTO_CLOSE_DEFAULT_CLOSING', default='22:00')
+AUTO_CLOSE_SHIFT_MAX_HOURS = env.int('AUTO_CLOSE_SHIFT_MAX_HOURS', default=14)
+# Terminal heartbeats (jobs.heartbeats): seconds between batch flushes of the
+# in-memory last-seen table (or terminals pending before an early flush),
+# quiet seconds before a terminal on an open shift counts as silent, and how
+# often the silent-terminal detector runs
+HEARTBEAT_FLUSH_SECONDS = env.float('HEARTBEAT_FLUSH_SECONDS', default=10)
+HEARTBEAT_MAX_PENDING = env.int('HEARTBEAT_MAX_PENDING', default=5000)
+HEARTBEAT_SILENCE_SECONDS = env.int('HEARTBEAT_SILENCE_SECONDS', default=90)
+HEARTBEAT_CHECK_SECONDS = env.int('HEARTBEAT_CHECK_SECONDS', default=30)
+# Notification fan-out: seconds within which a burst of one verb/group to the
+# same recipient folds into a digest row (0 disables), and how long the
+# role -> recipient directory is cached
+NOTIFY_COALESCE_SECONDS = env.int('NOTIFY_COALESCE_SECONDS', default=300)
+NOTIFY_DIRECTORY_TTL = env.int('NOTIFY_DIRECTORY_TTL', default=300)
+# Notification bell push stream (GET /notifications/api/stream/, ASGI only):
+# broker class (InProcessBroker for one process, RedisBroker across
+# processes), Redis URL for the latter, seconds between keepalive comments,
+# lifetime of one stream before the browser reconnects, and events buffered
+# per open stream
+NOTIFY_BROKER = env('NOTIFY_BROKER', default='notifications.broker.InProcessBroker')
+NOTIFY_REDIS_URL = env('NOTIFY_REDIS_URL', default='redis://localhost:6379/0')
+NOTIFY_STREAM_KEEPALIVE = env.int('NOTIFY_STREAM_KEEPALIVE', default=20)
+NOTIFY_STREAM_MAX_SECONDS = env.int('NOTIFY_STREAM_MAX_SECONDS', default=300)
+NOTIFY_STREAM_QUEUE = env.int('NOTIFY_STREAM_QUEUE', default=100)
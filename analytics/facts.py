@@ -0,0 +1,369 @@
+# analytics/facts.py
+"""
+Columnar job-facts store for HQ analytics.
+
+Jobs are exported into fixed-width column files, one directory per
+local month:
+
+    <ANALYTICS_FACTS_DIR>/
+        manifest.json               rows per partition, last exported job id
+        2026-10/job_id.col ts.col branch_id.col ... (one file per column)
+
+Every column is a packed array of one C type (see COLUMNS). Readers
+memory-map the files and view them through memoryview.cast, so a query
+touches only the partitions in its date range and never builds model
+instances. Text columns (job_type) are dictionary-encoded in the manifest.
+
+`refresh()` is incremental: it appends jobs with an id above the
+manifest's last_job_id, stopping at the first job younger than
+ANALYTICS_FACTS_LAG_SECONDS so a job whose transaction commits late is
+not skipped. Column files are appended first and the manifest is
+replaced afterwards, so readers (which trust the manifest row counts)
+never see a partial chunk; a crashed refresh is trimmed on the next run.
+Refresh and rebuild hold an exclusive flock on `<root>.lock` (beside the
+store, so a rebuild swap keeps it), which every worker and host sharing the
+directory sees; the kernel drops it if the process dies.
+
+Facts are a snapshot at export time. Amount edits made to older jobs are
+picked up by `rebuild()`, which writes a fresh store beside the current
+one and swaps it in.
+"""
+from array import array
+from calendar import timegm
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+import fcntl
+import json
+import logging
+import mmap
+import os
+import shutil
+
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+# name -> array typecode
+COLUMNS = {
+    "job_id": "q",
+    "ts": "q",            # local wall-clock time, seconds since 1970-01-01
+    "branch_id": "i",
+    "service_id": "i",
+    "attendant_id": "i",  # Job.created_by, -1 when unknown
+    "quantity": "i",
+    "amount": "q",        # total_amount in cents
+    "deposit": "q",       # deposit_amount in cents
+    "job_type": "B",      # index into manifest["dictionaries"]["job_type"]
+}
+
+GROUP_KEYS = ("branch_id", "service_id", "attendant_id", "job_type", "month", "day", "weekday", "hour")
+
+
+class FactQueryError(ValueError):
+    """Unknown group key or malformed filter."""
+
+
+def _cents(value) -> int:
+    return int((Decimal(value or 0) * 100).to_integral_value())
+
+
+def _money(cents: int) -> Decimal:
+    return (Decimal(cents) / 100).quantize(Decimal("0.01"))
+
+
+def _day_start(d: date) -> int:
+    return timegm(d.timetuple())
+
+
+# -------------------------------------------------
+# Partitions
+# -------------------------------------------------
+class Partition:
+    """Read-only mmap view of one month; use as a context manager."""
+
+    def __init__(self, path: Path, month: str, rows: int):
+        self.path = path
+        self.month = month
+        self.rows = rows
+        self._maps: List[mmap.mmap] = []
+        self._views: List[memoryview] = []
+        self.columns: Dict[str, memoryview] = {}
+
+    def __enter__(self):
+        for name, typecode in COLUMNS.items():
+            width = array(typecode).itemsize
+            with open(self.path / f"{name}.col", "rb") as fh:
+                mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps.append(mapped)
+            raw = memoryview(mapped)
+            self._views.append(raw)
+            self.columns[name] = raw[: self.rows * width].cast(typecode)
+        return self
+
+    def __exit__(self, *exc):
+        # views must be released before their mmap can be closed
+        for view in list(self.columns.values()) + self._views:
+            view.release()
+        self.columns, self._views = {}, []
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+
+
+class JobFactStore:
+
+    def __init__(self, root: Optional[str] = None, chunk_size: Optional[int] = None):
+        self._root = root
+        self._chunk_size = chunk_size
+
+    @property
+    def root(self) -> Path:
+        default = Path(settings.BASE_DIR) / "analytics_facts"
+        return Path(self._root or getattr(settings, "ANALYTICS_FACTS_DIR", default))
+
+    @property
+    def chunk_size(self) -> int:
+        return int(self._chunk_size or getattr(settings, "ANALYTICS_FACTS_CHUNK_SIZE", 5000))
+
+    @property
+    def lag(self) -> timedelta:
+        return timedelta(seconds=int(getattr(settings, "ANALYTICS_FACTS_LAG_SECONDS", 300)))
+
+    # -------------------------------------------------
+    # Manifest
+    # -------------------------------------------------
+    def manifest(self) -> dict:
+        try:
+            with open(self.root / MANIFEST, "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {"last_job_id": 0, "partitions": {}, "dictionaries": {"job_type": []}}
+
+    def _write_manifest(self, manifest: dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".{MANIFEST}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, sort_keys=True)
+        os.replace(tmp, self.root / MANIFEST)
+
+    # -------------------------------------------------
+    # Export
+    # -------------------------------------------------
+    @property
+    def lock_path(self) -> Path:
+        return self.root.with_name(self.root.name + ".lock")
+
+    @contextmanager
+    def _refresh_lock(self):
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as fh:
+            try:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise RuntimeError("Another job-facts refresh is running") from None
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+    def refresh(self, now: Optional[datetime] = None) -> dict:
+        """Append jobs created since the last refresh. Returns {"appended", "last_job_id"}."""
+        with self._refresh_lock():
+            return self._append(now or timezone.now())
+
+    def rebuild(self, now: Optional[datetime] = None) -> dict:
+        """Export every job into a new store and swap it in place of the current one."""
+        with self._refresh_lock():
+            staging = self.root.with_name(self.root.name + ".rebuild")
+            shutil.rmtree(staging, ignore_errors=True)
+            result = JobFactStore(root=str(staging), chunk_size=self.chunk_size)._append(now or timezone.now())
+
+            retired = self.root.with_name(self.root.name + ".old")
+            shutil.rmtree(retired, ignore_errors=True)
+            if self.root.exists():
+                os.replace(self.root, retired)
+            if staging.exists():
+                os.replace(staging, self.root)
+            shutil.rmtree(retired, ignore_errors=True)
+            return result
+
+    def _append(self, now: datetime) -> dict:
+        Job = apps.get_model("jobs", "Job")
+        manifest = self.manifest()
+        self._trim(manifest)
+        cutoff = now - self.lag
+        job_types: List[str] = manifest["dictionaries"].setdefault("job_type", [])
+
+        rows = (
+            Job.objects.filter(pk__gt=manifest["last_job_id"])
+            .order_by("pk")
+            .values_list(
+                "pk", "created_at", "branch_id", "service_id", "created_by_id",
+                "quantity", "total_amount", "deposit_amount", "type",
+            )
+        )
+        appended = 0
+        buffers: Dict[str, Dict[str, array]] = {}
+        last_id = manifest["last_job_id"]
+        for pk, created_at, branch_id, service_id, created_by_id, quantity, total, deposit, job_type in rows.iterator(chunk_size=self.chunk_size):
+            if created_at >= cutoff:
+                break
+            local = timezone.localtime(created_at)
+            month = local.strftime("%Y-%m")
+            cols = buffers.get(month)
+            if cols is None:
+                cols = buffers[month] = {name: array(code) for name, code in COLUMNS.items()}
+            if job_type not in job_types:
+                job_types.append(job_type)
+            cols["job_id"].append(pk)
+            cols["ts"].append(timegm(local.replace(tzinfo=None).timetuple()))
+            cols["branch_id"].append(branch_id)
+            cols["service_id"].append(service_id)
+            cols["attendant_id"].append(created_by_id if created_by_id is not None else -1)
+            cols["quantity"].append(quantity or 0)
+            cols["amount"].append(_cents(total))
+            cols["deposit"].append(_cents(deposit))
+            cols["job_type"].append(job_types.index(job_type))
+            last_id = pk
+            appended += 1
+            if appended % self.chunk_size == 0:
+                self._flush(manifest, buffers, last_id)
+                buffers = {}
+        self._flush(manifest, buffers, last_id)
+        return {"appended": appended, "last_job_id": manifest["last_job_id"]}
+
+    def _flush(self, manifest: dict, buffers: Dict[str, Dict[str, array]], last_id: int):
+        for month, cols in buffers.items():
+            directory = self.root / month
+            directory.mkdir(parents=True, exist_ok=True)
+            for name, values in cols.items():
+                with open(directory / f"{name}.col", "ab") as fh:
+                    values.tofile(fh)
+            manifest["partitions"][month] = manifest["partitions"].get(month, 0) + len(cols["job_id"])
+        manifest["last_job_id"] = last_id
+        self._write_manifest(manifest)
+
+    def _trim(self, manifest: dict):
+        """Cut column files back to the manifest row count (leftovers of a crashed refresh)."""
+        for month, count in manifest["partitions"].items():
+            for name, code in COLUMNS.items():
+                path = self.root / month / f"{name}.col"
+                size = count * array(code).itemsize
+                if path.exists() and path.stat().st_size != size:
+                    logger.warning("JobFactStore: trimming %s to %s row(s)", path, count)
+                    with open(path, "r+b") as fh:
+                        fh.truncate(size)
+
+    # -------------------------------------------------
+    # Queries
+    # -------------------------------------------------
+    def partitions(self, since: Optional[date] = None, until: Optional[date] = None) -> List[Partition]:
+        first = since.strftime("%Y-%m") if since else None
+        last = until.strftime("%Y-%m") if until else None
+        found = []
+        for month, count in sorted(self.manifest()["partitions"].items()):
+            if not count or (first and month < first) or (last and month > last):
+                continue
+            found.append(Partition(self.root / month, month, count))
+        return found
+
+    def query(
+        self,
+        group_by: Sequence[str] = (),
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+        branch_ids: Optional[Iterable[int]] = None,
+        service_ids: Optional[Iterable[int]] = None,
+    ) -> List[dict]:
+        """
+        Aggregate facts in [since, until] (local dates, inclusive) grouped by
+        any of GROUP_KEYS. Each row carries the group keys plus jobs,
+        quantity, amount, deposit and deposit_ratio.
+        """
+        group_by = list(group_by)
+        unknown = [k for k in group_by if k not in GROUP_KEYS]
+        if unknown:
+            raise FactQueryError(f"Unknown group key(s): {', '.join(unknown)}")
+        lo = _day_start(since) if since else None
+        hi = _day_start(until + timedelta(days=1)) if until else None
+        branches = set(branch_ids) if branch_ids else None
+        services = set(service_ids) if service_ids else None
+        job_types = self.manifest()["dictionaries"].get("job_type", [])
+
+        groups: Dict[tuple, list] = {}
+        for partition in self.partitions(since, until):
+            extract = [_extractor(k, partition.month) for k in group_by]
+            with partition as p:
+                c = p.columns
+                for row in zip(
+                    c["ts"], c["branch_id"], c["service_id"], c["attendant_id"],
+                    c["quantity"], c["amount"], c["deposit"], c["job_type"],
+                ):
+                    ts = row[0]
+                    if (lo is not None and ts < lo) or (hi is not None and ts >= hi):
+                        continue
+                    if (branches is not None and row[1] not in branches) or (services is not None and row[2] not in services):
+                        continue
+                    key = tuple(f(row) for f in extract)
+                    acc = groups.get(key)
+                    if acc is None:
+                        acc = groups[key] = [0, 0, 0, 0]
+                    acc[0] += 1
+                    acc[1] += row[4]
+                    acc[2] += row[5]
+                    acc[3] += row[6]
+
+        result = []
+        for key, (jobs, qty, amount, deposit) in groups.items():
+            row = {k: _decode(k, v, job_types) for k, v in zip(group_by, key)}
+            row.update({
+                "jobs": jobs,
+                "quantity": qty,
+                "amount": _money(amount),
+                "deposit": _money(deposit),
+                "deposit_ratio": round(deposit / amount, 4) if amount else None,
+            })
+            result.append(row)
+        result.sort(key=lambda r: tuple((r[k] is None, r[k]) for k in group_by))
+        return result
+
+
+# row = (ts, branch_id, service_id, attendant_id, quantity, amount, deposit, job_type)
+_EXTRACTORS = {
+    "branch_id": lambda row: row[1],
+    "service_id": lambda row: row[2],
+    "attendant_id": lambda row: row[3],
+    "job_type": lambda row: row[7],
+    "day": lambda row: row[0] // 86400,
+    "weekday": lambda row: (row[0] // 86400 + 3) % 7,  # 1970-01-01 was a Thursday; Monday = 0
+    "hour": lambda row: row[0] // 3600 % 24,
+}
+
+
+def _extractor(key: str, month: str):
+    if key == "month":
+        return lambda row: month
+    return _EXTRACTORS[key]
+
+
+def _decode(key: str, value, job_types: List[str]):
+    if key == "day":
+        return (date(1970, 1, 1) + timedelta(days=value)).isoformat()
+    if key == "attendant_id":
+        return value if value >= 0 else None
+    if key == "job_type":
+        return job_types[value] if value < len(job_types) else None
+    return value
+
+
+job_facts = JobFactStore()
+
+
+__all__ = ["JobFactStore", "Partition", "FactQueryError", "job_facts", "COLUMNS", "GROUP_KEYS"]
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.facts import job_facts
+
+
+class Command(BaseCommand):
+    help = (
+        "Append new jobs to the columnar job-facts store (schedule periodically); "
+        "--rebuild re-exports every job and swaps the store in"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="Re-export all jobs (picks up edits to old jobs)")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            result = job_facts.rebuild() if options["rebuild"] else job_facts.refresh()
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - start
+        verb = "Rebuilt with" if options["rebuild"] else "Appended"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['appended']} job fact(s) in {elapsed:.1f}s (last job id {result['last_job_id']})"
+        ))
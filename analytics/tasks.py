@@ -0,0 +1,14 @@
+# analytics/tasks.py
+from django.conf import settings
+
+from jobs.taskqueue import task
+
+
+@task(priority=-5, max_attempts=1, every=getattr(settings, "ANALYTICS_FACTS_REFRESH_SECONDS", 3600))
+def refresh_job_facts():
+    # append new jobs to the job-facts store; a refresh still running elsewhere keeps the slot
+    from analytics.facts import job_facts
+    try:
+        return job_facts.refresh()
+    except RuntimeError as exc:
+        return {"skipped": str(exc)}
@@ -1,3 +1,142 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import fcntl
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from analytics.facts import FactQueryError, JobFactStore
+from jobs.models import BackgroundTask, Job
+from jobs.taskqueue import TaskWorker, registry
+from jobs.tests.factories import make_branch, make_service, make_user
+
+
+class JobFactStoreTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        override = override_settings(ANALYTICS_FACTS_DIR=self.root, ANALYTICS_FACTS_LAG_SECONDS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.store = JobFactStore(chunk_size=2)
+        self.addCleanup(lambda: self.store.lock_path.unlink(missing_ok=True))
+        self.branch = make_branch()
+        self.other = make_branch()
+        self.print = make_service(price="5.00")
+        self.scan = make_service(price="2.00")
+        self.attendant = make_user(branch=self.branch)
+
+    def job(self, when, service=None, branch=None, amount="5.00", deposit="0.00", quantity=1, **kwargs):
+        job = Job.objects.create(
+            branch=branch or self.branch,
+            service=service or self.print,
+            customer_name="Walk-in",
+            quantity=quantity,
+            total_amount=Decimal(amount),
+            deposit_amount=Decimal(deposit),
+            created_by=kwargs.pop("created_by", self.attendant),
+            **kwargs,
+        )
+        Job.objects.filter(pk=job.pk).update(created_at=timezone.make_aware(when))
+        return job
+
+    def test_incremental_refresh_and_group_by(self):
+        self.job(datetime(2026, 8, 3, 9, 15), amount="10.00", deposit="4.00", quantity=2)
+        self.job(datetime(2026, 8, 3, 9, 45), service=self.scan, amount="2.00")
+        self.job(datetime(2026, 9, 1, 14, 5), branch=self.other, created_by=None)
+
+        self.assertEqual(self.store.refresh()["appended"], 3)
+        self.assertEqual(self.store.manifest()["partitions"], {"2026-08": 2, "2026-09": 1})
+
+        self.job(datetime(2026, 9, 2, 9, 0), amount="1.50")
+        self.assertEqual(self.store.refresh()["appended"], 1)
+        self.assertEqual(self.store.refresh()["appended"], 0)
+
+        by_hour = self.store.query(group_by=["hour"])
+        self.assertEqual([(r["hour"], r["jobs"]) for r in by_hour], [(9, 3), (14, 1)])
+
+        by_service = self.store.query(group_by=["service_id"], since=date(2026, 8, 1), until=date(2026, 8, 31))
+        self.assertEqual(by_service[0], {
+            "service_id": self.print.pk, "jobs": 1, "quantity": 2,
+            "amount": Decimal("10.00"), "deposit": Decimal("4.00"), "deposit_ratio": 0.4,
+        })
+        self.assertEqual(by_service[1]["service_id"], self.scan.pk)
+
+        by_attendant = self.store.query(group_by=["attendant_id", "day"], branch_ids=[self.other.pk])
+        self.assertEqual(by_attendant, [{
+            "attendant_id": None, "day": "2026-09-01", "jobs": 1, "quantity": 1,
+            "amount": Decimal("5.00"), "deposit": Decimal("0.00"), "deposit_ratio": 0.0,
+        }])
+        self.assertEqual(self.store.query(group_by=["weekday"])[0]["weekday"], 0)  # 2026-08-03 is a Monday
+
+        with self.assertRaises(FactQueryError):
+            self.store.query(group_by=["customer_name"])
+
+    def test_young_jobs_wait_for_the_lag(self):
+        now = timezone.now()
+        self.job(timezone.localtime(now - timedelta(hours=1)).replace(tzinfo=None))
+        self.job(timezone.localtime(now).replace(tzinfo=None))
+
+        with override_settings(ANALYTICS_FACTS_LAG_SECONDS=300):
+            self.assertEqual(self.store.refresh(now=now)["appended"], 1)
+            self.assertEqual(self.store.refresh(now=now + timedelta(minutes=10))["appended"], 1)
+
+    def test_crashed_append_is_trimmed_and_rebuild_picks_up_edits(self):
+        job = self.job(datetime(2026, 8, 3, 9, 0))
+        self.store.refresh()
+        with open(f"{self.root}/2026-08/amount.col", "ab") as fh:
+            fh.write(b"\0" * 5)  # partial write of a crashed refresh
+
+        self.job(datetime(2026, 8, 4, 9, 0))
+        with self.assertLogs("analytics.facts", level="WARNING"):
+            self.store.refresh()
+        self.assertEqual(self.store.query(group_by=["month"])[0]["amount"], Decimal("10.00"))
+
+        Job.objects.filter(pk=job.pk).update(total_amount=Decimal("7.00"))
+        self.assertEqual(self.store.rebuild()["appended"], 2)
+        self.assertEqual(self.store.query()[0]["amount"], Decimal("12.00"))
+
+    def test_refresh_is_refused_while_another_process_holds_the_lock(self):
+        self.job(datetime(2026, 8, 3, 9, 0))
+        self.store.refresh()  # creates the lock file and releases it
+        fd = os.open(self.store.lock_path, os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            with self.assertRaisesMessage(RuntimeError, "Another job-facts refresh is running"):
+                self.store.refresh()
+        finally:
+            os.close(fd)
+        self.assertEqual(self.store.refresh()["appended"], 0)
+
+    def test_periodic_task_refreshes_the_store(self):
+        self.job(datetime(2026, 8, 3, 9, 0))
+        registry.discover()
+        spec = registry.get("analytics.tasks.refresh_job_facts")
+        self.assertIn(spec, registry.periodic())
+
+        spec.delay()
+        TaskWorker().drain()
+        self.assertEqual(BackgroundTask.objects.get().result["appended"], 1)
+        self.assertEqual(JobFactStore().manifest()["last_job_id"], Job.objects.get().pk)
+
+    def test_api(self):
+        self.job(datetime(2026, 8, 3, 9, 0))
+        self.store.refresh()
+        client = APIClient()
+        client.force_authenticate(make_user(is_staff=True))
+
+        response = client.get("/api/analytics/job-facts/", {"group_by": "branch_id,month", "since": "2026-08-01"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["amount"], "5.00")
+        self.assertEqual(response.json()["results"][0]["month"], "2026-08")
+        self.assertEqual(client.get("/api/analytics/job-facts/", {"group_by": "nope"}).status_code, 400)
+        self.assertEqual(client.get("/api/analytics/job-facts/", {"since": "08/01"}).status_code, 400)
+
+        client.force_authenticate(make_user())
+        self.assertEqual(client.get("/api/analytics/job-facts/").status_code, 403)
@@ -0,0 +1,10 @@
+# analytics/urls.py
+from django.urls import path
+
+from .views import JobFactsQueryAPIView
+
+app_name = "analytics"
+
+urlpatterns = [
+    path("job-facts/", JobFactsQueryAPIView.as_view(), name="job-facts"),
+]
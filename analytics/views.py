@@ -1,3 +1,51 @@
-from django.shortcuts import render
+# analytics/views.py
+from django.utils.dateparse import parse_date
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from analytics.facts import FactQueryError, job_facts
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()] if value else None
+
+
+class JobFactsQueryAPIView(APIView):
+    """
+    Group-by / time-bucket queries over the job-facts store (HQ dashboards).
+
+    GET ?group_by=service_id,hour&since=2026-07-01&until=2026-09-30&branch=1,2&service=4
+    group keys: branch_id, service_id, attendant_id, job_type, month, day, weekday, hour
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            since = self._date(params.get("since"), "since")
+            until = self._date(params.get("until"), "until")
+            rows = job_facts.query(
+                group_by=[k.strip() for k in params.get("group_by", "").split(",") if k.strip()],
+                since=since,
+                until=until,
+                branch_ids=_int_list(params.get("branch")),
+                service_ids=_int_list(params.get("service")),
+            )
+        except (FactQueryError, ValueError) as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        for row in rows:
+            row["amount"] = str(row["amount"])
+            row["deposit"] = str(row["deposit"])
+        return Response({"as_of_job_id": job_facts.manifest()["last_job_id"], "results": rows})
+
+    def _date(self, value, name):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise ValueError(f"{name} must be YYYY-MM-DD")
+        return parsed
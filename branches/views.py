@@ -56,8 +56,11 @@ from jobs.services import (
     manager_service,
     shift_service,
     anomaly_service,
-    ShiftAggregationService,
+    shift_snapshot_service,
 )
+from jobs import counters
+from jobs.daysheet_cache import daysheet_cache
+from jobs.domain_events import domain_events
 from employees.auth.guards import (
     require_employee_login,
     require_permission_any,
@@ -159,9 +162,8 @@ class BranchViewSet(viewsets.ModelViewSet):
 
 def _get_models():
     DaySheet = apps.get_model("jobs", "DaySheet")
-    ShadowLogEvent = apps.get_model("jobs", "ShadowLogEvent")
     DaySheetShift = apps.get_model("jobs", "DaySheetShift")
-    return DaySheet, ShadowLogEvent, DaySheetShift
+    return DaySheet, DaySheetShift
 
 # ===================================================================
 # TEMPLATE VIEWS
@@ -202,7 +204,7 @@ def branch_manager_dashboard(request, branch_pk=None):
     """
 
     Branch = apps.get_model("branches", "Branch")
-    DaySheet, ShadowLogEvent, DaySheetShift = _get_models()
+    DaySheet, DaySheetShift = _get_models()
 
     # -------------------------------------------------
     # Resolve manager branch authority
@@ -236,8 +238,6 @@ def branch_manager_dashboard(request, branch_pk=None):
     # -------------------------------------------------
     # Business logic (UNCHANGED)
     # -------------------------------------------------
-    aggregator = ShiftAggregationService()
-
     def _within_day_close_window(now=None):
         now = now or timezone.localtime()
         return time(19, 30) <= now.time() <= time(20, 30)
@@ -257,9 +257,13 @@ def branch_manager_dashboard(request, branch_pk=None):
             date=timezone.localdate(),
         ).first()
 
+    sheet_jobs, sheet_amount = (
+        counters.read_totals(todays_sheet_obj) if todays_sheet_obj else (0, 0)
+    )
+
     todays_sheet = {
-        "total_jobs": getattr(todays_sheet_obj, "total_jobs", 0),
-        "total_amount": getattr(todays_sheet_obj, "total_amount", 0),
+        "total_jobs": sheet_jobs,
+        "total_amount": sheet_amount,
         "pending_amount": (
             todays_sheet_obj.meta.get("pending_amount", 0)
             if getattr(todays_sheet_obj, "meta", None)
@@ -288,13 +292,13 @@ def branch_manager_dashboard(request, branch_pk=None):
         shifts = (
             DaySheetShift.objects
             .filter(daysheet=todays_sheet_obj)
-            .select_related("user")
+            .select_related("user", "close_snapshot")
             .order_by("shift_start")
         )
 
         for shift in shifts:
             try:
-                agg = aggregator.aggregate(shift)
+                agg = shift_snapshot_service.shift_totals(shift)
             except Exception:
                 continue
 
@@ -325,16 +329,12 @@ def branch_manager_dashboard(request, branch_pk=None):
     recent_messages = []
 
     try:
-        events = (
-            ShadowLogEvent.objects
-            .filter(branch_id=branch_obj.pk)
-            .order_by("-timestamp")[:10]
-        )
+        events = domain_events.page(branch_id=branch_obj.pk, newest_first=True, limit=10).events
 
         for ev in events:
             recent_messages.append({
                 "title": ev.event_type.replace("_", " ").title(),
-                "created_at": ev.timestamp,
+                "created_at": ev.occurred_at,
             })
     except Exception:
         pass
@@ -423,6 +423,7 @@ def daysheet_lock(request, branch_id):
 
     sheet.locked = not sheet.locked
     sheet.save(update_fields=["locked"])
+    daysheet_cache.invalidate_sheet(sheet)
 
     return JsonResponse({"ok": True, "locked": sheet.locked})
 
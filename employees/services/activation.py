@@ -20,12 +20,14 @@ class AccountActivationService:
 
     Responsibilities:
     - Set employee_email from applicant email
-    - Generate secure temporary password
+    - Lock the password until credentials are issued
     - Create AuthorityAssignment (role + branch)
     - Set must_change_password = True
     - Return activation payload for welcome email
 
-    Does NOT send email — that is the caller's responsibility.
+    Does NOT issue the temporary password or send email: the welcome email
+    task does both (issue_temp_password), so the password is never stored
+    anywhere but the employee's password hash.
     """
 
     @classmethod
@@ -37,7 +39,6 @@ class AccountActivationService:
         Returns:
             {
                 "employee_email": str,
-                "temp_password": str,
                 "branch": Branch | None,
                 "role": AuthorityRole | None,
             }
@@ -45,9 +46,8 @@ class AccountActivationService:
         # 1. Set employee_email from applicant email
         cls._set_employee_email(employee, application)
 
-        # 2. Generate temporary password
-        temp_password = cls._generate_temp_password()
-        employee.set_password(temp_password)
+        # 2. No usable password until the welcome email task issues one
+        employee.set_unusable_password()
         employee.must_change_password = True
         employee.approved_at = timezone.now()
         employee.save(update_fields=[
@@ -84,11 +84,19 @@ class AccountActivationService:
 
         return {
             "employee_email": employee.employee_email,
-            "temp_password": temp_password,
             "branch": branch,
             "role": authority_role,
         }
 
+    @classmethod
+    def issue_temp_password(cls, employee) -> str:
+        """Set a fresh temporary password (must be changed on first login) and return it."""
+        temp_password = cls._generate_temp_password()
+        employee.set_password(temp_password)
+        employee.must_change_password = True
+        employee.save(update_fields=["password", "must_change_password"])
+        return temp_password
+
     # --------------------------------------------------
     # Internal helpers
     # --------------------------------------------------
@@ -0,0 +1,26 @@
+# employees/tasks.py
+from django.apps import apps
+
+from jobs.taskqueue import task
+
+
+@task(queue="email", priority=5, max_attempts=5)
+def send_welcome_email(employee_id, branch_id=None, role_id=None):
+    """
+    Issue first-login credentials and email them (queued by onboarding).
+
+    The temporary password is generated here, so it never sits in the task
+    row. A retry issues a new one; the last email sent is the valid one.
+    """
+    from employees.models import Employee
+    from employees.services.activation import AccountActivationService
+    from employees.services.email_service import EmployeeEmailService
+
+    employee = Employee.objects.get(pk=employee_id)
+    if not employee.must_change_password:
+        return {"skipped": "employee has already set a password"}
+    branch = apps.get_model("branches", "Branch").objects.filter(pk=branch_id).first() if branch_id else None
+    role = apps.get_model("Human_Resources", "AuthorityRole").objects.filter(pk=role_id).first() if role_id else None
+    temp_password = AccountActivationService.issue_temp_password(employee)
+    if not EmployeeEmailService.send_welcome_email(employee, temp_password=temp_password, branch=branch, role=role):
+        raise RuntimeError(f"welcome email to employee {employee_id} was not sent")
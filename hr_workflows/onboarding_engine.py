@@ -7,7 +7,7 @@ from hr_workflows.models.onboarding_phase import OnboardingPhase, PhaseStatus
 from hr_workflows.models.guarantor_detail import GuarantorDetail
 from employees.models import Employee
 from employees.services.activation import AccountActivationService, ActivationError
-from employees.services.email_service import EmployeeEmailService
+from employees.tasks import send_welcome_email
 
 
 class OnboardingError(Exception):
@@ -251,12 +251,12 @@ class OnboardingEngine:
                 application=application,
             )
 
-            # Send welcome email with credentials
-            EmployeeEmailService.send_welcome_email(
-                employee=employee,
-                temp_password=activation_payload["temp_password"],
-                branch=activation_payload["branch"],
-                role=activation_payload["role"],
+            # Issue credentials and email them (queued; runs once this commits)
+            branch, role = activation_payload["branch"], activation_payload["role"]
+            send_welcome_email.delay(
+                employee.pk,
+                branch_id=branch.pk if branch else None,
+                role_id=role.pk if role else None,
             )
 
         except ActivationError as e:
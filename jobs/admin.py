@@ -21,7 +21,11 @@ DaySheet = get_model_safe("jobs", "DaySheet")
 DaySheetShift = get_model_safe("jobs", "DaySheetShift")
 CorrectionEntry = get_model_safe("jobs", "CorrectionEntry")
 StatusLog = get_model_safe("jobs", "StatusLog")
+DomainEvent = get_model_safe("jobs", "DomainEvent")
+AuditSpoolEntry = get_model_safe("jobs", "AuditSpoolEntry")
 ShadowLogEvent = get_model_safe("jobs", "ShadowLogEvent")
+IngestedShadowEvent = get_model_safe("jobs", "IngestedShadowEvent")
+DaySheetChainSeal = get_model_safe("jobs", "DaySheetChainSeal")
 AnomalyFlag = get_model_safe("jobs", "AnomalyFlag")
 
 
@@ -105,6 +109,17 @@ if DaySheetShift is not None:
             return False
 
 
+if AuditSpoolEntry is not None:
+    @admin.register(AuditSpoolEntry)
+    class AuditSpoolEntryAdmin(admin.ModelAdmin):
+        list_display = ("id", "model_label", "attempts", "created_at", "last_attempt_at")
+        list_filter = ("model_label",)
+        readonly_fields = ("model_label", "rows", "error", "attempts", "created_at", "last_attempt_at")
+
+        def has_add_permission(self, request):
+            return False
+
+
 if CorrectionEntry is not None:
     @admin.register(CorrectionEntry)
     class CorrectionEntryAdmin(admin.ModelAdmin):
@@ -116,11 +131,13 @@ if CorrectionEntry is not None:
         actions = ["mark_approved", "mark_rejected"]
 
         def mark_approved(self, request, queryset):
-            updated = queryset.filter(status=CorrectionEntry.STATUS_OPEN).update(
-                status=CorrectionEntry.STATUS_APPROVED,
-                approved_by=request.user,
-                approved_at=timezone.now(),
-            )
+            # go through the service so amount corrections reach the shift snapshots
+            from jobs.services import correction_service
+
+            updated = 0
+            for correction in queryset.filter(status=CorrectionEntry.STATUS_OPEN):
+                correction_service.approve_correction(correction, request.user)
+                updated += 1
             self.message_user(request, f"{updated} correction(s) marked as approved.")
         mark_approved.short_description = "Mark selected corrections as APPROVED"
 
@@ -149,13 +166,58 @@ if StatusLog is not None:
             return False
 
 
+if DomainEvent is not None:
+    @admin.register(DomainEvent)
+    class DomainEventAdmin(admin.ModelAdmin):
+        list_display = ("id", "event_type", "aggregate_type", "aggregate_id", "seq", "branch_id", "actor_id", "occurred_at")
+        list_filter = ("aggregate_type", "event_type")
+        search_fields = ("aggregate_id", "branch_id", "actor_id")
+        readonly_fields = ("uuid", "seq", "schema_version", "payload", "occurred_at")
+
+        def has_add_permission(self, request):
+            return False
+
+        def has_delete_permission(self, request, obj=None):
+            return False
+
+
 if ShadowLogEvent is not None:
     @admin.register(ShadowLogEvent)
     class ShadowLogEventAdmin(admin.ModelAdmin):
-        list_display = ("id", "event_type", "branch_id", "timestamp", "sent_at", "received_at", "processed_at")
-        list_filter = ("event_type", "branch_id")
+        list_display = ("id", "event_type", "branch_id", "chain_seq", "timestamp", "delivery_status", "attempts", "next_attempt_at", "sent_at")
+        list_filter = ("delivery_status", "event_type", "branch_id")
         search_fields = ("payload", "branch_id", "event_type")
-        readonly_fields = ("payload", "signature", "timestamp", "sent_at", "received_at", "processed_at")
+        readonly_fields = (
+            "payload", "signature", "timestamp", "sent_at", "received_at", "processed_at",
+            "delivery_status", "attempts", "next_attempt_at", "lease_until", "claimed_by", "last_error",
+            "chain_seq", "prev_hash", "content_hash", "chain_hash",
+        )
+
+        def has_add_permission(self, request):
+            return False
+
+        def has_delete_permission(self, request, obj=None):
+            return False
+
+
+if IngestedShadowEvent is not None:
+    @admin.register(IngestedShadowEvent)
+    class IngestedShadowEventAdmin(admin.ModelAdmin):
+        list_display = ("id", "event_type", "branch_id", "timestamp", "received_at")
+        list_filter = ("event_type", "branch_id")
+        search_fields = ("uuid", "branch_id", "event_type")
+        readonly_fields = ("uuid", "payload", "signature", "timestamp", "received_at", "processed_at")
+
+        def has_add_permission(self, request):
+            return False
+
+
+if DaySheetChainSeal is not None:
+    @admin.register(DaySheetChainSeal)
+    class DaySheetChainSealAdmin(admin.ModelAdmin):
+        list_display = ("id", "daysheet", "branch_id", "first_seq", "last_seq", "leaf_count", "sealed_at")
+        list_filter = ("branch_id",)
+        readonly_fields = ("daysheet", "branch_id", "first_seq", "last_seq", "leaf_count", "merkle_root", "head_hash", "sealed_at")
 
         def has_add_permission(self, request):
             return False
@@ -174,3 +236,117 @@ if AnomalyFlag is not None:
 
         def has_delete_permission(self, request, obj=None):
             return False
+
+
+IdempotencyKey = get_model_safe("jobs", "IdempotencyKey")
+
+if IdempotencyKey is not None:
+    @admin.register(IdempotencyKey)
+    class IdempotencyKeyAdmin(admin.ModelAdmin):
+        list_display = ("id", "scope", "key", "user", "status", "response_status", "created_at", "expires_at")
+        list_filter = ("status",)
+        search_fields = ("scope", "key")
+        readonly_fields = ("created_at", "response_body", "request_hash")
+
+        def has_add_permission(self, request):
+            return False
+
+
+DaySheetCounterShard = get_model_safe("jobs", "DaySheetCounterShard")
+
+if DaySheetCounterShard is not None:
+    @admin.register(DaySheetCounterShard)
+    class DaySheetCounterShardAdmin(admin.ModelAdmin):
+        list_display = ("id", "daysheet", "slot", "total_jobs", "total_amount", "updated_at")
+        readonly_fields = ("daysheet", "slot", "total_jobs", "total_amount", "updated_at")
+
+        def has_add_permission(self, request):
+            return False
+
+        def has_delete_permission(self, request, obj=None):
+            return False
+
+
+ShiftCloseSnapshot = get_model_safe("jobs", "ShiftCloseSnapshot")
+
+if ShiftCloseSnapshot is not None:
+    @admin.register(ShiftCloseSnapshot)
+    class ShiftCloseSnapshotAdmin(admin.ModelAdmin):
+        list_display = ("id", "shift", "daysheet", "attendant", "job_count", "net_total", "adjustment_total", "corrections_applied", "computed_at")
+        readonly_fields = (
+            "shift", "daysheet", "attendant", "shift_start", "shift_end", "job_count",
+            "gross_total", "deposit_total", "net_total", "cash_total", "momo_total", "card_total",
+            "adjustment_total", "corrections_applied", "computed_at", "updated_at",
+        )
+
+        def has_add_permission(self, request):
+            return False
+
+        def has_delete_permission(self, request, obj=None):
+            return False
+
+
+
+RegionDailySale = get_model_safe("jobs", "RegionDailySale")
+BeltDailySale = get_model_safe("jobs", "BeltDailySale")
+CountryDailySale = get_model_safe("jobs", "CountryDailySale")
+
+if RegionDailySale is not None:
+    @admin.register(RegionDailySale)
+    class RegionDailySaleAdmin(admin.ModelAdmin):
+        list_display = ("region", "date", "total_amount", "total_count", "updated_at")
+        list_filter = ("region", "date")
+        readonly_fields = ("updated_at",)
+
+
+if BeltDailySale is not None:
+    @admin.register(BeltDailySale)
+    class BeltDailySaleAdmin(admin.ModelAdmin):
+        list_display = ("belt", "date", "total_amount", "total_count", "updated_at")
+        list_filter = ("belt", "date")
+        readonly_fields = ("updated_at",)
+
+
+if CountryDailySale is not None:
+    @admin.register(CountryDailySale)
+    class CountryDailySaleAdmin(admin.ModelAdmin):
+        list_display = ("country", "date", "total_amount", "total_count", "updated_at")
+        list_filter = ("country", "date")
+        readonly_fields = ("updated_at",)
+
+
+BackgroundTask = get_model_safe("jobs", "BackgroundTask")
+
+if BackgroundTask is not None:
+    @admin.register(BackgroundTask)
+    class BackgroundTaskAdmin(admin.ModelAdmin):
+        list_display = ("name", "queue", "priority", "status", "attempts", "progress", "run_at", "finished_at")
+        list_filter = ("status", "queue", "name")
+        search_fields = ("uuid", "name", "unique_key")
+        # arguments may carry secrets (sensitive tasks); they are not shown
+        exclude = ("args", "kwargs")
+        readonly_fields = (
+            "uuid", "attempts", "locked_by", "lease_until", "progress", "progress_message",
+            "result", "last_error", "created_at", "started_at", "finished_at",
+        )
+
+
+AutoCloseSweep = get_model_safe("jobs", "AutoCloseSweep")
+
+if AutoCloseSweep is not None:
+    @admin.register(AutoCloseSweep)
+    class AutoCloseSweepAdmin(admin.ModelAdmin):
+        list_display = ("started_at", "duration_ms", "branches", "sheets_due", "sheets_closed", "shifts_closed", "worker")
+        date_hierarchy = "started_at"
+        readonly_fields = ("started_at", "duration_ms", "branches", "sheets_due", "sheets_closed", "shifts_closed", "worker")
+
+
+TerminalHeartbeat = get_model_safe("jobs", "TerminalHeartbeat")
+
+if TerminalHeartbeat is not None:
+    @admin.register(TerminalHeartbeat)
+    class TerminalHeartbeatAdmin(admin.ModelAdmin):
+        list_display = ("branch", "user", "device_id", "first_seen", "last_seen")
+        list_filter = ("branch",)
+        search_fields = ("device_id",)
+        readonly_fields = ("first_seen", "last_seen")
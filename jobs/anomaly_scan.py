@@ -0,0 +1,218 @@
+# jobs/anomaly_scan.py
+"""
+Batch anomaly detection over many day sheets.
+
+AnomalyService checks one job / sheet / shift as it happens. The scanner
+runs the same rules over a date range of sheets with a few set-based
+queries per chunk of sheets:
+
+    duplicate_jobs          same service and amount on a sheet within
+                            ANOMALY_DUPLICATE_WINDOW_SECONDS (one ordered scan)
+    high_free_jobs          share of uncharged jobs >= ANOMALY_FREE_JOB_RATIO
+                            (one grouped count)
+    mismatch_cash           shift closing cash vs its close snapshot beyond
+                            ANOMALY_CASH_TOLERANCE (one join)
+    repeated_corrections    non-note corrections on a sheet >=
+                            ANOMALY_REPEATED_CORRECTIONS (one grouped count)
+
+Every finding carries an AnomalyFlag.fingerprint (unique), the same one
+the online detectors use, so a flag is raised once however many times a
+sheet is scanned. New flags are written with one bulk_create per chunk
+and announced with one ANOMALY_FLAGGED domain event each.
+"""
+from datetime import date
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from jobs.domain_events import domain_events
+from jobs.models import AnomalyFlag, CorrectionEntry, DaySheet, Job, ShiftCloseSnapshot
+from jobs.services import FREE_JOB_Q, cash_mismatch_tolerance
+
+logger = logging.getLogger(__name__)
+
+SCAN_CHUNK = 500
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+class AnomalyScanner:
+
+    def __init__(self):
+        self.detectors: Dict[str, Callable[[List[int]], List[AnomalyFlag]]] = {
+            AnomalyFlag.TYPE_DUPLICATE_JOBS: self.detect_duplicate_jobs,
+            AnomalyFlag.TYPE_HIGH_FREE_JOBS: self.detect_high_free_jobs,
+            AnomalyFlag.TYPE_MISMATCH_CASH: self.detect_cash_mismatch,
+            AnomalyFlag.TYPE_REPEATED_CORRECTIONS: self.detect_repeated_corrections,
+        }
+
+    # -------------------------------------------------
+    # Entry point
+    # -------------------------------------------------
+    def scan(
+        self,
+        since: date,
+        until: date,
+        branch_ids: Optional[Iterable[int]] = None,
+        detectors: Optional[Iterable[str]] = None,
+        dry_run: bool = False,
+    ) -> dict:
+        """
+        Run `detectors` (default all) over the sheets dated [since, until].
+        Returns {"sheets": n, "found": {type: n}, "created": {type: n}}.
+        """
+        names = list(detectors or self.detectors)
+        unknown = [n for n in names if n not in self.detectors]
+        if unknown:
+            raise ValueError(f"Unknown detector(s): {', '.join(unknown)}")
+
+        sheets = DaySheet.objects.filter(date__gte=since, date__lte=until)
+        if branch_ids:
+            sheets = sheets.filter(branch_id__in=list(branch_ids))
+        branch_by_sheet = dict(sheets.order_by("pk").values_list("pk", "branch_id"))
+
+        summary = {"sheets": len(branch_by_sheet), "found": dict.fromkeys(names, 0), "created": dict.fromkeys(names, 0)}
+        ids = list(branch_by_sheet)
+        for start in range(0, len(ids), SCAN_CHUNK):
+            chunk = ids[start:start + SCAN_CHUNK]
+            findings = []
+            for name in names:
+                found = self.detectors[name](chunk)
+                summary["found"][name] += len(found)
+                findings.extend(found)
+            for flag in self.emit(findings, branch_by_sheet, dry_run=dry_run):
+                summary["created"][flag.flag_type] += 1
+        return summary
+
+    def emit(self, findings: List[AnomalyFlag], branch_by_sheet: Dict[int, int], dry_run: bool = False, source: str = "scan") -> List[AnomalyFlag]:
+        """Save the findings not flagged yet and announce them. Returns the new flags."""
+        if not findings:
+            return []
+        existing = set(
+            AnomalyFlag.objects.filter(fingerprint__in=[f.fingerprint for f in findings])
+            .values_list("fingerprint", flat=True)
+        )
+        new = [f for f in findings if f.fingerprint not in existing]
+        if dry_run or not new:
+            return new
+
+        with transaction.atomic():
+            # a concurrent online detector may have raised the same flag meanwhile
+            AnomalyFlag.objects.bulk_create(new, batch_size=500, ignore_conflicts=True)
+            inserted = set(AnomalyFlag.objects.filter(uuid__in=[f.uuid for f in new]).values_list("uuid", flat=True))
+            new = [f for f in new if f.uuid in inserted]
+            for flag in new:
+                domain_events.record(
+                    "AnomalyFlag", flag.uuid, "ANOMALY_FLAGGED",
+                    {
+                        "flag_type": flag.flag_type,
+                        "fingerprint": flag.fingerprint,
+                        "daysheet_id": flag.daily_sheet_id,
+                        "shift_id": flag.shift_id,
+                        "source": source,
+                    },
+                    branch_id=branch_by_sheet.get(flag.daily_sheet_id),
+                )
+        return new
+
+    # -------------------------------------------------
+    # Detectors: sheet ids -> unsaved AnomalyFlags
+    # -------------------------------------------------
+    def detect_duplicate_jobs(self, sheet_ids: List[int]) -> List[AnomalyFlag]:
+        window = int(_setting("ANOMALY_DUPLICATE_WINDOW_SECONDS", 120))
+        rows = (
+            Job.objects.filter(daysheet_id__in=sheet_ids)
+            .order_by("daysheet_id", "service_id", "total_amount", "created_at", "pk")
+            .values_list("pk", "daysheet_id", "service_id", "total_amount", "created_at")
+        )
+        flags, prev = [], None
+        for pk, sheet_id, service_id, amount, created_at in rows.iterator(chunk_size=2000):
+            if (
+                prev is not None
+                and prev[1:4] == (sheet_id, service_id, amount)
+                and (created_at - prev[4]).total_seconds() <= window
+            ):
+                flags.append(AnomalyFlag(
+                    daily_sheet_id=sheet_id,
+                    flag_type=AnomalyFlag.TYPE_DUPLICATE_JOBS,
+                    severity=AnomalyFlag.SEV_MEDIUM,
+                    description=f"Duplicate job detected: job {pk} similar to {prev[0]}",
+                    notified_to=[{"role": "manager"}],
+                    fingerprint=AnomalyFlag.make_fingerprint(AnomalyFlag.TYPE_DUPLICATE_JOBS, "job", pk),
+                ))
+            prev = (pk, sheet_id, service_id, amount, created_at)
+        return flags
+
+    def detect_high_free_jobs(self, sheet_ids: List[int]) -> List[AnomalyFlag]:
+        threshold = float(_setting("ANOMALY_FREE_JOB_RATIO", 0.2))
+        rows = (
+            Job.objects.filter(daysheet_id__in=sheet_ids)
+            .values("daysheet_id")
+            .annotate(total=Count("pk"), free=Count("pk", filter=FREE_JOB_Q))
+            .filter(free__gt=0)
+        )
+        flags = []
+        for row in rows:
+            ratio = row["free"] / float(row["total"])
+            if ratio >= threshold:
+                flags.append(AnomalyFlag(
+                    daily_sheet_id=row["daysheet_id"],
+                    flag_type=AnomalyFlag.TYPE_HIGH_FREE_JOBS,
+                    severity=AnomalyFlag.SEV_HIGH,
+                    description=f"High free-job ratio: {row['free']}/{row['total']} ({ratio:.2f})",
+                    notified_to=[{"role": "manager"}, {"role": "hq"}],
+                    fingerprint=AnomalyFlag.make_fingerprint(AnomalyFlag.TYPE_HIGH_FREE_JOBS, "daysheet", row["daysheet_id"]),
+                ))
+        return flags
+
+    def detect_cash_mismatch(self, sheet_ids: List[int]) -> List[AnomalyFlag]:
+        tolerance = cash_mismatch_tolerance()
+        rows = ShiftCloseSnapshot.objects.filter(
+            daysheet_id__in=sheet_ids, shift__closing_cash__isnull=False,
+        ).values_list("shift_id", "daysheet_id", "cash_total", "shift__closing_cash")
+        flags = []
+        for shift_id, sheet_id, cash_total, closing_cash in rows:
+            if abs(Decimal(closing_cash or 0) - Decimal(cash_total or 0)) > tolerance:
+                flags.append(AnomalyFlag(
+                    daily_sheet_id=sheet_id,
+                    shift_id=shift_id,
+                    flag_type=AnomalyFlag.TYPE_MISMATCH_CASH,
+                    severity=AnomalyFlag.SEV_HIGH,
+                    description=f"Shift cash mismatch: reported {closing_cash} vs computed {cash_total}",
+                    notified_to=[{"role": "manager"}, {"role": "hq"}],
+                    fingerprint=AnomalyFlag.make_fingerprint(AnomalyFlag.TYPE_MISMATCH_CASH, "shift", shift_id),
+                ))
+        return flags
+
+    def detect_repeated_corrections(self, sheet_ids: List[int]) -> List[AnomalyFlag]:
+        threshold = int(_setting("ANOMALY_REPEATED_CORRECTIONS", 3))
+        rows = (
+            CorrectionEntry.objects.filter(daily_sheet_id__in=sheet_ids)
+            .exclude(type=CorrectionEntry.TYPE_NOTE)
+            .values("daily_sheet_id")
+            .annotate(n=Count("pk"))
+            .filter(n__gte=threshold)
+        )
+        return [
+            AnomalyFlag(
+                daily_sheet_id=row["daily_sheet_id"],
+                flag_type=AnomalyFlag.TYPE_REPEATED_CORRECTIONS,
+                severity=AnomalyFlag.SEV_MEDIUM,
+                description=f"{row['n']} corrections raised on one day sheet",
+                notified_to=[{"role": "manager"}, {"role": "hq"}],
+                fingerprint=AnomalyFlag.make_fingerprint(AnomalyFlag.TYPE_REPEATED_CORRECTIONS, "daysheet", row["daily_sheet_id"]),
+            )
+            for row in rows
+        ]
+
+
+anomaly_scanner = AnomalyScanner()
+
+
+__all__ = ["AnomalyScanner", "anomaly_scanner"]
@@ -1,5 +1,11 @@
+import functools
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
+from rest_framework import status
+from rest_framework.response import Response
+
+from jobs import idempotency
 
 def compute_queue_position_and_eta(job):
     """
@@ -28,3 +34,57 @@ def compute_queue_position_and_eta(job):
     total_minutes += job.estimated_total_minutes()
     eta = timezone.now() + timedelta(minutes=total_minutes)
     return queue_position, eta
+
+
+def idempotent(scope):
+    """
+    Make a DRF view method honour the `Idempotency-Key` request header.
+
+    Requests without the header run unchanged. Detail actions get the object
+    pk appended to the scope so one key cannot replay across jobs.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(idempotency.IDEMPOTENCY_HEADER)
+            if not key:
+                return view_method(self, request, *args, **kwargs)
+
+            full_scope = f"{scope}:{kwargs['pk']}" if kwargs.get("pk") is not None else scope
+            user = request.user if request.user.is_authenticated else None
+            try:
+                record, claimed = idempotency.claim(
+                    full_scope,
+                    key,
+                    user=user,
+                    request_hash=idempotency.request_fingerprint(request.data),
+                )
+            except idempotency.IdempotencyInProgress as exc:
+                return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+            except idempotency.IdempotencyError as exc:
+                return Response({"detail": str(exc)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+            if not claimed:
+                response = Response(record.response_body, status=record.response_status or status.HTTP_200_OK)
+                response["Idempotent-Replayed"] = "true"
+                return response
+
+            # the view's writes and the stored response commit together
+            try:
+                with transaction.atomic():
+                    response = view_method(self, request, *args, **kwargs)
+                    if response.status_code < 500:
+                        idempotency.complete(record, status_code=response.status_code, body=response.data)
+            except idempotency.IdempotencyLeaseLost as exc:
+                return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+            except Exception:
+                idempotency.release(record)
+                raise
+
+            if response.status_code >= 500:
+                idempotency.release(record)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -14,6 +14,7 @@ from jobs.models import (
 )
 
 from jobs.services import job_service
+from jobs.queueing import queue_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -255,9 +256,89 @@ class JobSerializer(serializers.ModelSerializer):
             except Exception:
                 logger.exception("Failed to attach job to daysheet")
 
+            queue_scheduler.enqueue(job)
+            job.refresh_from_db(fields=["queue_position", "expected_ready_at"])
+
             return job
 
 
+# ==================================================
+# BATCH INSTANT JOBS
+# ==================================================
+
+class InstantJobLineSerializer(serializers.Serializer):
+    service = serializers.PrimaryKeyRelatedField(queryset=ServiceType.objects.all())
+    quantity = serializers.IntegerField(min_value=1, default=1)
+    deposit_amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, default=Decimal("0.00"))
+    description = serializers.CharField(required=False, allow_blank=True, default="")
+    paper_size = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    print_mode = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    color_mode = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    side_mode = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class InstantJobBatchSerializer(serializers.Serializer):
+    """
+    Several instant line items for one customer, created in one transaction.
+    """
+    MAX_LINES = 200
+
+    branch = serializers.PrimaryKeyRelatedField(
+        queryset=Job._meta.get_field("branch").related_model.objects.all(),
+        required=False,
+    )
+    customer_name = serializers.CharField(required=False, allow_blank=True, default="")
+    customer_phone = serializers.CharField(required=False, allow_blank=True, default="")
+    lines = InstantJobLineSerializer(many=True)
+
+    def validate_lines(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one line is required.")
+        if len(value) > self.MAX_LINES:
+            raise serializers.ValidationError(f"At most {self.MAX_LINES} lines per batch.")
+        return value
+
+    def _normalize_variant(self, value):
+        return value if value not in ("", None) else None
+
+    def create(self, validated_data):
+        request = self.context.get("request")
+        user = request.user if request and request.user.is_authenticated else None
+
+        branch = validated_data.get("branch")
+        if not branch:
+            branch = JobSerializer()._infer_branch_from_user(user) if user else None
+            if not branch:
+                raise serializers.ValidationError(
+                    "branch is required (no assigned branch found for user)."
+                )
+
+        lines = [
+            {
+                "service_id": line["service"].pk,
+                "quantity": line.get("quantity", 1),
+                "deposit": line.get("deposit_amount", 0),
+                "description": line.get("description", ""),
+                "paper_size": self._normalize_variant(line.get("paper_size")),
+                "print_mode": self._normalize_variant(line.get("print_mode")),
+                "color_mode": self._normalize_variant(line.get("color_mode")),
+                "side_mode": self._normalize_variant(line.get("side_mode")),
+            }
+            for line in validated_data["lines"]
+        ]
+
+        try:
+            return job_service.create_instant_jobs_batch(
+                branch_id=branch.pk,
+                lines=lines,
+                created_by=user,
+                customer_name=validated_data.get("customer_name") or "",
+                customer_phone=validated_data.get("customer_phone") or "",
+            )
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
+
 # ==================================================
 # PRICING RULES (READ-ONLY)
 # ==================================================
@@ -9,6 +9,11 @@ from .views import (
     job_receipt,
     ServiceTypeListAPIView,
     ServicePricingRuleListAPIView,
+    HQIngestAPIView,
+    HQSalesRollupAPIView,
+    AutoCloseMetricsAPIView,
+    TerminalHeartbeatAPIView,
+    BackgroundTaskStatusAPIView,
 )
 
 router = DefaultRouter()
@@ -36,4 +41,13 @@ urlpatterns = [
         ServicePricingRuleListAPIView.as_view(),
         name="service-pricing",
     ),
+
+    # ----------------------------
+    # HQ ingestion (branch outbox batches)
+    # ----------------------------
+    path("hq/ingest/", HQIngestAPIView.as_view(), name="hq-ingest"),
+    path("hq/sales/", HQSalesRollupAPIView.as_view(), name="hq-sales"),
+    path("heartbeat/", TerminalHeartbeatAPIView.as_view(), name="terminal-heartbeat"),
+    path("hq/auto-close/", AutoCloseMetricsAPIView.as_view(), name="auto-close-metrics"),
+    path("tasks/<uuid:task_uuid>/", BackgroundTaskStatusAPIView.as_view(), name="task-status"),
 ]
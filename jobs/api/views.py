@@ -3,7 +3,7 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.views import APIView
 
 from django.shortcuts import render, get_object_or_404
@@ -14,12 +14,21 @@ import logging
 
 from .serializers import (
     JobSerializer,
+    InstantJobBatchSerializer,
     JobRecordSerializer,
     JobAttachmentSerializer,
     ServiceTypeSerializer,
     ServicePricingRuleSerializer,
 )
 
+from .helpers import idempotent
+from jobs.auto_close import auto_close_scheduler
+from jobs.heartbeats import heartbeats
+from jobs.hq_ingest import IngestError, decode_batch, ingest_batch
+from jobs.outbox import BRANCH_HEADER, SIGNATURE_HEADER
+from jobs.queueing import queue_scheduler
+from jobs.sales_rollups import LEVELS as ROLLUP_LEVELS, sales_rollups
+from jobs.taskqueue import task_status
 from jobs.services import (
     job_service,
     shift_service,
@@ -82,11 +91,57 @@ class JobViewSet(ReadWritePermissionMixin, viewsets.ModelViewSet):
         ctx["request"] = self.request
         return ctx
 
+    @idempotent("job.create")
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         user = self.request.user if self.request.user.is_authenticated else None
         serializer.save(created_by=user)
 
+    def perform_update(self, serializer):
+        job = serializer.save()
+        queue_scheduler.job_changed(job)
+
+    def perform_destroy(self, instance):
+        branch_id = instance.branch_id
+        instance.delete()
+        queue_scheduler.reschedule(branch_id)
+
+    @action(detail=False, methods=["get"], url_path="queue")
+    def queue(self, request):
+        """
+        GET /api/jobs/jobs/queue/?branch=<id>
+        Branch production queue (positions + ETAs) in one query.
+        """
+        branch = request.query_params.get("branch")
+        if not branch:
+            user = request.user if request.user.is_authenticated else None
+            branch_obj = JobSerializer()._infer_branch_from_user(user) if user else None
+            branch = getattr(branch_obj, "pk", None)
+        try:
+            branch_id = int(branch)
+        except (TypeError, ValueError):
+            return Response({"detail": "branch is required"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(queue_scheduler.read_model(branch_id))
+
+    @action(detail=False, methods=["post"], url_path="batch", permission_classes=[IsAuthenticated])
+    @idempotent("job.batch")
+    def batch(self, request):
+        """
+        POST /api/jobs/jobs/batch/
+        Create several instant jobs for one customer in a single transaction.
+        """
+        serializer = InstantJobBatchSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        jobs = serializer.save()
+        return Response(
+            self.get_serializer(jobs, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
+
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    @idempotent("job.start")
     def start(self, request, pk=None):
         job = self.get_object()
         if job.status == "in_progress":
@@ -95,11 +150,12 @@ class JobViewSet(ReadWritePermissionMixin, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        job.status = "in_progress"
-        job.save(update_fields=["status"])
+        queue_scheduler.start(job)
+        job.refresh_from_db(fields=["queue_position", "expected_ready_at"])
         return Response(self.get_serializer(job).data)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    @idempotent("job.complete")
     def complete(self, request, pk=None):
         job = self.get_object()
         if job.status == "completed":
@@ -113,12 +169,14 @@ class JobViewSet(ReadWritePermissionMixin, viewsets.ModelViewSet):
             job.status = "completed"
             job.completed_at = now
             job.save(update_fields=["status", "completed_at"])
+            queue_scheduler.job_changed(job, now=now)
 
             try:
                 JobRecord.objects.create(
                     job=job,
                     performed_by=request.user,
-                    time_start=now,
+                    # a job completed without being started has no duration to learn from
+                    time_start=job.started_at or now,
                     time_end=now,
                     quantity_produced=job.quantity or 1,
                     notes="Marked completed via API",
@@ -248,3 +306,123 @@ class ServicePricingRuleListAPIView(APIView):
         )
         serializer = ServicePricingRuleSerializer(rules, many=True)
         return Response(serializer.data)
+
+
+# ==================================================
+# HQ INGESTION (BRANCH SHADOW EVENTS)
+# ==================================================
+
+class HQIngestAPIView(APIView):
+    """
+    Bulk endpoint for branch outbox dispatchers.
+    Authenticated by the batch HMAC header under the key of the branch
+    named in X-Octos-Branch, not by user session.
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        branch_id = request.headers.get(BRANCH_HEADER, "").strip()
+        try:
+            events = decode_batch(
+                request.body,
+                content_encoding=request.headers.get("Content-Encoding", ""),
+                signature=request.headers.get(SIGNATURE_HEADER, ""),
+                branch_id=branch_id,
+            )
+        except IngestError as exc:
+            return Response({"detail": str(exc)}, status=exc.status)
+
+        acks = ingest_batch(events, branch_id=branch_id)
+        return Response({"ok": True, "acks": acks})
+
+
+# ==================================================
+# HQ SALES ROLLUPS
+# ==================================================
+
+class HQSalesRollupAPIView(APIView):
+    """
+    Sales per region / belt / country from the rollup tables.
+    GET ?level=belt&days=90   (level: region | belt | country, days: 1..366)
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        level = request.query_params.get("level", "region")
+        if level not in ROLLUP_LEVELS:
+            return Response({"detail": f"level must be one of {', '.join(ROLLUP_LEVELS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            days = int(request.query_params.get("days", 90))
+        except (TypeError, ValueError):
+            return Response({"detail": "days must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        days = max(1, min(days, 366))
+
+        rows = sales_rollups.last_days(level, days)
+        return Response({
+            "level": level,
+            "days": days,
+            "results": [{**row, "total_amount": str(row["total_amount"])} for row in rows],
+        })
+
+
+# ==================================================
+# TERMINAL HEARTBEATS
+# ==================================================
+
+class TerminalHeartbeatAPIView(APIView):
+    """
+    Liveness ping from an attendant dashboard; no DB write per ping.
+    POST {"device_id": "..."}   (or X-Device-Id header)  -> 204
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        branch_id = getattr(request.user, "branch_id", None)
+        if not branch_id:
+            return Response({"detail": "User has no branch"}, status=status.HTTP_400_BAD_REQUEST)
+        device_id = str(request.data.get("device_id") or request.headers.get("X-Device-Id") or "web")
+        heartbeats.ping(branch_id, request.user.pk, device_id[:64])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# ==================================================
+# AUTO-CLOSE SWEEPS
+# ==================================================
+
+class AutoCloseMetricsAPIView(APIView):
+    """
+    Duration stats of the recent auto-close sweeps.
+    GET ?limit=50   (1..500)
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", 50))
+        except (TypeError, ValueError):
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(auto_close_scheduler.metrics(limit=max(1, min(limit, 500))))
+
+
+# ==================================================
+# BACKGROUND TASKS
+# ==================================================
+
+class BackgroundTaskStatusAPIView(APIView):
+    """
+    Status / progress of one queued background task.
+    GET /tasks/<uuid>/
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, task_uuid):
+        snapshot = task_status(task_uuid)
+        if snapshot is None:
+            return Response({"detail": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(snapshot)
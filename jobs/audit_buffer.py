@@ -0,0 +1,309 @@
+# jobs/audit_buffer.py
+"""
+Commit-time batched writer for append-only audit rows
+(StatusLog, AuditLog, RecruitmentTransitionLog).
+
+    audit_buffer.add(StatusLog(...))
+
+Inside a transaction the row is not inserted immediately. It is queued
+and written by one bulk_create per model from transaction.on_commit:
+
+  * rows are grouped into segments, each flushed by its own on_commit hook
+    registered under the savepoint that was open when it started; rolling
+    that savepoint (or the whole transaction) back drops the segment;
+  * once a nested atomic block is released its segment shares the fate of
+    the enclosing block, so later rows of that block are merged into it
+    and a whole service call normally costs one INSERT per model;
+  * outside a transaction, with `immediate=True`, inside
+    `immediate_writes()` or with AUDIT_BUFFER_ENABLED = False the row is
+    saved at once (use this when the caller needs its pk);
+  * bulk_create does not send post_save, so only models without
+    post_save receivers should be buffered;
+  * if a batch fails after commit its rows are retried one by one; only
+    the rows that still fail are dropped from the batch, and they go to
+    AuditSpoolEntry (logged at ERROR) and are replayed by replay_spool()
+    (task jobs.tasks.replay_audit_spool, every AUDIT_SPOOL_REPLAY_SECONDS).
+
+AuditBufferMiddleware counts buffered rows per request and logs the
+INSERTs saved by batching.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
+import json
+import logging
+import threading
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_request_stats: ContextVar[Optional[dict]] = ContextVar("audit_buffer_request_stats", default=None)
+
+
+def buffering_enabled() -> bool:
+    return bool(getattr(settings, "AUDIT_BUFFER_ENABLED", True))
+
+
+class _Segment:
+    """Rows queued under one savepoint stack; flushed by its own on_commit hook."""
+
+    def __init__(self, using: str, sids: tuple, stats: Optional[dict]):
+        self.using = using
+        self.sids = sids
+        self.stats = stats
+        self.rows: Dict[type, List] = {}
+        self.done = False
+        self.callback = self.flush
+
+    def alive(self, conn) -> bool:
+        # the hook disappears from run_on_commit when its savepoint rolls back
+        if self.done:
+            return False
+        return any(func is self.callback for _, func, *_ in conn.run_on_commit)
+
+    def scope(self, open_sids: tuple) -> tuple:
+        """Savepoints of this segment that are still open (the ones deciding its fate)."""
+        n = 0
+        for a, b in zip(self.sids, open_sids):
+            if a != b:
+                break
+            n += 1
+        return self.sids[:n]
+
+    def absorb(self, other: "_Segment"):
+        for model, objs in other.rows.items():
+            self.rows.setdefault(model, []).extend(objs)
+        other.rows = {}
+        other.done = True
+
+    def flush(self):
+        self.done = True
+        rows, self.rows = self.rows, {}
+        records = inserts = 0
+        for model, objs in rows.items():
+            try:
+                _write(model, objs, self.using)
+            except Exception:
+                written, failed, exc = _write_rows(model, objs, self.using)
+                records += written
+                inserts += written
+                if failed:
+                    spool(model, failed, exc, using=self.using)
+                continue
+            records += len(objs)
+            inserts += 1
+        _count(self.stats, records, inserts)
+
+
+BATCH_SIZE = 500
+
+
+def _write(model, objs: List, using: str):
+    if len(objs) > BATCH_SIZE:
+        # several INSERTs: all or nothing, so a retry cannot duplicate rows
+        with transaction.atomic(using=using):
+            model.objects.using(using).bulk_create(objs, batch_size=BATCH_SIZE)
+    else:
+        model.objects.using(using).bulk_create(objs)
+
+
+def _write_rows(model, objs: List, using: str):
+    """Write objs one at a time after a failed batch. Returns (written, failed rows, last error)."""
+    written, failed, error = 0, [], None
+    for obj in objs:
+        try:
+            with transaction.atomic(using=using):
+                _write(model, [obj], using)
+        except Exception as exc:
+            failed.append(obj)
+            error = exc
+            continue
+        written += 1
+    return written, failed, error
+
+
+# -------------------------------------------------
+# Spool for rows that failed to write after commit
+# -------------------------------------------------
+def _dump(obj) -> dict:
+    row = {}
+    for f in obj._meta.concrete_fields:
+        if f.primary_key and isinstance(f, models.AutoField):
+            continue
+        value = f.value_from_object(obj)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, (uuid.UUID, Decimal)):
+            value = str(value)
+        row[f.attname] = value
+    return row
+
+
+def _load(model, row: dict):
+    fields = {f.attname: f for f in model._meta.concrete_fields}
+    values = {}
+    for name, value in row.items():
+        f = fields.get(name)
+        if f is None:
+            continue
+        values[name] = value if isinstance(f, models.JSONField) or value is None else f.to_python(value)
+    return model(**values)
+
+
+def spool(model, objs: List, exc: Exception, using: str = DEFAULT_DB_ALIAS):
+    """Keep committed audit rows that could not be written, for replay_spool()."""
+    from jobs.models import AuditSpoolEntry
+
+    logger.error(
+        "AuditBuffer: failed to write %s %s row(s) after commit (%s); spooled for replay",
+        len(objs), model.__name__, exc,
+    )
+    rows = [_dump(obj) for obj in objs]
+    try:
+        with transaction.atomic(using=using):
+            AuditSpoolEntry.objects.using(using).create(
+                model_label=model._meta.label, rows=rows, error=repr(exc)[:2000],
+            )
+    except Exception:
+        # last resort: the rows themselves go to the log
+        logger.critical(
+            "AuditBuffer: could not spool %s %s row(s); rows: %s",
+            len(rows), model.__name__, json.dumps(rows, cls=DjangoJSONEncoder),
+            exc_info=True,
+        )
+
+
+def replay_spool(limit: int = 100, using: str = DEFAULT_DB_ALIAS) -> dict:
+    """Write spooled rows again, oldest first. Returns {"entries", "rows", "failed"}."""
+    from jobs.models import AuditSpoolEntry
+
+    result = {"entries": 0, "rows": 0, "failed": 0}
+    for entry_id in list(AuditSpoolEntry.objects.using(using).order_by("id").values_list("pk", flat=True)[:limit]):
+        with transaction.atomic(using=using):
+            qs = AuditSpoolEntry.objects.using(using).select_for_update(
+                skip_locked=connections[using].features.has_select_for_update_skip_locked
+            )
+            entry = qs.filter(pk=entry_id).first()
+            if entry is None:  # replayed by someone else meanwhile
+                continue
+            result["entries"] += 1
+            model = apps.get_model(entry.model_label)
+            objs = [_load(model, row) for row in entry.rows]
+            try:
+                with transaction.atomic(using=using):
+                    _write(model, objs, using)
+            except Exception as exc:
+                logger.error("AuditBuffer: replay of spooled %s entry %s failed: %s", entry.model_label, entry.pk, exc)
+                entry.attempts += 1
+                entry.error = repr(exc)[:2000]
+                entry.last_attempt_at = timezone.now()
+                entry.save(update_fields=["attempts", "error", "last_attempt_at"])
+                result["failed"] += 1
+                continue
+            result["rows"] += len(objs)
+            entry.delete()
+    return result
+
+
+def _count(stats: Optional[dict], records: int, inserts: int):
+    if stats is not None:
+        stats["records"] += records
+        stats["inserts"] += inserts
+
+
+class AuditBuffer:
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def add(self, obj, immediate: bool = False, using: Optional[str] = None):
+        """Queue an unsaved audit row; returns it (pk is None until flushed)."""
+        using = using or DEFAULT_DB_ALIAS
+        conn = connections[using]
+        if immediate or not buffering_enabled() or getattr(self._local, "immediate", 0) or not conn.in_atomic_block:
+            obj.save(using=using)
+            _count(_request_stats.get(), 1, 1)
+            return obj
+
+        open_sids = tuple(conn.savepoint_ids)
+        segments = getattr(self._local, "segments", None) or {}
+        live = [seg for seg in segments.get(using, ()) if seg.alive(conn)]
+
+        segment = None
+        for seg in live:
+            if seg.scope(open_sids) != open_sids:
+                continue
+            if segment is None:
+                segment = seg
+            else:
+                segment.absorb(seg)
+        if segment is None:
+            segment = _Segment(using, open_sids, _request_stats.get())
+            transaction.on_commit(segment.callback, using=using)
+            live.append(segment)
+        segments[using] = [seg for seg in live if not seg.done]
+        self._local.segments = segments
+        segment.rows.setdefault(type(obj), []).append(obj)
+        return obj
+
+    @contextmanager
+    def immediate_writes(self):
+        """Save audit rows at once inside this block."""
+        self._local.immediate = getattr(self._local, "immediate", 0) + 1
+        try:
+            yield
+        finally:
+            self._local.immediate -= 1
+
+
+audit_buffer = AuditBuffer()
+
+
+@contextmanager
+def request_scope():
+    """Collect {"records", "inserts"} for the audit rows written in this scope."""
+    stats = {"records": 0, "inserts": 0}
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+
+
+class AuditBufferMiddleware:
+    """Reports how many audit INSERTs batching saved in each request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_scope() as stats:
+            response = self.get_response(request)
+        saved = stats["records"] - stats["inserts"]
+        if stats["records"]:
+            logger.debug(
+                "AuditBuffer: %s %s wrote %s audit row(s) in %s insert(s), saved %s",
+                request.method, request.path, stats["records"], stats["inserts"], saved,
+            )
+            if settings.DEBUG:
+                response["X-Audit-Inserts-Saved"] = str(saved)
+        return response
+
+
+__all__ = [
+    "AuditBuffer",
+    "audit_buffer",
+    "request_scope",
+    "AuditBufferMiddleware",
+    "buffering_enabled",
+    "spool",
+    "replay_spool",
+]
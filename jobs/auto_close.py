@@ -0,0 +1,331 @@
+# jobs/auto_close.py
+"""
+Periodic auto-close of stale shifts and day sheets across all branches.
+
+Each sweep:
+
+1. reads every open / partially closed sheet and the opening hours and
+   timezone of the branches that own one (two queries);
+2. marks a sheet due once its branch's closing time for that date, in
+   the branch's local time, is AUTO_CLOSE_GRACE_MINUTES behind us;
+3. per chunk of due sheets, in one transaction: auto-closes their open
+   shifts with one UPDATE, folds counter shards, auto-closes the sheets
+   with one UPDATE, freezes shift snapshots, bulk-creates the AUTO_CLOSE
+   flags and records the domain / shadow events, then seals each day chain;
+4. separately auto-closes shifts open longer than AUTO_CLOSE_SHIFT_MAX_HOURS
+   on sheets that are not due yet (power outage mid-day), so the manager
+   can still close the day.
+
+Rows are locked and re-checked before they are updated, so two sweeps that
+overlap cannot double-close; the periodic task (jobs.tasks.auto_close_stale)
+also runs one sweep per slot cluster-wide. Every sweep is recorded as an
+AutoCloseSweep row for duration metrics.
+
+Opening hours (Branch.opening_hours) are keyed by weekday ("mon".."sun",
+full names, or "0".."6") with a "default" fallback; each entry is
+{"open": "08:00", "close": "18:00"}, ["08:00", "18:00"], "08:00-18:00",
+or null / "closed" for a closed day (the sheet is due at local midnight).
+A closing time at or before the opening time means the branch closes after
+midnight. Branches without usable hours close at AUTO_CLOSE_DEFAULT_CLOSING.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+import socket
+import time as _time
+
+import pytz
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from branches.models import Branch
+from jobs import counters
+from jobs.daysheet_cache import daysheet_cache, tz_for_name
+from jobs.models import AnomalyFlag, AutoCloseSweep, DaySheet, DaySheetCounterShard, DaySheetShift
+from jobs.services import BaseService, shift_snapshot_service
+
+logger = logging.getLogger(__name__)
+
+SWEEP_CHUNK = 200
+OPEN_SHEET_STATUSES = (DaySheet.STATUS_OPEN, DaySheet.STATUS_PARTIALLY_CLOSED)
+DAY_KEYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+DAY_NAMES = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_MISSING = object()
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+# -------------------------------------------------
+# Opening hours
+# -------------------------------------------------
+def _parse_time(value) -> Optional[time]:
+    try:
+        hours, minutes = str(value).strip().split(":")[:2]
+        return time(int(hours), int(minutes))
+    except (TypeError, ValueError):
+        return None
+
+
+def _hours_entry(opening_hours, day: date):
+    if not isinstance(opening_hours, dict):
+        return _MISSING
+    weekday = day.weekday()
+    for key in (DAY_KEYS[weekday], DAY_NAMES[weekday], str(weekday)):
+        for variant in (key, key.capitalize(), key.upper()):
+            if variant in opening_hours:
+                return opening_hours[variant]
+    return opening_hours.get("default", _MISSING)
+
+
+def closes_at(opening_hours, day: date, tz, default_close: time) -> datetime:
+    """Aware datetime at which a branch with these hours closes for `day`."""
+    entry = _hours_entry(opening_hours, day)
+    if entry is not _MISSING and (entry is None or entry is False or entry in ("", "closed", [], {})):
+        local = datetime.combine(day + timedelta(days=1), time.min)
+        return tz.localize(local)
+
+    opens, close = None, None
+    if isinstance(entry, dict):
+        opens, close = _parse_time(entry.get("open")), _parse_time(entry.get("close", entry.get("closes")))
+    elif isinstance(entry, (list, tuple)) and len(entry) == 2:
+        opens, close = _parse_time(entry[0]), _parse_time(entry[1])
+    elif isinstance(entry, str) and "-" in entry:
+        start, _, end = entry.partition("-")
+        opens, close = _parse_time(start), _parse_time(end)
+
+    if close is None:
+        opens, close = None, default_close
+    close_day = day + timedelta(days=1) if opens is not None and close <= opens else day
+    return tz.localize(datetime.combine(close_day, close))
+
+
+def branch_timezone(*names):
+    for name in names:
+        tz = tz_for_name(name) if name else None
+        if tz is not None:
+            return tz
+    return tz_for_name(settings.TIME_ZONE) or pytz.UTC
+
+
+# -------------------------------------------------
+# Scheduler
+# -------------------------------------------------
+class AutoCloseScheduler(BaseService):
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"[:64]
+
+    def grace(self) -> timedelta:
+        return timedelta(minutes=int(_setting("AUTO_CLOSE_GRACE_MINUTES", 60)))
+
+    def default_close(self) -> time:
+        return _parse_time(_setting("AUTO_CLOSE_DEFAULT_CLOSING", "22:00")) or time(22, 0)
+
+    # -------------------------------------------------
+    # Planning
+    # -------------------------------------------------
+    def due_sheets(self, now=None, branch_ids: Optional[Iterable[int]] = None) -> Tuple[Dict[int, int], int]:
+        """({sheet_id: branch_id} of open sheets past closing + grace, branches looked at)."""
+        now = now or timezone.now()
+        sheets = DaySheet.objects.filter(
+            status__in=OPEN_SHEET_STATUSES,
+            date__lte=(now + timedelta(days=1)).date(),  # no zone is more than a day ahead of UTC
+        )
+        if branch_ids:
+            sheets = sheets.filter(branch_id__in=list(branch_ids))
+        rows = list(sheets.values_list("pk", "branch_id", "date"))
+        if not rows:
+            return {}, 0
+
+        branches = {
+            pk: (hours, branch_timezone(location_tz, country_tz))
+            for pk, hours, location_tz, country_tz in Branch.objects.filter(
+                pk__in={branch_id for _, branch_id, _ in rows}
+            ).values_list("pk", "opening_hours", "location__timezone", "country__timezone")
+        }
+        cutoff = now - self.grace()
+        default_close = self.default_close()
+        due = {}
+        for sheet_id, branch_id, day in rows:
+            hours, tz = branches[branch_id]
+            if closes_at(hours, day, tz, default_close) <= cutoff:
+                due[sheet_id] = branch_id
+        return due, len(branches)
+
+    # -------------------------------------------------
+    # Sweep
+    # -------------------------------------------------
+    def sweep(self, now=None, branch_ids: Optional[Iterable[int]] = None, dry_run: bool = False, worker: str = "") -> dict:
+        """
+        Auto-close due sheets (with their open shifts) and over-long shifts.
+        Returns {"branches", "sheets_due", "sheets_closed", "shifts_closed", "duration_ms"}.
+        """
+        started, clock = timezone.now(), _time.monotonic()
+        now = now or started
+        due, branch_count = self.due_sheets(now=now, branch_ids=branch_ids)
+        stale_shifts = self._stale_shift_ids(now, exclude_sheets=due, branch_ids=branch_ids)
+        summary = {"branches": branch_count, "sheets_due": len(due), "sheets_closed": 0, "shifts_closed": 0}
+
+        if dry_run:
+            summary["shifts_closed"] = len(stale_shifts) + DaySheetShift.objects.filter(
+                daysheet_id__in=list(due), status=DaySheetShift.SHIFT_OPEN,
+            ).count()
+        else:
+            ids = sorted(due)
+            for start in range(0, len(ids), SWEEP_CHUNK):
+                shifts, sheets = self._close_sheets(ids[start:start + SWEEP_CHUNK], now)
+                summary["shifts_closed"] += shifts
+                summary["sheets_closed"] += sheets
+            for start in range(0, len(stale_shifts), SWEEP_CHUNK):
+                with transaction.atomic():
+                    summary["shifts_closed"] += len(self._close_shifts(
+                        stale_shifts[start:start + SWEEP_CHUNK], now, reason="shift_exceeded_max_hours",
+                    ))
+
+        summary["duration_ms"] = int((_time.monotonic() - clock) * 1000)
+        if not dry_run:
+            AutoCloseSweep.objects.create(started_at=started, worker=(worker or self.worker_id)[:64], **summary)
+        if summary["sheets_closed"] or summary["shifts_closed"]:
+            logger.info("AutoCloseScheduler: %s", summary)
+        return summary
+
+    def _stale_shift_ids(self, now, exclude_sheets, branch_ids=None) -> List[int]:
+        max_hours = int(_setting("AUTO_CLOSE_SHIFT_MAX_HOURS", 14))
+        if max_hours <= 0:
+            return []
+        shifts = DaySheetShift.objects.filter(
+            status=DaySheetShift.SHIFT_OPEN, shift_start__lt=now - timedelta(hours=max_hours),
+        ).exclude(daysheet_id__in=list(exclude_sheets))
+        if branch_ids:
+            shifts = shifts.filter(daysheet__branch_id__in=list(branch_ids))
+        return list(shifts.order_by("pk").values_list("pk", flat=True))
+
+    def _close_sheets(self, sheet_ids: List[int], now) -> Tuple[int, int]:
+        reason = "closing_time_passed"
+        with transaction.atomic():
+            shifts = self._close_shifts(
+                DaySheetShift.objects.filter(daysheet_id__in=sheet_ids).values_list("pk", flat=True),
+                now, reason="daysheet_auto_closed",
+            )
+
+            # lock, then re-check: a manager may have closed some meanwhile
+            locked = list(
+                DaySheet.objects.select_for_update()
+                .filter(pk__in=sheet_ids, status__in=OPEN_SHEET_STATUSES)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            if not locked:
+                return len(shifts), 0
+            sharded = set(
+                DaySheetCounterShard.objects.filter(daysheet_id__in=locked)
+                .exclude(total_jobs=0, total_amount=0)
+                .values_list("daysheet_id", flat=True)
+            )
+            sheets = list(DaySheet.objects.filter(pk__in=locked).select_related("branch").order_by("pk"))
+            for sheet in sheets:
+                if sheet.pk in sharded:
+                    counters.fold(sheet)
+            DaySheet.objects.filter(pk__in=locked).update(status=DaySheet.STATUS_AUTO_CLOSED, closed_at=now)
+
+            AnomalyFlag.objects.bulk_create([
+                AnomalyFlag(
+                    daily_sheet_id=sheet.pk,
+                    flag_type=AnomalyFlag.TYPE_AUTO_CLOSE,
+                    severity=AnomalyFlag.SEV_CRITICAL,
+                    description=f"Auto-closed daysheet due to {reason}",
+                    notified_to=[{"role": "hq"}],
+                    fingerprint=AnomalyFlag.make_fingerprint(AnomalyFlag.TYPE_AUTO_CLOSE, "daysheet", sheet.pk),
+                )
+                for sheet in sheets
+            ], ignore_conflicts=True)
+
+            payload = {"reason": reason, "timestamp": now.isoformat(), "source": "scheduler"}
+            for sheet in sheets:
+                sheet.status, sheet.closed_at = DaySheet.STATUS_AUTO_CLOSED, now
+                daysheet_cache.invalidate_sheet(sheet)
+                self._record_event("DaySheet", str(sheet.pk), "DAY_AUTO_CLOSED", branch_id=sheet.branch_id, actor=None, payload=payload)
+                self._create_shadow_event("DAY_AUTO_CLOSED", sheet.branch_id, actor=None, payload=payload)
+                self._seal_day_chain(sheet, now=now)
+        return len(shifts), len(sheets)
+
+    def _close_shifts(self, shift_ids, now, reason: str) -> List[DaySheetShift]:
+        """Auto-close the still-open shifts among `shift_ids`. Call inside a transaction."""
+        locked = list(
+            DaySheetShift.objects.select_for_update()
+            .filter(pk__in=list(shift_ids), status=DaySheetShift.SHIFT_OPEN)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        if not locked:
+            return []
+        DaySheetShift.objects.filter(pk__in=locked).update(status=DaySheetShift.SHIFT_AUTO_CLOSED, shift_end=now)
+        shifts = list(DaySheetShift.objects.filter(pk__in=locked).select_related("daysheet").order_by("pk"))
+
+        for shift in shifts:
+            try:
+                shift_snapshot_service.freeze(shift)
+            except Exception as exc:
+                logger.exception("AutoCloseScheduler: failed to snapshot shift %s: %s", shift.pk, exc)
+
+        AnomalyFlag.objects.bulk_create([
+            AnomalyFlag(
+                daily_sheet_id=shift.daysheet_id,
+                shift_id=shift.pk,
+                flag_type=AnomalyFlag.TYPE_AUTO_CLOSE,
+                severity=AnomalyFlag.SEV_HIGH,
+                description=f"Auto-closed shift due to {reason}",
+                notified_to=[{"role": "manager"}, {"role": "hq"}],
+                fingerprint=AnomalyFlag.make_fingerprint(AnomalyFlag.TYPE_AUTO_CLOSE, "shift", shift.pk),
+            )
+            for shift in shifts
+        ], ignore_conflicts=True)
+
+        payload = {"reason": reason, "timestamp": now.isoformat(), "source": "scheduler"}
+        for shift in shifts:
+            branch_id = shift.daysheet.branch_id
+            self._record_event("DaySheetShift", str(shift.pk), "SHIFT_AUTO_CLOSED", branch_id=branch_id, actor=None, payload=payload)
+            self._create_shadow_event("SHIFT_AUTO_CLOSED", branch_id, actor=None, payload=payload)
+        return shifts
+
+    # -------------------------------------------------
+    # Metrics
+    # -------------------------------------------------
+    def metrics(self, limit: int = 50) -> dict:
+        """Duration stats (ms) over the last `limit` sweeps plus the sweeps themselves."""
+        sweeps = list(AutoCloseSweep.objects.order_by("-started_at")[:limit])
+        durations = sorted(s.duration_ms for s in sweeps)
+        stats = {"count": len(durations), "avg": None, "p50": None, "p95": None, "max": None}
+        if durations:
+            stats.update(
+                avg=int(sum(durations) / len(durations)),
+                p50=durations[(len(durations) - 1) // 2],
+                p95=durations[min(len(durations) - 1, int(round(0.95 * (len(durations) - 1))))],
+                max=durations[-1],
+            )
+        return {
+            "duration_ms": stats,
+            "sweeps": [
+                {
+                    "started_at": s.started_at,
+                    "duration_ms": s.duration_ms,
+                    "branches": s.branches,
+                    "sheets_due": s.sheets_due,
+                    "sheets_closed": s.sheets_closed,
+                    "shifts_closed": s.shifts_closed,
+                    "worker": s.worker,
+                }
+                for s in sweeps
+            ],
+        }
+
+
+auto_close_scheduler = AutoCloseScheduler()
+
+
+__all__ = ["AutoCloseScheduler", "auto_close_scheduler", "closes_at"]
@@ -0,0 +1,36 @@
+# jobs/cache_versions.py
+"""
+Version counters for per-process caches, kept in the database.
+
+The deployment has no shared cache backend (CACHES is the per-process
+LocMemCache default), so a token kept in `django.core.cache` never leaves
+the worker that rotated it. These counters live in CacheVersion rows that
+every worker reads:
+
+    version = cache_versions.current("jobs:pricing_index")   # one pk lookup
+    cache_versions.bump("jobs:pricing_index")                # after commit
+
+A key that was never bumped is at version 0.
+"""
+import logging
+
+from django.db.models import F
+
+from jobs.models import CacheVersion
+
+logger = logging.getLogger(__name__)
+
+
+def current(key: str) -> int:
+    return CacheVersion.objects.filter(key=key).values_list("version", flat=True).first() or 0
+
+
+def bump(key: str) -> None:
+    """Move the key to a new version (F() upsert, safe under concurrency)."""
+    if CacheVersion.objects.filter(key=key).update(version=F("version") + 1):
+        return
+    CacheVersion.objects.bulk_create([CacheVersion(key=key)], ignore_conflicts=True)
+    CacheVersion.objects.filter(key=key).update(version=F("version") + 1)
+
+
+__all__ = ["current", "bump"]
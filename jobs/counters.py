@@ -0,0 +1,146 @@
+# jobs/counters.py
+"""
+DaySheet counter writes.
+
+Single-row mode (default) keeps the original behaviour: the DaySheet row is
+locked and its totals are bumped with F() expressions.
+
+Sharded mode (DAYSHEET_COUNTER_SHARDS > 1) spreads increments over N
+DaySheetCounterShard rows, picked by attendant so each terminal mostly
+writes its own row. The visible totals are parent + SUM(shards); shards are
+folded back into the DaySheet at shift close and day close.
+
+Either way an increment holds a lock on the DaySheet row until its
+transaction ends (exclusive in single-row mode, shared in sharded mode, so
+attendants do not queue behind each other). Day close takes the exclusive
+lock before it folds, so it waits for in-flight increments and later ones
+see the closed status.
+"""
+from decimal import Decimal
+from typing import Tuple
+import zlib
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Sum
+
+from jobs.models import DaySheet, DaySheetCounterShard
+
+
+def shard_count() -> int:
+    return max(1, int(getattr(settings, "DAYSHEET_COUNTER_SHARDS", 1) or 1))
+
+
+def sharding_enabled() -> bool:
+    return shard_count() > 1
+
+
+def slot_for(user=None, job=None) -> int:
+    """Stable slot for an attendant (falls back to the job id)."""
+    seed = getattr(user, "pk", None) or getattr(job, "pk", None) or 0
+    return zlib.crc32(str(seed).encode("utf-8")) % shard_count()
+
+
+def ensure_shards(daysheet) -> None:
+    """Pre-create every slot so increments never race on INSERT."""
+    DaySheetCounterShard.objects.bulk_create(
+        [DaySheetCounterShard(daysheet_id=daysheet.pk, slot=i) for i in range(shard_count())],
+        ignore_conflicts=True,
+    )
+
+
+def lock_sheet(queryset):
+    """
+    First DaySheet of `queryset`, locked against a concurrent day close:
+    FOR UPDATE in single-row mode, a shared lock in sharded mode. Must run
+    inside the caller's transaction; the lock read sees the latest status.
+    """
+    if not sharding_enabled():
+        return queryset.select_for_update().first()
+
+    connection = connections[queryset.db]
+    suffix = {"mysql": " LOCK IN SHARE MODE", "postgresql": " FOR SHARE"}.get(connection.vendor)
+    if suffix is None:  # sqlite: the write lock is database-wide anyway
+        return queryset.first()
+    sql, params = queryset.order_by("pk")[:1].query.sql_with_params()
+    return next(iter(queryset.model.objects.db_manager(queryset.db).raw(sql + suffix, params)), None)
+
+
+def increment(daysheet, *, jobs: int = 1, amount=Decimal("0.00"), user=None, job=None) -> None:
+    """
+    Add `jobs` / `amount` to the sheet's totals. Must run inside the caller's
+    transaction; in single-row mode it takes the DaySheet row lock.
+    """
+    amount = Decimal(amount or 0)
+
+    if not sharding_enabled():
+        DaySheet.objects.filter(pk=daysheet.pk).update(
+            total_jobs=F("total_jobs") + jobs,
+            total_amount=F("total_amount") + amount,
+        )
+        return
+
+    slot = slot_for(user=user, job=job)
+    updated = DaySheetCounterShard.objects.filter(daysheet_id=daysheet.pk, slot=slot).update(
+        total_jobs=F("total_jobs") + jobs,
+        total_amount=F("total_amount") + amount,
+    )
+    if not updated:
+        ensure_shards(daysheet)
+        DaySheetCounterShard.objects.filter(daysheet_id=daysheet.pk, slot=slot).update(
+            total_jobs=F("total_jobs") + jobs,
+            total_amount=F("total_amount") + amount,
+        )
+
+
+def read_totals(daysheet) -> Tuple[int, Decimal]:
+    """
+    Current (total_jobs, total_amount) including unfolded shards.
+    One aggregate query in sharded mode, none otherwise.
+    """
+    base_jobs = daysheet.total_jobs or 0
+    base_amount = Decimal(daysheet.total_amount or 0)
+    if not sharding_enabled():
+        return base_jobs, base_amount
+
+    agg = DaySheetCounterShard.objects.filter(daysheet_id=daysheet.pk).aggregate(
+        jobs=Sum("total_jobs"),
+        amount=Sum("total_amount"),
+    )
+    return base_jobs + (agg["jobs"] or 0), base_amount + Decimal(agg["amount"] or 0)
+
+
+def fold(daysheet) -> DaySheet:
+    """
+    Move shard totals into the DaySheet row and zero the shards.
+    Safe to call in single-row mode (no shards -> no-op).
+    """
+    with transaction.atomic():
+        sheet = DaySheet.objects.select_for_update().get(pk=daysheet.pk)
+        shards = list(
+            DaySheetCounterShard.objects.select_for_update()
+            .filter(daysheet_id=sheet.pk)
+            .exclude(total_jobs=0, total_amount=0)
+        )
+        if not shards:
+            return sheet
+
+        jobs = sum(s.total_jobs for s in shards)
+        amount = sum((s.total_amount for s in shards), Decimal("0.00"))
+        DaySheet.objects.filter(pk=sheet.pk).update(
+            total_jobs=F("total_jobs") + jobs,
+            total_amount=F("total_amount") + amount,
+        )
+        DaySheetCounterShard.objects.filter(pk__in=[s.pk for s in shards]).update(
+            total_jobs=0,
+            total_amount=Decimal("0.00"),
+        )
+        sheet.refresh_from_db(fields=["total_jobs", "total_amount"])
+
+    # keep the caller's instance in step
+    daysheet.total_jobs = sheet.total_jobs
+    daysheet.total_amount = sheet.total_amount
+    return sheet
+
+
+__all__ = ["shard_count", "sharding_enabled", "slot_for", "ensure_shards", "lock_sheet", "increment", "read_totals", "fold"]
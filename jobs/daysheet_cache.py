@@ -0,0 +1,142 @@
+# jobs/daysheet_cache.py
+"""
+Resolution cache for the open DaySheet of a branch.
+
+Two layers, both keyed by (branch_id, local date):
+  * request scope — a dict bound to a ContextVar by DaySheetCacheMiddleware,
+    so repeated resolutions inside one request cost nothing;
+  * process scope — a short-TTL dict shared by the worker's threads.
+
+Only OPEN sheets are cached. Entries are dropped on close, auto-close and
+lock. Callers that write to the sheet re-check its status when they lock it,
+so a stale entry from another worker can delay a new sheet by at most
+DAYSHEET_CACHE_TTL_SECONDS but never attaches a job to a closed one.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+import pytz
+
+_request_cache: ContextVar[Optional[dict]] = ContextVar("daysheet_request_cache", default=None)
+
+
+@lru_cache(maxsize=256)
+def tz_for_name(tzname: str):
+    """pytz zones are immutable; build each one once per process."""
+    try:
+        return pytz.timezone(tzname)
+    except Exception:
+        return None
+
+
+class DaySheetResolutionCache:
+
+    def __init__(self, ttl: Optional[float] = None):
+        self._ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ttl(self) -> float:
+        if self._ttl is not None:
+            return self._ttl
+        return float(getattr(settings, "DAYSHEET_CACHE_TTL_SECONDS", 30))
+
+    def get(self, branch_id, date_local):
+        key = (branch_id, date_local)
+
+        scoped = _request_cache.get()
+        if scoped is not None and key in scoped:
+            self.hits += 1
+            return scoped[key]
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        # Model instances are mutable; hand each caller its own copy
+        sheet = copy.copy(entry[1])
+        if scoped is not None:
+            scoped[key] = sheet
+        return sheet
+
+    def put(self, sheet):
+        if sheet is None or sheet.pk is None or sheet.status != sheet.STATUS_OPEN:
+            return
+        key = (sheet.branch_id, sheet.date)
+        scoped = _request_cache.get()
+        if scoped is not None:
+            scoped[key] = sheet
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[key] = (time.monotonic() + self.ttl, copy.copy(sheet))
+
+    def put_on_commit(self, sheet):
+        """Cache only once the sheet is committed (immediately outside atomic blocks)."""
+        transaction.on_commit(lambda: self.put(sheet))
+
+    def invalidate(self, branch_id, date_local=None):
+        scoped = _request_cache.get()
+        with self._lock:
+            for store in filter(None, (self._entries, scoped)):
+                for key in [k for k in store if k[0] == branch_id and (date_local is None or k[1] == date_local)]:
+                    store.pop(key, None)
+
+    def invalidate_sheet(self, sheet):
+        """Drop the sheet now and again after commit (other threads may re-cache it meanwhile)."""
+        self.invalidate(sheet.branch_id, sheet.date)
+        transaction.on_commit(lambda: self.invalidate(sheet.branch_id, sheet.date))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        scoped = _request_cache.get()
+        if scoped is not None:
+            scoped.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+daysheet_cache = DaySheetResolutionCache()
+
+
+@contextmanager
+def request_scope():
+    """Bind a fresh request-level cache for the duration of the block."""
+    token = _request_cache.set({})
+    try:
+        yield
+    finally:
+        _request_cache.reset(token)
+
+
+class DaySheetCacheMiddleware:
+    """Gives every request its own DaySheet resolution scope."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_scope():
+            return self.get_response(request)
+
+
+__all__ = ["tz_for_name", "DaySheetResolutionCache", "daysheet_cache", "request_scope", "DaySheetCacheMiddleware"]
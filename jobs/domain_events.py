@@ -0,0 +1,287 @@
+# jobs/domain_events.py
+"""
+Unified append-only domain event store.
+
+Every domain action writes one DomainEvent row:
+
+    domain_events.record("Job", job.pk, "JOB_CREATED_INSTANT", payload, branch_id=..., actor=...)
+
+Rows go through the audit buffer, so one service call costs one bulk
+INSERT however many events it records. Events of an aggregate are numbered
+by `seq` (unique per aggregate) — except for the hot aggregates in
+DomainEvent.UNNUMBERED_AGGREGATES (DaySheet), whose events are ordered by
+id — and the store is indexed for the two read paths that matter: one
+aggregate's history, and a branch (or global) timeline ordered by time.
+
+A caller that must not lose its event with the buffered write (recruitment
+transitions have no other record) passes immediate=True: the event is then
+inserted, and numbered, inside the caller's transaction, under the
+aggregate row lock the caller already holds.
+
+Event types can be registered with a typed payload schema; payloads of
+registered types are checked on record. Unregistered types are accepted
+as free-form dicts.
+
+ShadowLogEvent stays the HQ transport (outbox + hash chain); this store
+replaces the local StatusLog / RecruitmentTransitionLog / AuditLog writes.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Sequence, Tuple
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from jobs.audit_buffer import audit_buffer
+from jobs.models import DomainEvent
+
+
+class InvalidEventPayload(ValueError):
+    """Payload does not match the registered schema of its event type."""
+
+
+class InvalidCursor(ValueError):
+    """Pagination cursor is malformed or belongs to another query shape."""
+
+
+# -------------------------------------------------
+# Typed payloads
+# -------------------------------------------------
+@dataclass(frozen=True)
+class EventSchema:
+    event_type: str
+    aggregate_type: str
+    fields: Dict[str, Tuple[type, ...]]
+    optional: Dict[str, Tuple[type, ...]] = field(default_factory=dict)
+    version: int = 1
+
+    def validate(self, aggregate_type: str, payload: dict):
+        if aggregate_type != self.aggregate_type:
+            raise InvalidEventPayload(f"{self.event_type} belongs to {self.aggregate_type}, not {aggregate_type}")
+        for name, types in self.fields.items():
+            if name not in payload:
+                raise InvalidEventPayload(f"{self.event_type}: missing '{name}'")
+            if not isinstance(payload[name], types):
+                raise InvalidEventPayload(f"{self.event_type}: '{name}' must be {_type_names(types)}")
+        for name, types in self.optional.items():
+            if payload.get(name) is not None and not isinstance(payload[name], types):
+                raise InvalidEventPayload(f"{self.event_type}: '{name}' must be {_type_names(types)}")
+
+
+def _type_names(types) -> str:
+    return " or ".join(t.__name__ for t in types)
+
+
+RECRUITMENT_TRANSITION = "RECRUITMENT_TRANSITION"
+
+
+def _aggregate_key(aggregate_type: str) -> str:
+    """Ordering key of one aggregate's history."""
+    return "id" if aggregate_type in DomainEvent.UNNUMBERED_AGGREGATES else "seq"
+
+
+# -------------------------------------------------
+# Cursors
+# -------------------------------------------------
+def _encode_cursor(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        raise InvalidCursor("malformed cursor")
+    if not isinstance(data, dict):
+        raise InvalidCursor("malformed cursor")
+    return data
+
+
+@dataclass
+class EventPage:
+    events: List[DomainEvent]
+    next_cursor: Optional[str]
+
+
+# -------------------------------------------------
+# Store
+# -------------------------------------------------
+class DomainEventStore:
+
+    def __init__(self):
+        self._schemas: Dict[str, EventSchema] = {}
+
+    def register(self, schema: EventSchema) -> EventSchema:
+        self._schemas[schema.event_type] = schema
+        return schema
+
+    def schema(self, event_type: str) -> Optional[EventSchema]:
+        return self._schemas.get(event_type)
+
+    def record(
+        self,
+        aggregate_type: str,
+        aggregate_id,
+        event_type: str,
+        payload: Optional[dict] = None,
+        branch_id=None,
+        actor: Optional[dict] = None,
+        occurred_at: Optional[datetime] = None,
+        immediate: bool = False,
+    ) -> DomainEvent:
+        """Append one event. Inside a transaction it is written on commit."""
+        payload = payload or {}
+        schema = self._schemas.get(event_type)
+        if schema is not None:
+            schema.validate(aggregate_type, payload)
+        actor = actor or {}
+        return audit_buffer.add(
+            DomainEvent(
+                aggregate_type=aggregate_type,
+                aggregate_id=str(aggregate_id),
+                event_type=event_type,
+                schema_version=schema.version if schema else 1,
+                branch_id=str(branch_id) if branch_id not in (None, "") else None,
+                actor_id=str(actor["user_id"]) if actor.get("user_id") is not None else None,
+                actor_role=actor.get("role"),
+                payload=payload,
+                occurred_at=occurred_at or timezone.now(),
+            ),
+            immediate=immediate,
+        )
+
+    # -------------------------------------------------
+    # Queries
+    # -------------------------------------------------
+    def history(self, aggregate_type: str, aggregate_id, after_seq: int = 0, limit: Optional[int] = None):
+        """
+        One aggregate's events in seq order (unique index scan); unnumbered
+        aggregates are ordered by id and `after_seq` is an event id.
+        """
+        key = _aggregate_key(aggregate_type)
+        qs = DomainEvent.objects.filter(
+            aggregate_type=aggregate_type, aggregate_id=str(aggregate_id), **{f"{key}__gt": after_seq}
+        ).order_by(key)
+        return list(qs[:limit] if limit else qs)
+
+    def page(
+        self,
+        aggregate: Optional[Tuple[str, object]] = None,
+        branch_id=None,
+        event_types: Optional[Sequence[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        newest_first: bool = False,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+    ) -> EventPage:
+        """
+        Keyset-paginated events. With `aggregate=(type, id)` the key is seq
+        (id for unnumbered aggregates), otherwise (occurred_at, id),
+        optionally narrowed to one branch. Pass the returned next_cursor to
+        continue.
+        """
+        limit = max(1, min(int(limit), 500))
+        qs = DomainEvent.objects.all()
+        key = None
+        if aggregate is not None:
+            key = _aggregate_key(aggregate[0])
+            qs = qs.filter(aggregate_type=aggregate[0], aggregate_id=str(aggregate[1]))
+            order = (f"-{key}",) if newest_first else (key,)
+        else:
+            order = ("-occurred_at", "-id") if newest_first else ("occurred_at", "id")
+        if branch_id not in (None, ""):
+            qs = qs.filter(branch_id=str(branch_id))
+        if event_types:
+            qs = qs.filter(event_type__in=list(event_types))
+        if since is not None:
+            qs = qs.filter(occurred_at__gte=since)
+        if until is not None:
+            qs = qs.filter(occurred_at__lt=until)
+
+        if cursor:
+            qs = qs.filter(self._after(_decode_cursor(cursor), key, newest_first))
+
+        rows = list(qs.order_by(*order)[: limit + 1])
+        events = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = events[-1]
+            if key is not None:
+                next_cursor = _encode_cursor({"s": getattr(last, key)})
+            else:
+                next_cursor = _encode_cursor({"t": last.occurred_at.isoformat(), "i": last.pk})
+        return EventPage(events=events, next_cursor=next_cursor)
+
+    def _after(self, data: dict, key: Optional[str], newest_first: bool) -> Q:
+        if key is not None:
+            if not isinstance(data.get("s"), int):
+                raise InvalidCursor("cursor is not an aggregate cursor")
+            return Q(**{f"{key}__lt" if newest_first else f"{key}__gt": data["s"]})
+        ts = parse_datetime(str(data.get("t") or ""))
+        if ts is None or not isinstance(data.get("i"), int):
+            raise InvalidCursor("cursor is not a timeline cursor")
+        if newest_first:
+            return Q(occurred_at__lt=ts) | Q(occurred_at=ts, id__lt=data["i"])
+        return Q(occurred_at__gt=ts) | Q(occurred_at=ts, id__gt=data["i"])
+
+    # -------------------------------------------------
+    # Adapters for readers of the old log tables
+    # -------------------------------------------------
+    def transition_logs(self, application) -> List[SimpleNamespace]:
+        """
+        RecruitmentTransitionLog-shaped rows (oldest first) for an application:
+        action, previous/new stage and status, payload_snapshot, performed_by, created_at.
+        """
+        events = [
+            e for e in self.history("RecruitmentApplication", application.pk)
+            if e.event_type == RECRUITMENT_TRANSITION
+        ]
+        actor_ids = {e.actor_id for e in events if e.actor_id}
+        users = get_user_model().objects.in_bulk([int(a) for a in actor_ids if a.isdigit()]) if actor_ids else {}
+        return [
+            SimpleNamespace(
+                action=e.payload.get("action"),
+                previous_stage=e.payload.get("previous_stage"),
+                new_stage=e.payload.get("new_stage"),
+                previous_status=e.payload.get("previous_status"),
+                new_status=e.payload.get("new_status"),
+                payload_snapshot=e.payload.get("payload_snapshot"),
+                performed_by=users.get(int(e.actor_id)) if e.actor_id and e.actor_id.isdigit() else None,
+                created_at=e.occurred_at,
+            )
+            for e in events
+        ]
+
+
+domain_events = DomainEventStore()
+
+domain_events.register(EventSchema(
+    RECRUITMENT_TRANSITION,
+    "RecruitmentApplication",
+    fields={
+        "action": (str,),
+        "previous_stage": (str,),
+        "new_stage": (str,),
+        "previous_status": (str,),
+        "new_status": (str,),
+    },
+    optional={"payload_snapshot": (dict,)},
+))
+
+
+__all__ = [
+    "DomainEventStore",
+    "EventSchema",
+    "EventPage",
+    "InvalidEventPayload",
+    "InvalidCursor",
+    "RECRUITMENT_TRANSITION",
+    "domain_events",
+]
@@ -0,0 +1,312 @@
+# jobs/estimator.py
+"""
+Streaming production-time estimator.
+
+Every closed JobRecord contributes one observation: minutes per unit
+produced, keyed by (branch, service). Each key keeps running statistics
+(Welford mean / variance, min / max) and a log-bucketed quantile sketch
+(relative error ~2.5%), all of which merge exactly across processes.
+
+Estimates are served from memory. Observations are accumulated as a delta
+and merged into ServiceType.meta["production_time"] at most every
+PRODUCTION_ESTIMATE_FLUSH_SECONDS, so several workers can learn at once
+without overwriting each other.
+"""
+from typing import Dict, Optional
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from jobs.models import ServiceType
+
+logger = logging.getLogger(__name__)
+
+META_KEY = "production_time"
+MAX_MINUTES_PER_UNIT = 24 * 60
+
+
+def minutes_per_unit(time_start, time_end, quantity_produced=None, job_quantity=None) -> Optional[float]:
+    """Observed minutes per unit for a closed record, or None if unusable."""
+    if not time_start or not time_end:
+        return None
+    seconds = (time_end - time_start).total_seconds()
+    if seconds <= 0:
+        return None
+    units = quantity_produced or job_quantity or 1
+    return seconds / 60.0 / max(1, units)
+
+
+class StreamingStats:
+    """Mergeable running statistics with a log-bucketed quantile sketch."""
+
+    GAMMA = 1.05
+    _LOG_GAMMA = math.log(GAMMA)
+
+    __slots__ = ("count", "mean", "m2", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.buckets: Dict[int, int] = {}
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        idx = math.ceil(math.log(value) / self._LOG_GAMMA)
+        self.buckets[idx] = self.buckets.get(idx, 0) + 1
+
+    def merge(self, other: "StreamingStats"):
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            self.buckets = dict(other.buckets)
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for idx, n in other.buckets.items():
+            self.buckets[idx] = self.buckets.get(idx, 0) + n
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if seen > rank:
+                # bucket midpoint (geometric), clamped to observed range
+                value = 2 * self.GAMMA ** idx / (self.GAMMA + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 4),
+            "m2": round(self.m2, 4),
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "buckets": {str(k): v for k, v in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "StreamingStats":
+        stats = cls()
+        if not data:
+            return stats
+        try:
+            stats.count = int(data.get("count", 0))
+            stats.mean = float(data.get("mean", 0.0))
+            stats.m2 = float(data.get("m2", 0.0))
+            stats.min = data.get("min")
+            stats.max = data.get("max")
+            stats.buckets = {int(k): int(v) for k, v in (data.get("buckets") or {}).items()}
+        except (TypeError, ValueError):
+            logger.warning("Ignoring malformed production_time stats: %r", data)
+            return cls()
+        return stats
+
+
+class _ServiceStats:
+    __slots__ = ("all", "branches")
+
+    def __init__(self):
+        self.all = StreamingStats()
+        self.branches: Dict[str, StreamingStats] = {}
+
+    def branch(self, branch_id) -> StreamingStats:
+        return self.branches.setdefault(str(branch_id), StreamingStats())
+
+    def merge(self, other: "_ServiceStats"):
+        self.all.merge(other.all)
+        for branch_id, stats in other.branches.items():
+            self.branch(branch_id).merge(stats)
+
+    def to_dict(self) -> dict:
+        return {
+            "all": self.all.to_dict(),
+            "branches": {k: v.to_dict() for k, v in self.branches.items()},
+        }
+
+    @classmethod
+    def from_meta(cls, meta: Optional[dict]) -> "_ServiceStats":
+        obj = cls()
+        data = (meta or {}).get(META_KEY) or {}
+        obj.all = StreamingStats.from_dict(data.get("all"))
+        obj.branches = {str(k): StreamingStats.from_dict(v) for k, v in (data.get("branches") or {}).items()}
+        return obj
+
+
+class ProductionTimeEstimator:
+    """
+    Per-process estimator. `estimate()` returns minutes per unit for a
+    branch + service: the branch's own quantile once it has enough samples,
+    otherwise the service-wide one, otherwise None.
+    """
+
+    def __init__(self, flush_interval: Optional[float] = None, min_samples: Optional[int] = None, quantile: Optional[float] = None):
+        self._flush_interval = flush_interval
+        self._min_samples = min_samples
+        self._quantile = quantile
+        self._lock = threading.Lock()
+        self._view: Dict[int, _ServiceStats] = {}
+        self._delta: Dict[int, _ServiceStats] = {}
+        self._last_flush = time.monotonic()
+        self._last_refresh = self._last_flush
+
+    @property
+    def flush_interval(self) -> float:
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return float(getattr(settings, "PRODUCTION_ESTIMATE_FLUSH_SECONDS", 300))
+
+    @property
+    def min_samples(self) -> int:
+        if self._min_samples is not None:
+            return self._min_samples
+        return int(getattr(settings, "PRODUCTION_ESTIMATE_MIN_SAMPLES", 5))
+
+    @property
+    def quantile(self) -> float:
+        if self._quantile is not None:
+            return self._quantile
+        return float(getattr(settings, "PRODUCTION_ESTIMATE_QUANTILE", 0.8))
+
+    # -------------------------------------------------
+    # Observations
+    # -------------------------------------------------
+    def observe(self, branch_id, service_id, minutes_per_unit: float) -> bool:
+        if not service_id or not minutes_per_unit or not (0 < minutes_per_unit <= MAX_MINUTES_PER_UNIT):
+            return False
+        with self._lock:
+            view = self._load(service_id)
+            delta = self._delta.setdefault(service_id, _ServiceStats())
+            for target in (view, delta):
+                target.all.add(minutes_per_unit)
+                if branch_id is not None:
+                    target.branch(branch_id).add(minutes_per_unit)
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return True
+
+    def observe_record(self, record) -> bool:
+        """Feed a closed JobRecord. Zero-length / open records are ignored."""
+        job = record.job
+        minutes = minutes_per_unit(record.time_start, record.time_end, record.quantity_produced, job.quantity)
+        if minutes is None:
+            return False
+        return self.observe(job.branch_id, job.service_id, minutes)
+
+    # -------------------------------------------------
+    # Estimates
+    # -------------------------------------------------
+    def estimate(self, branch_id, service_id, meta: Optional[dict] = None) -> Optional[float]:
+        """Minutes per unit, or None when there is not enough history."""
+        with self._lock:
+            self._expire_idle_views()
+            stats = self._load(service_id, meta=meta)
+            if branch_id is not None:
+                branch_stats = stats.branches.get(str(branch_id))
+                if branch_stats and branch_stats.count >= self.min_samples:
+                    return branch_stats.quantile(self.quantile)
+            if stats.all.count >= self.min_samples:
+                return stats.all.quantile(self.quantile)
+        return None
+
+    def stats(self, branch_id, service_id) -> dict:
+        with self._lock:
+            stats = self._load(service_id)
+            target = stats.branches.get(str(branch_id)) if branch_id is not None else stats.all
+            if not target:
+                return StreamingStats().to_dict()
+            data = target.to_dict()
+            data["stddev"] = math.sqrt(target.variance)
+            return data
+
+    # -------------------------------------------------
+    # Persistence
+    # -------------------------------------------------
+    def flush(self) -> int:
+        """Merge pending observations into ServiceType.meta. Returns services written."""
+        with self._lock:
+            pending, self._delta = self._delta, {}
+            self._last_flush = time.monotonic()
+        written = 0
+        for service_id, delta in pending.items():
+            try:
+                with transaction.atomic():
+                    rows = list(ServiceType.objects.select_for_update().filter(pk=service_id).values_list("meta", flat=True))
+                    if not rows:
+                        continue
+                    meta = dict(rows[0] or {})
+                    merged = _ServiceStats.from_meta(meta)
+                    merged.merge(delta)
+                    meta[META_KEY] = merged.to_dict()
+                    # queryset update: skips the ServiceType post_save pricing invalidation
+                    ServiceType.objects.filter(pk=service_id).update(meta=meta)
+                with self._lock:
+                    # other workers' flushes are picked up here
+                    unflushed = self._delta.get(service_id)
+                    if unflushed is not None:
+                        merged.merge(unflushed)
+                    self._view[service_id] = merged
+                written += 1
+            except Exception:
+                logger.exception("ProductionTimeEstimator: failed to persist stats for service %s", service_id)
+                with self._lock:
+                    self._delta.setdefault(service_id, _ServiceStats()).merge(delta)
+        return written
+
+    def reset(self):
+        """Forget in-memory state (persisted stats are reloaded on demand)."""
+        with self._lock:
+            self._view.clear()
+            self._delta.clear()
+            self._last_flush = self._last_refresh = time.monotonic()
+
+    def _expire_idle_views(self):
+        """Periodically drop views with nothing pending so other workers' flushes are seen."""
+        now = time.monotonic()
+        if now - self._last_refresh < self.flush_interval:
+            return
+        self._view = {k: v for k, v in self._view.items() if k in self._delta}
+        self._last_refresh = now
+
+    def _load(self, service_id, meta: Optional[dict] = None) -> _ServiceStats:
+        stats = self._view.get(service_id)
+        if stats is None:
+            if meta is None:
+                meta = ServiceType.objects.filter(pk=service_id).values_list("meta", flat=True).first()
+            stats = _ServiceStats.from_meta(meta)
+            self._view[service_id] = stats
+        return stats
+
+
+production_estimator = ProductionTimeEstimator()
+
+
+__all__ = ["StreamingStats", "ProductionTimeEstimator", "production_estimator", "minutes_per_unit", "META_KEY"]
@@ -0,0 +1,358 @@
+# jobs/eventchain.py
+"""
+Tamper-evident shadow event log.
+
+Every ShadowLogEvent is appended to its branch's hash chain:
+
+    content_hash = sha256(canonical JSON of the event content)
+    chain_hash   = sha256(prev_hash + content_hash)
+
+with the chain tip kept in EventChainHead. Services only write the event
+(and its content hash) in their own transaction; links are assigned after
+commit by a per-branch sequencer (`link_pending`, run from an on_commit
+hook and again by the outbox dispatcher before it plans a batch) that holds
+the head lock only for that short transaction, so attaches on a branch
+never wait on each other's chain head. Events are linked in id order of
+the ones committed so far, and the dispatcher sends each branch's events
+in chain order; an event is only sent once linked.
+
+When a DaySheet closes, the events linked since the branch's previous seal
+are sealed with a Merkle root over their content hashes (DaySheetChainSeal)
+and the seal is itself sent to HQ as a DAY_CHAIN_SEALED event.
+
+Verifying a day is one query plus one root comparison. When the roots
+differ, the tampered record is located by descending the Merkle tree of
+stored vs recomputed leaves: O(log n) node comparisons.
+
+Local DomainEvent rows are not chained: the ones HQ needs are mirrored
+by a ShadowLogEvent with the same payload, which is.
+"""
+from datetime import timezone as dt_timezone
+from typing import Iterable, List, Optional, Sequence
+import hashlib
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from jobs.models import ShadowLogEvent, IngestedShadowEvent, EventChainHead, DaySheetChainSeal
+from jobs.outbox import canonical_json
+
+logger = logging.getLogger(__name__)
+
+GENESIS_HASH = "0" * 64
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+SEAL_EVENT = "DAY_CHAIN_SEALED"
+
+CONTENT_FIELDS = ("uuid", "event_type", "branch_id", "actor", "source", "timestamp", "payload")
+
+
+# -------------------------------------------------
+# Hashing
+# -------------------------------------------------
+def normalize_timestamp(value):
+    """Aware datetime for a stored/incoming timestamp (strings are parsed)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            return None
+        value = parsed
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def _ts_text(value) -> Optional[str]:
+    value = normalize_timestamp(value)
+    return value.astimezone(dt_timezone.utc).isoformat() if value else None
+
+
+def content_hash(uuid, event_type, branch_id, actor, source, timestamp, payload) -> str:
+    body = {
+        "uuid": str(uuid),
+        "event_type": event_type,
+        "branch_id": str(branch_id) if branch_id not in (None, "") else None,
+        "actor": actor or {},
+        "source": source or {},
+        "timestamp": _ts_text(timestamp),
+        "payload": payload or {},
+    }
+    return hashlib.sha256(canonical_json(body)).hexdigest()
+
+
+def row_content_hash(row: dict) -> str:
+    return content_hash(*(row.get(f) for f in CONTENT_FIELDS))
+
+
+def link(prev_hash: str, leaf: str) -> str:
+    return hashlib.sha256((prev_hash + leaf).encode("ascii")).hexdigest()
+
+
+# -------------------------------------------------
+# Merkle tree
+# -------------------------------------------------
+def _leaf_node(leaf: str) -> str:
+    return hashlib.sha256(b"\x00" + leaf.encode("ascii")).hexdigest()
+
+
+def _inner_node(left: str, right: str) -> str:
+    return hashlib.sha256(b"\x01" + left.encode("ascii") + right.encode("ascii")).hexdigest()
+
+
+def merkle_levels(leaves: Sequence[str]) -> List[List[str]]:
+    """All tree levels, leaves first. An odd last node is carried up unchanged."""
+    if not leaves:
+        return [[EMPTY_ROOT]]
+    level = [_leaf_node(leaf) for leaf in leaves]
+    levels = [level]
+    while len(level) > 1:
+        nxt = [_inner_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        levels.append(nxt)
+        level = nxt
+    return levels
+
+
+def merkle_root(leaves: Sequence[str]) -> str:
+    return merkle_levels(leaves)[-1][0]
+
+
+def locate_divergence(expected: List[List[str]], actual: List[List[str]]):
+    """
+    Leftmost leaf index where two equally sized trees differ, found top-down.
+    Returns (index or None, node comparisons).
+    """
+    comparisons = 1
+    if expected[-1][0] == actual[-1][0]:
+        return None, comparisons
+    idx = 0
+    for depth in range(len(expected) - 2, -1, -1):
+        left = 2 * idx
+        comparisons += 1
+        if expected[depth][left] != actual[depth][left]:
+            idx = left
+        else:
+            idx = left + 1
+    return idx, comparisons
+
+
+# -------------------------------------------------
+# Chain
+# -------------------------------------------------
+def chain_key(branch_id) -> str:
+    return str(branch_id) if branch_id not in (None, "") else ""
+
+
+def _events_for_key(model, key: str):
+    qs = model.objects.all()
+    return qs.filter(branch_id=key) if key else qs.filter(branch_id__isnull=True)
+
+
+class EventChain:
+
+    LINK_CHUNK = 500
+
+    def append(self, event: ShadowLogEvent) -> ShadowLogEvent:
+        """Save an unsaved event; it is linked to its branch chain after commit."""
+        key = chain_key(event.branch_id)
+        event.timestamp = normalize_timestamp(event.timestamp) or timezone.now()
+        event.content_hash = content_hash(
+            event.uuid, event.event_type, event.branch_id, event.actor,
+            event.source, event.timestamp, event.payload,
+        )
+        event.save()
+        transaction.on_commit(lambda: self._link_after_commit(key))
+        return event
+
+    def _link_after_commit(self, key: str):
+        try:
+            self.link_pending(key)
+        except Exception:
+            # the dispatcher links whatever is left before its next batch
+            logger.exception("EventChain: failed to link pending events of chain %r", key)
+
+    def link_pending(self, key: Optional[str] = None) -> int:
+        """Link committed, unlinked events (of one chain, or all) in id order. Returns the count."""
+        if key is None:
+            keys = {
+                chain_key(b) for b in
+                ShadowLogEvent.objects.filter(chain_seq__isnull=True).values_list("branch_id", flat=True).distinct()
+            }
+        else:
+            keys = [key]
+        linked = 0
+        for k in sorted(keys):
+            with transaction.atomic():
+                linked += self._link_locked(self._lock_head(k), k)
+        return linked
+
+    def _link_locked(self, head: EventChainHead, key: str) -> int:
+        """Link the chain's unlinked events; the caller holds the head lock."""
+        linked = 0
+        while True:
+            events = list(
+                _events_for_key(ShadowLogEvent, key)
+                .filter(chain_seq__isnull=True)
+                .order_by("id")
+                .only("id", "content_hash")[: self.LINK_CHUNK]
+            )
+            if not events:
+                break
+            for event in events:
+                head.seq += 1
+                event.chain_seq = head.seq
+                event.prev_hash = head.head_hash or GENESIS_HASH
+                event.chain_hash = link(event.prev_hash, event.content_hash)
+                head.head_hash = event.chain_hash
+            ShadowLogEvent.objects.bulk_update(events, ["chain_seq", "prev_hash", "chain_hash"])
+            linked += len(events)
+        if linked:
+            EventChainHead.objects.filter(pk=head.pk).update(
+                seq=head.seq, head_hash=head.head_hash, updated_at=timezone.now()
+            )
+        return linked
+
+    def _lock_head(self, key: str) -> EventChainHead:
+        head, _ = EventChainHead.objects.select_for_update().get_or_create(chain_key=key)
+        return head
+
+    # -------------------------------------------------
+    # Seals
+    # -------------------------------------------------
+    def seal_daysheet(self, daysheet, now=None) -> DaySheetChainSeal:
+        """Seal the branch events linked since the previous seal (idempotent)."""
+        existing = DaySheetChainSeal.objects.filter(daysheet=daysheet).first()
+        if existing is not None:
+            return existing
+        key = chain_key(daysheet.branch_id)
+        with transaction.atomic():
+            head = self._lock_head(key)
+            self._link_locked(head, key)
+            prev_last = (
+                DaySheetChainSeal.objects.filter(branch_id=key)
+                .order_by("-last_seq").values_list("last_seq", flat=True).first()
+            ) or 0
+            leaves = list(
+                _events_for_key(ShadowLogEvent, key)
+                .filter(chain_seq__gt=prev_last, chain_seq__lte=head.seq)
+                .order_by("chain_seq")
+                .values_list("content_hash", flat=True)
+            )
+            return DaySheetChainSeal.objects.create(
+                daysheet=daysheet,
+                branch_id=key,
+                first_seq=prev_last + 1,
+                last_seq=head.seq,
+                leaf_count=len(leaves),
+                merkle_root=merkle_root(leaves),
+                head_hash=head.head_hash,
+                sealed_at=now or timezone.now(),
+            )
+
+    def seal_payload(self, seal: DaySheetChainSeal) -> dict:
+        return {
+            "daysheet_id": str(seal.daysheet_id),
+            "branch_id": seal.branch_id,
+            "first_seq": seal.first_seq,
+            "last_seq": seal.last_seq,
+            "leaf_count": seal.leaf_count,
+            "merkle_root": seal.merkle_root,
+            "head_hash": seal.head_hash,
+        }
+
+    # -------------------------------------------------
+    # Verification
+    # -------------------------------------------------
+    def verify_seal(self, seal: DaySheetChainSeal) -> dict:
+        """Check a branch-side seal against the branch's own events."""
+        return self.verify_range(ShadowLogEvent, seal.branch_id, seal.first_seq, seal.last_seq, seal.leaf_count, seal.merkle_root)
+
+    def verify_ingested(self, seal_payload: dict) -> dict:
+        """Check HQ's ingested copies against a DAY_CHAIN_SEALED payload."""
+        return self.verify_range(
+            IngestedShadowEvent,
+            seal_payload.get("branch_id") or "",
+            int(seal_payload["first_seq"]),
+            int(seal_payload["last_seq"]),
+            int(seal_payload["leaf_count"]),
+            seal_payload["merkle_root"],
+        )
+
+    def verify_range(self, model, key: str, first_seq: int, last_seq: int, leaf_count: int, expected_root: str) -> dict:
+        rows = list(
+            _events_for_key(model, key)
+            .filter(chain_seq__gte=first_seq, chain_seq__lte=last_seq)
+            .order_by("chain_seq")
+            .values("chain_seq", "content_hash", *CONTENT_FIELDS)
+        )
+        result = {
+            "branch_id": key,
+            "first_seq": first_seq,
+            "last_seq": last_seq,
+            "leaf_count": len(rows),
+            "ok": False,
+            "reason": "",
+            "tampered_seq": None,
+            "comparisons": 0,
+        }
+
+        expected_seqs = range(first_seq, last_seq + 1)
+        if model is ShadowLogEvent and len(rows) < len(expected_seqs):
+            rows = self._with_archived(rows, key, first_seq, last_seq)
+        if len(rows) != leaf_count or [r["chain_seq"] for r in rows] != list(expected_seqs):
+            present = {r["chain_seq"] for r in rows}
+            missing = next((seq for seq in expected_seqs if seq not in present), None)
+            result.update(reason="missing or extra events", tampered_seq=missing)
+            return result
+
+        actual = [row_content_hash(r) for r in rows]
+        actual_levels = merkle_levels(actual)
+        result["comparisons"] = 1
+        if actual_levels[-1][0] == expected_root:
+            result["ok"] = True
+            return result
+
+        stored = [r["content_hash"] for r in rows]
+        stored_levels = merkle_levels(stored)
+        if stored_levels[-1][0] == expected_root:
+            idx, comparisons = locate_divergence(stored_levels, actual_levels)
+            result.update(reason="event content modified", comparisons=comparisons + 1)
+        else:
+            # stored hashes were rewritten too: first row whose stored hash is not its content's
+            idx = next((i for i, (s, a) in enumerate(zip(stored, actual)) if s != a), None)
+            result.update(reason="stored hashes rewritten")
+        if idx is not None:
+            result["tampered_seq"] = rows[idx]["chain_seq"]
+        return result
+
+    def _with_archived(self, rows: List[dict], key: str, first_seq: int, last_seq: int) -> List[dict]:
+        """Fill seqs moved out by jobs.retention from the cold archive."""
+        from jobs.retention import archive_reader
+
+        present = {r["chain_seq"] for r in rows}
+        archived = archive_reader.rows(
+            "shadow_event",
+            branch_id=key or None,
+            where=lambda r: first_seq <= (r.get("chain_seq") or 0) <= last_seq and r["chain_seq"] not in present,
+        )
+        return sorted(rows + list(archived), key=lambda r: r["chain_seq"])
+
+
+event_chain = EventChain()
+
+
+__all__ = [
+    "EventChain",
+    "event_chain",
+    "content_hash",
+    "link",
+    "merkle_levels",
+    "merkle_root",
+    "locate_divergence",
+    "GENESIS_HASH",
+    "SEAL_EVENT",
+]
@@ -0,0 +1,184 @@
+# jobs/heartbeats.py
+"""
+Attendant terminal heartbeats and silent-terminal detection.
+
+Dashboards POST /api/jobs/heartbeat/ every few seconds. A ping only updates
+this process's in-memory table {(branch, user, device): (first, last)}; the
+table is written to TerminalHeartbeat once HEARTBEAT_FLUSH_SECONDS have
+passed (or HEARTBEAT_MAX_PENDING terminals are waiting), by whichever ping
+comes next: one INSERT for new terminals, then one UPDATE per batch that
+only moves last_seen forward (GREATEST), so a process flushing older pings
+after another process never rewinds a terminal. Each process flushes its
+own terminals, so the stored last_seen trails reality by at most the flush
+interval.
+
+The detector (periodic task jobs.tasks.detect_silent_terminals) compares
+every open DaySheetShift with its attendant's latest heartbeat. A terminal
+that reported during the shift and has been quiet for
+HEARTBEAT_SILENCE_SECONDS is silent; day sheets with silent terminals are
+flagged TERMINAL_SILENT (HIGH when every reporting terminal of the sheet is
+silent, which usually means a power or network outage). One flag is raised
+per silence episode: the fingerprint carries the newest last-seen time.
+Shifts whose attendant never sent a heartbeat are not judged.
+"""
+from datetime import datetime, timedelta
+from functools import reduce
+from typing import Dict, Optional, Tuple
+import logging
+import operator
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, Max, Q, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from jobs.anomaly_scan import anomaly_scanner
+from jobs.models import AnomalyFlag, DaySheetShift, TerminalHeartbeat
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+class HeartbeatBuffer:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[int, int, str], Tuple[datetime, datetime]] = {}
+        self._last_flush = time.monotonic()
+
+    def ping(self, branch_id: int, user_id: int, device_id: str, at: Optional[datetime] = None) -> bool:
+        """Record one ping in memory. Returns True when this call flushed the table."""
+        at = at or timezone.now()
+        key = (branch_id, user_id, (device_id or "web")[:64])
+        with self._lock:
+            first, last = self._pending.get(key, (at, at))
+            self._pending[key] = (min(first, at), max(last, at))
+            due = (
+                time.monotonic() - self._last_flush >= float(_setting("HEARTBEAT_FLUSH_SECONDS", 10))
+                or len(self._pending) >= int(_setting("HEARTBEAT_MAX_PENDING", 5000))
+            )
+        if due:
+            self.flush()
+        return due
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """Insert new terminals and move last_seen forward for the rest. Returns rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        rows = [
+            TerminalHeartbeat(branch_id=branch_id, user_id=user_id, device_id=device_id, first_seen=first, last_seen=last)
+            for (branch_id, user_id, device_id), (first, last) in pending.items()
+        ]
+        try:
+            with transaction.atomic():
+                TerminalHeartbeat.objects.bulk_create(rows, batch_size=BATCH_SIZE, ignore_conflicts=True)
+                for start in range(0, len(rows), BATCH_SIZE):
+                    _advance_last_seen(rows[start:start + BATCH_SIZE])
+        except Exception:
+            logger.exception("HeartbeatBuffer: flush of %s terminal(s) failed; keeping them for the next flush", len(rows))
+            with self._lock:
+                for key, (first, last) in pending.items():
+                    newer = self._pending.get(key)
+                    self._pending[key] = (min(first, newer[0]), max(last, newer[1])) if newer else (first, last)
+            return 0
+        return len(rows)
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._last_flush = time.monotonic()
+
+
+def _advance_last_seen(rows):
+    """One UPDATE: last_seen = GREATEST(last_seen, pending last) for each row's terminal."""
+    keys = [Q(branch_id=r.branch_id, user_id=r.user_id, device_id=r.device_id) for r in rows]
+    pending_last = Case(
+        *[When(key, then=r.last_seen) for key, r in zip(keys, rows)],
+        output_field=DateTimeField(),
+    )
+    TerminalHeartbeat.objects.filter(reduce(operator.or_, keys)).update(last_seen=Greatest(F("last_seen"), pending_last))
+
+
+class SilentTerminalDetector:
+
+    def detect(self, now: Optional[datetime] = None, dry_run: bool = False) -> dict:
+        """
+        Flag day sheets whose terminals went quiet during an open shift.
+        Returns {"open_shifts", "monitored", "silent", "flagged"}.
+        """
+        now = now or timezone.now()
+        cutoff = now - timedelta(seconds=int(_setting("HEARTBEAT_SILENCE_SECONDS", 90)))
+        shifts = list(
+            DaySheetShift.objects.filter(status=DaySheetShift.SHIFT_OPEN)
+            .values_list("pk", "daysheet_id", "daysheet__branch_id", "user_id", "shift_start")
+        )
+        summary = {"open_shifts": len(shifts), "monitored": 0, "silent": 0, "flagged": 0}
+        if not shifts:
+            return summary
+
+        last_seen = {
+            (row["branch_id"], row["user_id"]): row["last"]
+            for row in TerminalHeartbeat.objects.filter(
+                branch_id__in={s[2] for s in shifts}, user_id__in={s[3] for s in shifts},
+            ).values("branch_id", "user_id").annotate(last=Max("last_seen"))
+        }
+
+        sheets: Dict[int, dict] = {}
+        for shift_id, sheet_id, branch_id, user_id, started in shifts:
+            last = last_seen.get((branch_id, user_id))
+            if last is None or (started is not None and last < started):
+                continue
+            sheet = sheets.setdefault(sheet_id, {"branch_id": branch_id, "monitored": 0, "silent": []})
+            sheet["monitored"] += 1
+            if last < cutoff:
+                sheet["silent"].append((shift_id, last))
+
+        findings, branch_by_sheet = [], {}
+        for sheet_id, sheet in sheets.items():
+            summary["monitored"] += sheet["monitored"]
+            summary["silent"] += len(sheet["silent"])
+            if not sheet["silent"]:
+                continue
+            silent = sheet["silent"]
+            all_silent = len(silent) == sheet["monitored"]
+            newest = max(last for _, last in silent)
+            branch_by_sheet[sheet_id] = sheet["branch_id"]
+            findings.append(AnomalyFlag(
+                daily_sheet_id=sheet_id,
+                shift_id=silent[0][0] if len(silent) == 1 else None,
+                flag_type=AnomalyFlag.TYPE_TERMINAL_SILENT,
+                severity=AnomalyFlag.SEV_HIGH if all_silent else AnomalyFlag.SEV_MEDIUM,
+                description=(
+                    f"{len(silent)}/{sheet['monitored']} terminal(s) silent during an open shift; "
+                    f"last heartbeat {timezone.localtime(newest):%H:%M:%S}"
+                ),
+                notified_to=[{"role": "manager"}, {"role": "hq"}] if all_silent else [{"role": "manager"}],
+                fingerprint=AnomalyFlag.make_fingerprint(
+                    AnomalyFlag.TYPE_TERMINAL_SILENT, "daysheet", f"{sheet_id}@{int(newest.timestamp())}",
+                ),
+            ))
+
+        summary["flagged"] = len(anomaly_scanner.emit(findings, branch_by_sheet, dry_run=dry_run, source="heartbeat"))
+        return summary
+
+
+heartbeats = HeartbeatBuffer()
+silent_terminal_detector = SilentTerminalDetector()
+
+
+__all__ = ["HeartbeatBuffer", "SilentTerminalDetector", "heartbeats", "silent_terminal_detector"]
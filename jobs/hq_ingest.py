@@ -0,0 +1,209 @@
+# jobs/hq_ingest.py
+"""
+HQ-side bulk ingestion of branch shadow events.
+
+Branch dispatchers (jobs.outbox.HttpHQClient) POST gzip-compressed
+{"events": [...]} batches. A batch is handled with a fixed number of
+queries whatever its size:
+
+  1. the batch HMAC (X-Octos-Signature over the raw JSON) is checked with
+     the key of the branch named in X-Octos-Branch (SHADOW_EVENT_BRANCH_SECRETS;
+     HQ never falls back to the shared secret, so one leaked key cannot
+     speak for other branches),
+  2. every event must belong to that branch, and its payload signature is
+     verified in memory with the same key,
+  3. one SELECT on the unique uuid index finds events already ingested,
+  4. new events are written with chunked bulk_create(ignore_conflicts=True).
+
+Every event gets an ack. Redelivered events are acked again (idempotent).
+Once an event of a branch is rejected, the rest of that branch's events
+in the batch are rejected too, so a branch is never applied out of order;
+the sender retries them after the failed one.
+"""
+from typing import List, Optional
+import hmac
+import json
+import logging
+import uuid as uuid_lib
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from jobs.models import IngestedShadowEvent
+from jobs.outbox import branch_secrets, sign_payload
+
+logger = logging.getLogger(__name__)
+
+
+class IngestError(Exception):
+    """Whole-batch rejection; carries the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def max_batch_bytes() -> int:
+    return int(getattr(settings, "HQ_INGEST_MAX_BYTES", 16 * 1024 * 1024))
+
+
+def max_batch_events() -> int:
+    return int(getattr(settings, "HQ_INGEST_MAX_EVENTS", 5000))
+
+
+def ingest_secret(branch_id) -> str:
+    """The branch's own key ('' when it has none)."""
+    return branch_secrets().get(str(branch_id), "") if branch_id not in (None, "") else ""
+
+
+def decode_batch(
+    body: bytes, content_encoding: str = "", signature: str = "", branch_id: str = "", secret: Optional[str] = None
+) -> List[dict]:
+    """Decompress, authenticate (with `branch_id`'s key) and parse a request body into event dicts."""
+    if secret is None:
+        if not branch_secrets():
+            raise IngestError("ingest is not configured (no branch keys)", status=503)
+        if not branch_id:
+            raise IngestError("missing branch header")
+        secret = ingest_secret(branch_id)
+        if not secret:
+            raise IngestError("unknown branch", status=403)
+
+    raw = body or b""
+    if content_encoding.strip().lower() == "gzip":
+        # bounded decompression: refuse batches that inflate past the limit
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            raw = inflater.decompress(raw, max_batch_bytes() + 1)
+        except zlib.error:
+            raise IngestError("invalid gzip body")
+        if len(raw) > max_batch_bytes() or inflater.unconsumed_tail:
+            raise IngestError("batch too large", status=413)
+    elif len(raw) > max_batch_bytes():
+        raise IngestError("batch too large", status=413)
+
+    expected = hmac.new(secret.encode("utf-8"), raw, "sha256").hexdigest()
+    if not signature or not hmac.compare_digest(expected, signature):
+        raise IngestError("bad batch signature", status=403)
+
+    try:
+        events = json.loads(raw).get("events")
+    except (ValueError, AttributeError):
+        raise IngestError("invalid JSON body")
+    if not isinstance(events, list):
+        raise IngestError("'events' must be a list")
+    if len(events) > max_batch_events():
+        raise IngestError("too many events in batch", status=413)
+    return events
+
+
+def _validate(event, secret: str) -> Optional[str]:
+    """Error text for an unacceptable event, else None."""
+    if not isinstance(event, dict):
+        return "malformed event"
+    if not event.get("event_type"):
+        return "missing event_type"
+    payload = event.get("payload")
+    if not isinstance(payload, dict):
+        return "payload must be an object"
+    if event.get("timestamp") and parse_datetime(str(event["timestamp"])) is None:
+        return "invalid timestamp"
+    if not hmac.compare_digest(sign_payload(payload, secret), str(event.get("signature") or "")):
+        return "bad signature"
+    return None
+
+
+def _int_or_none(value):
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def ingest_batch(events: List[dict], branch_id=None, secret: Optional[str] = None, now=None) -> List[dict]:
+    """
+    Store a decoded batch sent for `branch_id` and return one ack per event,
+    in request order. Events of any other branch are rejected.
+    """
+    unknown = False
+    if secret is None:
+        # only an explicit secret (tests, tools) may be empty
+        secret = ingest_secret(branch_id)
+        unknown = not secret
+    now = now or timezone.now()
+
+    acks = []
+    halted = set()
+    accepted = {}
+    for event in events:
+        raw_uuid = event.get("uuid") if isinstance(event, dict) else None
+        try:
+            key = uuid_lib.UUID(str(raw_uuid))
+        except (TypeError, ValueError):
+            acks.append({"uuid": raw_uuid, "ok": False, "error": "invalid uuid"})
+            continue
+
+        event_branch = event.get("branch_id")
+        if unknown:
+            error = "unknown branch"
+        elif event_branch in halted:
+            error = "earlier event of branch rejected"
+        elif branch_id is not None and str(event_branch) != str(branch_id):
+            error = "event branch does not match the signing branch"
+        else:
+            error = _validate(event, secret)
+        if error:
+            halted.add(event_branch)
+            acks.append({"uuid": str(key), "ok": False, "error": error})
+            continue
+        accepted.setdefault(key, event)
+        acks.append({"uuid": str(key), "ok": True})
+
+    if accepted:
+        with transaction.atomic():
+            existing = {
+                row[0]: row[1:]
+                for row in IngestedShadowEvent.objects.filter(uuid__in=list(accepted)).values_list(
+                    "uuid", "received_at", "processed_at"
+                )
+            }
+            IngestedShadowEvent.objects.bulk_create(
+                [
+                    IngestedShadowEvent(
+                        uuid=key,
+                        event_type=event["event_type"],
+                        branch_id=(str(event["branch_id"]) if event.get("branch_id") is not None else None),
+                        source=event.get("source") or {},
+                        actor=event.get("actor") or {},
+                        timestamp=parse_datetime(str(event["timestamp"])) if event.get("timestamp") else None,
+                        payload=event["payload"],
+                        signature=event.get("signature") or "",
+                        received_at=now,
+                        processed_at=now,
+                        chain_seq=_int_or_none(event.get("chain_seq")),
+                        prev_hash=str(event.get("prev_hash") or "")[:64],
+                        content_hash=str(event.get("content_hash") or "")[:64],
+                        chain_hash=str(event.get("chain_hash") or "")[:64],
+                    )
+                    for key, event in accepted.items()
+                    if key not in existing
+                ],
+                batch_size=1000,
+                ignore_conflicts=True,
+            )
+
+        for ack in acks:
+            if not ack["ok"]:
+                continue
+            received_at, processed_at = existing.get(uuid_lib.UUID(ack["uuid"]), (now, now))
+            ack["received_at"] = received_at.isoformat()
+            ack["processed_at"] = (processed_at or received_at).isoformat()
+            if uuid_lib.UUID(ack["uuid"]) in existing:
+                ack["duplicate"] = True
+    return acks
+
+
+__all__ = ["IngestError", "ingest_secret", "decode_batch", "ingest_batch"]
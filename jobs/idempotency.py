@@ -0,0 +1,197 @@
+# jobs/idempotency.py
+"""
+Idempotency keys for job APIs.
+
+Attendant terminals on weak networks retry POSTs. A request carrying an
+`Idempotency-Key` claims a row in IdempotencyKey (unique on scope + key);
+a retry finds that row through the unique index and gets the stored
+response back without re-running pricing, DaySheet locking or audit writes.
+
+An unfinished claim holds a lease (locked_until, IDEMPOTENCY_LEASE_SECONDS).
+While it runs, retries get IdempotencyInProgress; once it has passed (the
+worker died before completing or releasing) the next retry takes the key
+over and runs the operation itself. complete() only succeeds while the
+caller still holds its lease, and is meant to run in the same transaction
+as the operation, so a claim that was taken over rolls its work back.
+"""
+from datetime import timedelta
+from typing import Optional, Tuple
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from jobs.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyError(Exception):
+    """Base class for idempotency key failures."""
+
+
+class IdempotencyKeyReused(IdempotencyError):
+    """The key was already used for a different request or user."""
+
+
+class IdempotencyInProgress(IdempotencyError):
+    """The original request holding this key has not finished yet."""
+
+
+class IdempotencyLeaseLost(IdempotencyInProgress):
+    """The claim outlived its lease and another request took the key over."""
+
+
+def key_ttl() -> timedelta:
+    return timedelta(hours=int(getattr(settings, "IDEMPOTENCY_KEY_TTL_HOURS", 24)))
+
+
+def lease() -> timedelta:
+    return timedelta(seconds=int(getattr(settings, "IDEMPOTENCY_LEASE_SECONDS", 120)))
+
+
+def request_fingerprint(data) -> str:
+    """Stable sha256 of a request body / parameter dict."""
+    try:
+        raw = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    except Exception:
+        raw = str(data)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def verify_owner(record: IdempotencyKey, user, request_hash: str):
+    if record.user_id is not None and record.user_id != getattr(user, "pk", None):
+        raise IdempotencyKeyReused("Idempotency-Key belongs to another user.")
+    if request_hash and record.request_hash and record.request_hash != request_hash:
+        raise IdempotencyKeyReused("Idempotency-Key was already used with a different request.")
+
+
+def lookup(scope: str, key: str, now=None) -> Optional[IdempotencyKey]:
+    """Return the live (unexpired) record for scope + key, or None."""
+    now = now or timezone.now()
+    return IdempotencyKey.objects.filter(scope=scope, key=key, expires_at__gt=now).first()
+
+
+def claim(scope: str, key: str, *, user=None, request_hash: str = "") -> Tuple[IdempotencyKey, bool]:
+    """
+    Claim `key` for `scope`.
+
+    Returns (record, True) when this caller owns the key and must run the
+    operation, or (record, False) when a completed response can be replayed.
+    Raises IdempotencyInProgress / IdempotencyKeyReused otherwise.
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters.")
+
+    now = timezone.now()
+    existing = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+    if existing and existing.expires_at <= now:
+        # expired but not yet purged — free the slot
+        existing.delete()
+        existing = None
+
+    if existing is None:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    scope=scope,
+                    key=key,
+                    user=user if getattr(user, "pk", None) else None,
+                    request_hash=request_hash,
+                    locked_until=now + lease(),
+                    expires_at=now + key_ttl(),
+                )
+            return record, True
+        except IntegrityError:
+            # lost the race to a concurrent request with the same key
+            existing = IdempotencyKey.objects.get(scope=scope, key=key)
+
+    verify_owner(existing, user, request_hash)
+    if existing.status != IdempotencyKey.STATUS_COMPLETED:
+        if not _take_over(existing, now):
+            raise IdempotencyInProgress("A request with this Idempotency-Key is still being processed.")
+        return existing, True
+    return existing, False
+
+
+def _take_over(record: IdempotencyKey, now) -> bool:
+    """Renew the lease of an abandoned in-progress claim; False while it is still held."""
+    held_until = record.locked_until or record.created_at + lease()
+    if held_until > now:
+        return False
+    renewed = now + lease()
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, status=IdempotencyKey.STATUS_IN_PROGRESS, locked_until=record.locked_until,
+    ).update(locked_until=renewed)
+    if not taken:  # another retry got there first, or the original finished
+        return False
+    logger.warning("Taking over abandoned idempotency key %s/%s", record.scope, record.key)
+    record.locked_until = renewed
+    return True
+
+
+def complete(record: IdempotencyKey, *, status_code: int = 200, body=None) -> IdempotencyKey:
+    """
+    Store the response under the key. Raises IdempotencyLeaseLost when the
+    claim was taken over, so the caller's transaction rolls back.
+    """
+    body = body if body is not None else {}
+    done = IdempotencyKey.objects.filter(
+        pk=record.pk, status=IdempotencyKey.STATUS_IN_PROGRESS, locked_until=record.locked_until,
+    ).update(status=IdempotencyKey.STATUS_COMPLETED, response_status=status_code, response_body=body)
+    if not done:
+        raise IdempotencyLeaseLost("Idempotency-Key was taken over by a retry of this request.")
+    record.status = IdempotencyKey.STATUS_COMPLETED
+    record.response_status = status_code
+    record.response_body = body
+    return record
+
+
+def release(record: IdempotencyKey):
+    """Give the key back after a failed attempt so the client can retry."""
+    try:
+        # a claim that was taken over carries a new lease and is not ours to drop
+        IdempotencyKey.objects.filter(
+            pk=record.pk, status=IdempotencyKey.STATUS_IN_PROGRESS, locked_until=record.locked_until,
+        ).delete()
+    except Exception:
+        logger.exception("Failed to release idempotency key %s/%s", record.scope, record.key)
+
+
+def purge_expired(now=None, chunk_size: int = 1000) -> int:
+    """Delete expired keys in chunks. Returns the number of rows removed."""
+    now = now or timezone.now()
+    removed = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects
+            .filter(expires_at__lte=now)
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return removed
+        deleted, _ = IdempotencyKey.objects.filter(pk__in=ids).delete()
+        removed += deleted
+
+
+__all__ = [
+    "IDEMPOTENCY_HEADER",
+    "IdempotencyError",
+    "IdempotencyKeyReused",
+    "IdempotencyInProgress",
+    "IdempotencyLeaseLost",
+    "request_fingerprint",
+    "verify_owner",
+    "lookup",
+    "claim",
+    "complete",
+    "release",
+    "purge_expired",
+]
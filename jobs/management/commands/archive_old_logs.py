@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.retention import TABLES, LogArchiver
+
+
+class Command(BaseCommand):
+    help = (
+        "Move StatusLog, delivered ShadowLogEvent, AuditLog and DomainEvent (except recruitment) rows "
+        "older than their retention horizon into the gzip JSONL archive (schedule daily via cron or the task runner)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--table", action="append", default=[], choices=sorted(TABLES),
+            help="Table to archive (repeatable; default all)",
+        )
+        parser.add_argument("--days", type=int, default=None, help="Override the retention horizon in days")
+        parser.add_argument("--chunk-size", type=int, default=None)
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would move")
+
+    def handle(self, *args, **options):
+        if options["days"] is not None and options["days"] < 0:
+            raise CommandError("--days must be >= 0")
+        archiver = LogArchiver(chunk_size=options["chunk_size"])
+
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        for name in options["table"] or sorted(TABLES):
+            result = archiver.archive_table(name, days=options["days"], dry_run=options["dry_run"])
+            self.stdout.write(self.style.SUCCESS(
+                f"{verb} {result['archived']} {name} row(s) older than {result['cutoff']:%Y-%m-%d %H:%M} "
+                f"({result['files']} file(s))"
+            ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from jobs.auto_close import auto_close_scheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Auto-close day sheets past their branch's closing time (and their open shifts), "
+        "plus shifts open longer than AUTO_CLOSE_SHIFT_MAX_HOURS. run_workers schedules this "
+        "every AUTO_CLOSE_INTERVAL_SECONDS; use the command for one-off runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--branch", action="append", type=int, default=[], help="Branch id (repeatable; default all)")
+        parser.add_argument("--dry-run", action="store_true", help="Report what is due without closing anything")
+
+    def handle(self, *args, **options):
+        result = auto_close_scheduler.sweep(branch_ids=options["branch"] or None, dry_run=options["dry_run"])
+        verb = "would close" if options["dry_run"] else "closed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['branches']} branch(es), {result['sheets_due']} sheet(s) due: {verb} "
+            f"{result['sheets_closed'] if not options['dry_run'] else result['sheets_due']} sheet(s) and "
+            f"{result['shifts_closed']} shift(s) in {result['duration_ms']} ms."
+        ))
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.estimator import ProductionTimeEstimator, production_estimator, minutes_per_unit, META_KEY
+from jobs.models import JobRecord, ServiceType
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-branch/service production-time estimates in ServiceType.meta from closed JobRecords"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Only use records that closed in the last N days")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        records = JobRecord.objects.filter(time_end__isnull=False)
+        if options["days"]:
+            records = records.filter(time_end__gte=timezone.now() - timedelta(days=options["days"]))
+
+        rows = records.order_by("pk").values_list(
+            "job__branch_id",
+            "job__service_id",
+            "job__quantity",
+            "quantity_produced",
+            "time_start",
+            "time_end",
+        )
+
+        # Rebuild from scratch so re-running never double counts
+        with transaction.atomic():
+            for service in ServiceType.objects.select_for_update().only("pk", "meta"):
+                if META_KEY in (service.meta or {}):
+                    meta = dict(service.meta)
+                    meta.pop(META_KEY)
+                    ServiceType.objects.filter(pk=service.pk).update(meta=meta)
+
+        estimator = ProductionTimeEstimator(flush_interval=float("inf"))
+        seen = used = 0
+        for branch_id, service_id, job_qty, produced, start, end in rows.iterator(chunk_size=options["chunk_size"]):
+            seen += 1
+            minutes = minutes_per_unit(start, end, produced, job_qty)
+            if minutes is not None and estimator.observe(branch_id, service_id, minutes):
+                used += 1
+
+        written = estimator.flush()
+        production_estimator.reset()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {seen} record(s), used {used}; wrote estimates for {written} service(s)."
+        ))
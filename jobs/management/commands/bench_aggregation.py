@@ -0,0 +1,111 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from branches.models import Country, Region, Branch
+from jobs.models import ServiceType, DaySheet, DaySheetShift, Job
+from jobs.services import daysheet_service, ShiftAggregationService, DayAggregationService
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark DaySheet/shift aggregation against a per-row loop (all writes are rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jobs", type=int, default=10000, help="Jobs on the benchmark DaySheet")
+        parser.add_argument("--shifts", type=int, default=4, help="Closed shifts (one attendant each)")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+
+    def handle(self, *args, **options):
+        repeat = max(1, options["repeat"])
+
+        try:
+            with transaction.atomic():
+                sheet = self._fixtures(max(1, options["jobs"]), max(1, options["shifts"]))
+                shift = DaySheetShift.objects.filter(daysheet=sheet).first()
+
+                self.stdout.write(f"{'measurement':<28} {'ms':>10} {'queries':>8}")
+                self._report("row loop (day totals)", lambda: self._row_loop(sheet), repeat)
+                self._report("compute_day_totals", lambda: daysheet_service.compute_day_totals(sheet), repeat)
+                self._report("ShiftAggregationService", lambda: ShiftAggregationService().aggregate(shift), repeat)
+                self._report("DayAggregationService", lambda: DayAggregationService().aggregate(sheet), repeat)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS("Benchmark complete (no data kept)."))
+
+    def _report(self, label, fn, repeat):
+        best = None
+        queries = 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                fn()
+                elapsed = time.perf_counter() - start
+            queries = len(ctx.captured_queries)
+            best = elapsed if best is None else min(best, elapsed)
+        self.stdout.write(f"{label:<28} {best * 1000:>10.1f} {queries:>8}")
+
+    def _row_loop(self, sheet):
+        total = Decimal("0.00")
+        for job in Job.objects.filter(daysheet=sheet):
+            total += Decimal(job.total_amount or 0) - Decimal(job.deposit_amount or 0)
+        return total
+
+    def _fixtures(self, job_count, shift_count):
+        country, _ = Country.objects.get_or_create(code="BN", defaults={"name": "Benchland"})
+        region, _ = Region.objects.get_or_create(country=country, name="Bench Region")
+        branch = Branch.objects.create(code="BENCH-AGG", name="Bench Aggregation", country=country, region=region)
+        service = ServiceType.objects.create(code="BENCH_AGG_SVC", name="Bench Service", price=Decimal("5.00"))
+        sheet = DaySheet.objects.create(branch=branch, date=timezone.localdate())
+
+        User = get_user_model()
+        users = [
+            User.objects.create_user(
+                employee_email=f"bench-agg-{i}@bench.local",
+                first_name="Bench",
+                last_name=str(i),
+                password=None,
+                branch=branch,
+            )
+            for i in range(shift_count)
+        ]
+
+        now = timezone.now()
+        for user in users:
+            DaySheetShift.objects.create(
+                daysheet=sheet,
+                user=user,
+                shift_start=now - timedelta(hours=1),
+                shift_end=now + timedelta(hours=1),
+                status=DaySheetShift.SHIFT_CLOSED,
+            )
+
+        Job.objects.bulk_create(
+            [
+                Job(
+                    branch=branch,
+                    service=service,
+                    daysheet=sheet,
+                    customer_name="Bench",
+                    quantity=1 + i % 5,
+                    unit_price=Decimal("5.00"),
+                    total_amount=Decimal(5 * (1 + i % 5)) - Decimal(i % 3),
+                    deposit_amount=Decimal(i % 3),
+                    created_by=users[i % shift_count],
+                )
+                for i in range(job_count)
+            ],
+            batch_size=1000,
+        )
+        return sheet
@@ -0,0 +1,66 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from branches.models import Country, Region, Branch
+from jobs.models import ServiceType
+from jobs.services import job_service
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark per-job latency of single vs batch instant-job creation (all writes are rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1,10,100", help="Comma-separated batch sizes")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per size (best is reported)")
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options["sizes"].split(",") if s.strip()]
+        repeat = max(1, options["repeat"])
+
+        self.stdout.write(f"{'size':>6} {'single ms/job':>15} {'batch ms/job':>14} {'speedup':>9}")
+        try:
+            with transaction.atomic():
+                branch, service = self._fixtures()
+                for size in sizes:
+                    single = min(self._time_single(branch, service, size) for _ in range(repeat))
+                    batch = min(self._time_batch(branch, service, size) for _ in range(repeat))
+                    self.stdout.write(
+                        f"{size:>6} {single * 1000 / size:>15.3f} {batch * 1000 / size:>14.3f} "
+                        f"{(single / batch if batch else 0):>8.1f}x"
+                    )
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS("Benchmark complete (no data kept)."))
+
+    def _fixtures(self):
+        country, _ = Country.objects.get_or_create(code="BN", defaults={"name": "Benchland"})
+        region, _ = Region.objects.get_or_create(country=country, name="Bench Region")
+        branch = Branch.objects.create(code="BENCH-001", name="Bench Branch", country=country, region=region)
+        service = ServiceType.objects.create(code="BENCH_SVC", name="Bench Service", price=Decimal("5.00"))
+        return branch, service
+
+    def _time_single(self, branch, service, size):
+        start = time.perf_counter()
+        for _ in range(size):
+            job_service.create_instant_job(
+                branch_id=branch.pk,
+                service_id=service.pk,
+                quantity=2,
+                customer_name="Bench",
+            )
+        return time.perf_counter() - start
+
+    def _time_batch(self, branch, service, size):
+        lines = [{"service_id": service.pk, "quantity": 2} for _ in range(size)]
+        start = time.perf_counter()
+        job_service.create_instant_jobs_batch(branch_id=branch.pk, lines=lines, customer_name="Bench")
+        return time.perf_counter() - start
@@ -0,0 +1,77 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from branches.models import Country, Region, Branch
+from jobs.models import DaySheet, DomainEvent
+from jobs.projections import sales_projection
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark a full sales projection rebuild over synthetic history (all writes are rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--branches", type=int, default=100)
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--jobs-per-day", type=int, default=40)
+
+    def handle(self, *args, **options):
+        branches, days, per_day = max(1, options["branches"]), max(1, options["days"]), max(1, options["jobs_per_day"])
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                events = self._fixtures(branches, days, per_day)
+                self.stdout.write(f"seeded {events} events in {time.perf_counter() - start:.1f}s")
+
+                start = time.perf_counter()
+                # workers share this transaction, so the benchmark runs serially
+                result = sales_projection.run(branch_ids=list(self.branch_ids), full=True, workers=1)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"full rebuild: {result['events']} events, {result['sheets']} sheets in {elapsed:.1f}s "
+                    f"({result['events'] / max(elapsed, 1e-9):,.0f} events/s)"
+                )
+                raise _Rollback()
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS("Benchmark complete (no data kept)."))
+
+    def _fixtures(self, branches, days, per_day):
+        rng = random.Random(7)
+        country, _ = Country.objects.get_or_create(code="BN", defaults={"name": "Benchland"})
+        region, _ = Region.objects.get_or_create(country=country, name="Bench Region")
+        today = timezone.localdate()
+        self.branch_ids = []
+        count = 0
+        for b in range(branches):
+            branch = Branch.objects.create(code=f"BENCH-PRJ-{b}", name=f"Bench Projection {b}", country=country, region=region)
+            self.branch_ids.append(branch.pk)
+            amounts = [[Decimal(rng.randint(100, 5000)) / 100 for _ in range(per_day)] for _ in range(days)]
+            # open sheets: the events are folded, but there are no Job rows to repair from
+            sheets = DaySheet.objects.bulk_create([
+                DaySheet(
+                    branch=branch, date=today - timedelta(days=d), status=DaySheet.STATUS_OPEN,
+                    total_jobs=per_day, total_amount=sum(amounts[d]),
+                )
+                for d in range(days)
+            ])
+            batch = []
+            for sheet, day_amounts in zip(sheets, amounts):
+                for seq, amount in enumerate(day_amounts, start=1):
+                    batch.append(DomainEvent(
+                        aggregate_type="DaySheet", aggregate_id=str(sheet.pk),
+                        event_type="JOB_ATTACHED", branch_id=str(branch.pk),
+                        payload={"job_id": str(seq), "total_amount": float(amount), "payment_type": "cash"},
+                    ))
+            DomainEvent.objects.bulk_create(batch, batch_size=2000)
+            count += len(batch)
+        return count
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.outbox import OutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = "Deliver pending ShadowLogEvents to HQ in batches (run once, or keep running with --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--loop", action="store_true", help="Keep dispatching until interrupted")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to sleep when the outbox is idle")
+        parser.add_argument(
+            "--requeue-failed", nargs="?", const="", default=None, metavar="BRANCH_ID",
+            help="Requeue failed events (of one branch, or all) and unpark their branches, then dispatch",
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = OutboxDispatcher(batch_size=options["batch_size"])
+        if options["requeue_failed"] is not None:
+            requeued = dispatcher.requeue_failed(branch_id=options["requeue_failed"] or None)
+            self.stdout.write(f"Requeued {requeued} failed event(s).")
+        while True:
+            totals = dispatcher.drain()
+            if totals["claimed"] or not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(
+                    "Delivered {delivered}, retrying {retry}, failed {failed}, deferred {deferred} "
+                    "of {claimed} claimed event(s).".format(**totals)
+                ))
+            if not options["loop"]:
+                return
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
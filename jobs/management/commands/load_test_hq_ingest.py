@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import hmac
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from jobs.api.views import HQIngestAPIView
+from jobs.models import IngestedShadowEvent
+from jobs.outbox import BRANCH_HEADER, HttpHQClient, SIGNATURE_HEADER, canonical_json, sign_payload, signing_secret
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the HQ ingest endpoint with signed, gzip-compressed batches from many branches. "
+        "Runs in-process (writes rolled back) unless --url points at a live server, whose "
+        "SHADOW_EVENT_BRANCH_SECRETS must give branches 1..N this deployment's signing secret."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=20000)
+        parser.add_argument("--branches", type=int, default=200)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--redeliver", type=float, default=0.1, help="Fraction of batches sent twice")
+        parser.add_argument("--url", default="", help="Live ingest URL (e.g. http://hq:8000/api/jobs/hq/ingest/)")
+        parser.add_argument("--concurrency", type=int, default=8, help="Parallel senders with --url")
+
+    def handle(self, *args, **options):
+        secret = signing_secret()
+        if not secret:
+            raise CommandError("Set SHADOW_EVENT_SIGNING_SECRET to run the ingest load test.")
+
+        batches = self._batches(options["events"], max(1, options["branches"]), max(1, options["batch_size"]), secret)
+        resend = int(len(batches) * max(0.0, options["redeliver"]))
+        batches = batches + batches[:resend]
+
+        if options["url"]:
+            elapsed, acked = self._run_http(options["url"], batches, secret, max(1, options["concurrency"]))
+            queries = None
+        else:
+            keys = {str(b): secret for b in range(1, max(1, options["branches"]) + 1)}
+            try:
+                with override_settings(SHADOW_EVENT_BRANCH_SECRETS=keys), transaction.atomic():
+                    elapsed, acked, queries = self._run_local(batches, secret)
+                    raise _Rollback()
+            except _Rollback:
+                pass
+
+        sent = sum(len(b) for b in batches)
+        self.stdout.write(f"batches         {len(batches):>10}  ({resend} redelivered)")
+        self.stdout.write(f"events sent     {sent:>10}")
+        self.stdout.write(f"events acked    {acked:>10}")
+        self.stdout.write(f"elapsed (s)     {elapsed:>10.2f}")
+        self.stdout.write(f"events / second {sent / elapsed if elapsed else 0:>10.0f}")
+        if queries is not None:
+            self.stdout.write(f"queries / batch {queries / len(batches):>10.1f}")
+        self.stdout.write(self.style.SUCCESS("Load test complete."))
+
+    def _batches(self, total, branches, batch_size, secret):
+        """Signed batches of up to batch_size events, one branch per batch (as HQ requires)."""
+        now = timezone.now().isoformat()
+        by_branch = {}
+        for i in range(total):
+            payload = {"seq": i, "amount": str(i % 97), "note": "load-test"}
+            by_branch.setdefault(i % branches + 1, []).append({
+                "uuid": str(uuid.uuid4()),
+                "event_type": "LOAD_TEST",
+                "branch_id": str(i % branches + 1),
+                "source": {"app": "load_test"},
+                "actor": {"user_id": i % 50},
+                "timestamp": now,
+                "payload": payload,
+                "signature": sign_payload(payload, secret),
+            })
+        return [
+            events[i:i + batch_size]
+            for events in by_branch.values()
+            for i in range(0, len(events), batch_size)
+        ]
+
+    def _run_local(self, batches, secret):
+        view = HQIngestAPIView.as_view()
+        factory = RequestFactory()
+        acked = 0
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            for batch in batches:
+                raw = canonical_json({"events": batch})
+                request = factory.post(
+                    "/api/jobs/hq/ingest/",
+                    data=gzip.compress(raw),
+                    content_type="application/json",
+                    HTTP_CONTENT_ENCODING="gzip",
+                    **{
+                        "HTTP_" + BRANCH_HEADER.upper().replace("-", "_"): batch[0]["branch_id"],
+                        "HTTP_" + SIGNATURE_HEADER.upper().replace("-", "_"): hmac.new(secret.encode(), raw, hashlib.sha256).hexdigest(),
+                    },
+                )
+                response = view(request)
+                if response.status_code != 200:
+                    raise CommandError(f"ingest returned {response.status_code}: {response.data}")
+                acked += sum(1 for ack in response.data["acks"] if ack["ok"])
+            elapsed = time.perf_counter() - start
+        stored = IngestedShadowEvent.objects.filter(event_type="LOAD_TEST").count()
+        self.stdout.write(f"rows stored     {stored:>10}")
+        return elapsed, acked, len(ctx.captured_queries)
+
+    def _run_http(self, url, batches, secret, concurrency):
+        client = HttpHQClient(url=url, secret=secret)
+
+        def send(batch):
+            return sum(1 for ack in client.deliver_batch(batch).get("acks", []) if ack.get("ok"))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            acked = sum(pool.map(send, batches))
+        return time.perf_counter() - start, acked
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from jobs.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key rows (schedule hourly via cron or the task runner)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        removed = purge_expired(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Purged {removed} expired idempotency key(s)."))
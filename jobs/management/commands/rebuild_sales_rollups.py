@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from jobs.sales_rollups import sales_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill or repair DailySale from DaySheet totals and recompute the region / belt / country "
+        "sales rollups for a date range (default: the last 90 days)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=90, help="Days back from today (ignored with --since)")
+        parser.add_argument("--since", help="First date (YYYY-MM-DD)")
+        parser.add_argument("--until", help="Last date (YYYY-MM-DD, default today)")
+        parser.add_argument("--branch", action="append", type=int, default=[], help="Branch id (repeatable; default all)")
+        parser.add_argument("--rollups-only", action="store_true", help="Keep DailySale, only recompute the rollups")
+
+    def handle(self, *args, **options):
+        until = self._date(options["until"], "--until") or timezone.localdate()
+        since = self._date(options["since"], "--since")
+        if since is None:
+            if options["days"] < 1:
+                raise CommandError("--days must be >= 1")
+            since = until - timedelta(days=options["days"] - 1)
+        if since > until:
+            raise CommandError("--since is after --until")
+
+        if options["rollups_only"]:
+            result = {"daily_sales": 0, **sales_rollups.refresh_rollups(since, until)}
+        else:
+            result = sales_rollups.rebuild(since, until, branch_ids=options["branch"] or None)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{since:%Y-%m-%d}..{until:%Y-%m-%d}: {result['daily_sales']} daily sale row(s), "
+            f"{result['region']} region, {result['belt']} belt, {result['country']} country rollup row(s)"
+        ))
+
+    def _date(self, value, flag):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f"{flag} must be YYYY-MM-DD")
+        return parsed
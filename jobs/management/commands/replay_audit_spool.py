@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from jobs.audit_buffer import replay_spool
+
+
+class Command(BaseCommand):
+    help = "Write spooled audit rows whose after-commit write failed (also runs as the replay_audit_spool task)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=100, help="Spool entries per run")
+
+    def handle(self, *args, **options):
+        result = replay_spool(limit=options["limit"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {result['rows']} row(s) from {result['entries'] - result['failed']} spool entr(ies); "
+            f"{result['failed']} still failing."
+        ))
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.taskqueue import registry, run_pool
+
+
+class Command(BaseCommand):
+    help = "Run background task workers (thread or process pool) until interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=None, help="Workers in the pool (default TASK_WORKER_CONCURRENCY)")
+        parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+        parser.add_argument("--queue", action="append", default=[], help="Queue to serve (repeatable; default all)")
+        parser.add_argument("--burst", action="store_true", help="Exit once no task is due")
+        parser.add_argument("--poll-interval", type=float, default=None, help="Seconds to sleep when idle")
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"] or getattr(settings, "TASK_WORKER_CONCURRENCY", 4)
+        registry.discover()
+        self.stdout.write(
+            f"Starting {concurrency} {options['mode']} worker(s) on "
+            f"{', '.join(options['queue']) or 'all queues'}; tasks: {', '.join(registry.names())}"
+        )
+        run_pool(
+            concurrency=concurrency,
+            mode=options["mode"],
+            queues=options["queue"],
+            burst=options["burst"],
+            poll_seconds=options["poll_interval"],
+        )
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
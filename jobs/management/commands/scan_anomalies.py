@@ -0,0 +1,56 @@
+from datetime import timedelta
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from jobs.anomaly_scan import anomaly_scanner
+
+
+class Command(BaseCommand):
+    help = (
+        "Run every anomaly detector over the day sheets of a date range (default: yesterday and today) "
+        "and raise the AnomalyFlags not raised yet. Schedule nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=2, help="Days back from today, inclusive (ignored with --since)")
+        parser.add_argument("--since", help="First sheet date (YYYY-MM-DD)")
+        parser.add_argument("--until", help="Last sheet date (YYYY-MM-DD, default today)")
+        parser.add_argument("--branch", action="append", type=int, default=[], help="Branch id (repeatable; default all)")
+        parser.add_argument(
+            "--detector", action="append", default=[], choices=sorted(anomaly_scanner.detectors),
+            help="Detector to run (repeatable; default all)",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Report new findings without writing flags")
+
+    def handle(self, *args, **options):
+        until = self._date(options["until"], "--until") or timezone.localdate()
+        since = self._date(options["since"], "--since")
+        if since is None:
+            if options["days"] < 1:
+                raise CommandError("--days must be >= 1")
+            since = until - timedelta(days=options["days"] - 1)
+
+        start = time.perf_counter()
+        result = anomaly_scanner.scan(
+            since, until,
+            branch_ids=options["branch"] or None,
+            detectors=options["detector"] or None,
+            dry_run=options["dry_run"],
+        )
+        elapsed = time.perf_counter() - start
+
+        verb = "would raise" if options["dry_run"] else "raised"
+        self.stdout.write(f"Scanned {result['sheets']} day sheet(s) {since:%Y-%m-%d}..{until:%Y-%m-%d} in {elapsed:.1f}s")
+        for name, found in sorted(result["found"].items()):
+            self.stdout.write(self.style.SUCCESS(f"  {name}: {found} found, {verb} {result['created'][name]} new"))
+
+    def _date(self, value, flag):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f"{flag} must be YYYY-MM-DD")
+        return parsed
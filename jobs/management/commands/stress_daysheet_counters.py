@@ -0,0 +1,107 @@
+import statistics
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, close_old_connections, transaction
+from django.test.utils import override_settings
+
+from branches.models import Country, Region, Branch
+from jobs import counters
+from jobs.models import DaySheet, DaySheetCounterShard, Job, ServiceType
+
+
+class Command(BaseCommand):
+    help = (
+        "Multi-threaded stress test of DaySheet counter writes: single-row lock vs sharded counters. "
+        "Needs a database with row locking (MySQL/PostgreSQL); test data is removed afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--jobs-per-thread", type=int, default=50)
+        parser.add_argument("--shards", type=int, default=8)
+        parser.add_argument("--hold-ms", type=float, default=2.0, help="Simulated work while the counter lock is held")
+
+    def handle(self, *args, **options):
+        if not connection.features.has_select_for_update:
+            raise CommandError(f"{connection.vendor} has no row locks; run against MySQL or PostgreSQL.")
+
+        branch, service = self._fixtures()
+        try:
+            self.stdout.write(f"{'mode':>10} {'jobs/s':>10} {'wait avg ms':>12} {'wait p95 ms':>12} {'total ok':>9}")
+            for label, shards in (("single", 1), ("sharded", options["shards"])):
+                with override_settings(DAYSHEET_COUNTER_SHARDS=shards):
+                    result = self._run(branch, service, options)
+                self.stdout.write(
+                    f"{label:>10} {result['throughput']:>10.1f} {result['wait_avg']:>12.3f} "
+                    f"{result['wait_p95']:>12.3f} {str(result['consistent']):>9}"
+                )
+        finally:
+            Job.objects.filter(branch=branch).delete()
+            DaySheet.objects.filter(branch=branch).delete()
+            branch.delete()
+            service.delete()
+
+    def _fixtures(self):
+        country, _ = Country.objects.get_or_create(code="ST", defaults={"name": "Stressland"})
+        region, _ = Region.objects.get_or_create(country=country, name="Stress Region")
+        branch = Branch.objects.create(code=f"STRESS-{int(time.time())}", name="Stress Branch", country=country, region=region)
+        service = ServiceType.objects.create(code=f"STRESS_{int(time.time())}", name="Stress Service", price=Decimal("1.00"))
+        return branch, service
+
+    def _run(self, branch, service, options):
+        DaySheet.objects.filter(branch=branch).delete()
+        sheet = DaySheet.objects.create(branch=branch, date="2000-01-01")
+        counters.ensure_shards(sheet)
+
+        waits = []
+        waits_lock = threading.Lock()
+        hold = options["hold_ms"] / 1000.0
+        per_thread = options["jobs_per_thread"]
+
+        def worker(thread_no):
+            local = []
+            try:
+                for _ in range(per_thread):
+                    with transaction.atomic():
+                        job = Job.objects.create(
+                            branch=branch, service=service, customer_name="stress",
+                            total_amount=Decimal("1.00"), daysheet=sheet,
+                        )
+                        t0 = time.perf_counter()
+                        if not counters.sharding_enabled():
+                            DaySheet.objects.select_for_update().get(pk=sheet.pk)
+                        counters.increment(sheet, jobs=1, amount=Decimal("1.00"), user=_Attendant(thread_no), job=job)
+                        local.append(time.perf_counter() - t0)
+                        time.sleep(hold)
+            finally:
+                with waits_lock:
+                    waits.extend(local)
+                close_old_connections()
+
+        threads = [threading.Thread(target=worker, args=(i + 1,)) for i in range(options["threads"])]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        counters.fold(sheet)
+        sheet.refresh_from_db()
+        expected = options["threads"] * per_thread
+        waits_ms = sorted(w * 1000 for w in waits) or [0.0]
+        return {
+            "throughput": expected / elapsed if elapsed else 0.0,
+            "wait_avg": statistics.mean(waits_ms),
+            "wait_p95": waits_ms[int(len(waits_ms) * 0.95) - 1 if len(waits_ms) > 1 else 0],
+            "consistent": sheet.total_jobs == expected and not DaySheetCounterShard.objects.filter(daysheet=sheet).exclude(total_jobs=0).exists(),
+        }
+
+
+class _Attendant:
+    """Stand-in user so each thread maps to its own shard slot."""
+    def __init__(self, pk):
+        self.pk = pk
@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from jobs.eventchain import event_chain, SEAL_EVENT
+from jobs.models import DaySheetChainSeal, IngestedShadowEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify sealed days of the shadow event hash chain, one Merkle root comparison per day, "
+        "across branches in parallel. Use --ingested at HQ to check received copies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--branch", action="append", default=[], help="Branch id (repeatable; default all)")
+        parser.add_argument("--workers", type=int, default=4, help="Branches verified in parallel")
+        parser.add_argument(
+            "--ingested", action="store_true",
+            help="Verify IngestedShadowEvent copies against received DAY_CHAIN_SEALED events",
+        )
+
+    def handle(self, *args, **options):
+        seals_by_branch = self._seals(options["branch"], options["ingested"])
+        if not seals_by_branch:
+            self.stdout.write("No sealed days to verify.")
+            return
+
+        verify = event_chain.verify_ingested if options["ingested"] else event_chain.verify_seal
+        workers = max(1, options["workers"])
+
+        def run(seals):
+            try:
+                return [verify(seal) for seal in seals]
+            finally:
+                if workers > 1:
+                    connections.close_all()
+
+        if workers == 1:
+            results = [run(seals) for seals in seals_by_branch.values()]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(run, seals_by_branch.values()))
+
+        days = bad = 0
+        for branch_results in results:
+            for result in branch_results:
+                days += 1
+                if result["ok"]:
+                    continue
+                bad += 1
+                self.stdout.write(self.style.ERROR(
+                    f"branch {result['branch_id'] or '-'} seq {result['first_seq']}..{result['last_seq']}: "
+                    f"{result['reason']}; first bad seq {result['tampered_seq']} "
+                    f"({result['comparisons']} node comparison(s))"
+                ))
+
+        summary = f"Verified {days} sealed day(s) across {len(seals_by_branch)} branch(es); {bad} failed."
+        if bad:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def _seals(self, branches, ingested):
+        grouped = {}
+        if ingested:
+            qs = IngestedShadowEvent.objects.filter(event_type=SEAL_EVENT).order_by("branch_id", "chain_seq")
+            if branches:
+                qs = qs.filter(branch_id__in=branches)
+            for branch_id, payload in qs.values_list("branch_id", "payload"):
+                grouped.setdefault(branch_id or "", []).append(payload)
+        else:
+            qs = DaySheetChainSeal.objects.order_by("branch_id", "first_seq")
+            if branches:
+                qs = qs.filter(branch_id__in=branches)
+            for seal in qs:
+                grouped.setdefault(seal.branch_id, []).append(seal)
+        return grouped
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-17 07:39
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0002_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DaySheetCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('total_jobs', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('daysheet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to='jobs.daysheet')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('daysheet', 'slot'), name='unique_daysheet_counter_slot')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-17 07:49
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0003_daysheetcountershard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftCloseSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shift_start', models.DateTimeField(blank=True, null=True)),
+                ('shift_end', models.DateTimeField(blank=True, null=True)),
+                ('job_count', models.PositiveIntegerField(default=0)),
+                ('gross_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('deposit_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('net_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('cash_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('momo_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('card_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('adjustment_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Sum of approved correction deltas applied after close', max_digits=14)),
+                ('corrections_applied', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('attendant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('daysheet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_snapshots', to='jobs.daysheet')),
+                ('shift', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='close_snapshot', to='jobs.daysheetshift')),
+            ],
+        ),
+    ]
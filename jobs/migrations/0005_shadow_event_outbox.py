@@ -0,0 +1,54 @@
+# Generated by Django 5.1.3 on 2026-10-17 08:02
+
+from django.db import migrations, models
+
+
+def mark_sent_events_delivered(apps, schema_editor):
+    # Events already delivered inline before the outbox existed must not be resent
+    ShadowLogEvent = apps.get_model("jobs", "ShadowLogEvent")
+    ShadowLogEvent.objects.filter(sent_at__isnull=False).update(delivery_status="delivered")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0004_shiftclosesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shadowlogevent',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shadowlogevent',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='shadowlogevent',
+            name='delivery_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('delivered', 'Delivered'), ('failed', 'Failed')], default='pending', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='shadowlogevent',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='shadowlogevent',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='shadowlogevent',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='shadowlogevent',
+            index=models.Index(fields=['delivery_status', 'id'], name='shadow_outbox_idx'),
+        ),
+        migrations.RunPython(mark_sent_events_delivered, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.3 on 2026-10-17 08:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0005_shadow_event_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestedShadowEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(unique=True)),
+                ('event_type', models.CharField(max_length=128)),
+                ('branch_id', models.CharField(blank=True, max_length=128, null=True)),
+                ('source', models.JSONField(blank=True, default=dict)),
+                ('actor', models.JSONField(blank=True, default=dict)),
+                ('timestamp', models.DateTimeField(blank=True, null=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('signature', models.CharField(blank=True, max_length=512)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('-id',),
+                'indexes': [models.Index(fields=['branch_id', 'timestamp'], name='jobs_ingest_branch__a7a3de_idx'), models.Index(fields=['event_type'], name='jobs_ingest_event_t_47bf9b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.1.3 on 2026-10-17 08:22
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0006_ingestedshadowevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DaySheetChainSeal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('branch_id', models.CharField(db_index=True, max_length=128)),
+                ('first_seq', models.BigIntegerField()),
+                ('last_seq', models.BigIntegerField()),
+                ('leaf_count', models.PositiveIntegerField(default=0)),
+                ('merkle_root', models.CharField(max_length=64)),
+                ('head_hash', models.CharField(blank=True, max_length=64)),
+                ('sealed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ('-sealed_at',),
+            },
+        ),
+        migrations.CreateModel(
+            name='EventChainHead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chain_key', models.CharField(max_length=128, unique=True)),
+                ('seq', models.BigIntegerField(default=0)),
+                ('head_hash', models.CharField(blank=True, max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingestedshadowevent',
+            name='chain_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='ingestedshadowevent',
+            name='chain_seq',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingestedshadowevent',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='ingestedshadowevent',
+            name='prev_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='shadowlogevent',
+            name='chain_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='shadowlogevent',
+            name='chain_seq',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='shadowlogevent',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='shadowlogevent',
+            name='prev_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='ingestedshadowevent',
+            index=models.Index(fields=['branch_id', 'chain_seq'], name='ingested_chain_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shadowlogevent',
+            index=models.Index(fields=['branch_id', 'chain_seq'], name='shadow_chain_idx'),
+        ),
+        migrations.AddField(
+            model_name='daysheetchainseal',
+            name='daysheet',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='chain_seal', to='jobs.daysheet'),
+        ),
+        migrations.AddIndex(
+            model_name='daysheetchainseal',
+            index=models.Index(fields=['branch_id', 'last_seq'], name='chain_seal_branch_idx'),
+        ),
+    ]
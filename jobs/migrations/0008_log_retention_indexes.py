@@ -0,0 +1,37 @@
+# Generated by Django 5.1.3 on 2026-10-17 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0007_event_hash_chain'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shadowlogevent',
+            index=models.Index(fields=['branch_id', 'timestamp'], name='shadow_branch_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shadowlogevent',
+            index=models.Index(fields=['timestamp'], name='shadow_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statuslog',
+            index=models.Index(fields=['entity_type', 'entity_id', 'created_at'], name='statuslog_entity_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statuslog',
+            index=models.Index(fields=['created_at'], name='statuslog_created_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='shadowlogevent',
+            name='jobs_shadow_branch__f67ab9_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='statuslog',
+            name='jobs_status_entity__6ea4b6_idx',
+        ),
+    ]
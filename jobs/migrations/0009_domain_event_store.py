@@ -0,0 +1,132 @@
+# Generated by Django 5.1.3 on 2026-10-17 08:34
+
+import django.core.serializers.json
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+BATCH = 1000
+
+
+def _branches_for(apps, entity_type, ids):
+    """Branch id per entity pk for the StatusLog entity types that have one."""
+    ids = [int(i) for i in ids if str(i).isdigit()]
+    if not ids:
+        return {}
+    if entity_type == "DaySheet":
+        rows = apps.get_model("jobs", "DaySheet").objects.filter(pk__in=ids).values_list("pk", "branch_id")
+    elif entity_type == "Job":
+        rows = apps.get_model("jobs", "Job").objects.filter(pk__in=ids).values_list("pk", "branch_id")
+    elif entity_type == "DaySheetShift":
+        rows = apps.get_model("jobs", "DaySheetShift").objects.filter(pk__in=ids).values_list("pk", "daysheet__branch_id")
+    else:
+        return {}
+    return {str(pk): branch_id for pk, branch_id in rows}
+
+
+def backfill_domain_events(apps, schema_editor):
+    # Copy the StatusLog and RecruitmentTransitionLog history into the unified store
+    DomainEvent = apps.get_model("jobs", "DomainEvent")
+    StatusLog = apps.get_model("jobs", "StatusLog")
+    TransitionLog = apps.get_model("hr_workflows", "RecruitmentTransitionLog")
+    seqs = {}
+
+    def next_seq(key):
+        seqs[key] = seqs.get(key, 0) + 1
+        return seqs[key]
+
+    def write(chunk, to_event):
+        by_type = {}
+        for row in chunk:
+            by_type.setdefault(row[0], set()).add(row[1])
+        branches = {t: lookup(t, ids) for t, ids in by_type.items()}
+        DomainEvent.objects.bulk_create([to_event(row, branches) for row in chunk], batch_size=BATCH)
+
+    def lookup(entity_type, ids):
+        if entity_type == "RecruitmentApplication":
+            Application = apps.get_model("hr_workflows", "RecruitmentApplication")
+            return {str(pk): b for pk, b in Application.objects.filter(pk__in=ids).values_list("pk", "recommended_branch_id")}
+        return _branches_for(apps, entity_type, ids)
+
+    def status_event(row, branches):
+        entity_type, entity_id, log = row
+        branch_id = branches[entity_type].get(entity_id)
+        return DomainEvent(
+            aggregate_type=entity_type,
+            aggregate_id=entity_id,
+            seq=next_seq((entity_type, entity_id)),
+            event_type=log.event,
+            branch_id=str(branch_id) if branch_id else None,
+            actor_id=log.actor_id,
+            actor_role=log.actor_role,
+            payload=log.payload or {},
+            occurred_at=log.created_at,
+        )
+
+    def transition_event(row, branches):
+        _, application_id, log = row
+        branch_id = branches["RecruitmentApplication"].get(application_id)
+        return DomainEvent(
+            aggregate_type="RecruitmentApplication",
+            aggregate_id=application_id,
+            seq=next_seq(("RecruitmentApplication", application_id)),
+            event_type="RECRUITMENT_TRANSITION",
+            branch_id=str(branch_id) if branch_id else None,
+            actor_id=str(log.performed_by_id) if log.performed_by_id else None,
+            payload={
+                "action": log.action,
+                "previous_stage": log.previous_stage,
+                "new_stage": log.new_stage,
+                "previous_status": log.previous_status,
+                "new_status": log.new_status,
+                "payload_snapshot": log.payload_snapshot,
+            },
+            occurred_at=log.created_at,
+        )
+
+    for qs, key, to_event in (
+        (StatusLog.objects.order_by("created_at", "id"), lambda log: (log.entity_type, log.entity_id), status_event),
+        (TransitionLog.objects.order_by("created_at", "id"), lambda log: ("RecruitmentApplication", str(log.application_id)), transition_event),
+    ):
+        chunk = []
+        for log in qs.iterator(chunk_size=BATCH):
+            chunk.append((*key(log), log))
+            if len(chunk) >= BATCH:
+                write(chunk, to_event)
+                chunk = []
+        if chunk:
+            write(chunk, to_event)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0008_log_retention_indexes'),
+        ('hr_workflows', '0018_recruitmentapplication_position_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DomainEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('aggregate_type', models.CharField(max_length=64)),
+                ('aggregate_id', models.CharField(max_length=128)),
+                ('seq', models.PositiveIntegerField()),
+                ('event_type', models.CharField(max_length=128)),
+                ('schema_version', models.PositiveSmallIntegerField(default=1)),
+                ('branch_id', models.CharField(blank=True, max_length=128, null=True)),
+                ('actor_id', models.CharField(blank=True, max_length=128, null=True)),
+                ('actor_role', models.CharField(blank=True, max_length=64, null=True)),
+                ('payload', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ('occurred_at', 'id'),
+                'indexes': [models.Index(fields=['branch_id', 'occurred_at', 'id'], name='domain_event_branch_ts_idx'), models.Index(fields=['occurred_at', 'id'], name='domain_event_ts_idx')],
+                'constraints': [models.UniqueConstraint(fields=('aggregate_type', 'aggregate_id', 'seq'), name='domain_event_aggregate_seq')],
+            },
+        ),
+        migrations.RunPython(backfill_domain_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.3 on 2026-10-17 08:40
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0001_initial'),
+        ('jobs', '0009_domain_event_store'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BranchSalesTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_jobs', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('trading_days', models.PositiveIntegerField(default=0)),
+                ('first_date', models.DateField(blank=True, null=True)),
+                ('last_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sales_totals', to='branches.branch')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProjectionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64)),
+                ('partition', models.CharField(max_length=128)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('name', 'partition'), name='unique_projection_partition')],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.3 on 2026-10-17 08:46
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Human_Resources', '0008_auditlog_timeline_indexes'),
+        ('branches', '0001_initial'),
+        ('jobs', '0010_projection_read_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BeltDailySale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('belt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='Human_Resources.belt')),
+            ],
+            options={
+                'ordering': ('-date',),
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('belt', 'date'), name='unique_belt_daily_sale')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CountryDailySale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('country', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='branches.country')),
+            ],
+            options={
+                'ordering': ('-date',),
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('country', 'date'), name='unique_country_daily_sale')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RegionDailySale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='branches.region')),
+            ],
+            options={
+                'ordering': ('-date',),
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('region', 'date'), name='unique_region_daily_sale')],
+            },
+        ),
+    ]
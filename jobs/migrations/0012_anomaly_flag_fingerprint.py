@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-17 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0011_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anomalyflag',
+            name='fingerprint',
+            field=models.CharField(blank=True, help_text='Detector key (e.g. duplicate_jobs:job:42); one flag per finding', max_length=128, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.3 on 2026-10-17 09:02
+
+import django.core.serializers.json
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0012_anomaly_flag_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('name', models.CharField(help_text='Registered task name (module.function)', max_length=200)),
+                ('queue', models.CharField(default='default', max_length=64)),
+                ('priority', models.SmallIntegerField(default=0, help_text='Higher runs first')),
+                ('args', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('kwargs', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('unique_key', models.CharField(blank=True, help_text='Enqueueing the same key twice yields the existing task', max_length=200, null=True, unique=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='queued', max_length=16)),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Not claimed before this time')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('locked_by', models.CharField(blank=True, default='', max_length=64)),
+                ('lease_until', models.DateTimeField(blank=True, null=True)),
+                ('progress', models.FloatField(default=0.0, help_text='0..1, reported by the task')),
+                ('progress_message', models.CharField(blank=True, default='', max_length=255)),
+                ('result', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('-created_at',),
+                'indexes': [models.Index(fields=['status', 'queue', 'priority', 'run_at'], name='bgtask_claim_idx'), models.Index(fields=['status', 'lease_until'], name='bgtask_lease_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-17 09:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0013_background_tasks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutoCloseSweep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(db_index=True)),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+                ('branches', models.PositiveIntegerField(default=0)),
+                ('sheets_due', models.PositiveIntegerField(default=0)),
+                ('sheets_closed', models.PositiveIntegerField(default=0)),
+                ('shifts_closed', models.PositiveIntegerField(default=0)),
+                ('worker', models.CharField(blank=True, default='', max_length=64)),
+            ],
+            options={
+                'ordering': ('-started_at',),
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.3 on 2026-10-17 09:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0001_initial'),
+        ('jobs', '0014_auto_close_sweeps'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='anomalyflag',
+            name='flag_type',
+            field=models.CharField(choices=[('auto_close', 'Auto Close'), ('mismatch_cash', 'Mismatch Cash'), ('high_free_jobs', 'High Free Jobs'), ('duplicate_jobs', 'Duplicate Jobs'), ('repeated_corrections', 'Repeated Corrections'), ('terminal_silent', 'Terminal Silent'), ('custom', 'Custom')], default='custom', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='TerminalHeartbeat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.CharField(max_length=64)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminal_heartbeats', to='branches.branch')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminal_heartbeats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['branch', 'last_seen'], name='heartbeat_branch_seen_idx')],
+                'constraints': [models.UniqueConstraint(fields=('branch', 'user', 'device_id'), name='unique_terminal_heartbeat')],
+            },
+        ),
+    ]
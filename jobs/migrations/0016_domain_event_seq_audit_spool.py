@@ -0,0 +1,34 @@
+# Generated by Django 5.1.3 on 2026-10-17 09:45
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0015_terminal_heartbeats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditSpoolEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=100)),
+                ('rows', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('error', models.TextField(blank=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_attempt_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AlterField(
+            model_name='domainevent',
+            name='seq',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-17 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0016_domain_event_seq_audit_spool'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shadowlogevent',
+            index=models.Index(fields=['delivery_status', 'branch_id', 'id'], name='shadow_outbox_branch_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-17 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0017_shadow_outbox_branch_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='shadowlogevent',
+            name='shadow_outbox_branch_idx',
+        ),
+        migrations.AddIndex(
+            model_name='shadowlogevent',
+            index=models.Index(fields=['delivery_status', 'branch_id', 'chain_seq'], name='shadow_outbox_chain_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-17 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0019_cache_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, help_text='End of the in-progress lease; a retry may take the key over after it', null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-17 10:29
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0020_idempotency_lease'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='shadowlogevent',
+            name='shadow_branch_ts_idx',
+        ),
+    ]
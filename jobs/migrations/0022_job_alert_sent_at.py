@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-17 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0021_drop_shadow_branch_ts_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='alert_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-17 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0022_job_alert_sent_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
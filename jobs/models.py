@@ -1,10 +1,12 @@
 # jobs/models.py
+import math
 import uuid
 from decimal import Decimal
 from django.conf import settings
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, models, transaction
 from django.utils import timezone
 from django.core.validators import MinValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
 
 User = settings.AUTH_USER_MODEL
 
@@ -302,7 +304,11 @@ class Job(models.Model):
     queue_position = models.PositiveIntegerField(null=True, blank=True)
     expected_ready_at = models.DateTimeField(null=True, blank=True)
 
+    # when work began (queue_scheduler.start); the completion record's time_start
+    started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    # set by send_job_alerts once the branch has been told the job is nearly ready
+    alert_sent_at = models.DateTimeField(null=True, blank=True)
 
     created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="jobs_created")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -319,6 +325,11 @@ class Job(models.Model):
         if self.expected_minutes_per_unit:
             return int(self.expected_minutes_per_unit)
         meta = getattr(self.service, "meta", {}) or {}
+        # learned from JobRecord history (jobs.estimator); imported lazily to avoid a cycle
+        from jobs.estimator import production_estimator
+        learned = production_estimator.estimate(self.branch_id, self.service_id, meta=meta)
+        if learned is not None:
+            return max(1, math.ceil(learned))
         return int(meta.get("avg_minutes_per_unit", 30))
 
     def estimated_total_minutes(self):
@@ -454,18 +465,148 @@ class StatusLog(models.Model):
     class Meta:
         ordering = ("-created_at",)
         indexes = [
-            models.Index(fields=["entity_type", "entity_id"]),
+            models.Index(fields=["entity_type", "entity_id", "created_at"], name="statuslog_entity_ts_idx"),
             models.Index(fields=["event"]),
+            models.Index(fields=["created_at"], name="statuslog_created_idx"),
         ]
 
     def __str__(self):
         return f"StatusLog {self.event} @ {self.entity_type}:{self.entity_id}"
 
 
+# -----------------------
+# NEW: DomainEvent (unified local event store)
+# -----------------------
+SEQ_ATTEMPTS = 5
+
+
+class DomainEventQuerySet(models.QuerySet):
+
+    def next_seqs(self, events):
+        """Assign consecutive per-aggregate seqs to unsaved events lacking one."""
+        pending = [e for e in events if e.seq is None and e.numbered]
+        keys = {(e.aggregate_type, e.aggregate_id) for e in pending}
+        if not keys:
+            return
+        match = models.Q()
+        for aggregate_type, aggregate_id in keys:
+            match |= models.Q(aggregate_type=aggregate_type, aggregate_id=aggregate_id)
+        last = {
+            (row["aggregate_type"], row["aggregate_id"]): row["last"]
+            for row in self.filter(match).values("aggregate_type", "aggregate_id").annotate(last=models.Max("seq"))
+        }
+        for event in pending:
+            key = (event.aggregate_type, event.aggregate_id)
+            last[key] = (last.get(key) or 0) + 1
+            event.seq = last[key]
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Seqs are read and assigned in one query; a concurrent writer on the same
+        aggregate makes the unique constraint fail, and the batch is renumbered."""
+        objs = list(objs)
+        unnumbered = [o for o in objs if o.seq is None and o.numbered]
+        for attempt in range(SEQ_ATTEMPTS):
+            self.next_seqs(objs)
+            try:
+                with transaction.atomic(using=self.db, savepoint=True):
+                    return super().bulk_create(objs, *args, **kwargs)
+            except IntegrityError:
+                for obj in unnumbered:
+                    obj.seq = None
+                if attempt == SEQ_ATTEMPTS - 1 or not unnumbered:
+                    raise
+
+
+class DomainEvent(models.Model):
+    """
+    One row per domain action (jobs, shifts, corrections, recruitment).
+    Events of one aggregate are numbered 1, 2, 3... by `seq`; payloads of
+    registered event types are validated by jobs.domain_events.
+
+    Aggregates in UNNUMBERED_AGGREGATES are written by many concurrent
+    transactions (every job attach records on its DaySheet), so numbering
+    them at flush time would collide on the unique constraint; their seq
+    stays NULL and their history is ordered by id.
+    """
+    UNNUMBERED_AGGREGATES = frozenset({"DaySheet"})
+
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    aggregate_type = models.CharField(max_length=64)
+    aggregate_id = models.CharField(max_length=128)
+    seq = models.PositiveIntegerField(null=True, blank=True)
+    event_type = models.CharField(max_length=128)
+    schema_version = models.PositiveSmallIntegerField(default=1)
+    branch_id = models.CharField(max_length=128, blank=True, null=True)
+    actor_id = models.CharField(max_length=128, blank=True, null=True)
+    actor_role = models.CharField(max_length=64, blank=True, null=True)
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    occurred_at = models.DateTimeField(default=timezone.now)
+
+    objects = DomainEventQuerySet.as_manager()
+
+    class Meta:
+        ordering = ("occurred_at", "id")
+        constraints = [
+            models.UniqueConstraint(fields=["aggregate_type", "aggregate_id", "seq"], name="domain_event_aggregate_seq"),
+        ]
+        indexes = [
+            models.Index(fields=["branch_id", "occurred_at", "id"], name="domain_event_branch_ts_idx"),
+            models.Index(fields=["occurred_at", "id"], name="domain_event_ts_idx"),
+        ]
+
+    @property
+    def numbered(self) -> bool:
+        return self.aggregate_type not in self.UNNUMBERED_AGGREGATES
+
+    def save(self, *args, **kwargs):
+        if self.seq is None and self.numbered:
+            type(self).objects.using(kwargs.get("using") or DEFAULT_DB_ALIAS).next_seqs([self])
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.event_type} @ {self.aggregate_type}:{self.aggregate_id}#{self.seq}"
+
+
+# -----------------------
+# NEW: AuditSpoolEntry (audit rows whose post-commit write failed)
+# -----------------------
+class AuditSpoolEntry(models.Model):
+    """
+    Audit rows (DomainEvent, AuditLog, ...) the audit buffer could not write
+    after their transaction committed. Kept as field values and replayed by
+    jobs.audit_buffer.replay_spool until they land.
+    """
+    model_label = models.CharField(max_length=100)
+    rows = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_attempt_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("id",)
+
+    def __str__(self):
+        return f"Spooled {len(self.rows)} {self.model_label} row(s) ({self.attempts} attempt(s))"
+
+
 # -----------------------
 # NEW: ShadowLogEvent (immutable, sent to HQ)
 # -----------------------
 class ShadowLogEvent(models.Model):
+    """
+    Outbox row for HQ. Written inside the business transaction; delivered
+    in batches by jobs.outbox.OutboxDispatcher.
+    """
+    DELIVERY_PENDING = "pending"
+    DELIVERY_DELIVERED = "delivered"
+    DELIVERY_FAILED = "failed"
+    DELIVERY_CHOICES = [
+        (DELIVERY_PENDING, "Pending"),
+        (DELIVERY_DELIVERED, "Delivered"),
+        (DELIVERY_FAILED, "Failed"),
+    ]
+
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, db_index=True)
     event_type = models.CharField(max_length=128)
     branch_id = models.CharField(max_length=128, blank=True, null=True)
@@ -478,17 +619,105 @@ class ShadowLogEvent(models.Model):
     received_at = models.DateTimeField(null=True, blank=True)
     processed_at = models.DateTimeField(null=True, blank=True)
 
+    # outbox delivery state
+    delivery_status = models.CharField(max_length=16, choices=DELIVERY_CHOICES, default=DELIVERY_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+
+    # per-branch hash chain (jobs.eventchain)
+    chain_seq = models.BigIntegerField(null=True, blank=True)
+    prev_hash = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    chain_hash = models.CharField(max_length=64, blank=True)
+
     class Meta:
         ordering = ("-timestamp",)
         indexes = [
             models.Index(fields=["event_type"]),
-            models.Index(fields=["branch_id"]),
+            models.Index(fields=["timestamp"], name="shadow_ts_idx"),
+            models.Index(fields=["delivery_status", "id"], name="shadow_outbox_idx"),
+            models.Index(fields=["delivery_status", "branch_id", "chain_seq"], name="shadow_outbox_chain_idx"),
+            models.Index(fields=["branch_id", "chain_seq"], name="shadow_chain_idx"),
         ]
 
     def __str__(self):
         return f"ShadowEvent {self.event_type} @ {self.timestamp.isoformat()}"
 
 
+# -----------------------
+# HQ: ingested branch shadow events
+# -----------------------
+class IngestedShadowEvent(models.Model):
+    """
+    HQ-side copy of a branch ShadowLogEvent, written by the bulk ingest
+    endpoint (jobs.hq_ingest). The unique uuid makes redelivery idempotent.
+    """
+    uuid = models.UUIDField(unique=True)
+    event_type = models.CharField(max_length=128)
+    branch_id = models.CharField(max_length=128, blank=True, null=True)
+    source = models.JSONField(default=dict, blank=True)
+    actor = models.JSONField(default=dict, blank=True)
+    timestamp = models.DateTimeField(null=True, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    signature = models.CharField(max_length=512, blank=True)
+    received_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    chain_seq = models.BigIntegerField(null=True, blank=True)
+    prev_hash = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    chain_hash = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        ordering = ("-id",)
+        indexes = [
+            models.Index(fields=["branch_id", "timestamp"]),
+            models.Index(fields=["event_type"]),
+            models.Index(fields=["branch_id", "chain_seq"], name="ingested_chain_idx"),
+        ]
+
+    def __str__(self):
+        return f"Ingested {self.event_type} from branch {self.branch_id}"
+
+
+# -----------------------
+# Event chain heads and day seals
+# -----------------------
+class EventChainHead(models.Model):
+    """Tip of one branch's shadow event hash chain ('' = events without a branch)."""
+    chain_key = models.CharField(max_length=128, unique=True)
+    seq = models.BigIntegerField(default=0)
+    head_hash = models.CharField(max_length=64, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Chain {self.chain_key or '-'} @ {self.seq}"
+
+
+class DaySheetChainSeal(models.Model):
+    """
+    Merkle root over a branch's chained shadow events since its previous
+    seal, written when the DaySheet closes.
+    """
+    daysheet = models.OneToOneField("jobs.DaySheet", on_delete=models.PROTECT, related_name="chain_seal")
+    branch_id = models.CharField(max_length=128, db_index=True)
+    first_seq = models.BigIntegerField()
+    last_seq = models.BigIntegerField()
+    leaf_count = models.PositiveIntegerField(default=0)
+    merkle_root = models.CharField(max_length=64)
+    head_hash = models.CharField(max_length=64, blank=True)
+    sealed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ("-sealed_at",)
+        indexes = [models.Index(fields=["branch_id", "last_seq"], name="chain_seal_branch_idx")]
+
+    def __str__(self):
+        return f"Seal {self.daysheet_id} [{self.first_seq}..{self.last_seq}]"
+
+
 # -----------------------
 # NEW: AnomalyFlag (fixed)
 # -----------------------
@@ -510,6 +739,7 @@ class AnomalyFlag(models.Model):
     TYPE_HIGH_FREE_JOBS = "high_free_jobs"
     TYPE_DUPLICATE_JOBS = "duplicate_jobs"
     TYPE_REPEATED_CORRECTIONS = "repeated_corrections"
+    TYPE_TERMINAL_SILENT = "terminal_silent"
     TYPE_CUSTOM = "custom"
 
     FLAG_TYPE_CHOICES = [
@@ -518,6 +748,7 @@ class AnomalyFlag(models.Model):
         (TYPE_HIGH_FREE_JOBS, "High Free Jobs"),
         (TYPE_DUPLICATE_JOBS, "Duplicate Jobs"),
         (TYPE_REPEATED_CORRECTIONS, "Repeated Corrections"),
+        (TYPE_TERMINAL_SILENT, "Terminal Silent"),
         (TYPE_CUSTOM, "Custom"),
     ]
 
@@ -529,9 +760,302 @@ class AnomalyFlag(models.Model):
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     notified_to = models.JSONField(default=list, blank=True, help_text="List of roles/users notified")
+    fingerprint = models.CharField(
+        max_length=128, null=True, blank=True, unique=True,
+        help_text="Detector key (e.g. duplicate_jobs:job:42); one flag per finding",
+    )
 
     class Meta:
         ordering = ("-created_at",)
 
+    @staticmethod
+    def make_fingerprint(flag_type: str, entity: str, entity_id) -> str:
+        return f"{flag_type}:{entity}:{entity_id}"
+
     def __str__(self):
         return f"Anomaly {self.flag_type} ({self.severity}) on sheet {getattr(self.daily_sheet, 'id', None)}"
+
+
+# -----------------------
+# NEW: IdempotencyKey (safe client retries)
+# -----------------------
+class IdempotencyKey(models.Model):
+    """
+    Client-supplied key for a mutating request. The first request claims the
+    key; retries with the same key get the stored response back instead of
+    running the operation again. Rows expire after IDEMPOTENCY_KEY_TTL_HOURS.
+    """
+    STATUS_IN_PROGRESS = "in_progress"
+    STATUS_COMPLETED = "completed"
+
+    STATUS_CHOICES = [
+        (STATUS_IN_PROGRESS, "In Progress"),
+        (STATUS_COMPLETED, "Completed"),
+    ]
+
+    scope = models.CharField(max_length=64, help_text="Operation the key applies to, e.g. job.complete:42")
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    request_hash = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_IN_PROGRESS)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    locked_until = models.DateTimeField(
+        null=True, blank=True, help_text="End of the in-progress lease; a retry may take the key over after it"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "key"], name="unique_idempotency_scope_key"),
+        ]
+
+    def __str__(self):
+        return f"IdempotencyKey {self.scope} {self.key} ({self.status})"
+
+
+# -----------------------
+# NEW: DaySheetCounterShard (opt-in sharded totals)
+# -----------------------
+class DaySheetCounterShard(models.Model):
+    """
+    One of N counter slots for a DaySheet. When DAYSHEET_COUNTER_SHARDS > 1,
+    job attaches increment a shard instead of the DaySheet row so attendants
+    do not serialize on one hot row. Shards are folded into
+    DaySheet.total_jobs / total_amount at shift close and day close.
+    """
+    daysheet = models.ForeignKey(DaySheet, on_delete=models.CASCADE, related_name="counter_shards")
+    slot = models.PositiveSmallIntegerField()
+    total_jobs = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["daysheet", "slot"], name="unique_daysheet_counter_slot"),
+        ]
+
+    def __str__(self):
+        return f"CounterShard {self.daysheet_id}#{self.slot} ({self.total_jobs} jobs)"
+
+
+# -----------------------
+# NEW: ShiftCloseSnapshot (frozen shift totals)
+# -----------------------
+class ShiftCloseSnapshot(models.Model):
+    """
+    Totals of a shift frozen when it closes. Day close and dashboards read
+    these rows instead of re-aggregating jobs. Approved amount corrections
+    are applied as deltas (adjustment_total) rather than by recomputing.
+    """
+    shift = models.OneToOneField(DaySheetShift, on_delete=models.CASCADE, related_name="close_snapshot")
+    daysheet = models.ForeignKey(DaySheet, on_delete=models.CASCADE, related_name="shift_snapshots")
+    attendant = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    shift_start = models.DateTimeField(null=True, blank=True)
+    shift_end = models.DateTimeField(null=True, blank=True)
+
+    job_count = models.PositiveIntegerField(default=0)
+    gross_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    deposit_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    net_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    cash_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    momo_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    card_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    adjustment_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"),
+                                           help_text="Sum of approved correction deltas applied after close")
+    corrections_applied = models.PositiveIntegerField(default=0)
+
+    computed_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Snapshot for shift {self.shift_id} ({self.job_count} jobs, {self.net_total})"
+
+
+# -----------------------
+# NEW: Projection read models (jobs.projections)
+# -----------------------
+class ProjectionCheckpoint(models.Model):
+    """Last DomainEvent id a projection has applied for one partition (branch)."""
+    name = models.CharField(max_length=64)
+    partition = models.CharField(max_length=128)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["name", "partition"], name="unique_projection_partition"),
+        ]
+
+    def __str__(self):
+        return f"{self.name}[{self.partition}] @ {self.position}"
+
+
+class BranchSalesTotals(models.Model):
+    """Lifetime per-branch counters, projected from DailySale rows."""
+    branch = models.OneToOneField("branches.Branch", on_delete=models.CASCADE, related_name="sales_totals")
+    total_jobs = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+    trading_days = models.PositiveIntegerField(default=0)
+    first_date = models.DateField(null=True, blank=True)
+    last_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"BranchSalesTotals {self.branch_id}: {self.total_jobs} jobs"
+
+
+# -----------------------
+# NEW: Sales rollups (jobs.sales_rollups)
+# -----------------------
+class SalesRollup(models.Model):
+    """DailySale summed over one level of the branch hierarchy."""
+    date = models.DateField(db_index=True)
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+    total_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+        ordering = ("-date",)
+
+
+class RegionDailySale(SalesRollup):
+    region = models.ForeignKey("branches.Region", on_delete=models.CASCADE, related_name="daily_sales")
+
+    class Meta(SalesRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=["region", "date"], name="unique_region_daily_sale"),
+        ]
+
+
+class BeltDailySale(SalesRollup):
+    belt = models.ForeignKey("Human_Resources.Belt", on_delete=models.CASCADE, related_name="daily_sales")
+
+    class Meta(SalesRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=["belt", "date"], name="unique_belt_daily_sale"),
+        ]
+
+
+class CountryDailySale(SalesRollup):
+    country = models.ForeignKey("branches.Country", on_delete=models.CASCADE, related_name="daily_sales")
+
+    class Meta(SalesRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=["country", "date"], name="unique_country_daily_sale"),
+        ]
+
+
+# -----------------------
+# NEW: Background tasks (jobs.taskqueue)
+# -----------------------
+class BackgroundTask(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CANCELLED = "cancelled"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+        (STATUS_CANCELLED, "Cancelled"),
+    ]
+
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    name = models.CharField(max_length=200, help_text="Registered task name (module.function)")
+    queue = models.CharField(max_length=64, default="default")
+    priority = models.SmallIntegerField(default=0, help_text="Higher runs first")
+    args = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    unique_key = models.CharField(
+        max_length=200, null=True, blank=True, unique=True,
+        help_text="Enqueueing the same key twice yields the existing task",
+    )
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    run_at = models.DateTimeField(default=timezone.now, help_text="Not claimed before this time")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    locked_by = models.CharField(max_length=64, blank=True, default="")
+    lease_until = models.DateTimeField(null=True, blank=True)
+
+    progress = models.FloatField(default=0.0, help_text="0..1, reported by the task")
+    progress_message = models.CharField(max_length=255, blank=True, default="")
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["status", "queue", "priority", "run_at"], name="bgtask_claim_idx"),
+            models.Index(fields=["status", "lease_until"], name="bgtask_lease_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} [{self.status}] {self.uuid}"
+
+
+# -----------------------
+# NEW: Auto-close sweeps (jobs.auto_close)
+# -----------------------
+class AutoCloseSweep(models.Model):
+    """One run of the stale shift / day sheet auto-close sweep, kept for timing metrics."""
+    started_at = models.DateTimeField(db_index=True)
+    duration_ms = models.PositiveIntegerField(default=0)
+    branches = models.PositiveIntegerField(default=0)
+    sheets_due = models.PositiveIntegerField(default=0)
+    sheets_closed = models.PositiveIntegerField(default=0)
+    shifts_closed = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=64, blank=True, default="")
+
+    class Meta:
+        ordering = ("-started_at",)
+
+    def __str__(self):
+        return f"auto-close @ {self.started_at:%Y-%m-%d %H:%M} ({self.duration_ms} ms)"
+
+
+# -----------------------
+# NEW: Terminal heartbeats (jobs.heartbeats)
+# -----------------------
+class TerminalHeartbeat(models.Model):
+    """Last time one attendant terminal (branch, user, device) pinged, flushed in batches."""
+    branch = models.ForeignKey("branches.Branch", on_delete=models.CASCADE, related_name="terminal_heartbeats")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="terminal_heartbeats")
+    device_id = models.CharField(max_length=64)
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["branch", "user", "device_id"], name="unique_terminal_heartbeat"),
+        ]
+        indexes = [
+            models.Index(fields=["branch", "last_seen"], name="heartbeat_branch_seen_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} ({self.user_id}@{self.branch_id}) last seen {self.last_seen}"
+
+
+# -----------------------
+# NEW: Shared cache versions (jobs.cache_versions)
+# -----------------------
+class CacheVersion(models.Model):
+    """Invalidation counter shared by every worker's in-process caches."""
+    key = models.CharField(max_length=150, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key} v{self.version}"
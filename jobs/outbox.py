@@ -0,0 +1,402 @@
+# jobs/outbox.py
+"""
+Transactional outbox for HQ shadow events.
+
+Services write ShadowLogEvent rows inside their own transaction
+(BaseService._create_shadow_event) and never call HQ inline. A dispatcher
+(`manage.py dispatch_shadow_events`, or the jobs.tasks.dispatch_shadow_events
+task every SHADOW_OUTBOX_DISPATCH_SECONDS on the task workers) drains the
+outbox:
+
+  * pending rows are claimed with a short lease, many per HQ call;
+  * each branch's events are sent in chain order (jobs.eventchain links
+    them after commit; unlinked events are linked before each plan and
+    never sent), and a branch is only claimed as a contiguous prefix, so
+    one branch never overtakes itself even with several dispatchers running;
+  * branches are planned from their first pending event, so a branch
+    that is backing off never hides the others' events from a batch;
+  * HQ acknowledges every event; acks are recorded with one bulk_update;
+  * failed events are retried with capped exponential backoff and jitter.
+    HQ being unreachable (transport errors, timeouts, 5xx) is retried for
+    as long as it lasts; only events HQ rejected (a negative ack, or a 4xx
+    for their branch's request) are marked failed, after
+    SHADOW_OUTBOX_MAX_ATTEMPTS. A branch with a failed event is parked
+    (HQ's chain would have a gap) until an operator requeues it:
+    `dispatch_shadow_events --requeue-failed`.
+
+Each branch signs with its own key (SHADOW_EVENT_BRANCH_SECRETS, falling
+back to the deployment-wide SHADOW_EVENT_SIGNING_SECRET). HttpHQClient
+sends one request per branch in a batch, naming the branch in X-Octos-Branch,
+and HQ checks the batch and every event against that branch's key.
+"""
+from datetime import timedelta
+from typing import Dict, List, Optional
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import random
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from jobs.models import ShadowLogEvent
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Octos-Signature"
+BRANCH_HEADER = "X-Octos-Branch"
+
+
+def canonical_json(data) -> bytes:
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def sign_payload(payload, secret: Optional[str]) -> str:
+    """HMAC-SHA256 of the canonical JSON payload ('' when no secret is configured)."""
+    if not secret:
+        return ""
+    return hmac.new(secret.encode("utf-8"), canonical_json(payload), hashlib.sha256).hexdigest()
+
+
+def branch_secrets() -> Dict[str, str]:
+    return {str(k): v for k, v in (getattr(settings, "SHADOW_EVENT_BRANCH_SECRETS", None) or {}).items() if v}
+
+
+def signing_secret(branch_id=None) -> str:
+    """Key that signs a branch's events: its own entry, else the shared secret."""
+    if branch_id is not None:
+        key = branch_secrets().get(str(branch_id))
+        if key:
+            return key
+    return getattr(settings, "SHADOW_EVENT_SIGNING_SECRET", "") or ""
+
+
+def is_transient(exc) -> bool:
+    """True when HQ did not judge the events: no response, 5xx, 408 or 429."""
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status is None or status >= 500 or status in (408, 429)
+
+
+def event_to_wire(event: ShadowLogEvent) -> dict:
+    return {
+        "uuid": str(event.uuid),
+        "event_type": event.event_type,
+        "branch_id": event.branch_id,
+        "source": event.source,
+        "actor": event.actor,
+        "timestamp": event.timestamp.isoformat() if event.timestamp else None,
+        "payload": event.payload,
+        "signature": event.signature,
+        "chain_seq": event.chain_seq,
+        "prev_hash": event.prev_hash,
+        "content_hash": event.content_hash,
+        "chain_hash": event.chain_hash,
+    }
+
+
+# -------------------------------------------------
+# HQ transport
+# -------------------------------------------------
+class HttpHQClient:
+    """
+    Posts gzip-compressed JSON batches to HQ_INGEST_URL.
+
+    Request body: {"events": [<wire event>, ...]}
+    Response body: {"acks": [{"uuid": ..., "ok": bool, "error": ..., "received_at": ..., "processed_at": ...}]}
+    Transport errors and transient replies (5xx, 408, 429) raise; any other
+    non-2xx reply to a branch's request becomes a negative ack for each of
+    its events.
+    """
+
+    def __init__(self, url: Optional[str] = None, timeout: Optional[float] = None, secret: Optional[str] = None):
+        self.url = url or getattr(settings, "HQ_INGEST_URL", "")
+        self.timeout = timeout if timeout is not None else float(getattr(settings, "SHADOW_OUTBOX_HTTP_TIMEOUT", 10))
+        self.secret = secret  # None: each branch's own signing_secret()
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
+
+    def deliver_batch(self, events: List[dict]) -> dict:
+        """One signed request per branch (in batch order); the acks are merged."""
+        by_branch: Dict[Optional[str], List[dict]] = {}
+        for event in events:
+            by_branch.setdefault(event.get("branch_id"), []).append(event)
+        acks = []
+        for branch_id, branch_events in by_branch.items():
+            try:
+                acks.extend(self._post(branch_id, branch_events).get("acks") or [])
+            except Exception as exc:
+                if is_transient(exc):
+                    raise
+                error = f"HTTP {exc.response.status_code}: {exc.response.text[:200]}"
+                acks.extend({"uuid": e["uuid"], "ok": False, "error": error} for e in branch_events)
+        return {"acks": acks}
+
+    def _post(self, branch_id, events: List[dict]) -> dict:
+        raw = canonical_json({"events": events})
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        if branch_id is not None:
+            headers[BRANCH_HEADER] = str(branch_id)
+        secret = self.secret if self.secret is not None else signing_secret(branch_id)
+        if secret:
+            headers[SIGNATURE_HEADER] = hmac.new(secret.encode("utf-8"), raw, hashlib.sha256).hexdigest()
+        res = self.session.post(self.url, data=gzip.compress(raw), headers=headers, timeout=self.timeout)
+        res.raise_for_status()
+        return res.json()
+
+
+def default_hq_client():
+    if getattr(settings, "HQ_INGEST_URL", ""):
+        return HttpHQClient()
+    from jobs.services import HQClient
+    return HQClient()
+
+
+# -------------------------------------------------
+# Dispatcher
+# -------------------------------------------------
+class OutboxDispatcher:
+
+    def __init__(
+        self,
+        client=None,
+        batch_size: Optional[int] = None,
+        lease_seconds: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        retry_base_seconds: Optional[float] = None,
+        retry_max_seconds: Optional[float] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        self._client = client
+        self.batch_size = batch_size or int(getattr(settings, "SHADOW_OUTBOX_BATCH_SIZE", 200))
+        self.lease_seconds = lease_seconds or int(getattr(settings, "SHADOW_OUTBOX_LEASE_SECONDS", 60))
+        self.max_attempts = max_attempts or int(getattr(settings, "SHADOW_OUTBOX_MAX_ATTEMPTS", 10))
+        self.retry_base_seconds = retry_base_seconds or float(getattr(settings, "SHADOW_OUTBOX_RETRY_BASE_SECONDS", 5))
+        self.retry_max_seconds = retry_max_seconds or float(getattr(settings, "SHADOW_OUTBOX_RETRY_MAX_SECONDS", 3600))
+        self.rng = rng or random.Random()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = default_hq_client()
+        return self._client
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds before retry number `attempts` (half fixed, half jitter)."""
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * (2 ** min(max(0, attempts - 1), 32)))
+        return delay / 2 + self.rng.uniform(0, delay / 2)
+
+    # -------------------------------------------------
+    # Claiming
+    # -------------------------------------------------
+    def _ready_branches(self, now) -> List[Optional[str]]:
+        """
+        Branches whose first pending event (in chain order) is due and
+        unleased, oldest first; branches with a failed event are parked.
+        """
+        pending = ShadowLogEvent.objects.filter(
+            delivery_status=ShadowLogEvent.DELIVERY_PENDING, chain_seq__isnull=False
+        )
+        heads = dict(pending.order_by().values("branch_id").annotate(head=Min("chain_seq")).values_list("branch_id", "head"))
+        parked = set(
+            ShadowLogEvent.objects.filter(delivery_status=ShadowLogEvent.DELIVERY_FAILED)
+            .order_by().values_list("branch_id", flat=True).distinct()
+        )
+        rows = (
+            pending
+            .filter(chain_seq__in=set(heads.values()))
+            .filter(Q(lease_until__isnull=True) | Q(lease_until__lte=now))
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            .order_by("id")
+            .values_list("branch_id", "chain_seq")
+        )
+        return [
+            branch_id for branch_id, seq in rows
+            if heads.get(branch_id) == seq and branch_id not in parked
+        ][: self.batch_size]
+
+    def _plan(self, now) -> Dict[Optional[str], List[int]]:
+        """Per-branch contiguous prefixes of due, unleased events (oldest first)."""
+        branches = self._ready_branches(now)
+        plan: Dict[Optional[str], List[int]] = {}
+        if not branches:
+            return plan
+        share = max(1, -(-self.batch_size // len(branches)))
+        picked = 0
+        for branch_id in branches:
+            rows = (
+                ShadowLogEvent.objects
+                .filter(delivery_status=ShadowLogEvent.DELIVERY_PENDING, branch_id=branch_id, chain_seq__isnull=False)
+                .order_by("chain_seq")
+                .values_list("id", "next_attempt_at", "lease_until")[: min(share, self.batch_size - picked)]
+            )
+            for pk, next_attempt_at, lease_until in rows:
+                if (lease_until and lease_until > now) or (next_attempt_at and next_attempt_at > now):
+                    break
+                plan.setdefault(branch_id, []).append(pk)
+                picked += 1
+            if picked >= self.batch_size:
+                break
+        return plan
+
+    def requeue_failed(self, branch_id=None) -> int:
+        """Operator action: put failed events (of one branch, or all) back in the queue."""
+        qs = ShadowLogEvent.objects.filter(delivery_status=ShadowLogEvent.DELIVERY_FAILED)
+        if branch_id is not None:
+            qs = qs.filter(branch_id=str(branch_id))
+        return qs.update(
+            delivery_status=ShadowLogEvent.DELIVERY_PENDING, attempts=0, next_attempt_at=None,
+            claimed_by="", lease_until=None,
+        )
+
+    def claim(self, now=None) -> List[ShadowLogEvent]:
+        from jobs.eventchain import event_chain
+
+        now = now or timezone.now()
+        event_chain.link_pending()  # events whose after-commit link did not run
+        plan = self._plan(now)
+        if not plan:
+            return []
+        token = uuid.uuid4().hex
+        ids = [pk for pks in plan.values() for pk in pks]
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+        with transaction.atomic():
+            ShadowLogEvent.objects.filter(
+                Q(lease_until__isnull=True) | Q(lease_until__lte=now),
+                id__in=ids,
+                delivery_status=ShadowLogEvent.DELIVERY_PENDING,
+            ).update(claimed_by=token, lease_until=lease_until)
+            won = set(ShadowLogEvent.objects.filter(id__in=ids, claimed_by=token).values_list("id", flat=True))
+
+            # Another dispatcher took part of a branch: keep only our contiguous prefix
+            keep, release = [], []
+            for pks in plan.values():
+                gap = False
+                for pk in pks:
+                    if pk not in won:
+                        gap = True
+                    elif gap:
+                        release.append(pk)
+                    else:
+                        keep.append(pk)
+            if release:
+                ShadowLogEvent.objects.filter(id__in=release, claimed_by=token).update(claimed_by="", lease_until=None)
+        return list(ShadowLogEvent.objects.filter(id__in=keep).order_by("branch_id", "chain_seq"))
+
+    # -------------------------------------------------
+    # Delivery
+    # -------------------------------------------------
+    def dispatch_once(self, now=None) -> dict:
+        """Claim, send and record one batch. Returns counts by outcome."""
+        now = now or timezone.now()
+        events = self.claim(now=now)
+        result = {"claimed": len(events), "delivered": 0, "retry": 0, "failed": 0, "deferred": 0}
+        if not events:
+            return result
+
+        try:
+            response = self.client.deliver_batch([event_to_wire(e) for e in events]) or {}
+            acks = {str(a.get("uuid")): a for a in response.get("acks") or []}
+            call_error = None if response.get("ok", True) else (response.get("error") or "HQ rejected batch")
+        except Exception as exc:
+            logger.exception("OutboxDispatcher: HQ call failed for %s event(s)", len(events))
+            acks, call_error = {}, f"{type(exc).__name__}: {exc}"
+            unreachable = True
+        else:
+            unreachable = False
+
+        done_at = timezone.now()
+        failed_branches = set()
+        updated = []
+        for event in events:
+            event.claimed_by = ""
+            event.lease_until = None
+            if event.branch_id in failed_branches:
+                # keep branch order: resend after the earlier failure (HQ dedupes by uuid)
+                result["deferred"] += 1
+                updated.append(event)
+                continue
+
+            ack = acks.get(str(event.uuid))
+            if call_error is None and ack and ack.get("ok"):
+                event.delivery_status = ShadowLogEvent.DELIVERY_DELIVERED
+                event.attempts += 1
+                event.sent_at = done_at
+                event.received_at = _parse_ts(ack.get("received_at")) or done_at
+                event.processed_at = _parse_ts(ack.get("processed_at")) or done_at
+                event.next_attempt_at = None
+                event.last_error = ""
+                result["delivered"] += 1
+            else:
+                event.attempts += 1
+                event.last_error = call_error or (ack or {}).get("error") or "no ack from HQ"
+                failed_branches.add(event.branch_id)
+                # an outage only delays events; attempts keep growing for the backoff
+                if not unreachable and event.attempts >= self.max_attempts:
+                    event.delivery_status = ShadowLogEvent.DELIVERY_FAILED
+                    event.next_attempt_at = None
+                    result["failed"] += 1
+                else:
+                    event.next_attempt_at = now + timedelta(seconds=self.backoff(event.attempts))
+                    result["retry"] += 1
+            updated.append(event)
+
+        ShadowLogEvent.objects.bulk_update(
+            updated,
+            [
+                "delivery_status", "attempts", "next_attempt_at", "lease_until", "claimed_by",
+                "last_error", "sent_at", "received_at", "processed_at",
+            ],
+        )
+        return result
+
+    def drain(self, now=None, max_batches: Optional[int] = None) -> dict:
+        """Dispatch batches until nothing is claimable. Returns summed counts."""
+        totals = {"claimed": 0, "delivered": 0, "retry": 0, "failed": 0, "deferred": 0}
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            result = self.dispatch_once(now=now)
+            if not result["claimed"]:
+                break
+            batches += 1
+            for key, value in result.items():
+                totals[key] += value
+            if not result["delivered"] and not result["failed"]:
+                # everything claimable is backing off; let the next tick pick it up
+                break
+        return totals
+
+
+def _parse_ts(value):
+    if not value:
+        return None
+    if hasattr(value, "isoformat"):
+        return value
+    try:
+        return parse_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+
+
+__all__ = [
+    "BRANCH_HEADER",
+    "HttpHQClient",
+    "OutboxDispatcher",
+    "branch_secrets",
+    "canonical_json",
+    "default_hq_client",
+    "event_to_wire",
+    "sign_payload",
+    "signing_secret",
+]
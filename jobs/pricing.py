@@ -0,0 +1,202 @@
+# jobs/pricing.py
+"""
+In-process pricing index for instant jobs.
+
+Pricing rules change roughly once a month but are read on every job, so the
+active ServicePricingRule rows are compiled into a dict keyed by
+(service_id, paper_size, print_mode, color_mode, side_mode). The flat-rule and
+ServiceType.price fallbacks are resolved at build time, so a lookup never
+touches the database.
+
+Cross-process invalidation uses a version counter in the database
+(jobs.cache_versions; the Django cache is per process here): saving a rule or
+service bumps it (on commit), and every worker compares its own version with
+the shared one at most every PRICING_INDEX_VERSION_CHECK_SECONDS. A snapshot
+older than PRICING_INDEX_MAX_AGE_SECONDS is rebuilt whatever the version says,
+which bounds staleness after out-of-band edits (raw SQL, a lost bump).
+"""
+from decimal import Decimal
+from typing import Optional, Dict, Tuple, Any
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from jobs import cache_versions
+from jobs.models import ServiceType, ServicePricingRule
+
+logger = logging.getLogger(__name__)
+
+PRICING_VERSION_KEY = "jobs:pricing_index"
+
+PricingKey = Tuple[Any, Optional[str], Optional[str], Optional[str], Optional[str]]
+
+
+class PricingIndex:
+    """
+    Versioned, thread-safe snapshot of all active pricing rules.
+
+    `resolve()` mirrors JobService.resolve_unit_price_safe:
+      1. exact variant rule
+      2. first active flat rule for the service
+      3. ServiceType.price (or 0.00)
+    """
+
+    def __init__(self, check_interval: Optional[float] = None):
+        self._lock = threading.Lock()
+        self._rules: Dict[PricingKey, Decimal] = {}
+        self._fallbacks: Dict[Any, Decimal] = {}
+        self._version: Optional[int] = None
+        self._built = False
+        self._built_at = 0.0
+        self._last_check = 0.0
+        self._check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def resolve(
+        self,
+        *,
+        service: ServiceType,
+        paper_size: str = None,
+        print_mode: str = None,
+        color_mode: str = None,
+        side_mode: str = None,
+    ) -> Decimal:
+        self._ensure_fresh()
+
+        key = (service.pk, paper_size, print_mode, color_mode, side_mode)
+        price = self._rules.get(key)
+        if price is not None:
+            self.hits += 1
+            return price
+
+        self.misses += 1
+        fallback = self._fallbacks.get(service.pk)
+        if fallback is not None:
+            return fallback
+        # Service created after the last build: same fallback as the DB path
+        return Decimal(getattr(service, "price", "0.00") or "0.00")
+
+    def lookup_exact(self, *, service: ServiceType, paper_size=None, print_mode=None, color_mode=None, side_mode=None) -> Optional[Decimal]:
+        """Exact variant price or None (no fallbacks applied)."""
+        self._ensure_fresh()
+        return self._rules.get((service.pk, paper_size, print_mode, color_mode, side_mode))
+
+    def invalidate(self, *, broadcast: bool = True):
+        """
+        Drop the local snapshot. With broadcast=True the shared version is
+        bumped so other workers rebuild on their next version check.
+        """
+        with self._lock:
+            self._built = False
+        if broadcast:
+            try:
+                cache_versions.bump(PRICING_VERSION_KEY)
+            except Exception:
+                logger.exception("PricingIndex: failed to publish new version")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "version": self._version,
+            "rules": len(self._rules),
+            "services": len(self._fallbacks),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "rebuilds": self.rebuilds,
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+
+    # -------------------------------------------------
+    # Internal helpers
+    # -------------------------------------------------
+    @property
+    def check_interval(self) -> float:
+        if self._check_interval is not None:
+            return self._check_interval
+        return float(getattr(settings, "PRICING_INDEX_VERSION_CHECK_SECONDS", 5))
+
+    @property
+    def max_age(self) -> float:
+        return float(getattr(settings, "PRICING_INDEX_MAX_AGE_SECONDS", 600))
+
+    def _shared_version(self) -> int:
+        return cache_versions.current(PRICING_VERSION_KEY)
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._built and now - self._built_at >= self.max_age:
+            with self._lock:
+                self._built = False
+        if self._built and (now - self._last_check) < self.check_interval:
+            return
+
+        try:
+            shared = self._shared_version()
+        except Exception:
+            logger.exception("PricingIndex: version check failed, keeping current snapshot")
+            shared = self._version
+
+        if self._built and shared == self._version:
+            self._last_check = now
+            return
+
+        with self._lock:
+            if self._built and shared == self._version:
+                self._last_check = now
+                return
+            self._build(shared)
+            self._last_check = time.monotonic()
+
+    def _build(self, version: Optional[str]):
+        rules: Dict[PricingKey, Decimal] = {}
+        flat: Dict[Any, Decimal] = {}
+
+        active = (
+            ServicePricingRule.objects
+            .filter(is_active=True)
+            .order_by("pk")
+            .values_list(
+                "service_type_id",
+                "pricing_type",
+                "paper_size",
+                "print_mode",
+                "color_mode",
+                "side_mode",
+                "unit_price",
+            )
+        )
+        for service_id, pricing_type, paper_size, print_mode, color_mode, side_mode, unit_price in active:
+            rules.setdefault((service_id, paper_size, print_mode, color_mode, side_mode), unit_price)
+            if pricing_type == "flat":
+                flat.setdefault(service_id, unit_price)
+
+        fallbacks: Dict[Any, Decimal] = {}
+        for service_id, price in ServiceType.objects.values_list("pk", "price"):
+            fallbacks[service_id] = flat.get(service_id, Decimal(price or "0.00"))
+
+        self._rules = rules
+        self._fallbacks = fallbacks
+        self._version = version
+        self._built = True
+        self._built_at = time.monotonic()
+        self.rebuilds += 1
+        logger.debug("PricingIndex rebuilt: %s rules, %s services (version %s)", len(rules), len(fallbacks), version)
+
+
+# Process-wide singleton used by JobService
+pricing_index = PricingIndex()
+
+
+__all__ = ["PricingIndex", "pricing_index", "PRICING_VERSION_KEY"]
@@ -0,0 +1,323 @@
+# jobs/projections.py
+"""
+Projection rebuild engine for sales read models.
+
+The "sales" projection replays JOB_ATTACHED / JOB_BATCH_CREATED_INSTANT
+domain events (jobs.domain_events) to find the day sheets that changed,
+then:
+
+  * checks closed day sheets against their Job rows and repairs
+    DaySheet.total_jobs / total_amount drift from those rows,
+  * has jobs.sales_rollups rebuild DailySale (and the region / belt /
+    country rollups) for the dates it repaired,
+  * writes BranchSalesTotals (lifetime per-branch counters) from DailySale.
+
+Domain events are written after commit by the audit buffer, so they can
+trail — or, after a failed flush, miss — sales that are already counted.
+They are never used to lower committed totals: the folded event totals
+only locate sheets and report gaps in the event stream. Sheets still open,
+or closed less than PROJECTION_SETTLE_SECONDS ago, are left alone and the
+branch checkpoint is held before their events so the next run sees them
+again.
+
+Each branch is a partition with its own ProjectionCheckpoint (last
+DomainEvent id applied). The scan starts PROJECTION_REPLAY_OVERLAP ids
+before the checkpoint to catch events whose ids were allocated before the
+checkpoint but committed after it. Branches are independent and are
+projected in parallel.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from jobs.models import (
+    BranchSalesTotals,
+    DailySale,
+    DaySheet,
+    DaySheetCounterShard,
+    DomainEvent,
+    Job,
+    ProjectionCheckpoint,
+)
+from jobs.sales_rollups import sales_rollups
+
+logger = logging.getLogger(__name__)
+
+SALES_PROJECTION = "sales"
+SALES_EVENTS = ("JOB_ATTACHED", "JOB_BATCH_CREATED_INSTANT")
+CENT = Decimal("0.01")
+SETTLED_STATUSES = (DaySheet.STATUS_BRANCH_CLOSED, DaySheet.STATUS_HQ_CLOSED, DaySheet.STATUS_AUTO_CLOSED)
+
+
+def replay_overlap() -> int:
+    return int(getattr(settings, "PROJECTION_REPLAY_OVERLAP", 1000))
+
+
+def settle_delay() -> timedelta:
+    return timedelta(seconds=int(getattr(settings, "PROJECTION_SETTLE_SECONDS", 600)))
+
+
+def _money(value) -> Decimal:
+    try:
+        return Decimal(str(value or 0)).quantize(CENT)
+    except (InvalidOperation, ValueError):
+        return Decimal("0.00")
+
+
+@dataclass
+class SheetTotals:
+    jobs: int = 0
+    amount: Decimal = Decimal("0.00")
+    by_payment_type: Dict[str, dict] = field(default_factory=dict)
+
+    def add(self, jobs: int, amount: Decimal, payment_type: str):
+        self.jobs += jobs
+        self.amount += amount
+        bucket = self.by_payment_type.setdefault(payment_type, {"jobs": 0, "amount": Decimal("0.00")})
+        bucket["jobs"] += jobs
+        bucket["amount"] += amount
+
+    def breakdown(self) -> dict:
+        return {k: {"jobs": v["jobs"], "amount": str(v["amount"])} for k, v in sorted(self.by_payment_type.items())}
+
+
+def fold_sales_events(rows: Iterable) -> Dict[int, SheetTotals]:
+    """(aggregate_id, event_type, payload) rows -> totals per DaySheet pk."""
+    totals: Dict[int, SheetTotals] = {}
+    for aggregate_id, event_type, payload in rows:
+        if not str(aggregate_id).isdigit():
+            continue
+        payload = payload or {}
+        sheet = totals.setdefault(int(aggregate_id), SheetTotals())
+        if event_type == "JOB_ATTACHED":
+            sheet.add(1, _money(payload.get("total_amount")), payload.get("payment_type") or "cash")
+        elif event_type == "JOB_BATCH_CREATED_INSTANT":
+            jobs = payload.get("job_count")
+            if jobs is None:
+                jobs = len(payload.get("jobs") or [])
+            # instant jobs carry no payment channel (see compute_day_totals)
+            sheet.add(int(jobs), _money(payload.get("total_amount")), "cash")
+    return totals
+
+
+class SalesProjection:
+
+    name = SALES_PROJECTION
+
+    def __init__(self, overlap: Optional[int] = None):
+        self._overlap = overlap
+
+    @property
+    def overlap(self) -> int:
+        return replay_overlap() if self._overlap is None else self._overlap
+
+    # -------------------------------------------------
+    # Entry points
+    # -------------------------------------------------
+    def run(self, branch_ids: Optional[List] = None, full: bool = False, workers: int = 1) -> dict:
+        """Project the given branches (default: all). Returns summed counts."""
+        if branch_ids is None:
+            Branch = apps.get_model("branches", "Branch")
+            branch_ids = list(Branch.objects.order_by("pk").values_list("pk", flat=True))
+        upto = DomainEvent.objects.aggregate(last=Max("id"))["last"] or 0
+        workers = max(1, min(int(workers), len(branch_ids)))
+
+        def work(branch_id):
+            try:
+                return self.project_branch(branch_id, upto=upto, full=full)
+            finally:
+                if workers > 1:
+                    connections.close_all()
+
+        if workers == 1:
+            results = [work(b) for b in branch_ids]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(work, branch_ids))
+
+        keys = ("events", "sheets", "repaired", "deferred", "event_gaps", "daily_sales")
+        summary = {"branches": len(results), **dict.fromkeys(keys, 0)}
+        for result in results:
+            for key in keys:
+                summary[key] += result[key]
+        return summary
+
+    def project_branch(self, branch_id, upto: Optional[int] = None, full: bool = False, now=None) -> dict:
+        key = str(branch_id)
+        if upto is None:
+            upto = DomainEvent.objects.aggregate(last=Max("id"))["last"] or 0
+        checkpoint, _ = ProjectionCheckpoint.objects.get_or_create(name=self.name, partition=key)
+        result = {
+            "branch_id": key, "events": 0, "sheets": 0, "repaired": 0, "deferred": 0,
+            "event_gaps": 0, "daily_sales": 0,
+        }
+
+        events = DomainEvent.objects.filter(aggregate_type="DaySheet", event_type__in=SALES_EVENTS)
+        if full:
+            start = 0
+            events = events.filter(branch_id=key, id__lte=upto)
+        else:
+            start = max(0, checkpoint.position - self.overlap)
+            touched = set(
+                DomainEvent.objects.filter(
+                    id__gt=start, id__lte=upto, branch_id=key,
+                    aggregate_type="DaySheet", event_type__in=SALES_EVENTS,
+                ).values_list("aggregate_id", flat=True).distinct()
+            )
+            if not touched:
+                self._advance(checkpoint, upto)
+                return result
+            # whole history of each touched sheet, so the comparison is exact
+            events = events.filter(aggregate_id__in=touched)
+
+        counted = [0]
+        first_new: Dict[str, int] = {}
+
+        def rows():
+            for event_id, aggregate_id, event_type, payload in events.values_list(
+                "id", "aggregate_id", "event_type", "payload"
+            ).iterator(chunk_size=5000):
+                counted[0] += 1
+                if event_id > start and event_id < first_new.get(aggregate_id, upto + 1):
+                    first_new[aggregate_id] = event_id
+                yield aggregate_id, event_type, payload
+
+        totals = fold_sales_events(rows())
+        result["events"] = counted[0]
+
+        sheets = list(DaySheet.objects.filter(branch_id=branch_id, pk__in=list(totals)).only(
+            "pk", "branch_id", "date", "status", "closed_at", "total_jobs", "total_amount"
+        ))
+        result["sheets"] = len(sheets)
+        settled, deferred = self._split_settled(sheets, now or timezone.now())
+        result["deferred"] = len(deferred)
+
+        repaired, result["event_gaps"] = self._repair_sheets(settled, totals)
+        result["repaired"] = len(repaired)
+        if repaired:
+            dates = [s.date for s in repaired]
+            result["daily_sales"] = sales_rollups.rebuild(min(dates), max(dates), branch_ids=[branch_id])["daily_sales"]
+        self._write_branch_totals(branch_id)
+
+        # hold the checkpoint before unsettled sheets so the next run looks at them again
+        held = [first_new[str(s.pk)] - 1 for s in deferred if str(s.pk) in first_new]
+        self._advance(checkpoint, min([upto] + held))
+        return result
+
+    # -------------------------------------------------
+    # Day sheet repair
+    # -------------------------------------------------
+    def _split_settled(self, sheets: List[DaySheet], now) -> Tuple[List[DaySheet], List[DaySheet]]:
+        """Closed sheets past the settle delay (no attach can still land) vs the rest."""
+        horizon = now - settle_delay()
+        settled, deferred = [], []
+        for sheet in sheets:
+            closed = sheet.status in SETTLED_STATUSES and (sheet.closed_at is None or sheet.closed_at <= horizon)
+            (settled if closed else deferred).append(sheet)
+        return settled, deferred
+
+    @staticmethod
+    def _job_totals(sheet_ids: List[int]) -> Dict[int, Tuple[int, Decimal]]:
+        rows = (
+            Job.objects.filter(daysheet_id__in=sheet_ids)
+            .values("daysheet_id")
+            .annotate(jobs=Count("pk"), amount=Sum(Coalesce("total_amount", Value(Decimal("0.00")))))
+        )
+        return {row["daysheet_id"]: (row["jobs"], _money(row["amount"])) for row in rows}
+
+    def _repair_sheets(self, sheets: List[DaySheet], totals: Dict[int, SheetTotals]) -> Tuple[List[DaySheet], int]:
+        """
+        Bring settled DaySheet totals (row + unfolded shards) in line with
+        their Job rows. Returns (repaired sheets, sheets whose events disagree
+        with their jobs).
+        """
+        if not sheets:
+            return [], 0
+        ids = [s.pk for s in sheets]
+        jobs = self._job_totals(ids)
+        shard_sums = {
+            row["daysheet_id"]: (row["jobs"] or 0, _money(row["amount"]))
+            for row in DaySheetCounterShard.objects.filter(daysheet_id__in=ids)
+            .values("daysheet_id").annotate(jobs=Sum("total_jobs"), amount=Sum("total_amount"))
+        }
+        repaired, gaps = [], 0
+        for sheet in sheets:
+            want = jobs.get(sheet.pk, (0, Decimal("0.00")))
+            seen = totals[sheet.pk]
+            if (seen.jobs, seen.amount) != want:
+                gaps += 1
+                logger.warning(
+                    "SalesProjection: events of DaySheet %s disagree with its jobs (events %s/%s, jobs %s/%s)",
+                    sheet.pk, seen.jobs, seen.amount, want[0], want[1],
+                )
+            shard_jobs, shard_amount = shard_sums.get(sheet.pk, (0, Decimal("0.00")))
+            if (sheet.total_jobs + shard_jobs, _money(sheet.total_amount) + shard_amount) == want:
+                continue
+            if self._repair_sheet(sheet.pk):
+                repaired.append(sheet)
+        return repaired, gaps
+
+    def _repair_sheet(self, sheet_pk: int) -> bool:
+        with transaction.atomic():
+            sheet = DaySheet.objects.select_for_update().get(pk=sheet_pk)
+            if sheet.status not in SETTLED_STATUSES:  # reopened meanwhile
+                return False
+            shards = list(DaySheetCounterShard.objects.select_for_update().filter(daysheet_id=sheet_pk))
+            want_jobs, want_amount = self._job_totals([sheet_pk]).get(sheet_pk, (0, Decimal("0.00")))
+            jobs = sheet.total_jobs + sum(s.total_jobs for s in shards)
+            amount = _money(sheet.total_amount) + sum((s.total_amount for s in shards), Decimal("0.00"))
+            if (jobs, amount) == (want_jobs, want_amount):
+                return False
+            logger.warning(
+                "SalesProjection: DaySheet %s drifted from its jobs (jobs %s -> %s, amount %s -> %s)",
+                sheet_pk, jobs, want_jobs, amount, want_amount,
+            )
+            # shards keep their share; the row absorbs the difference
+            shard_jobs, shard_amount = jobs - sheet.total_jobs, amount - _money(sheet.total_amount)
+            DaySheet.objects.filter(pk=sheet_pk).update(
+                total_jobs=want_jobs - shard_jobs,
+                total_amount=want_amount - shard_amount,
+            )
+        return True
+
+    # -------------------------------------------------
+    # Read model writers
+    # -------------------------------------------------
+    def _write_branch_totals(self, branch_id):
+        agg = DailySale.objects.filter(branch_id=branch_id).aggregate(
+            jobs=Sum("total_count"),
+            amount=Sum("total_amount"),
+            days=Count("pk"),
+            first=Min("date"),
+            last=Max("date"),
+        )
+        BranchSalesTotals.objects.update_or_create(
+            branch_id=branch_id,
+            defaults={
+                "total_jobs": agg["jobs"] or 0,
+                "total_amount": _money(agg["amount"]),
+                "trading_days": agg["days"] or 0,
+                "first_date": agg["first"],
+                "last_date": agg["last"],
+            },
+        )
+
+    def _advance(self, checkpoint: ProjectionCheckpoint, upto: int):
+        if upto > checkpoint.position:
+            ProjectionCheckpoint.objects.filter(pk=checkpoint.pk, position__lt=upto).update(position=upto)
+
+
+sales_projection = SalesProjection()
+
+
+__all__ = ["SalesProjection", "SheetTotals", "fold_sales_events", "sales_projection", "SALES_EVENTS"]
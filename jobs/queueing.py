@@ -0,0 +1,250 @@
+# jobs/queueing.py
+"""
+Per-branch production queue.
+
+Queued (non-instant) jobs are ordered as:
+  1. jobs already in progress (they cannot be preempted),
+  2. express jobs,
+  3. normal jobs,
+each group oldest first. Positions are 1-based. ETAs come from a simple
+lane model: JOB_QUEUE_LANES jobs can be produced in parallel, and each job
+takes Job.estimated_total_minutes() on the first free lane.
+
+Rescheduling is incremental: the stored prefix that is already in the right
+order keeps its positions and ETAs (its lane state is replayed from the
+stored ETAs), only the suffix from the first out-of-place row is
+recomputed, and only rows whose position or ETA actually changed are
+written back with one bulk_update.
+"""
+from datetime import timedelta
+from typing import List, Optional
+import heapq
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import (
+    Job,
+    STATUS_QUEUED,
+    STATUS_IN_PROGRESS,
+    STATUS_READY,
+    PRIORITY_EXPRESS,
+    JOB_TYPE_INSTANT,
+)
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_IN_PROGRESS)
+VISIBLE_STATUSES = (STATUS_QUEUED, STATUS_IN_PROGRESS, STATUS_READY)
+
+
+# Summaries are cached per process for QUEUE_SUMMARY_CACHE_SECONDS under a
+# per-branch generation token kept in the same cache, so a cached read costs
+# no query. A job change retires the token in the worker that made it; other
+# workers serve their copy until it expires (at most the TTL).
+QUEUE_SUMMARY_GENERATION_KEY = "jobs:queue_summary:{branch_id}:generation"
+
+
+def queue_summary_ttl() -> int:
+    return int(getattr(settings, "QUEUE_SUMMARY_CACHE_SECONDS", 15))
+
+
+def queue_summary_cache_key(branch_id, limit) -> str:
+    key = QUEUE_SUMMARY_GENERATION_KEY.format(branch_id=branch_id)
+    generation = cache.get(key)
+    if generation is None:
+        # a fresh token, never a reused one: summaries cached under an evicted token stay unreachable
+        generation = uuid.uuid4().hex
+        cache.set(key, generation, None)
+    return f"jobs:queue_summary:{branch_id}:{generation}:{limit}"
+
+
+def invalidate_queue_summary(branch_id):
+    """Retire this worker's cached summaries of a branch."""
+    if branch_id is None:
+        return
+    try:
+        cache.delete(QUEUE_SUMMARY_GENERATION_KEY.format(branch_id=branch_id))
+    except Exception:
+        logger.exception("Failed to invalidate queue summary for branch %s", branch_id)
+
+
+def lane_count() -> int:
+    return max(1, int(getattr(settings, "JOB_QUEUE_LANES", 1) or 1))
+
+
+def queue_sort_key(job):
+    return (
+        job.status != STATUS_IN_PROGRESS,
+        job.priority != PRIORITY_EXPRESS,
+        job.created_at,
+        job.pk,
+    )
+
+
+def is_queueable(job) -> bool:
+    return job.type != JOB_TYPE_INSTANT and job.status in ACTIVE_STATUSES
+
+
+class BranchQueueScheduler:
+
+    def __init__(self, lanes: Optional[int] = None):
+        self._lanes = lanes
+
+    @property
+    def lanes(self) -> int:
+        return self._lanes or lane_count()
+
+    # -------------------------------------------------
+    # Events
+    # -------------------------------------------------
+    def enqueue(self, job: Job, now=None) -> int:
+        """Place a newly created job in its branch queue."""
+        return self.job_changed(job, now=now)
+
+    def start(self, job: Job, now=None) -> int:
+        """Mark a job in progress; its ETA is fixed from the start time."""
+        now = now or timezone.now()
+        with transaction.atomic():
+            job.status = STATUS_IN_PROGRESS
+            job.started_at = now
+            job.expected_ready_at = now + timedelta(minutes=job.estimated_total_minutes())
+            job.save(update_fields=["status", "started_at", "expected_ready_at", "updated_at"])
+            return self.reschedule(job.branch_id, now=now, dirty=job.pk)
+
+    def job_changed(self, job: Job, now=None) -> int:
+        """
+        Re-sync the branch queue after a job was created, updated, completed
+        or cancelled. Jobs leaving the queue lose their position.
+        """
+        with transaction.atomic():
+            if not is_queueable(job) and job.queue_position is not None:
+                Job.objects.filter(pk=job.pk).update(queue_position=None)
+                job.queue_position = None
+                transaction.on_commit(lambda: invalidate_queue_summary(job.branch_id))
+            return self.reschedule(job.branch_id, now=now, dirty=job.pk)
+
+    # -------------------------------------------------
+    # Scheduling
+    # -------------------------------------------------
+    def reschedule(self, branch_id, now=None, dirty=None) -> int:
+        """
+        Recompute positions / ETAs for a branch. `dirty` is the pk of a job
+        whose estimate may have changed; the stable prefix stops before it.
+        Returns the number of rows written.
+        """
+        now = (now or timezone.now()).replace(microsecond=0)
+
+        with transaction.atomic():
+            qs = (
+                Job.objects
+                .filter(branch_id=branch_id, status__in=ACTIVE_STATUSES)
+                .exclude(type=JOB_TYPE_INSTANT)
+                .select_related("service")
+                .only(
+                    "pk", "branch_id", "status", "priority", "type", "quantity",
+                    "expected_minutes_per_unit", "queue_position", "expected_ready_at",
+                    "created_at", "service__meta",
+                )
+            )
+            if connection.features.has_select_for_update:
+                lock = {"of": ("self",)} if connection.features.has_select_for_update_of else {}
+                qs = qs.select_for_update(**lock)
+
+            jobs = sorted(qs, key=queue_sort_key)
+            changed = self._plan(jobs, now, dirty=dirty)
+            if changed:
+                Job.objects.bulk_update(changed, ["queue_position", "expected_ready_at"])
+                transaction.on_commit(lambda: invalidate_queue_summary(branch_id))
+            return len(changed)
+
+    def _plan(self, jobs: List[Job], now, dirty=None) -> List[Job]:
+        lanes = [now] * self.lanes
+        heapq.heapify(lanes)
+
+        # Keep the prefix that is already stored in the right order
+        stable = 0
+        for idx, job in enumerate(jobs):
+            if job.pk == dirty or job.queue_position != idx + 1 or job.expected_ready_at is None:
+                break
+            stable = idx + 1
+            heapq.heapreplace(lanes, max(job.expected_ready_at, now))
+
+        changed = []
+        for idx in range(stable, len(jobs)):
+            job = jobs[idx]
+            free_at = heapq.heappop(lanes)
+            if job.status == STATUS_IN_PROGRESS and job.expected_ready_at:
+                eta = job.expected_ready_at
+            else:
+                eta = max(free_at, now) + timedelta(minutes=job.estimated_total_minutes())
+            heapq.heappush(lanes, max(eta, now))
+
+            if job.queue_position != idx + 1 or job.expected_ready_at != eta:
+                job.queue_position = idx + 1
+                job.expected_ready_at = eta
+                changed.append(job)
+        return changed
+
+    # -------------------------------------------------
+    # Read model
+    # -------------------------------------------------
+    def read_model(self, branch_id, limit: Optional[int] = None) -> list:
+        """
+        Queue rows for dashboards in one query: active jobs by position,
+        then jobs that are ready for pickup. Instant jobs never queue and are
+        left out. This is the only queue projection; the cached branch
+        summary (BranchService.get_branch_queue_summary) is built from it.
+        `created_by` is the creator's full name; their login (the
+        Employee USERNAME_FIELD) is `created_by_email`.
+        """
+        qs = (
+            Job.objects
+            .filter(branch_id=branch_id, status__in=VISIBLE_STATUSES)
+            .exclude(type=JOB_TYPE_INSTANT)
+            .order_by(F("queue_position").asc(nulls_last=True), "created_at")
+            .values(
+                "id",
+                "queue_position",
+                "status",
+                "priority",
+                "customer_name",
+                "customer_phone",
+                "quantity",
+                "total_amount",
+                "expected_ready_at",
+                "created_at",
+                service_name=F("service__name"),
+                creator_first=F("created_by__first_name"),
+                creator_last=F("created_by__last_name"),
+                created_by_email=F("created_by__employee_email"),
+            )
+        )
+        if limit:
+            qs = qs[:limit]
+        rows = list(qs)
+        for row in rows:
+            first, last = row.pop("creator_first"), row.pop("creator_last")
+            row["created_by"] = " ".join(filter(None, (first, last))) or None
+        return rows
+
+
+queue_scheduler = BranchQueueScheduler()
+
+
+__all__ = [
+    "ACTIVE_STATUSES",
+    "VISIBLE_STATUSES",
+    "BranchQueueScheduler",
+    "queue_scheduler",
+    "queue_sort_key",
+    "is_queueable",
+    "queue_summary_cache_key",
+    "queue_summary_ttl",
+    "invalidate_queue_summary",
+]
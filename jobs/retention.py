@@ -0,0 +1,240 @@
+# jobs/retention.py
+"""
+Retention and cold archive for the append-only log tables.
+
+StatusLog, ShadowLogEvent, DomainEvent and Human_Resources.AuditLog rows
+older than a per-table horizon are moved out of the hot tables in
+pk-ordered chunks:
+
+  1. a chunk of old rows is read with one values() query,
+  2. it is written as gzip-compressed JSON Lines, one file per UTC day,
+     under <RETENTION_ARCHIVE_DIR>/<table>/<YYYY-MM-DD>/part-<first>-<last>.jsonl.gz
+     (written to a temp file and renamed, so a file is complete or absent),
+  3. the chunk is deleted by primary key.
+
+Part names are derived from the chunk's pk range, so a run interrupted
+between (2) and (3) rewrites the same file on the next run instead of
+duplicating rows.
+
+ShadowLogEvent rows are only archived once HQ has acknowledged them;
+pending and failed outbox rows stay hot whatever their age. Recruitment
+transition events stay hot too: they are the application history shown
+in HR.
+
+ArchiveReader reads the archive back, pruning partitions by date.
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+import gzip
+import json
+import logging
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ArchiveTable:
+    name: str
+    model_label: str
+    time_field: str
+    days_setting: str
+    default_days: int
+    filters: Dict = field(default_factory=dict)
+    excludes: Dict = field(default_factory=dict)
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def retention_days(self) -> int:
+        return int(getattr(settings, self.days_setting, self.default_days))
+
+
+TABLES: Dict[str, ArchiveTable] = {
+    t.name: t
+    for t in (
+        ArchiveTable("status_log", "jobs.StatusLog", "created_at", "RETENTION_STATUS_LOG_DAYS", 90),
+        ArchiveTable(
+            "shadow_event", "jobs.ShadowLogEvent", "timestamp", "RETENTION_SHADOW_EVENT_DAYS", 90,
+            filters={"delivery_status": "delivered"},
+        ),
+        ArchiveTable("audit_log", "Human_Resources.AuditLog", "timestamp", "RETENTION_AUDIT_LOG_DAYS", 365),
+        ArchiveTable(
+            "domain_event", "jobs.DomainEvent", "occurred_at", "RETENTION_DOMAIN_EVENT_DAYS", 365,
+            excludes={"aggregate_type": "RecruitmentApplication"},
+        ),
+    )
+}
+
+
+class ArchiveJSONEncoder(DjangoJSONEncoder):
+    """Keeps full microsecond precision (DjangoJSONEncoder truncates to ms),
+    so archived shadow events still match their chain content hashes."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def archive_root() -> Path:
+    return Path(getattr(settings, "RETENTION_ARCHIVE_DIR", Path(settings.BASE_DIR) / "archive"))
+
+
+def _utc_day(value) -> date:
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value.astimezone(dt_timezone.utc).date()
+
+
+# -------------------------------------------------
+# Writer
+# -------------------------------------------------
+class LogArchiver:
+
+    def __init__(self, root: Optional[Path] = None, chunk_size: Optional[int] = None):
+        self._root = Path(root) if root is not None else None
+        self._chunk_size = chunk_size
+
+    @property
+    def root(self) -> Path:
+        return self._root or archive_root()
+
+    @property
+    def chunk_size(self) -> int:
+        return self._chunk_size or int(getattr(settings, "RETENTION_CHUNK_SIZE", 1000))
+
+    def cutoff(self, table: ArchiveTable, now=None, days: Optional[int] = None):
+        now = now or timezone.now()
+        return now - timedelta(days=table.retention_days() if days is None else days)
+
+    def eligible(self, table: ArchiveTable, cutoff):
+        return table.model.objects.filter(**{f"{table.time_field}__lt": cutoff}, **table.filters).exclude(**table.excludes)
+
+    def archive_table(self, name: str, now=None, days: Optional[int] = None, dry_run: bool = False) -> dict:
+        """Move rows older than the horizon into the archive. Returns counts."""
+        table = TABLES[name]
+        model = table.model
+        cutoff = self.cutoff(table, now=now, days=days)
+        result = {"table": name, "cutoff": cutoff, "archived": 0, "files": 0}
+        if dry_run:
+            result["archived"] = self.eligible(table, cutoff).count()
+            return result
+
+        columns = [f.attname for f in model._meta.concrete_fields]
+        pk_name = model._meta.pk.attname
+        while True:
+            rows = list(self.eligible(table, cutoff).order_by(pk_name).values(*columns)[: self.chunk_size])
+            if not rows:
+                return result
+            by_day: Dict[date, List[dict]] = {}
+            for row in rows:
+                by_day.setdefault(_utc_day(row[table.time_field]), []).append(row)
+            for day, day_rows in sorted(by_day.items()):
+                self._write_part(name, day, day_rows, pk_name)
+                result["files"] += 1
+            ids = [row[pk_name] for row in rows]
+            model.objects.filter(pk__in=ids).delete()
+            result["archived"] += len(ids)
+
+    def _write_part(self, name: str, day: date, rows: List[dict], pk_name: str) -> Path:
+        folder = self.root / name / day.isoformat()
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"part-{rows[0][pk_name]}-{rows[-1][pk_name]}.jsonl.gz"
+        tmp = path.with_name(path.name + ".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as fh:
+            for row in rows:
+                fh.write(json.dumps(row, cls=ArchiveJSONEncoder, separators=(",", ":")))
+                fh.write("\n")
+        os.replace(tmp, path)
+        return path
+
+
+# -------------------------------------------------
+# Reader
+# -------------------------------------------------
+class ArchiveReader:
+
+    def __init__(self, root: Optional[Path] = None):
+        self._root = Path(root) if root is not None else None
+
+    @property
+    def root(self) -> Path:
+        return self._root or archive_root()
+
+    def partitions(self, name: str, since=None, until=None) -> List[Path]:
+        """Part files of a table whose day overlaps [since, until), oldest first."""
+        base = self.root / name
+        if not base.is_dir():
+            return []
+        first = _utc_day(since) if since else None
+        last = _utc_day(until) if until else None
+        parts = []
+        for folder in sorted(base.iterdir()):
+            try:
+                day = date.fromisoformat(folder.name)
+            except ValueError:
+                continue
+            if (first and day < first) or (last and day > last):
+                continue
+            parts.extend(sorted(folder.glob("part-*.jsonl.gz"), key=_part_start))
+        return parts
+
+    def rows(
+        self,
+        name: str,
+        since=None,
+        until=None,
+        where: Optional[Callable[[dict], bool]] = None,
+        **equals,
+    ) -> Iterator[dict]:
+        """
+        Archived rows of a table in pk order per day, with the time field parsed.
+        `equals` matches columns by value (compared as strings), `where` is an
+        extra row predicate.
+        """
+        time_field = TABLES[name].time_field
+        wanted = {k: str(v) for k, v in equals.items()}
+        for path in self.partitions(name, since=since, until=until):
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                for line in fh:
+                    row = json.loads(line)
+                    if any(str(row.get(k)) != v for k, v in wanted.items()):
+                        continue
+                    ts = parse_datetime(row[time_field]) if row.get(time_field) else None
+                    row[time_field] = ts
+                    if ts is not None and ((since and ts < since) or (until and ts >= until)):
+                        continue
+                    if where is not None and not where(row):
+                        continue
+                    yield row
+
+
+def _part_start(path: Path) -> int:
+    try:
+        return int(path.name.split("-")[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+log_archiver = LogArchiver()
+archive_reader = ArchiveReader()
+
+
+__all__ = [
+    "ArchiveTable",
+    "TABLES",
+    "LogArchiver",
+    "ArchiveReader",
+    "log_archiver",
+    "archive_reader",
+]
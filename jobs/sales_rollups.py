@@ -0,0 +1,246 @@
+# jobs/sales_rollups.py
+"""
+Incrementally maintained sales read models.
+
+    DailySale           one row per branch and day
+    RegionDailySale     DailySale summed per region and day
+    BeltDailySale       ... per belt (Region.belt)
+    CountryDailySale    ... per country
+
+`record_sale()` runs inside the transaction that attaches jobs to a
+DaySheet but only queues the sale: the DailySale and region / belt /
+country deltas are applied from transaction.on_commit, with F(), in one
+short transaction of their own. Those rows are shared by every sale of a
+branch (or of a whole country) on a day, and holding their locks for the
+whole attach transaction would serialize every attach behind them.
+
+A crash between commit and the hook leaves the read models short;
+`rebuild()` (command: rebuild_sales_rollups) recomputes any date range
+from DaySheet totals. Its DailySale rewrite is absolute, so it is meant for
+days whose sheets no longer take sales (the projection only passes settled
+sheets). `refresh_rollups()` is safe against live hooks: see its docstring.
+
+HQ reads (`sales_rollups.totals("belt", since, until)`) touch one row
+per belt and day instead of the Job table.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from jobs.models import (
+    BeltDailySale,
+    CountryDailySale,
+    DailySale,
+    DaySheet,
+    DaySheetCounterShard,
+    RegionDailySale,
+)
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal("0.01")
+
+# level -> (model, key field on the rollup, path from Branch)
+LEVELS = {
+    "country": (CountryDailySale, "country", "country"),
+    "belt": (BeltDailySale, "belt", "region__belt"),
+    "region": (RegionDailySale, "region", "region"),
+}
+
+
+def _bump(model, filters: dict, jobs: int, amount: Decimal) -> None:
+    """F() upsert of one counter row (create on first sale of the day)."""
+    updated = model.objects.filter(**filters).update(
+        total_count=F("total_count") + jobs,
+        total_amount=F("total_amount") + amount,
+    )
+    if updated:
+        return
+    model.objects.bulk_create([model(**filters)], ignore_conflicts=True)
+    model.objects.filter(**filters).update(
+        total_count=F("total_count") + jobs,
+        total_amount=F("total_amount") + amount,
+    )
+
+
+class SalesRollupService:
+
+    # -------------------------------------------------
+    # Write path
+    # -------------------------------------------------
+    def record_sale(self, daysheet, *, jobs: int = 1, amount=Decimal("0.00")) -> None:
+        """Queue a sale for the branch's DailySale and its rollups; applied on commit."""
+        amount = Decimal(amount or 0)
+        branch_id, day = daysheet.branch_id, daysheet.date
+        transaction.on_commit(lambda: self._apply_sale(branch_id, day, jobs, amount))
+
+    def _apply_sale(self, branch_id, day: date, jobs: int, amount: Decimal) -> None:
+        try:
+            keys = self._hierarchy(branch_id)
+            with transaction.atomic():
+                # fixed order (country, belt, region, then DailySale) so concurrent
+                # hooks cannot deadlock; refresh_rollups() locks in the same order
+                for level, (model, field, _) in LEVELS.items():
+                    if keys[level] is not None:
+                        _bump(model, {f"{field}_id": keys[level], "date": day}, jobs, amount)
+                _bump(DailySale, {"branch_id": branch_id, "date": day}, jobs, amount)
+        except Exception:
+            logger.exception("SalesRollups: failed to apply sale for branch %s on %s", branch_id, day)
+
+    def _hierarchy(self, branch_id) -> Dict[str, Optional[int]]:
+        return self._hierarchies([branch_id]).get(branch_id, dict.fromkeys(LEVELS))
+
+    def _hierarchies(self, branch_ids) -> Dict[int, Dict[str, Optional[int]]]:
+        Branch = apps.get_model("branches", "Branch")
+        paths = [path for _, _, path in LEVELS.values()]
+        rows = Branch.objects.filter(pk__in=list(branch_ids)).values_list("pk", *paths)
+        return {row[0]: dict(zip(LEVELS, row[1:])) for row in rows}
+
+    # -------------------------------------------------
+    # Repair
+    # -------------------------------------------------
+    def rebuild(self, since: date, until: date, branch_ids: Optional[Iterable] = None) -> dict:
+        """
+        Recompute DailySale from DaySheet totals (row + unfolded shards) for
+        [since, until], then the rollups of the same dates from DailySale.
+        With branch_ids only those branches' DailySale rows are rewritten;
+        rollups are always recomputed whole for the dates.
+        """
+        sheets = DaySheet.objects.filter(date__gte=since, date__lte=until)
+        if branch_ids:
+            sheets = sheets.filter(branch_id__in=list(branch_ids))
+
+        per_day: Dict[Tuple[int, date], List] = {}
+        for branch_id, day, jobs, amount in sheets.values_list("branch_id", "date", "total_jobs", "total_amount"):
+            bucket = per_day.setdefault((branch_id, day), [0, Decimal("0.00")])
+            bucket[0] += jobs or 0
+            bucket[1] += Decimal(amount or 0)
+        shard_rows = (
+            DaySheetCounterShard.objects.filter(daysheet__in=sheets)
+            .values("daysheet__branch_id", "daysheet__date")
+            .annotate(jobs=Sum("total_jobs"), amount=Sum("total_amount"))
+        )
+        for row in shard_rows:
+            bucket = per_day.setdefault((row["daysheet__branch_id"], row["daysheet__date"]), [0, Decimal("0.00")])
+            bucket[0] += row["jobs"] or 0
+            bucket[1] += Decimal(row["amount"] or 0)
+
+        with transaction.atomic():
+            DailySale.objects.bulk_create(
+                [
+                    DailySale(branch_id=branch_id, date=day, total_count=jobs, total_amount=amount)
+                    for (branch_id, day), (jobs, amount) in per_day.items()
+                ],
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=["branch", "date"],
+                update_fields=["total_count", "total_amount", "updated_at"],
+            )
+        rollups = self.refresh_rollups(since, until)
+
+        return {"daily_sales": len(per_day), **rollups}
+
+    def refresh_rollups(self, since: date, until: date) -> Dict[str, int]:
+        """
+        Rewrite every rollup row of [since, until] from DailySale.
+
+        Serialized with the on-commit sale hooks by row locks rather than
+        by deleting and recreating rows: every rollup row the dates need is
+        created first, then the rollup rows and the DailySale rows are
+        locked (the hooks' order) before DailySale is read. A hook has
+        therefore either committed both of its bumps before the read, or
+        bumps the rewritten rows after this transaction commits. Call it
+        outside a transaction.
+        """
+        day_filter = {"date__gte": since, "date__lte": until}
+        with transaction.atomic():
+            sales = list(DailySale.objects.filter(**day_filter).values_list("branch_id", "date").distinct())
+            hierarchy = self._hierarchies({branch_id for branch_id, _ in sales})
+            for level, (model, field, _) in LEVELS.items():
+                keys = {(hierarchy[b][level], day) for b, day in sales if hierarchy.get(b, {}).get(level) is not None}
+                model.objects.bulk_create(
+                    [model(**{f"{field}_id": key}, date=day) for key, day in keys],
+                    batch_size=500, ignore_conflicts=True,
+                )
+
+        written = {}
+        with transaction.atomic():
+            rollup_rows = {
+                level: list(model.objects.select_for_update().filter(**day_filter).order_by("pk"))
+                for level, (model, _, _) in LEVELS.items()
+            }
+            sales = list(
+                DailySale.objects.select_for_update().filter(**day_filter).order_by("pk")
+                .values_list("branch_id", "date", "total_count", "total_amount")
+            )
+            hierarchy = self._hierarchies({row[0] for row in sales})
+            sums: Dict[str, Dict[Tuple[int, date], List]] = {level: {} for level in LEVELS}
+            for branch_id, day, jobs, amount in sales:
+                for level, key in hierarchy.get(branch_id, {}).items():
+                    if key is None:
+                        continue
+                    bucket = sums[level].setdefault((key, day), [0, Decimal("0.00")])
+                    bucket[0] += jobs or 0
+                    bucket[1] += Decimal(amount or 0)
+
+            now = timezone.now()
+            for level, (model, field, _) in LEVELS.items():
+                keep, stale = [], []
+                for row in rollup_rows[level]:
+                    bucket = sums[level].get((getattr(row, f"{field}_id"), row.date))
+                    if bucket is None:
+                        stale.append(row.pk)
+                        continue
+                    row.total_count, row.total_amount = bucket
+                    row.updated_at = now
+                    keep.append(row)
+                model.objects.bulk_update(keep, ["total_count", "total_amount", "updated_at"], batch_size=500)
+                if stale:
+                    model.objects.filter(pk__in=stale).delete()
+                written[level] = len(keep)
+        return written
+
+    # -------------------------------------------------
+    # HQ reads
+    # -------------------------------------------------
+    def totals(self, level: str, since: date, until: Optional[date] = None) -> List[dict]:
+        """
+        Sales per `level` key ("region", "belt" or "country") over
+        [since, until], largest first: [{"id", "name", "total_count", "total_amount"}].
+        """
+        if level not in LEVELS:
+            raise ValueError(f"Unknown rollup level: {level}")
+        model, field, _ = LEVELS[level]
+        qs = model.objects.filter(date__gte=since)
+        if until is not None:
+            qs = qs.filter(date__lte=until)
+        rows = (
+            qs.values(f"{field}_id", f"{field}__name")
+            .annotate(total_count=Sum("total_count"), total_amount=Sum("total_amount"))
+            .order_by("-total_amount")
+        )
+        return [
+            {
+                "id": row[f"{field}_id"],
+                "name": row[f"{field}__name"],
+                "total_count": row["total_count"] or 0,
+                "total_amount": Decimal(row["total_amount"] or 0).quantize(CENT),
+            }
+            for row in rows
+        ]
+
+    def last_days(self, level: str, days: int, today: Optional[date] = None) -> List[dict]:
+        today = today or timezone.localdate()
+        return self.totals(level, since=today - timedelta(days=max(1, days) - 1), until=today)
+
+
+sales_rollups = SalesRollupService()
+
+
+__all__ = ["SalesRollupService", "sales_rollups", "LEVELS"]
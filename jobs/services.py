@@ -13,8 +13,12 @@ from typing import Optional, Tuple, Dict, Any
 from datetime import timedelta
 import logging
 
-from django.db import transaction
-from django.db.models import F
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.core.cache import cache
+from django.db import transaction, connection
+from django.db.models import F, Q, Sum, Count, Case, When, Value, DecimalField, ExpressionWrapper
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.db import models
 
@@ -24,16 +28,37 @@ from .models import (
     DailySale,
     DaySheet,
     DaySheetShift,
-    StatusLog,
+    DomainEvent,
     ShadowLogEvent,
     CorrectionEntry,
     AnomalyFlag,
+    ShiftCloseSnapshot,
 )
 from jobs.models import ServiceType, ServicePricingRule
+from jobs.pricing import pricing_index
+from jobs import idempotency
+from jobs import counters
+from jobs.daysheet_cache import daysheet_cache, tz_for_name
+from jobs.queueing import queue_scheduler, queue_summary_cache_key, queue_summary_ttl
+from jobs.outbox import sign_payload, signing_secret
+from jobs.domain_events import domain_events
+from jobs.eventchain import event_chain, SEAL_EVENT
+from jobs.sales_rollups import sales_rollups
 import pytz
 
 logger = logging.getLogger(__name__)
 
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+ZERO_MONEY = Decimal("0.00")
+
+# jobs recorded without charge
+FREE_JOB_Q = Q(total_amount__isnull=True) | Q(total_amount=0)
+
+
+def cash_mismatch_tolerance() -> Decimal:
+    """Largest |closing cash - computed cash| a shift may show before it is flagged."""
+    return Decimal(str(getattr(settings, "ANOMALY_CASH_TOLERANCE", "10.00")))
+
 # ---------------------------
 # Adapters / Interfaces
 # ---------------------------
@@ -59,6 +84,10 @@ class PINVerifier:
         try:
             pin_hash = getattr(profile, "pin_hash", None) or getattr(user, "pin_hash", None)
             if pin_hash:
+                if "$" in str(pin_hash):
+                    # Django hasher format ("<algorithm>$..."), as set by the profile owner
+                    return check_password(str(pin), str(pin_hash))
+                # legacy unsalted sha256 hex
                 candidate = hashlib.sha256(str(pin).encode("utf-8")).hexdigest()
                 return hmac.compare_digest(candidate, str(pin_hash))
         except Exception:
@@ -73,6 +102,11 @@ class HQClient:
         now = timezone.now()
         return {"ok": True, "received_at": now.isoformat(), "processed_at": now.isoformat()}
 
+    def deliver_batch(self, events: list) -> dict:
+        # Simulated per-event acks (see jobs.outbox.HttpHQClient for the wire format)
+        now = timezone.now().isoformat()
+        return {"ok": True, "acks": [{"uuid": e["uuid"], "ok": True, "received_at": now, "processed_at": now} for e in events]}
+
 
 # ---------------------------
 # Base Service
@@ -82,40 +116,44 @@ class BaseService:
         self.hq = hq_client or HQClient()
         self.pin_verifier = pin_verifier or PINVerifier()
 
-    # StatusLog helper
-    def _create_status_log(self, entity_type: str, entity_id: str, event: str, actor: Optional[dict] = None, payload: Optional[dict] = None) -> StatusLog:
-        return StatusLog.objects.create(
-            entity_type=entity_type,
-            entity_id=str(entity_id),
-            event=event,
-            actor_id=(actor or {}).get("user_id") if actor else None,
-            actor_role=(actor or {}).get("role") if actor else None,
-            payload=payload or {},
+    # Domain event helper
+    # One DomainEvent row per action (jobs.domain_events). Inside a transaction
+    # it is buffered and bulk-written on commit; pass immediate=True when the
+    # pk is needed now.
+    def _record_event(self, entity_type: str, entity_id: str, event: str, branch_id=None, actor: Optional[dict] = None, payload: Optional[dict] = None, immediate: bool = False) -> DomainEvent:
+        return domain_events.record(
+            entity_type, entity_id, event, payload or {}, branch_id=branch_id, actor=actor, immediate=immediate
         )
 
     # Shadow event helper
     def _create_shadow_event(self, event_type: str, branch_id: Optional[str], actor: Optional[dict], payload: dict, signature_secret: Optional[str] = None) -> ShadowLogEvent:
-        ev = ShadowLogEvent.objects.create(
+        """
+        Write a pending outbox row in the caller's transaction. Delivery to
+        HQ happens out of band (jobs.outbox / dispatch_shadow_events).
+        """
+        return event_chain.append(ShadowLogEvent(
             event_type=event_type,
             branch_id=str(branch_id) if branch_id else None,
             source=payload.get("source", {}),
             actor=actor or {},
             timestamp=payload.get("timestamp", timezone.now()),
             payload=payload,
-            signature="",
-        )
-        # deliver (best-effort)
+            signature=sign_payload(payload, signature_secret or signing_secret(branch_id)),
+        ))
+
+    # Day chain seal helper
+    def _seal_day_chain(self, daysheet: DaySheet, actor: Optional[dict] = None, now=None):
+        """Seal the branch event chain for a closed day and send the root to HQ."""
         try:
-            res = self.hq.deliver(payload, signature_secret=signature_secret)
-            if res.get("ok"):
-                ev.sent_at = timezone.now()
-                ev.received_at = res.get("received_at") or timezone.now()
-                ev.processed_at = res.get("processed_at") or timezone.now()
-                ev.save(update_fields=["sent_at", "received_at", "processed_at"])
+            with transaction.atomic():
+                seal = event_chain.seal_daysheet(daysheet, now=now)
+                payload = event_chain.seal_payload(seal)
+                payload["timestamp"] = (now or timezone.now()).isoformat()
+                self._create_shadow_event(SEAL_EVENT, getattr(daysheet.branch, "pk", None), actor=actor, payload=payload)
+            return seal
         except Exception as exc:
-            # Fail silently for core operation but log for diagnostics
-            logger.exception("HQ delivery failed for shadow event %s: %s", event_type, exc)
-        return ev
+            logger.exception("Failed to seal event chain for daysheet %s: %s", getattr(daysheet, "pk", None), exc)
+            return None
 
 
 # ---------------------------
@@ -123,8 +161,9 @@ class BaseService:
 # ---------------------------
 def _local_date_for_branch(now, branch):
     tzname = getattr(branch, "timezone", None) or "UTC"
+    tz = tz_for_name(tzname)
     try:
-        local = now.astimezone(pytz.timezone(tzname))
+        local = now.astimezone(tz) if tz is not None else now
     except Exception:
         local = now
     return local.date()
@@ -183,7 +222,7 @@ from django.db.models import F
 from django.utils import timezone
 
 from jobs.models import Job, JobRecord, ServiceType, ServicePricingRule
-from .models import DaySheet, DaySheetShift, StatusLog, ShadowLogEvent, CorrectionEntry, AnomalyFlag
+from .models import DaySheet, DaySheetShift, DomainEvent, ShadowLogEvent, CorrectionEntry, AnomalyFlag
 
 
 logger = logging.getLogger(__name__)
@@ -252,27 +291,20 @@ class JobService(BaseService):
             if job.daysheet_id:
                 return job.daysheet, False, False
 
-            # Resolve / lock daysheet
+            # Resolve / lock daysheet (one fetch; sharded mode takes a shared lock)
             if daysheet is None:
-                daysheet, created = DaySheetService(
-                    self.hq, self.pin_verifier
-                ).get_or_create_daysheet_for_branch(
-                    job.branch, user=user, now=now
-                )
+                daysheet, created = self._resolve_and_lock_daysheet(job.branch, user=user, now=now)
             else:
                 created = False
-
-            # 🔒 Lock the daysheet row
-            daysheet = DaySheet.objects.select_for_update().get(pk=daysheet.pk)
+                daysheet = counters.lock_sheet(DaySheet.objects.filter(pk=daysheet.pk)) or daysheet
 
             # ✅ TRUST THE JOB TOTAL (single source of truth)
             total_for_job = Decimal(job.total_amount or 0)
             payment_type = AnomalyService._infer_payment_type_from_job_static(job)
 
             # Update aggregates safely
-            daysheet.total_jobs = F("total_jobs") + 1
-            daysheet.total_amount = F("total_amount") + total_for_job
-            daysheet.save(update_fields=["total_jobs", "total_amount"])
+            counters.increment(daysheet, jobs=1, amount=total_for_job, user=user, job=job)
+            sales_rollups.record_sale(daysheet, jobs=1, amount=total_for_job)
 
             # Attach job
             job.daysheet = daysheet
@@ -286,8 +318,8 @@ class JobService(BaseService):
                 "timestamp": now.isoformat(),
             }
 
-            self._create_status_log(
-                "DaySheet", str(daysheet.pk), "JOB_ATTACHED", payload=payload
+            self._record_event(
+                "DaySheet", str(daysheet.pk), "JOB_ATTACHED", branch_id=job.branch.pk, payload=payload
             )
             self._create_shadow_event(
                 "JOB_ATTACHED",
@@ -302,6 +334,24 @@ class JobService(BaseService):
 
             return daysheet, created, True
 
+    def _resolve_and_lock_daysheet(self, branch, user=None, now=None) -> Tuple[DaySheet, bool]:
+        """
+        Resolve the branch's open DaySheet through the resolution cache and
+        fetch it once under counters.lock_sheet (a shared lock when counters
+        are sharded), so a concurrent day close waits for this attach. A
+        cached sheet that turns out to be closed is evicted and resolved again.
+        """
+        sheet_service = DaySheetService(self.hq, self.pin_verifier)
+        for attempt in range(2):
+            daysheet, created = sheet_service.get_or_create_daysheet_for_branch(
+                branch, user=user, now=now, use_cache=(attempt == 0)
+            )
+            locked = counters.lock_sheet(DaySheet.objects.filter(pk=daysheet.pk, status=DaySheet.STATUS_OPEN))
+            if locked is not None:
+                return locked, created
+            daysheet_cache.invalidate(daysheet.branch_id, daysheet.date)
+        raise ValueError(f"No open DaySheet available for branch {getattr(branch, 'pk', branch)}")
+
     # -------------------------------------------------
     # INSTANT JOB CREATION (PATCHED)
     # -------------------------------------------------
@@ -320,7 +370,26 @@ class JobService(BaseService):
         print_mode=None,
         color_mode=None,
         side_mode=None,
+        idempotency_key=None,
     ):
+        """
+        Create, price and attach a single instant job.
+
+        When `idempotency_key` is given, a retry with the same key returns the
+        job created by the first call without pricing, locking or logging again.
+        """
+        request_hash = ""
+        if idempotency_key:
+            request_hash = idempotency.request_fingerprint({
+                "branch_id": branch_id, "service_id": service_id, "quantity": quantity,
+                "deposit": deposit, "customer_name": customer_name, "customer_phone": customer_phone,
+                "description": description, "paper_size": paper_size, "print_mode": print_mode,
+                "color_mode": color_mode, "side_mode": side_mode,
+            })
+            replay = self._replay_instant_job(idempotency_key, created_by, request_hash)
+            if replay is not None:
+                return replay
+
         svc = ServiceType.objects.get(pk=service_id)
 
         if any([paper_size, print_mode, color_mode, side_mode]):
@@ -347,6 +416,17 @@ class JobService(BaseService):
         now = timezone.now()
 
         with transaction.atomic():
+            key_record = None
+            if idempotency_key:
+                key_record, claimed = idempotency.claim(
+                    self.IDEMPOTENCY_SCOPE_INSTANT,
+                    idempotency_key,
+                    user=created_by,
+                    request_hash=request_hash,
+                )
+                if not claimed:
+                    return Job.objects.get(pk=key_record.response_body["job_id"])
+
             job = Job.objects.create(
                 branch_id=branch_id,
                 service=svc,
@@ -372,12 +452,6 @@ class JobService(BaseService):
                 notes="Instant job (auto-priced)",
             )
 
-            DaySheetService(
-                self.hq, self.pin_verifier
-            ).get_or_create_daysheet_for_branch(
-                job.branch, user=created_by, now=now
-            )
-
             self.attach_job_to_daysheet_idempotent(job, user=created_by, now=now)
 
             payload = {
@@ -390,24 +464,166 @@ class JobService(BaseService):
                 "timestamp": now.isoformat(),
             }
 
-            self._create_status_log(
-                "Job", str(job.pk), "JOB_CREATED_INSTANT", payload=payload
+            self._record_event(
+                "Job", str(job.pk), "JOB_CREATED_INSTANT", branch_id=branch_id, payload=payload
             )
             actor = {
-            "user_id": getattr(created_by, "pk", None),
-            "role": getattr(getattr(created_by, "role", None), "code", None),
-        }
+                "user_id": getattr(created_by, "pk", None),
+                "role": getattr(getattr(created_by, "role", None), "code", None),
+            }
+            self._create_shadow_event(
+                "JOB_CREATED_INSTANT",
+                str(branch_id),
+                actor=actor,
+                payload=payload,
+            )
+            if key_record is not None:
+                idempotency.complete(key_record, status_code=201, body={"job_id": job.pk})
 
-        self._create_shadow_event(
-            "JOB_CREATED_INSTANT",
-            str(branch_id),
-            actor=actor,
-            payload=payload,
-        )
+        return job
 
+    IDEMPOTENCY_SCOPE_INSTANT = "job.create_instant"
 
+    def _replay_instant_job(self, idempotency_key, created_by, request_hash) -> Optional[Job]:
+        record = idempotency.lookup(self.IDEMPOTENCY_SCOPE_INSTANT, idempotency_key)
+        if record is None or record.status != record.STATUS_COMPLETED:
+            return None
+        idempotency.verify_owner(record, created_by, request_hash)
+        return Job.objects.filter(pk=record.response_body.get("job_id")).first()
 
-        return job
+    # -------------------------------------------------
+    # BATCH INSTANT JOB CREATION
+    # -------------------------------------------------
+    def create_instant_jobs_batch(
+        self,
+        *,
+        branch_id,
+        lines,
+        created_by=None,
+        customer_name=None,
+        customer_phone=None,
+    ):
+        """
+        Create several instant jobs for one customer in a single transaction.
+
+        `lines` is a list of dicts with the create_instant_job line fields:
+        service_id, quantity, deposit, description and the print variants.
+        The DaySheet is resolved and locked once, totals are applied with one
+        F() update, and one DomainEvent + one ShadowLogEvent cover the batch.
+        """
+        if not lines:
+            raise ValueError("At least one job line is required")
+
+        service_ids = {line["service_id"] for line in lines}
+        services = ServiceType.objects.in_bulk(service_ids)
+        missing = service_ids - set(services)
+        if missing:
+            raise ServiceType.DoesNotExist(f"Unknown service(s): {sorted(missing)}")
+
+        now = timezone.now()
+        priced = []
+        for line in lines:
+            svc = services[line["service_id"]]
+            variants = {
+                "paper_size": line.get("paper_size"),
+                "print_mode": line.get("print_mode"),
+                "color_mode": line.get("color_mode"),
+                "side_mode": line.get("side_mode"),
+            }
+            if any(variants.values()):
+                self._validate_print_variants(service=svc, **variants)
+
+            unit_price = self.resolve_unit_price_safe(service=svc, **variants)
+            qty = int(line.get("quantity") or 1)
+            deposit = Decimal(line.get("deposit") or 0)
+            total = max(Decimal("0.00"), (unit_price * qty) - deposit).quantize(Decimal("0.01"))
+
+            priced.append(Job(
+                branch_id=branch_id,
+                service=svc,
+                customer_name=customer_name or "",
+                customer_phone=customer_phone or "",
+                description=line.get("description") or "",
+                quantity=qty,
+                unit_price=unit_price,
+                total_amount=total,
+                deposit_amount=deposit,
+                type="instant",
+                status="completed",
+                completed_at=now,
+                created_by=created_by,
+            ))
+
+        batch_total = sum((j.total_amount for j in priced), Decimal("0.00"))
+
+        with transaction.atomic():
+            Branch = Job._meta.get_field("branch").related_model
+            branch = Branch.objects.get(pk=branch_id)
+
+            # 🔒 One lock for the whole batch
+            daysheet, _ = self._resolve_and_lock_daysheet(branch, user=created_by, now=now)
+
+            for job in priced:
+                job.daysheet = daysheet
+
+            if connection.features.can_return_rows_from_bulk_insert:
+                jobs = Job.objects.bulk_create(priced)
+            else:
+                # Backends without RETURNING (MySQL) need the pks for JobRecord FKs
+                jobs = []
+                for job in priced:
+                    job.save(force_insert=True)
+                    jobs.append(job)
+
+            JobRecord.objects.bulk_create([
+                JobRecord(
+                    job=job,
+                    performed_by=created_by,
+                    time_start=now,
+                    time_end=now,
+                    quantity_produced=job.quantity,
+                    notes="Instant job (auto-priced, batch)",
+                )
+                for job in jobs
+            ])
+
+            counters.increment(daysheet, jobs=len(jobs), amount=batch_total, user=created_by)
+            sales_rollups.record_sale(daysheet, jobs=len(jobs), amount=batch_total)
+
+            payload = {
+                "branch_id": str(branch_id),
+                "daysheet_id": str(daysheet.pk),
+                "job_ids": [str(j.pk) for j in jobs],
+                "jobs": [
+                    {
+                        "job_id": str(j.pk),
+                        "service": j.service.name,
+                        "unit_price": float(j.unit_price),
+                        "quantity": j.quantity,
+                        "total_amount": float(j.total_amount),
+                    }
+                    for j in jobs
+                ],
+                "job_count": len(jobs),
+                "total_amount": float(batch_total),
+                "timestamp": now.isoformat(),
+            }
+
+            self._record_event(
+                "DaySheet", str(daysheet.pk), "JOB_BATCH_CREATED_INSTANT", branch_id=branch_id, payload=payload
+            )
+            actor = {
+                "user_id": getattr(created_by, "pk", None),
+                "role": getattr(getattr(created_by, "role", None), "code", None),
+            }
+            self._create_shadow_event(
+                "JOB_BATCH_CREATED_INSTANT",
+                str(branch_id),
+                actor=actor,
+                payload=payload,
+            )
+
+        return jobs
 
     # -------------------------------------------------
     # PRICING
@@ -421,15 +637,19 @@ class JobService(BaseService):
         color_mode: str = None,
         side_mode: str = None,
     ) -> Decimal:
-        rule = ServicePricingRule.objects.get(
-            service_type=service,
-            is_active=True,
+        price = pricing_index.lookup_exact(
+            service=service,
             paper_size=paper_size,
             print_mode=print_mode,
             color_mode=color_mode,
             side_mode=side_mode,
         )
-        return rule.unit_price
+        if price is None:
+            raise ServicePricingRule.DoesNotExist(
+                f"No active pricing rule for {service.code} "
+                f"({paper_size}, {print_mode}, {color_mode}, {side_mode})"
+            )
+        return price
 
     def resolve_unit_price_safe(
         self,
@@ -440,24 +660,17 @@ class JobService(BaseService):
         color_mode: str = None,
         side_mode: str = None,
     ) -> Decimal:
-        try:
-            return self.resolve_unit_price(
-                service=service,
-                paper_size=paper_size,
-                print_mode=print_mode,
-                color_mode=color_mode,
-                side_mode=side_mode,
-            )
-        except Exception:
-            rule = ServicePricingRule.objects.filter(
-                service_type=service,
-                pricing_type="flat",
-                is_active=True,
-            ).first()
-            if rule:
-                return rule.unit_price
-
-        return Decimal(getattr(service, "price", "0.00") or "0.00")
+        """
+        Exact rule -> flat rule -> ServiceType.price, served from the
+        in-process pricing index (no DB round-trip on the hot path).
+        """
+        return pricing_index.resolve(
+            service=service,
+            paper_size=paper_size,
+            print_mode=print_mode,
+            color_mode=color_mode,
+            side_mode=side_mode,
+        )
 
 
 
@@ -468,11 +681,18 @@ class DaySheetService(BaseService):
         user=None,
         now=None,
         allow_reopen=False,
-        shift_name=None
+        shift_name=None,
+        use_cache=True,
     ) -> Tuple[DaySheet, bool]:
 
         now = now or timezone.now()
         date_local = _local_date_for_branch(now, branch)
+
+        if use_cache:
+            cached = daysheet_cache.get(branch.pk, date_local)
+            if cached is not None:
+                return cached, False
+
         weekday = date_local.strftime("%A")
 
         with transaction.atomic():
@@ -486,6 +706,7 @@ class DaySheetService(BaseService):
                 .first()
             )
             if sheet:
+                daysheet_cache.put_on_commit(sheet)
                 return sheet, False
 
             snap = _branch_snapshot(branch)
@@ -503,6 +724,8 @@ class DaySheetService(BaseService):
                 shift_name=shift_name or None,
                 meta={},
             )
+            if counters.sharding_enabled():
+                counters.ensure_shards(sheet)
 
             actor = {
                 "user_id": getattr(user, "pk", None),
@@ -510,10 +733,11 @@ class DaySheetService(BaseService):
             }
 
             try:
-                self._create_status_log(
+                self._record_event(
                     "DaySheet",
                     str(sheet.pk),
                     "DAY_SHEET_CREATED",
+                    branch_id=getattr(branch, "pk", None),
                     actor=actor,
                     payload={"date": str(sheet.date)},
                 )
@@ -530,22 +754,38 @@ class DaySheetService(BaseService):
                     exc,
                 )
 
+            daysheet_cache.put_on_commit(sheet)
             return sheet, True
         
     def compute_day_totals(self, daysheet: DaySheet) -> Dict[str, Any]:
         """
         Authoritative financial aggregation for a DaySheet.
         Read-only. No mutations. Safe to call repeatedly.
+        Computed in a single grouped query.
         """
+        total = Coalesce(F("total_amount"), Value(ZERO_MONEY), output_field=MONEY)
+        deposit = Coalesce(F("deposit_amount"), Value(ZERO_MONEY), output_field=MONEY)
+        balance = ExpressionWrapper(total - deposit, output_field=MONEY)
+
+        agg = Job.objects.filter(daysheet=daysheet).aggregate(
+            total_jobs=Count("pk"),
+            gross_total=Sum(total),
+            deposits_total=Sum(deposit),
+            completed_total=Sum(Case(When(Q(total_amount__isnull=True) | Q(total_amount__lte=deposit), then=total), default=Value(ZERO_MONEY), output_field=MONEY)),
+            outstanding_total=Sum(Case(When(total_amount__gt=deposit, then=balance), default=Value(ZERO_MONEY), output_field=MONEY)),
+        )
 
-        qs = Job.objects.filter(daysheet=daysheet)
+        def _money(value):
+            return Decimal(value or 0).quantize(Decimal("0.01"))
 
-        totals = {
-            "total_jobs": 0,
-            "gross_total": Decimal("0.00"),
-            "deposits_total": Decimal("0.00"),
-            "completed_total": Decimal("0.00"),
-            "outstanding_total": Decimal("0.00"),
+        return {
+            "total_jobs": agg["total_jobs"] or 0,
+            "gross_total": _money(agg["gross_total"]),
+            "deposits_total": _money(agg["deposits_total"]),
+            "completed_total": _money(agg["completed_total"]),
+            "outstanding_total": _money(agg["outstanding_total"]),
+            # Jobs carry no payment channel; channel allocation only applies to
+            # explicit cash/momo/card types, so these stay zero.
             "by_channel": {
                 "cash": Decimal("0.00"),
                 "momo": Decimal("0.00"),
@@ -553,41 +793,26 @@ class DaySheetService(BaseService):
             },
         }
 
-        for job in qs:
-            total = Decimal(job.total_amount or 0)
-            deposit = Decimal(job.deposit_amount or 0)
-            balance = total - deposit
-
-            payment_type = AnomalyService._infer_payment_type_from_job_static(job)
-
-            totals["total_jobs"] += 1
-            totals["gross_total"] += total
-            totals["deposits_total"] += deposit
-
-            if balance <= 0:
-                totals["completed_total"] += total
-            else:
-                totals["outstanding_total"] += balance
-
-            # Channel allocation (deposit-based)
-            if payment_type in totals["by_channel"]:
-                totals["by_channel"][payment_type] += deposit
-
-        # Quantize for safety
-        for k in ["gross_total", "deposits_total", "completed_total", "outstanding_total"]:
-            totals[k] = totals[k].quantize(Decimal("0.01"))
-
-        for ch in totals["by_channel"]:
-            totals["by_channel"][ch] = totals["by_channel"][ch].quantize(Decimal("0.01"))
-
-        return totals
-
 
 class ShiftService(BaseService):
     def start_shift(self, branch, user, now=None, role: str = "ATTENDANT", shift_name: Optional[str] = None) -> DaySheetShift:
         now = now or timezone.now()
-        daysheet, created = DaySheetService(self.hq, self.pin_verifier).get_or_create_daysheet_for_branch(branch, user=user, now=now, shift_name=shift_name)
+        sheet_service = DaySheetService(self.hq, self.pin_verifier)
         with transaction.atomic():
+            # Re-check the (possibly cached) sheet under counters.lock_sheet so a
+            # concurrent day close either waits for this shift or is seen here
+            for attempt in range(2):
+                daysheet, created = sheet_service.get_or_create_daysheet_for_branch(
+                    branch, user=user, now=now, shift_name=shift_name, use_cache=(attempt == 0)
+                )
+                locked = counters.lock_sheet(DaySheet.objects.filter(pk=daysheet.pk, status=DaySheet.STATUS_OPEN))
+                if locked is not None:
+                    daysheet = locked
+                    break
+                daysheet_cache.invalidate(daysheet.branch_id, daysheet.date)
+            else:
+                raise ValueError(f"No open DaySheet available for branch {getattr(branch, 'pk', branch)}")
+
             shift = DaySheetShift.objects.select_for_update().filter(daysheet=daysheet, user=user, status=DaySheetShift.SHIFT_OPEN).first()
             if shift:
                 return shift
@@ -606,7 +831,7 @@ class ShiftService(BaseService):
 
             payload = {"shift_id": str(shift.pk), "daysheet_id": str(daysheet.pk), "timestamp": now.isoformat()}
             try:
-                self._create_status_log("DaySheetShift", str(shift.pk), "SHIFT_STARTED", actor=actor, payload=payload)
+                self._record_event("DaySheetShift", str(shift.pk), "SHIFT_STARTED", branch_id=getattr(branch, "pk", None), actor=actor, payload=payload)
                 self._create_shadow_event("SHIFT_STARTED", getattr(branch, "pk", None), actor=actor, payload=payload)
             except Exception as exc:
                 logger.exception("ShiftService.start_shift: failed to create logs for shift %s: %s", getattr(shift, "pk", None), exc)
@@ -628,6 +853,8 @@ class ShiftService(BaseService):
             shift.pin_verified_by = user
             shift.submitted = True
             shift.save()
+            counters.fold(shift.daysheet)
+            snapshot = shift_snapshot_service.freeze(shift)
             actor = {"user_id": getattr(user, "pk", None),
                 "user_id": getattr(user, "pk", None),
                 "role": getattr(getattr(user, "role", None), "code", None),
@@ -640,26 +867,28 @@ class ShiftService(BaseService):
                 "timestamp": now.isoformat(),
             }
             try:
-                self._create_status_log("DaySheetShift", str(shift.pk), "SHIFT_CLOSED", actor=actor, payload=payload)
+                self._record_event("DaySheetShift", str(shift.pk), "SHIFT_CLOSED", branch_id=getattr(shift.daysheet.branch, "pk", None), actor=actor, payload=payload)
                 self._create_shadow_event("SHIFT_CLOSED", getattr(shift.daysheet.branch, "pk", None), actor=actor, payload=payload)
             except Exception as exc:
                 logger.exception("ShiftService.close_shift: failed to create logs for shift %s: %s", getattr(shift, "pk", None), exc)
 
             # basic mismatch detection
             try:
-                jobs_qs = Job.objects.filter(daysheet=shift.daysheet, created_by=shift.user)
-                computed_total = jobs_qs.aggregate(total=models.Sum("total_amount"))["total"] or Decimal("0.00")
-                tolerance = Decimal("10.00")
+                computed_total = snapshot.cash_total
+                tolerance = cash_mismatch_tolerance()
                 cash_diff = (Decimal(shift.closing_cash or 0) - Decimal(computed_total or 0))
                 if abs(cash_diff) > tolerance:
                     try:
-                        AnomalyFlag.objects.create(
-                            daily_sheet=shift.daysheet,
-                            shift=shift,
-                            flag_type=AnomalyFlag.TYPE_MISMATCH_CASH,
-                            severity=AnomalyFlag.SEV_HIGH,
-                            description=f"Shift cash mismatch: reported {shift.closing_cash} vs computed {computed_total}",
-                            notified_to=[{"role": "manager"}, {"role": "hq"}],
+                        AnomalyFlag.objects.get_or_create(
+                            fingerprint=AnomalyFlag.make_fingerprint(AnomalyFlag.TYPE_MISMATCH_CASH, "shift", shift.pk),
+                            defaults={
+                                "daily_sheet": shift.daysheet,
+                                "shift": shift,
+                                "flag_type": AnomalyFlag.TYPE_MISMATCH_CASH,
+                                "severity": AnomalyFlag.SEV_HIGH,
+                                "description": f"Shift cash mismatch: reported {shift.closing_cash} vs computed {computed_total}",
+                                "notified_to": [{"role": "manager"}, {"role": "hq"}],
+                            },
                         )
                     except Exception as exc:
                         logger.exception("ShiftService.close_shift: failed to create AnomalyFlag for shift %s: %s", getattr(shift, "pk", None), exc)
@@ -681,11 +910,17 @@ class ManagerService(BaseService):
         if not self.pin_verifier.verify(manager_user, pin):
             raise PermissionError("Invalid manager PIN")
 
-        # 3️⃣ Compute authoritative day totals
-        aggregator = DayAggregationService()
-        day_totals = aggregator.aggregate(daysheet)
-
         with transaction.atomic():
+            # 3️⃣ Lock the sheet (waits for in-flight attaches), re-check, fold
+            # sharded counters, then sum the frozen shift snapshots
+            locked = DaySheet.objects.select_for_update().get(pk=daysheet.pk)
+            if locked.status not in (DaySheet.STATUS_OPEN, DaySheet.STATUS_PARTIALLY_CLOSED):
+                raise ValueError("DaySheet is already closed.")
+            if daysheet.shifts.filter(status=DaySheetShift.SHIFT_OPEN).exists():
+                raise ValueError("Not all shifts are closed. Manager cannot close the day.")
+            counters.fold(daysheet)
+
+            day_totals = shift_snapshot_service.day_totals(daysheet)
 
             # 4️⃣ Persist closure + totals snapshot
             daysheet.status = DaySheet.STATUS_BRANCH_CLOSED
@@ -694,7 +929,7 @@ class ManagerService(BaseService):
 
             # Store snapshot in meta (immutable audit record)
             meta = daysheet.meta or {}
-            meta["final_aggregation"] = {
+            final_aggregation = {
                 "job_count": day_totals["job_count"],
                 "shift_count": day_totals["shift_count"],
                 "gross_total": str(day_totals["gross_total"]),
@@ -704,11 +939,14 @@ class ManagerService(BaseService):
                 "momo_total": str(day_totals["momo_total"]),
                 "card_total": str(day_totals["card_total"]),
                 "expected_closing_cash": str(day_totals["expected_closing_cash"]),
+                "adjustment_total": str(day_totals["adjustment_total"]),
                 "computed_at": day_totals["computed_at"].isoformat(),
             }
+            meta["final_aggregation"] = final_aggregation
             daysheet.meta = meta
 
             daysheet.save(update_fields=["status", "closed_at", "closed_by", "meta"])
+            daysheet_cache.invalidate_sheet(daysheet)
 
             # 5️⃣ Audit + HQ events
             actor = {
@@ -719,15 +957,16 @@ class ManagerService(BaseService):
             payload = {
                 "daysheet_id": str(daysheet.pk),
                 "date": str(daysheet.date),
-                "totals": day_totals,
+                "totals": final_aggregation,
                 "timestamp": now.isoformat(),
             }
 
             try:
-                self._create_status_log(
+                self._record_event(
                     "DaySheet",
                     str(daysheet.pk),
                     "MANAGER_CLOSED",
+                    branch_id=getattr(daysheet.branch, "pk", None),
                     actor=actor,
                     payload=payload,
                 )
@@ -744,6 +983,8 @@ class ManagerService(BaseService):
                     exc,
                 )
 
+            self._seal_day_chain(daysheet, actor=actor, now=now)
+
             return daysheet
 
 
@@ -762,12 +1003,52 @@ class CorrectionService(BaseService):
             )
             actor = {"user_id": getattr(created_by, "pk", None), "role": getattr(created_by, "role", None) if created_by else None}
             try:
-                self._create_status_log("CorrectionEntry", str(ce.uuid), "CORRECTION_CREATED", actor=actor, payload=payload)
+                self._record_event("CorrectionEntry", str(ce.uuid), "CORRECTION_CREATED", branch_id=getattr(daysheet.branch, "pk", None), actor=actor, payload=payload)
                 self._create_shadow_event("CORRECTION_CREATED", getattr(daysheet.branch, "pk", None), actor=actor, payload=payload)
             except Exception as exc:
                 logger.exception("CorrectionService.create_correction_entry: failed to log/shadow for correction %s: %s", getattr(ce, "uuid", None), exc)
             return ce
 
+    def approve_correction(self, correction: CorrectionEntry, approved_by, now=None) -> CorrectionEntry:
+        """
+        Approve an open correction. Monetary corrections on a closed shift are
+        applied to its snapshot as a delta; no jobs are re-aggregated.
+        """
+        now = now or timezone.now()
+        with transaction.atomic():
+            ce = CorrectionEntry.objects.select_for_update().select_related("job").get(pk=correction.pk)
+            if ce.status != CorrectionEntry.STATUS_OPEN:
+                raise ValueError("Correction is not open.")
+
+            ce.status = CorrectionEntry.STATUS_APPROVED
+            ce.approved_by = approved_by
+            ce.approved_at = now
+            update_fields = ["status", "approved_by", "approved_at"]
+            if ce.shift_id is None and ce.job_id:
+                ce.shift = shift_snapshot_service.shift_for_job(ce.job)
+                update_fields.append("shift")
+            ce.save(update_fields=update_fields)
+
+            snapshot = shift_snapshot_service.apply_correction(ce)
+
+            actor = {"user_id": getattr(approved_by, "pk", None), "role": getattr(getattr(approved_by, "role", None), "code", None)}
+            delta = _correction_amount_delta(ce)
+            payload = {
+                "correction_id": str(ce.uuid),
+                "shift_id": str(ce.shift_id) if ce.shift_id else None,
+                "amount_delta": str(delta) if delta is not None else None,
+                "applied_to_snapshot": snapshot is not None,
+                "timestamp": now.isoformat(),
+            }
+            try:
+                self._record_event("CorrectionEntry", str(ce.uuid), "CORRECTION_APPROVED", branch_id=getattr(ce.daily_sheet.branch, "pk", None), actor=actor, payload=payload)
+                self._create_shadow_event("CORRECTION_APPROVED", getattr(ce.daily_sheet.branch, "pk", None), actor=actor, payload=payload)
+            except Exception as exc:
+                logger.exception("CorrectionService.approve_correction: failed to log/shadow for correction %s: %s", ce.uuid, exc)
+
+            correction.refresh_from_db()
+            return ce
+
 
 class AnomalyService(BaseService):
     @staticmethod
@@ -806,16 +1087,21 @@ class AnomalyService(BaseService):
                 created_at__gte=since
             ).exclude(pk=job.pk).first()
             if dup:
-                af = AnomalyFlag.objects.create(
-                    daily_sheet=job.daysheet,
-                    shift=None,
-                    flag_type=AnomalyFlag.TYPE_DUPLICATE_JOBS,
-                    severity=AnomalyFlag.SEV_MEDIUM,
-                    description=f"Duplicate job detected: job {job.pk} similar to {dup.pk}",
-                    notified_to=[{"role": "manager"}],
+                af, created = AnomalyFlag.objects.get_or_create(
+                    fingerprint=AnomalyFlag.make_fingerprint(AnomalyFlag.TYPE_DUPLICATE_JOBS, "job", job.pk),
+                    defaults={
+                        "daily_sheet": job.daysheet,
+                        "shift": None,
+                        "flag_type": AnomalyFlag.TYPE_DUPLICATE_JOBS,
+                        "severity": AnomalyFlag.SEV_MEDIUM,
+                        "description": f"Duplicate job detected: job {job.pk} similar to {dup.pk}",
+                        "notified_to": [{"role": "manager"}],
+                    },
                 )
+                if not created:
+                    return af
                 try:
-                    self._create_status_log("AnomalyFlag", str(af.uuid), "DUPLICATE_JOB_DETECTED", actor={"user_id": getattr(job.created_by, "pk", None)}, payload={"job": job.pk, "duplicate_of": dup.pk})
+                    self._record_event("AnomalyFlag", str(af.uuid), "DUPLICATE_JOB_DETECTED", branch_id=getattr(job.branch, "pk", None), actor={"user_id": getattr(job.created_by, "pk", None)}, payload={"job": job.pk, "duplicate_of": dup.pk})
                     self._create_shadow_event("DUPLICATE_JOB", getattr(job.branch, "pk", None), actor={"user_id": getattr(job.created_by, "pk", None)}, payload={"job": job.pk, "duplicate_of": dup.pk})
                 except Exception as exc:
                     logger.exception("AnomalyService.detect_duplicate_job: failed to create logs for anomaly %s: %s", getattr(af, "uuid", None), exc)
@@ -826,22 +1112,27 @@ class AnomalyService(BaseService):
 
     def detect_high_free_jobs(self, daysheet: DaySheet, free_ratio_threshold: float = 0.2) -> Optional[AnomalyFlag]:
         try:
-            total = daysheet.total_jobs or 0
+            total, _ = counters.read_totals(daysheet)
             if total == 0:
                 return None
-            free_count = Job.objects.filter(daysheet=daysheet, service__is_priced=False).count()
+            free_count = Job.objects.filter(FREE_JOB_Q, daysheet=daysheet).count()
             ratio = free_count / float(total)
             if ratio >= float(free_ratio_threshold):
-                af = AnomalyFlag.objects.create(
-                    daily_sheet=daysheet,
-                    shift=None,
-                    flag_type=AnomalyFlag.TYPE_HIGH_FREE_JOBS,
-                    severity=AnomalyFlag.SEV_HIGH,
-                    description=f"High free-job ratio: {free_count}/{total} ({ratio:.2f})",
-                    notified_to=[{"role": "manager"}, {"role": "hq"}],
+                af, created = AnomalyFlag.objects.get_or_create(
+                    fingerprint=AnomalyFlag.make_fingerprint(AnomalyFlag.TYPE_HIGH_FREE_JOBS, "daysheet", daysheet.pk),
+                    defaults={
+                        "daily_sheet": daysheet,
+                        "shift": None,
+                        "flag_type": AnomalyFlag.TYPE_HIGH_FREE_JOBS,
+                        "severity": AnomalyFlag.SEV_HIGH,
+                        "description": f"High free-job ratio: {free_count}/{total} ({ratio:.2f})",
+                        "notified_to": [{"role": "manager"}, {"role": "hq"}],
+                    },
                 )
+                if not created:
+                    return af
                 try:
-                    self._create_status_log("AnomalyFlag", str(af.uuid), "HIGH_FREE_JOBS", actor=None, payload={"free_count": free_count, "total": total, "ratio": ratio})
+                    self._record_event("AnomalyFlag", str(af.uuid), "HIGH_FREE_JOBS", branch_id=getattr(daysheet.branch, "pk", None), actor=None, payload={"free_count": free_count, "total": total, "ratio": ratio})
                     self._create_shadow_event("HIGH_FREE_JOBS", getattr(daysheet.branch, "pk", None), actor=None, payload={"free_count": free_count, "total": total, "ratio": ratio})
                 except Exception as exc:
                     logger.exception("AnomalyService.detect_high_free_jobs: failed to create logs for anomaly %s: %s", getattr(af, "uuid", None), exc)
@@ -858,19 +1149,26 @@ class AnomalyService(BaseService):
                 shift.shift_end = now
                 shift.save(update_fields=["status", "shift_end"])
                 try:
-                    af = AnomalyFlag.objects.create(
-                        daily_sheet=shift.daysheet,
-                        shift=shift,
-                        flag_type=AnomalyFlag.TYPE_AUTO_CLOSE,
-                        severity=AnomalyFlag.SEV_HIGH,
-                        description=f"Auto-closed shift due to {reason}",
-                        notified_to=[{"role": "manager"}, {"role": "hq"}],
+                    shift_snapshot_service.freeze(shift)
+                except Exception as exc:
+                    logger.exception("AnomalyService.auto_close_shift_and_flag: failed to snapshot shift %s: %s", getattr(shift, "pk", None), exc)
+                try:
+                    af, _ = AnomalyFlag.objects.get_or_create(
+                        fingerprint=AnomalyFlag.make_fingerprint(AnomalyFlag.TYPE_AUTO_CLOSE, "shift", shift.pk),
+                        defaults={
+                            "daily_sheet": shift.daysheet,
+                            "shift": shift,
+                            "flag_type": AnomalyFlag.TYPE_AUTO_CLOSE,
+                            "severity": AnomalyFlag.SEV_HIGH,
+                            "description": f"Auto-closed shift due to {reason}",
+                            "notified_to": [{"role": "manager"}, {"role": "hq"}],
+                        },
                     )
                 except Exception as exc:
                     logger.exception("AnomalyService.auto_close_shift_and_flag: failed to create AnomalyFlag for shift %s: %s", getattr(shift, "pk", None), exc)
                     af = None
                 try:
-                    self._create_status_log("DaySheetShift", str(shift.pk), "SHIFT_AUTO_CLOSED", actor=None, payload={"reason": reason, "timestamp": now.isoformat()})
+                    self._record_event("DaySheetShift", str(shift.pk), "SHIFT_AUTO_CLOSED", branch_id=getattr(shift.daysheet.branch, "pk", None), actor=None, payload={"reason": reason, "timestamp": now.isoformat()})
                     self._create_shadow_event("SHIFT_AUTO_CLOSED", getattr(shift.daysheet.branch, "pk", None), actor=None, payload={"reason": reason, "timestamp": now.isoformat()})
                 except Exception as exc:
                     logger.exception("AnomalyService.auto_close_shift_and_flag: failed to create logs for auto-closed shift %s: %s", getattr(shift, "pk", None), exc)
@@ -880,27 +1178,35 @@ class AnomalyService(BaseService):
     def auto_close_daysheet_if_needed(self, daysheet: DaySheet, reason: str = "closing_time_passed"):
         now = timezone.now()
         with transaction.atomic():
-            if daysheet.status in (DaySheet.STATUS_OPEN, DaySheet.STATUS_PARTIALLY_CLOSED):
+            # lock before the status check, like manager_close_day
+            status = DaySheet.objects.select_for_update().values_list("status", flat=True).get(pk=daysheet.pk)
+            if status in (DaySheet.STATUS_OPEN, DaySheet.STATUS_PARTIALLY_CLOSED):
+                counters.fold(daysheet)
                 daysheet.status = DaySheet.STATUS_AUTO_CLOSED
                 daysheet.closed_at = now
                 daysheet.save(update_fields=["status", "closed_at"])
+                daysheet_cache.invalidate_sheet(daysheet)
                 try:
-                    af = AnomalyFlag.objects.create(
-                        daily_sheet=daysheet,
-                        shift=None,
-                        flag_type=AnomalyFlag.TYPE_AUTO_CLOSE,
-                        severity=AnomalyFlag.SEV_CRITICAL,
-                        description=f"Auto-closed daysheet due to {reason}",
-                        notified_to=[{"role": "hq"}],
+                    af, _ = AnomalyFlag.objects.get_or_create(
+                        fingerprint=AnomalyFlag.make_fingerprint(AnomalyFlag.TYPE_AUTO_CLOSE, "daysheet", daysheet.pk),
+                        defaults={
+                            "daily_sheet": daysheet,
+                            "shift": None,
+                            "flag_type": AnomalyFlag.TYPE_AUTO_CLOSE,
+                            "severity": AnomalyFlag.SEV_CRITICAL,
+                            "description": f"Auto-closed daysheet due to {reason}",
+                            "notified_to": [{"role": "hq"}],
+                        },
                     )
                 except Exception as exc:
                     logger.exception("AnomalyService.auto_close_daysheet_if_needed: failed to create AnomalyFlag for daysheet %s: %s", getattr(daysheet, "pk", None), exc)
                     af = None
                 try:
-                    self._create_status_log("DaySheet", str(daysheet.pk), "DAY_AUTO_CLOSED", actor=None, payload={"reason": reason, "timestamp": now.isoformat()})
+                    self._record_event("DaySheet", str(daysheet.pk), "DAY_AUTO_CLOSED", branch_id=getattr(daysheet.branch, "pk", None), actor=None, payload={"reason": reason, "timestamp": now.isoformat()})
                     self._create_shadow_event("DAY_AUTO_CLOSED", getattr(daysheet.branch, "pk", None), actor=None, payload={"reason": reason, "timestamp": now.isoformat()})
                 except Exception as exc:
                     logger.exception("AnomalyService.auto_close_daysheet_if_needed: failed to create logs for daysheet auto-close %s: %s", getattr(daysheet, "pk", None), exc)
+                self._seal_day_chain(daysheet, now=now)
                 return daysheet, af
         return daysheet, None
 
@@ -1003,127 +1309,69 @@ class BranchService(BaseService):
             return False
 
     def get_branch_queue_summary(self, branch_id, limit: int = 20) -> list:
-            """
-            Return a list of job summary dicts for the given branch.
-            Each entry:
-            {
-                'id': int,
-                'customer_name': str,
-                'service': str,
-                'status': str,
-                'eta': ISO timestamp or None,
-                'created_at': ISO timestamp,
-                'queue_position': int or None,
-                'total_amount': float,
-                'created_by': username or None,
-                'quantity': int
-            }
-            """
-            Job = None
-            try:
-                from django.apps import apps
-                Job = apps.get_model("jobs", "Job")
-            except Exception:
-                Job = None
-
-            if Job is None:
-                return []
-
-            try:
-                statuses = ["queued", "in_progress", "ready"]
-                qs = (
-                    Job.objects
-                    .filter(branch_id=branch_id, status__in=statuses)
-                    .order_by("queue_position", "created_at")[:limit]
-                )
-
-                results = []
-                for j in qs:
-                    try:
-                        service_name = j.service.name
-                    except Exception:
-                        service_name = ""
-
-                    results.append({
-                        "id": j.pk,
-                        "customer_name": getattr(j, "customer_name", "") or "",
-                        "service": service_name,
-                        "status": getattr(j, "status", "") or "",
-                        "eta": (
-                            j.expected_ready_at.isoformat()
-                            if getattr(j, "expected_ready_at", None)
-                            else None
-                        ),
-                        "created_at": (
-                            j.created_at.isoformat()
-                            if getattr(j, "created_at", None)
-                            else None
-                        ),
-                        "queue_position": getattr(j, "queue_position", None),
-                        "total_amount": float(getattr(j, "total_amount", 0) or 0),
-                        "created_by": (
-                            getattr(j.created_by, "username", None)
-                            if getattr(j, "created_by", None)
-                            else None
-                        ),
-                        "quantity": int(getattr(j, "quantity", 1) or 1),
-                    })
-
-                return results
-
-            except Exception as exc:
-                logger.debug(
-                    "BranchService.get_branch_queue_summary: primary query failed, trying fallback ordering: %s",
-                    exc,
-                )
+        """
+        Return a list of job summary dicts for the given branch.
+        Each entry:
+        {
+            'id': int,
+            'customer_name': str,
+            'customer_phone': str or None,
+            'service': str,              # also as 'service_name'
+            'status': str,
+            'priority': str,
+            'eta': ISO timestamp or None,  # also as 'expected_ready_at'
+            'created_at': ISO timestamp,
+            'queue_position': int or None,
+            'total_amount': float,
+            'created_by': creator name or None,
+            'created_by_email': creator email or None,
+            'quantity': int
+        }
+        Formatted from queue_scheduler.read_model (so instant jobs are left
+        out, as in the queue API) and cached per branch in each worker for
+        QUEUE_SUMMARY_CACHE_SECONDS; a change to a queued job at the branch
+        drops the copy of the worker that made it (see
+        jobs.queueing.invalidate_queue_summary).
+        """
+        cache_key = queue_summary_cache_key(branch_id, limit)
+        try:
+            cached = cache.get(cache_key)
+        except Exception:
+            logger.debug("BranchService.get_branch_queue_summary: cache read failed", exc_info=True)
+            cached = None
+        if cached is not None:
+            return cached
 
-                try:
-                    qs = (
-                        Job.objects
-                        .filter(branch_id=branch_id, status__in=statuses)
-                        .order_by("created_at")[:limit]
-                    )
+        try:
+            results = []
+            for row in queue_scheduler.read_model(branch_id, limit=limit):
+                eta = row["expected_ready_at"].isoformat() if row["expected_ready_at"] else None
+                results.append({
+                    "id": row["id"],
+                    "customer_name": row["customer_name"] or "",
+                    "customer_phone": row["customer_phone"],
+                    "service": row["service_name"] or "",
+                    "service_name": row["service_name"] or "",
+                    "status": row["status"] or "",
+                    "priority": row["priority"],
+                    "eta": eta,
+                    "expected_ready_at": eta,
+                    "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+                    "queue_position": row["queue_position"],
+                    "total_amount": float(row["total_amount"] or 0),
+                    "created_by": row["created_by"],
+                    "created_by_email": row["created_by_email"],
+                    "quantity": int(row["quantity"] or 1),
+                })
+        except Exception:
+            logger.exception("BranchService.get_branch_queue_summary failed for branch %s", branch_id)
+            return []
 
-                    results = []
-                    for j in qs:
-                        try:
-                            service_name = j.service.name
-                        except Exception:
-                            service_name = ""
-
-                        results.append({
-                            "id": j.pk,
-                            "customer_name": getattr(j, "customer_name", "") or "",
-                            "service": service_name,
-                            "status": getattr(j, "status", "") or "",
-                            "eta": (
-                                j.expected_ready_at.isoformat()
-                                if getattr(j, "expected_ready_at", None)
-                                else None
-                            ),
-                            "created_at": (
-                                j.created_at.isoformat()
-                                if getattr(j, "created_at", None)
-                                else None
-                            ),
-                            "queue_position": getattr(j, "queue_position", None),
-                            "total_amount": float(getattr(j, "total_amount", 0) or 0),
-                            "created_by": (
-                                getattr(j.created_by, "username", None)
-                                if getattr(j, "created_by", None)
-                                else None
-                            ),
-                            "quantity": int(getattr(j, "quantity", 1) or 1),
-                        })
-
-                    return results
-
-                except Exception:
-                    logger.exception(
-                        "BranchService.get_branch_queue_summary fallback query failed for branch %s",
-                        branch_id,
-                    )
-                    return []
+        try:
+            cache.set(cache_key, results, queue_summary_ttl())
+        except Exception:
+            logger.debug("BranchService.get_branch_queue_summary: cache write failed", exc_info=True)
+        return results
 
 # ---------------------------
 # Preconfigured singletons (facade targets)
@@ -1142,6 +1390,29 @@ branch_service = BranchService(hq_client=_default_hq, pin_verifier=_default_pin)
 # jobs/services/shift_aggregation.py
 from jobs.models import Job, DaySheetShift
 
+
+def _quantize_money(value) -> Decimal:
+    return Decimal(value or 0).quantize(Decimal("0.01"))
+
+
+def job_totals_aggregates() -> dict:
+    """
+    Aggregate expressions shared by shift and day totals.
+
+    Jobs have no stored payment channel, so ShiftAggregationService's
+    inference always lands on cash: callers report the net total as cash
+    and zero for momo/card.
+    """
+    quantity = Coalesce(F("quantity"), Value(1))
+    unit_price = Coalesce(F("unit_price"), Value(ZERO_MONEY), output_field=MONEY)
+    return {
+        "job_count": Count("pk"),
+        "gross_total": Sum(ExpressionWrapper(unit_price * quantity, output_field=MONEY)),
+        "deposit_total": Sum(Coalesce(F("deposit_amount"), Value(ZERO_MONEY), output_field=MONEY)),
+        "net_total": Sum(Coalesce(F("total_amount"), Value(ZERO_MONEY), output_field=MONEY)),
+    }
+
+
 class ShiftAggregationService:
     """
     Read-only aggregation service.
@@ -1165,42 +1436,12 @@ class ShiftAggregationService:
         shift_end = shift.shift_end or timezone.now()
 
         jobs_qs = Job.objects.filter(
-            daysheet=shift.daysheet,
-            created_by=shift.user,
+            daysheet_id=shift.daysheet_id,
+            created_by_id=shift.user_id,
             created_at__gte=shift.shift_start,
             created_at__lte=shift_end,
         )
-
-        totals = {
-            "gross_total": Decimal("0.00"),
-            "deposit_total": Decimal("0.00"),
-            "net_total": Decimal("0.00"),
-            "cash_total": Decimal("0.00"),
-            "momo_total": Decimal("0.00"),
-            "card_total": Decimal("0.00"),
-        }
-
-        job_count = jobs_qs.count()
-
-        for job in jobs_qs:
-            job_gross = Decimal(job.unit_price or 0) * Decimal(job.quantity or 1)
-            deposit = Decimal(job.deposit_amount or 0)
-            net = Decimal(job.total_amount or 0)
-
-            totals["gross_total"] += job_gross
-            totals["deposit_total"] += deposit
-            totals["net_total"] += net
-
-            payment_type = self._infer_payment_type(job)
-
-            if payment_type == self.PAYMENT_CASH:
-                totals["cash_total"] += net
-            elif payment_type == self.PAYMENT_MOMO:
-                totals["momo_total"] += net
-            elif payment_type == self.PAYMENT_CARD:
-                totals["card_total"] += net
-
-        expected_cash = totals["cash_total"]
+        totals = jobs_qs.aggregate(**job_totals_aggregates())
 
         return {
             "shift_id": shift.pk,
@@ -1210,15 +1451,15 @@ class ShiftAggregationService:
             "shift_start": shift.shift_start,
             "shift_end": shift_end,
 
-            "job_count": job_count,
+            "job_count": totals["job_count"] or 0,
 
-            "gross_total": totals["gross_total"].quantize(Decimal("0.01")),
-            "deposit_total": totals["deposit_total"].quantize(Decimal("0.01")),
-            "net_total": totals["net_total"].quantize(Decimal("0.01")),
+            "gross_total": _quantize_money(totals["gross_total"]),
+            "deposit_total": _quantize_money(totals["deposit_total"]),
+            "net_total": _quantize_money(totals["net_total"]),
 
-            "expected_cash": expected_cash.quantize(Decimal("0.01")),
-            "momo_total": totals["momo_total"].quantize(Decimal("0.01")),
-            "card_total": totals["card_total"].quantize(Decimal("0.01")),
+            "expected_cash": _quantize_money(totals["net_total"]),
+            "momo_total": ZERO_MONEY,
+            "card_total": ZERO_MONEY,
 
             "computed_at": timezone.now(),
         }
@@ -1280,78 +1521,243 @@ class DayAggregationService:
     """
     Read-only aggregation service.
     Computes authoritative totals for a full DaySheet
-    by composing ShiftAggregationService results.
+    over the windows of its closed shifts.
     """
 
     def __init__(self):
         self.shift_aggregator = ShiftAggregationService()
 
+    CLOSED_SHIFT_STATUSES = [
+        DaySheetShift.SHIFT_CLOSED,
+        DaySheetShift.SHIFT_AUTO_CLOSED,
+        DaySheetShift.SHIFT_LOCKED,
+    ]
+
     def aggregate(self, daysheet: DaySheet) -> dict:
         if not daysheet:
             raise ValueError("DaySheet is required")
 
-        shifts = DaySheetShift.objects.filter(
+        shift_stats = DaySheetShift.objects.filter(
             daysheet=daysheet,
-            status__in=[
-                DaySheetShift.SHIFT_CLOSED,
-                DaySheetShift.SHIFT_AUTO_CLOSED,
-                DaySheetShift.SHIFT_LOCKED,
-            ],
+            status__in=self.CLOSED_SHIFT_STATUSES,
+        ).aggregate(
+            shift_count=Count("pk"),
+            invalid=Count("pk", filter=Q(shift_start__isnull=True)),
         )
+        if shift_stats["invalid"]:
+            raise ValueError("Invalid shift")
+
+        # Jobs joined to the closed shift windows of their creator. A job
+        # inside two windows counts twice, exactly as summing shifts did.
+        now = timezone.now()
+        totals = Job.objects.filter(
+            daysheet=daysheet,
+            created_by__daysheetshift__daysheet=daysheet,
+            created_by__daysheetshift__status__in=self.CLOSED_SHIFT_STATUSES,
+            created_at__gte=F("created_by__daysheetshift__shift_start"),
+            created_at__lte=Coalesce(F("created_by__daysheetshift__shift_end"), Value(now)),
+        ).aggregate(**job_totals_aggregates())
+
+        return {
+            "daysheet_id": daysheet.pk,
+            "branch_id": daysheet.branch_id,
+            "date": daysheet.date,
+
+            "shift_count": shift_stats["shift_count"],
+            "job_count": totals["job_count"] or 0,
+
+            "gross_total": _quantize_money(totals["gross_total"]),
+            "deposit_total": _quantize_money(totals["deposit_total"]),
+            "net_total": _quantize_money(totals["net_total"]),
 
-        totals = {
-            "gross_total": Decimal("0.00"),
-            "deposit_total": Decimal("0.00"),
-            "net_total": Decimal("0.00"),
-            "cash_total": Decimal("0.00"),
-            "momo_total": Decimal("0.00"),
-            "card_total": Decimal("0.00"),
+            "cash_total": _quantize_money(totals["net_total"]),
+            "momo_total": ZERO_MONEY,
+            "card_total": ZERO_MONEY,
+
+            "expected_closing_cash": _quantize_money(totals["net_total"]),
+
+            "computed_at": timezone.now(),
         }
 
-        job_count = 0
 
-        for shift in shifts:
-            shift_data = self.shift_aggregator.aggregate(shift)
+# jobs/services/shift_snapshots.py
+def _correction_amount_delta(correction: CorrectionEntry) -> Optional[Decimal]:
+    """
+    Signed net-amount change carried by a monetary correction, or None.
+    Accepts payload {"amount_delta": x} or {"old_amount": a, "new_amount": b}.
+    """
+    if correction.type not in (CorrectionEntry.TYPE_AMOUNT_CORRECTION, CorrectionEntry.TYPE_RECONCILIATION):
+        return None
+    payload = correction.payload or {}
+    try:
+        if payload.get("amount_delta") is not None:
+            return _quantize_money(payload["amount_delta"])
+        if payload.get("new_amount") is not None and payload.get("old_amount") is not None:
+            return _quantize_money(Decimal(str(payload["new_amount"])) - Decimal(str(payload["old_amount"])))
+    except Exception:
+        logger.warning("Correction %s has a non-numeric amount payload", getattr(correction, "uuid", None))
+    return None
+
+
+class ShiftSnapshotService:
+    """
+    Freezes shift totals into ShiftCloseSnapshot when a shift closes, and
+    answers day / dashboard totals from those rows (O(shifts), not O(jobs)).
+
+    A snapshot's money totals = jobs in the shift window at close
+    + approved monetary corrections for the shift (adjustment_total).
+    """
+
+    MONEY_FIELDS = ("gross_total", "deposit_total", "net_total", "cash_total", "momo_total", "card_total")
 
-            job_count += shift_data["job_count"]
+    def __init__(self):
+        self.shift_aggregator = ShiftAggregationService()
 
-            totals["gross_total"] += shift_data["gross_total"]
-            totals["deposit_total"] += shift_data["deposit_total"]
-            totals["net_total"] += shift_data["net_total"]
+    def freeze(self, shift: DaySheetShift) -> ShiftCloseSnapshot:
+        """Create the snapshot for a closed shift (idempotent: an existing one is returned)."""
+        existing = ShiftCloseSnapshot.objects.filter(shift=shift).first()
+        if existing is not None:
+            return existing
+
+        agg = self.shift_aggregator.aggregate(shift)
+        adjustments = CorrectionEntry.objects.filter(
+            shift=shift,
+            status=CorrectionEntry.STATUS_APPROVED,
+        )
+        adjustment = sum(
+            (d for d in map(_correction_amount_delta, adjustments) if d is not None),
+            ZERO_MONEY,
+        )
+
+        snapshot, _ = ShiftCloseSnapshot.objects.get_or_create(
+            shift=shift,
+            defaults={
+                "daysheet_id": shift.daysheet_id,
+                "attendant_id": shift.user_id,
+                "shift_start": shift.shift_start,
+                "shift_end": agg["shift_end"],
+                "job_count": agg["job_count"],
+                "gross_total": agg["gross_total"],
+                "deposit_total": agg["deposit_total"],
+                "net_total": agg["net_total"] + adjustment,
+                "cash_total": agg["expected_cash"] + adjustment,
+                "momo_total": agg["momo_total"],
+                "card_total": agg["card_total"],
+                "adjustment_total": adjustment,
+                "corrections_applied": adjustments.count() if adjustment else 0,
+                "computed_at": agg["computed_at"],
+            },
+        )
+        return snapshot
+
+    def snapshots_for_daysheet(self, daysheet: DaySheet) -> list:
+        """Snapshots of every closed shift, freezing shifts closed before snapshots existed."""
+        shifts = (
+            DaySheetShift.objects
+            .filter(daysheet=daysheet, status__in=DayAggregationService.CLOSED_SHIFT_STATUSES)
+            .select_related("close_snapshot")
+        )
+        snapshots = []
+        for shift in shifts:
+            try:
+                snapshots.append(shift.close_snapshot)
+            except ShiftCloseSnapshot.DoesNotExist:
+                snapshots.append(self.freeze(shift))
+        return snapshots
 
-            totals["cash_total"] += shift_data["expected_cash"]
-            totals["momo_total"] += shift_data["momo_total"]
-            totals["card_total"] += shift_data["card_total"]
+    def day_totals(self, daysheet: DaySheet) -> dict:
+        """Same shape as DayAggregationService.aggregate, summed from snapshots."""
+        if not daysheet:
+            raise ValueError("DaySheet is required")
 
-        expected_closing_cash = totals["cash_total"]
+        snapshots = self.snapshots_for_daysheet(daysheet)
+        totals = {name: sum((getattr(s, name) for s in snapshots), ZERO_MONEY) for name in self.MONEY_FIELDS}
 
         return {
             "daysheet_id": daysheet.pk,
             "branch_id": daysheet.branch_id,
             "date": daysheet.date,
 
-            "shift_count": shifts.count(),
-            "job_count": job_count,
+            "shift_count": len(snapshots),
+            "job_count": sum(s.job_count for s in snapshots),
 
-            "gross_total": totals["gross_total"].quantize(Decimal("0.01")),
-            "deposit_total": totals["deposit_total"].quantize(Decimal("0.01")),
-            "net_total": totals["net_total"].quantize(Decimal("0.01")),
+            "gross_total": _quantize_money(totals["gross_total"]),
+            "deposit_total": _quantize_money(totals["deposit_total"]),
+            "net_total": _quantize_money(totals["net_total"]),
 
-            "cash_total": totals["cash_total"].quantize(Decimal("0.01")),
-            "momo_total": totals["momo_total"].quantize(Decimal("0.01")),
-            "card_total": totals["card_total"].quantize(Decimal("0.01")),
+            "cash_total": _quantize_money(totals["cash_total"]),
+            "momo_total": _quantize_money(totals["momo_total"]),
+            "card_total": _quantize_money(totals["card_total"]),
 
-            "expected_closing_cash": expected_closing_cash.quantize(Decimal("0.01")),
+            "expected_closing_cash": _quantize_money(totals["cash_total"]),
+            "adjustment_total": _quantize_money(sum((s.adjustment_total for s in snapshots), ZERO_MONEY)),
 
             "computed_at": timezone.now(),
         }
 
+    def shift_totals(self, shift: DaySheetShift) -> dict:
+        """Frozen totals for a closed shift, live aggregation for an open one."""
+        try:
+            snapshot = shift.close_snapshot
+        except ShiftCloseSnapshot.DoesNotExist:
+            snapshot = None
+        if snapshot is None:
+            agg = self.shift_aggregator.aggregate(shift)
+            agg["adjustment_total"] = ZERO_MONEY
+            return agg
+        return {
+            "shift_id": shift.pk,
+            "job_count": snapshot.job_count,
+            "gross_total": snapshot.gross_total,
+            "deposit_total": snapshot.deposit_total,
+            "net_total": snapshot.net_total,
+            "expected_cash": snapshot.cash_total,
+            "momo_total": snapshot.momo_total,
+            "card_total": snapshot.card_total,
+            "adjustment_total": snapshot.adjustment_total,
+            "computed_at": snapshot.computed_at,
+        }
+
+    def shift_for_job(self, job: Job) -> Optional[DaySheetShift]:
+        """The creator's shift whose window contains the job."""
+        if job is None or not job.created_by_id or not job.daysheet_id:
+            return None
+        return (
+            DaySheetShift.objects
+            .filter(daysheet_id=job.daysheet_id, user_id=job.created_by_id, shift_start__lte=job.created_at)
+            .filter(Q(shift_end__isnull=True) | Q(shift_end__gte=job.created_at))
+            .order_by("-shift_start")
+            .first()
+        )
+
+    def apply_correction(self, correction: CorrectionEntry) -> Optional[ShiftCloseSnapshot]:
+        """
+        Add an approved correction's delta to its shift snapshot.
+        Shifts that are still open pick the correction up when frozen.
+        """
+        delta = _correction_amount_delta(correction)
+        if delta is None or not correction.shift_id:
+            return None
+        updated = ShiftCloseSnapshot.objects.filter(shift_id=correction.shift_id).update(
+            net_total=F("net_total") + delta,
+            cash_total=F("cash_total") + delta,
+            adjustment_total=F("adjustment_total") + delta,
+            corrections_applied=F("corrections_applied") + 1,
+        )
+        if not updated:
+            return None
+        return ShiftCloseSnapshot.objects.get(shift_id=correction.shift_id)
+
+
+shift_snapshot_service = ShiftSnapshotService()
+
 
 __all__ = [
     "JobService",
     "DaySheetService",
     "ShiftService",
     "ShiftAggregationService",
+    "ShiftSnapshotService",
     "ManagerService",
     "CorrectionService",
     "AnomalyService",
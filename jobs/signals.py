@@ -0,0 +1,41 @@
+# jobs/signals.py
+"""
+Model signal handlers for the jobs app. Connected in JobsConfig.ready().
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from jobs.models import ServiceType, ServicePricingRule, JobRecord, Job, JOB_TYPE_INSTANT
+from jobs.pricing import pricing_index
+from jobs.estimator import production_estimator
+from jobs.queueing import invalidate_queue_summary
+
+
+@receiver(post_save, sender=ServicePricingRule)
+@receiver(post_delete, sender=ServicePricingRule)
+@receiver(post_save, sender=ServiceType)
+@receiver(post_delete, sender=ServiceType)
+def invalidate_pricing_index(sender, **kwargs):
+    # Wait for commit so no worker rebuilds from uncommitted prices
+    transaction.on_commit(pricing_index.invalidate)
+
+
+@receiver(post_save, sender=JobRecord)
+def observe_closed_job_record(sender, instance, created, update_fields=None, **kwargs):
+    # Count a record once: when it is created closed, or when time_end is saved
+    if instance.time_end is None:
+        return
+    if not created and (update_fields is None or "time_end" not in update_fields):
+        return
+    transaction.on_commit(lambda: production_estimator.observe_record(instance))
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def invalidate_branch_queue_summary(sender, instance, **kwargs):
+    # instant jobs are not in the queue read model: a sale must not retire it
+    if instance.type == JOB_TYPE_INSTANT:
+        return
+    branch_id = instance.branch_id
+    transaction.on_commit(lambda: invalidate_queue_summary(branch_id))
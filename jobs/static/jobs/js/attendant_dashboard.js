@@ -469,3 +469,40 @@ document.addEventListener("keydown", (e) => {
     if (e.key === "Escape") closeMenu();
   });
 })();
+/* ============================================================
+ * TERMINAL HEARTBEAT
+ * ============================================================ */
+(function () {
+  const HEARTBEAT_ENDPOINT = "/api/jobs/heartbeat/";
+  const HEARTBEAT_INTERVAL_MS = 15000;
+  const DEVICE_KEY = "octos-device-id";
+
+  function getCookie(name) {
+    const m = document.cookie.match("(^|;)\\s*" + name + "\\s*=\\s*([^;]+)");
+    return m ? m.pop() : "";
+  }
+
+  function deviceId() {
+    let id = localStorage.getItem(DEVICE_KEY);
+    if (!id) {
+      id = window.crypto && crypto.randomUUID
+        ? crypto.randomUUID()
+        : Date.now().toString(36) + Math.random().toString(36).slice(2);
+      localStorage.setItem(DEVICE_KEY, id);
+    }
+    return id;
+  }
+
+  function beat() {
+    fetch(HEARTBEAT_ENDPOINT, {
+      method: "POST",
+      credentials: "same-origin",
+      keepalive: true,
+      headers: { "Content-Type": "application/json", "X-CSRFToken": getCookie("csrftoken") },
+      body: JSON.stringify({ device_id: deviceId() }),
+    }).catch(() => {});
+  }
+
+  beat();
+  setInterval(beat, HEARTBEAT_INTERVAL_MS);
+})();
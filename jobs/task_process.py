@@ -0,0 +1,21 @@
+# jobs/task_process.py
+"""
+Entry point of one `run_workers --mode process` worker process.
+
+Kept free of model imports so a spawned child can unpickle it before
+Django is set up.
+"""
+import threading
+
+
+def main(queues, burst, poll_seconds):
+    import django
+    django.setup()
+
+    from jobs.taskqueue import TaskWorker, registry
+
+    registry.discover()
+    try:
+        TaskWorker(queues=queues, poll_seconds=poll_seconds).work(threading.Event(), burst=burst)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,477 @@
+# jobs/taskqueue.py
+"""
+Database-backed background tasks (no broker).
+
+Declaring and enqueueing:
+
+    @task(queue="email", priority=5, max_attempts=5)
+    def send_welcome_email(employee_id, ...): ...
+
+    send_welcome_email.delay(employee.pk, ...)          # BackgroundTask row
+    send_welcome_email.enqueue(args=[...], run_at=..., unique_key="...")
+
+The row is written in the caller's transaction, so a task enqueued by a
+request that rolls back never runs. Task modules named `tasks` in
+installed apps are discovered by the workers.
+
+Workers (`manage.py run_workers`) claim due tasks by priority, then
+run_at. Claiming uses SELECT ... FOR UPDATE SKIP LOCKED where the backend
+supports it (MySQL 8, PostgreSQL); elsewhere a conditional UPDATE with a
+worker token decides who won. A claimed task holds a lease; the task
+extends it whenever it reports progress, and a task whose lease expires
+(worker died) is queued again. Delivery is therefore at-least-once and
+tasks should be idempotent.
+
+Tasks declared with `every=<seconds>` are periodic: each worker enqueues
+the current slot's run under a unique key ("periodic:<name>:<slot>"), so
+however many workers and nodes are up, each slot runs once. Finished slot
+rows older than TASK_PERIODIC_KEEP_HOURS are pruned when a new slot is
+enqueued.
+
+A failing task is retried with capped exponential backoff and jitter
+until max_attempts, then marked failed. Tasks declared `sensitive=True`
+have their arguments cleared on every path that ends them (success,
+failure, lost lease, unregistered); still, pass ids and load secrets inside
+the task rather than queueing them.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Callable, Dict, Iterable, List, Optional
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from jobs.models import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+
+class TaskNotRegistered(LookupError):
+    """No task with this name is registered in this process."""
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+# -------------------------------------------------
+# Declaration
+# -------------------------------------------------
+class Task:
+
+    def __init__(
+        self,
+        func: Callable,
+        name: str,
+        queue: str = "default",
+        priority: int = 0,
+        max_attempts: int = 3,
+        bind: bool = False,
+        sensitive: bool = False,
+        every: Optional[int] = None,
+    ):
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.bind = bind
+        self.sensitive = sensitive
+        self.every = every
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        """Run inline (no queue)."""
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<Task {self.name}>"
+
+    def delay(self, *args, **kwargs) -> BackgroundTask:
+        return self.enqueue(args=args, kwargs=kwargs)
+
+    def enqueue(
+        self,
+        args: Iterable = (),
+        kwargs: Optional[dict] = None,
+        run_at: Optional[datetime] = None,
+        priority: Optional[int] = None,
+        queue: Optional[str] = None,
+        unique_key: Optional[str] = None,
+    ) -> BackgroundTask:
+        """Queue one run. With unique_key, an existing task of that key is returned instead."""
+        fields = {
+            "name": self.name,
+            "queue": queue or self.queue,
+            "priority": self.priority if priority is None else priority,
+            "args": list(args),
+            "kwargs": kwargs or {},
+            "max_attempts": self.max_attempts,
+            "run_at": run_at or timezone.now(),
+        }
+        if unique_key:
+            obj, _ = BackgroundTask.objects.get_or_create(unique_key=unique_key, defaults=fields)
+            return obj
+        return BackgroundTask.objects.create(**fields)
+
+    def run(self, ctx: "TaskContext", args, kwargs):
+        if self.bind:
+            return self.func(ctx, *args, **kwargs)
+        return self.func(*args, **kwargs)
+
+
+class TaskRegistry:
+
+    def __init__(self):
+        self._tasks: Dict[str, Task] = {}
+        self._discovered = False
+
+    def register(self, spec: Task) -> Task:
+        self._tasks[spec.name] = spec
+        return spec
+
+    def get(self, name: str) -> Task:
+        if name not in self._tasks and not self._discovered:
+            self.discover()
+        try:
+            return self._tasks[name]
+        except KeyError:
+            raise TaskNotRegistered(name)
+
+    def discover(self):
+        autodiscover_modules("tasks")
+        self._discovered = True
+
+    def names(self) -> List[str]:
+        return sorted(self._tasks)
+
+    def sensitive(self) -> List[str]:
+        if not self._discovered:
+            self.discover()
+        return [name for name, spec in self._tasks.items() if spec.sensitive]
+
+    def periodic(self) -> List[Task]:
+        return [spec for spec in self._tasks.values() if spec.every]
+
+
+registry = TaskRegistry()
+
+
+def task(
+    func: Optional[Callable] = None,
+    *,
+    name: Optional[str] = None,
+    queue: str = "default",
+    priority: int = 0,
+    max_attempts: int = 3,
+    bind: bool = False,
+    sensitive: bool = False,
+    every: Optional[int] = None,
+):
+    """Register a function as a background task (usable with or without arguments)."""
+
+    def wrap(fn):
+        return registry.register(Task(
+            fn,
+            name=name or f"{fn.__module__}.{fn.__name__}",
+            queue=queue,
+            priority=priority,
+            max_attempts=max_attempts,
+            bind=bind,
+            sensitive=sensitive,
+            every=every,
+        ))
+
+    return wrap(func) if func is not None else wrap
+
+
+# -------------------------------------------------
+# Execution
+# -------------------------------------------------
+@dataclass
+class TaskContext:
+    """Handed to `bind=True` tasks as their first argument."""
+    task: BackgroundTask
+    worker: "TaskWorker"
+
+    @property
+    def attempt(self) -> int:
+        return self.task.attempts
+
+    def progress(self, done: float, total: Optional[float] = None, message: str = ""):
+        """Report progress (done/total, or a 0..1 fraction) and extend the lease."""
+        fraction = done / total if total else done
+        fraction = max(0.0, min(1.0, float(fraction)))
+        self.task.progress = fraction
+        self.task.progress_message = message[:255]
+        self.task.lease_until = timezone.now() + timedelta(seconds=self.worker.lease_seconds)
+        BackgroundTask.objects.filter(pk=self.task.pk, locked_by=self.task.locked_by).update(
+            progress=fraction, progress_message=self.task.progress_message, lease_until=self.task.lease_until,
+        )
+
+
+class TaskWorker:
+
+    def __init__(
+        self,
+        queues: Optional[Iterable[str]] = None,
+        lease_seconds: Optional[int] = None,
+        poll_seconds: Optional[float] = None,
+        retry_base_seconds: Optional[float] = None,
+        retry_max_seconds: Optional[float] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        self.queues = list(queues or [])
+        self.lease_seconds = int(lease_seconds or _setting("TASK_LEASE_SECONDS", 300))
+        self.poll_seconds = float(poll_seconds or _setting("TASK_POLL_SECONDS", 1.0))
+        self.retry_base_seconds = float(retry_base_seconds or _setting("TASK_RETRY_BASE_SECONDS", 10))
+        self.retry_max_seconds = float(retry_max_seconds or _setting("TASK_RETRY_MAX_SECONDS", 3600))
+        self.rng = rng or random.Random()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self._scheduled: Dict[str, int] = {}
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds before retry number `attempts` (half fixed, half jitter)."""
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * (2 ** max(0, attempts - 1)))
+        return delay / 2 + self.rng.uniform(0, delay / 2)
+
+    # -------------------------------------------------
+    # Claiming
+    # -------------------------------------------------
+    def claim(self, limit: int = 1, now: Optional[datetime] = None) -> List[BackgroundTask]:
+        now = now or timezone.now()
+        qs = BackgroundTask.objects.filter(status=BackgroundTask.STATUS_QUEUED, run_at__lte=now)
+        if self.queues:
+            qs = qs.filter(queue__in=self.queues)
+        qs = qs.order_by("-priority", "run_at", "id")
+        token = f"{self.worker_id}:{uuid.uuid4().hex[:8]}"[-64:]
+
+        with transaction.atomic():
+            if connections[router.db_for_write(BackgroundTask)].features.has_select_for_update_skip_locked:
+                qs = qs.select_for_update(skip_locked=True)
+            ids = list(qs.values_list("id", flat=True)[:limit])
+            if not ids:
+                return []
+            # without SKIP LOCKED two workers may pick the same ids; the status guard picks one winner
+            BackgroundTask.objects.filter(id__in=ids, status=BackgroundTask.STATUS_QUEUED).update(
+                status=BackgroundTask.STATUS_RUNNING,
+                locked_by=token,
+                lease_until=now + timedelta(seconds=self.lease_seconds),
+                started_at=now,
+                attempts=F("attempts") + 1,
+            )
+        return list(BackgroundTask.objects.filter(locked_by=token, status=BackgroundTask.STATUS_RUNNING).order_by("-priority", "run_at", "id"))
+
+    def requeue_expired(self, now: Optional[datetime] = None) -> int:
+        """Give tasks of dead workers back to the queue (or fail them when out of attempts)."""
+        now = now or timezone.now()
+        expired = BackgroundTask.objects.filter(status=BackgroundTask.STATUS_RUNNING, lease_until__lt=now)
+        out_of_attempts = expired.filter(attempts__gte=F("max_attempts"))
+        fail = dict(
+            status=BackgroundTask.STATUS_FAILED, locked_by="", lease_until=None, finished_at=now,
+            last_error="lease expired (worker lost)",
+        )
+        sensitive = registry.sensitive()
+        failed = out_of_attempts.filter(name__in=sensitive).update(args=[], kwargs={}, **fail)
+        failed += out_of_attempts.exclude(name__in=sensitive).update(**fail)
+        requeued = expired.update(
+            status=BackgroundTask.STATUS_QUEUED, locked_by="", lease_until=None, run_at=now,
+            last_error="lease expired (worker lost)",
+        )
+        if failed or requeued:
+            logger.warning("TaskWorker: %s expired task(s) requeued, %s failed", requeued, failed)
+        return requeued + failed
+
+    def schedule_periodic(self, now: Optional[datetime] = None) -> int:
+        """Enqueue the current slot of every periodic task (once per slot per worker). Returns rows created."""
+        now = now or timezone.now()
+        created = 0
+        for spec in registry.periodic():
+            slot = int(now.timestamp()) // spec.every * spec.every
+            if self._scheduled.get(spec.name) == slot:
+                continue
+            key = f"periodic:{spec.name}:{slot}"
+            if not BackgroundTask.objects.filter(unique_key=key).exists():
+                spec.enqueue(run_at=datetime.fromtimestamp(slot, tz=dt_timezone.utc), unique_key=key)
+                created += 1
+                self._prune_slots(spec, now)
+            self._scheduled[spec.name] = slot
+        return created
+
+    def _prune_slots(self, spec: Task, now: datetime) -> int:
+        """Delete finished slot rows of a periodic task older than TASK_PERIODIC_KEEP_HOURS."""
+        keep = timedelta(hours=float(_setting("TASK_PERIODIC_KEEP_HOURS", 24)))
+        deleted, _ = BackgroundTask.objects.filter(
+            unique_key__startswith=f"periodic:{spec.name}:",
+            status__in=(BackgroundTask.STATUS_SUCCEEDED, BackgroundTask.STATUS_FAILED, BackgroundTask.STATUS_CANCELLED),
+            finished_at__lt=now - keep,
+        ).delete()
+        return deleted
+
+    # -------------------------------------------------
+    # Running
+    # -------------------------------------------------
+    def run_task(self, bg: BackgroundTask) -> str:
+        """Run one claimed task and record the outcome. Returns the new status."""
+        try:
+            spec = registry.get(bg.name)
+        except TaskNotRegistered:
+            logger.error("TaskWorker: task %s (%s) is not registered", bg.name, bg.uuid)
+            # nothing says whether its arguments are secret: scrub them
+            return self._finish(bg, BackgroundTask.STATUS_FAILED, error=f"task {bg.name!r} is not registered", scrub=True)
+
+        try:
+            result = spec.run(TaskContext(bg, self), bg.args or [], bg.kwargs or {})
+        except Exception as exc:
+            logger.exception("TaskWorker: %s (%s) failed on attempt %s", bg.name, bg.uuid, bg.attempts)
+            error = f"{type(exc).__name__}: {exc}"
+            if bg.attempts >= bg.max_attempts:
+                return self._finish(bg, BackgroundTask.STATUS_FAILED, error=error, scrub=spec.sensitive)
+            return self._finish(
+                bg, BackgroundTask.STATUS_QUEUED, error=error,
+                run_at=timezone.now() + timedelta(seconds=self.backoff(bg.attempts)),
+            )
+        return self._finish(bg, BackgroundTask.STATUS_SUCCEEDED, result=_jsonable(result), scrub=spec.sensitive)
+
+    def _finish(self, bg: BackgroundTask, status: str, result=None, error: str = "", run_at=None, scrub: bool = False) -> str:
+        now = timezone.now()
+        fields = {"status": status, "locked_by": "", "lease_until": None, "last_error": error}
+        if status == BackgroundTask.STATUS_QUEUED:
+            fields["run_at"] = run_at or now
+        else:
+            fields["finished_at"] = now
+        if status == BackgroundTask.STATUS_SUCCEEDED:
+            fields.update(result=result, progress=1.0)
+        if scrub:
+            fields.update(args=[], kwargs={})
+        # a lost lease means another worker owns the task now; leave its row alone
+        if not BackgroundTask.objects.filter(pk=bg.pk, locked_by=bg.locked_by).update(**fields):
+            logger.warning("TaskWorker: lost the lease on %s (%s) before it finished", bg.name, bg.uuid)
+        for key, value in fields.items():
+            setattr(bg, key, value)
+        return status
+
+    def run_once(self, now: Optional[datetime] = None) -> bool:
+        """Claim and run one task. Returns False when nothing was due."""
+        close_old_connections()
+        claimed = self.claim(limit=1, now=now)
+        for bg in claimed:
+            self.run_task(bg)
+        return bool(claimed)
+
+    def drain(self, max_tasks: Optional[int] = None) -> int:
+        """Run due tasks in this thread until none is left. Returns how many ran."""
+        ran = 0
+        while (max_tasks is None or ran < max_tasks) and self.run_once():
+            ran += 1
+        return ran
+
+    def work(self, stop: threading.Event, burst: bool = False):
+        """Loop until `stop` is set (or, with burst, until the queue is empty)."""
+        try:
+            while not stop.is_set():
+                self.schedule_periodic()
+                if self.run_once():
+                    continue
+                self.requeue_expired()
+                if burst:
+                    return
+                stop.wait(self.poll_seconds)
+        finally:
+            connections.close_all()
+
+
+def _jsonable(value):
+    try:
+        json.dumps(value, cls=DjangoJSONEncoder)
+        return value
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+# -------------------------------------------------
+# Pools
+# -------------------------------------------------
+def run_pool(concurrency: int = 1, mode: str = "thread", queues=None, burst: bool = False, poll_seconds=None):
+    """Run `concurrency` workers as threads or processes until interrupted."""
+    registry.discover()
+    concurrency = max(1, int(concurrency))
+    if mode == "process":
+        import multiprocessing
+        from jobs.task_process import main as process_main
+        ctx = multiprocessing.get_context("spawn")
+        procs = [ctx.Process(target=process_main, args=(queues, burst, poll_seconds), daemon=False) for _ in range(concurrency)]
+        for p in procs:
+            p.start()
+        try:
+            for p in procs:
+                p.join()
+        except KeyboardInterrupt:
+            for p in procs:
+                p.join()
+        return
+
+    stop = threading.Event()
+    threads = [
+        threading.Thread(
+            target=TaskWorker(queues=queues, poll_seconds=poll_seconds).work,
+            args=(stop, burst), name=f"task-worker-{i}", daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    try:
+        while any(t.is_alive() for t in threads):
+            for t in threads:
+                t.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for t in threads:
+            t.join()
+
+
+def task_status(task_uuid) -> Optional[dict]:
+    """Status / progress snapshot of one task, or None."""
+    bg = BackgroundTask.objects.filter(uuid=task_uuid).first()
+    if bg is None:
+        return None
+    return {
+        "uuid": str(bg.uuid),
+        "name": bg.name,
+        "queue": bg.queue,
+        "status": bg.status,
+        "attempts": bg.attempts,
+        "max_attempts": bg.max_attempts,
+        "progress": bg.progress,
+        "progress_message": bg.progress_message,
+        "result": bg.result,
+        "last_error": bg.last_error,
+        "run_at": bg.run_at,
+        "created_at": bg.created_at,
+        "started_at": bg.started_at,
+        "finished_at": bg.finished_at,
+    }
+
+
+__all__ = [
+    "Task",
+    "TaskContext",
+    "TaskNotRegistered",
+    "TaskWorker",
+    "registry",
+    "run_pool",
+    "task",
+    "task_status",
+]
@@ -1,21 +1,75 @@
-from celery import shared_task
+from django.conf import settings
+from jobs.taskqueue import task
 from django.utils import timezone
 from .models import Job
 from django.core.mail import send_mail
 
-@shared_task
+@task(queue="email", every=getattr(settings, "JOB_ALERT_INTERVAL_SECONDS", 300))
 def send_job_alerts():
-    # find jobs nearing ready in next 10 minutes and not already ready/completed
-    window = timezone.now() + timezone.timedelta(minutes=10)
-    candidates = Job.objects.filter(status__in=["queued","in_progress"], expected_ready_at__lte=window, expected_ready_at__gte=timezone.now())
+    # find jobs nearing ready in next 10 minutes and not already ready/completed or alerted
+    now = timezone.now()
+    window = now + timezone.timedelta(minutes=10)
+    candidates = (
+        Job.objects
+        .filter(status__in=["queued", "in_progress"], expected_ready_at__lte=window,
+                expected_ready_at__gte=now, alert_sent_at__isnull=True)
+        .select_related("branch")
+    )
+    alerted = []
     for job in candidates:
-        # Example: send an email to branch manager (requires branch.manager.email)
+        # Branch has no manager relation; its contact email stands in for one
         manager = getattr(job.branch, "manager", None)
-        if manager and getattr(manager, "email", None):
+        recipient = getattr(manager, "email", None) or job.branch.email
+        if recipient:
             send_mail(
                 subject=f"Job nearing completion: Job#{job.id}",
                 message=f"Job {job.id} for {job.customer_name} is expected at {job.expected_ready_at}.",
                 from_email="no-reply@farhat.local",
-                recipient_list=[manager.email],
+                recipient_list=[recipient],
                 fail_silently=True,
             )
+        alerted.append(job.pk)
+    # jobs of branches without an address are marked too, so they are not re-read every run
+    Job.objects.filter(pk__in=alerted).update(alert_sent_at=now)
+    return {"alerted": len(alerted)}
+
+
+@task(priority=-5, every=getattr(settings, "ANOMALY_SCAN_INTERVAL_SECONDS", 86400))
+def scan_anomalies(days=2):
+    # nightly sweep of every branch's recent day sheets (flags are fingerprinted, so reruns are harmless)
+    from .anomaly_scan import anomaly_scanner
+    today = timezone.localdate()
+    return anomaly_scanner.scan(since=today - timezone.timedelta(days=days - 1), until=today)
+
+
+@task(priority=5, max_attempts=1, every=getattr(settings, "AUDIT_SPOOL_REPLAY_SECONDS", 300))
+def replay_audit_spool(limit=100):
+    # audit rows whose after-commit write failed
+    from .audit_buffer import replay_spool
+    return replay_spool(limit=limit)
+
+
+@task(priority=10, max_attempts=1, every=getattr(settings, "SHADOW_OUTBOX_DISPATCH_SECONDS", 30))
+def dispatch_shadow_events(batch_size=None):
+    # one drain of the HQ outbox per slot; claims are leased, so overlapping drains are safe
+    from .outbox import OutboxDispatcher
+    return OutboxDispatcher(batch_size=batch_size).drain()
+
+
+@task(bind=True, priority=5, max_attempts=1, every=getattr(settings, "AUTO_CLOSE_INTERVAL_SECONDS", 300))
+def auto_close_stale(ctx):
+    # one sweep at a time cluster-wide: a slot whose predecessor still runs is skipped
+    from .auto_close import auto_close_scheduler
+    from .models import BackgroundTask
+    running = BackgroundTask.objects.filter(name=ctx.task.name, status=BackgroundTask.STATUS_RUNNING).exclude(pk=ctx.task.pk)
+    if running.exists():
+        return {"skipped": "previous sweep still running"}
+    return auto_close_scheduler.sweep(worker=ctx.task.locked_by)
+
+
+@task(priority=5, max_attempts=1, every=getattr(settings, "HEARTBEAT_CHECK_SECONDS", 30))
+def detect_silent_terminals():
+    # flush this process's pings first so its own terminals are not judged on stale rows
+    from .heartbeats import heartbeats, silent_terminal_detector
+    heartbeats.flush()
+    return silent_terminal_detector.detect()
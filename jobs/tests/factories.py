@@ -0,0 +1,59 @@
+# jobs/tests/factories.py
+"""
+Small fixture builders shared by the jobs test modules.
+"""
+from decimal import Decimal
+import itertools
+
+from django.contrib.auth import get_user_model
+
+from branches.models import Country, Region, Branch
+from jobs.models import ServiceType, ServicePricingRule
+
+User = get_user_model()
+
+_seq = itertools.count(1)
+
+
+def make_branch(code=None, name=None, **kwargs):
+    n = next(_seq)
+    country, _ = Country.objects.get_or_create(code="GH", defaults={"name": "Ghana"})
+    region, _ = Region.objects.get_or_create(country=country, name="Greater Accra")
+    return Branch.objects.create(
+        code=code or f"TST-{n:03d}",
+        name=name or f"Test Branch {n}",
+        country=country,
+        region=region,
+        **kwargs,
+    )
+
+
+def make_user(email=None, branch=None, **kwargs):
+    n = next(_seq)
+    return User.objects.create_user(
+        employee_email=email or f"attendant{n}@test.com",
+        first_name="Test",
+        last_name=f"User{n}",
+        password="testpass123",
+        branch=branch,
+        **kwargs,
+    )
+
+
+def make_service(code=None, price="10.00", **kwargs):
+    n = next(_seq)
+    return ServiceType.objects.create(
+        code=code or f"SVC_{n}",
+        name=kwargs.pop("name", f"Service {n}"),
+        price=Decimal(price) if price is not None else None,
+        **kwargs,
+    )
+
+
+def make_rule(service, unit_price, pricing_type="variant", **variants):
+    return ServicePricingRule.objects.create(
+        service_type=service,
+        pricing_type=pricing_type,
+        unit_price=Decimal(unit_price),
+        **variants,
+    )
@@ -0,0 +1,110 @@
+# jobs/tests/hq_standin.py
+"""
+Local HQ stand-in for outbox tests.
+
+A ThreadingHTTPServer on 127.0.0.1 that speaks the HttpHQClient protocol
+(gzip JSON {"events": [...]} in, {"acks": [...]} out) and records every
+batch it receives. Latency and failures are injectable:
+
+    with HQStandIn(latency=0.05) as hq:
+        hq.fail_next_calls = 1           # HTTP 503 for the next call
+        hq.fail_uuids.add(some_uuid)     # per-event negative ack
+        hq.reject_branches.add("3")      # HTTP 403 for that branch's requests
+        client = HttpHQClient(url=hq.url)
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gzip
+import json
+import threading
+import time
+
+from django.utils import timezone
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        hq = self.server.standin
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        events = json.loads(body or b"{}").get("events") or []
+
+        if hq.latency:
+            time.sleep(hq.latency)
+
+        with hq.lock:
+            hq.calls += 1
+            if hq.fail_next_calls > 0:
+                hq.fail_next_calls -= 1
+                self._reply(503, {"error": "unavailable"})
+                return
+            if self.headers.get("X-Octos-Branch") in hq.reject_branches:
+                self._reply(403, {"error": "unknown branch"})
+                return
+            hq.batches.append(events)
+            hq.headers.append(dict(self.headers))
+            now = timezone.now().isoformat()
+            acks = []
+            halted = set()
+            for event in events:
+                if event["uuid"] in hq.fail_uuids or event["branch_id"] in halted:
+                    # like HQ, stop applying a branch after its first rejected event
+                    halted.add(event["branch_id"])
+                    acks.append({"uuid": event["uuid"], "ok": False, "error": "rejected"})
+                    continue
+                hq.received.setdefault(event["uuid"], event)
+                acks.append({"uuid": event["uuid"], "ok": True, "received_at": now, "processed_at": now})
+        self._reply(200, {"acks": acks})
+
+    def _reply(self, status, data):
+        raw = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HQStandIn:
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.fail_next_calls = 0
+        self.fail_uuids = set()
+        self.reject_branches = set()
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.batches = []
+        self.headers = []
+        self.received = {}
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/ingest/"
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.standin = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
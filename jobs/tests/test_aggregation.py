@@ -0,0 +1,182 @@
+# jobs/tests/test_aggregation.py
+"""
+Parity between the SQL aggregations and the per-row Python loops they replaced.
+"""
+from datetime import timedelta
+from decimal import Decimal
+import random
+
+from django.test import TestCase
+from django.utils import timezone
+
+from jobs.models import Job, DaySheet, DaySheetShift
+from jobs.services import daysheet_service, ShiftAggregationService, DayAggregationService
+from jobs.tests.factories import make_branch, make_user, make_service
+
+
+# -------------------------------------------------
+# Reference implementations (previous row-by-row versions)
+# -------------------------------------------------
+def legacy_day_totals(daysheet):
+    totals = {
+        "total_jobs": 0,
+        "gross_total": Decimal("0.00"),
+        "deposits_total": Decimal("0.00"),
+        "completed_total": Decimal("0.00"),
+        "outstanding_total": Decimal("0.00"),
+    }
+    for job in Job.objects.filter(daysheet=daysheet):
+        total = Decimal(job.total_amount or 0)
+        deposit = Decimal(job.deposit_amount or 0)
+        balance = total - deposit
+        totals["total_jobs"] += 1
+        totals["gross_total"] += total
+        totals["deposits_total"] += deposit
+        if balance <= 0:
+            totals["completed_total"] += total
+        else:
+            totals["outstanding_total"] += balance
+    return totals
+
+
+def legacy_shift_totals(shift):
+    shift_end = shift.shift_end or timezone.now()
+    totals = {"job_count": 0, "gross_total": Decimal("0.00"), "deposit_total": Decimal("0.00"), "net_total": Decimal("0.00")}
+    for job in Job.objects.filter(
+        daysheet=shift.daysheet,
+        created_by=shift.user,
+        created_at__gte=shift.shift_start,
+        created_at__lte=shift_end,
+    ):
+        totals["job_count"] += 1
+        totals["gross_total"] += Decimal(job.unit_price or 0) * Decimal(job.quantity or 1)
+        totals["deposit_total"] += Decimal(job.deposit_amount or 0)
+        totals["net_total"] += Decimal(job.total_amount or 0)
+    return totals
+
+
+def legacy_day_aggregate(daysheet):
+    totals = {"shift_count": 0, "job_count": 0, "gross_total": Decimal("0.00"), "deposit_total": Decimal("0.00"), "net_total": Decimal("0.00")}
+    for shift in DaySheetShift.objects.filter(daysheet=daysheet, status__in=DayAggregationService.CLOSED_SHIFT_STATUSES):
+        totals["shift_count"] += 1
+        for key, value in legacy_shift_totals(shift).items():
+            totals[key] += value
+    return totals
+
+
+# -------------------------------------------------
+# Fixtures
+# -------------------------------------------------
+class AggregationFixtureMixin:
+
+    def build_day(self, seed=7, jobs_per_user=40):
+        rng = random.Random(seed)
+        self.branch = make_branch()
+        self.users = [make_user(branch=self.branch) for _ in range(3)]
+        self.service = make_service(price="4.50")
+        self.sheet = DaySheet.objects.create(branch=self.branch, date=timezone.localdate())
+
+        base = timezone.now().replace(hour=8, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        jobs = []
+        for user in self.users:
+            for i in range(jobs_per_user):
+                unit = Decimal(rng.randint(50, 5000)) / 100
+                qty = rng.randint(1, 6)
+                deposit = rng.choice([Decimal("0.00"), Decimal(rng.randint(0, 4000)) / 100])
+                total = rng.choice([None, max(unit * qty - deposit, Decimal("0.00")), unit * qty])
+                jobs.append(Job(
+                    branch=self.branch,
+                    service=self.service,
+                    daysheet=self.sheet,
+                    customer_name="Walk-in",
+                    quantity=qty,
+                    unit_price=rng.choice([None, unit, unit, unit]),
+                    total_amount=total,
+                    deposit_amount=deposit,
+                    created_by=user,
+                ))
+        Job.objects.bulk_create(jobs)
+
+        # Spread creation times across the working day (auto_now_add ignores explicit values)
+        for idx, job in enumerate(Job.objects.filter(daysheet=self.sheet).order_by("pk")):
+            Job.objects.filter(pk=job.pk).update(created_at=base + timedelta(minutes=5 * (idx % 120)))
+
+        u1, u2, u3 = self.users
+        self.make_shift(u1, base, base + timedelta(hours=4), DaySheetShift.SHIFT_CLOSED)
+        # overlapping windows for the same attendant: jobs count in both
+        self.make_shift(u1, base + timedelta(hours=3), base + timedelta(hours=9), DaySheetShift.SHIFT_AUTO_CLOSED)
+        self.make_shift(u2, base + timedelta(hours=1), None, DaySheetShift.SHIFT_LOCKED)
+        self.make_shift(u3, base, base + timedelta(hours=9), DaySheetShift.SHIFT_OPEN)  # excluded
+
+    def make_shift(self, user, start, end, status):
+        return DaySheetShift.objects.create(
+            daysheet=self.sheet, user=user, shift_start=start, shift_end=end, status=status,
+        )
+
+
+# =========================================================
+# DaySheetService.compute_day_totals
+# =========================================================
+class DayTotalsParityTest(AggregationFixtureMixin, TestCase):
+
+    def setUp(self):
+        self.build_day()
+
+    def test_matches_row_loop(self):
+        expected = legacy_day_totals(self.sheet)
+        result = daysheet_service.compute_day_totals(self.sheet)
+        for key, value in expected.items():
+            self.assertEqual(result[key], value, key)
+        self.assertEqual(result["by_channel"], {"cash": Decimal("0.00"), "momo": Decimal("0.00"), "card": Decimal("0.00")})
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            daysheet_service.compute_day_totals(self.sheet)
+
+    def test_empty_sheet(self):
+        empty = DaySheet.objects.create(branch=make_branch(), date=timezone.localdate())
+        result = daysheet_service.compute_day_totals(empty)
+        self.assertEqual(result["total_jobs"], 0)
+        self.assertEqual(result["gross_total"], Decimal("0.00"))
+        self.assertEqual(result["outstanding_total"], Decimal("0.00"))
+
+
+# =========================================================
+# ShiftAggregationService / DayAggregationService
+# =========================================================
+class ShiftAndDayAggregationParityTest(AggregationFixtureMixin, TestCase):
+
+    def setUp(self):
+        self.build_day()
+
+    def test_each_shift_matches_row_loop(self):
+        service = ShiftAggregationService()
+        for shift in DaySheetShift.objects.filter(daysheet=self.sheet):
+            expected = legacy_shift_totals(shift)
+            result = service.aggregate(shift)
+            for key, value in expected.items():
+                self.assertEqual(result[key], value, f"shift {shift.pk} {key}")
+            self.assertEqual(result["expected_cash"], expected["net_total"])
+            self.assertEqual(result["momo_total"], Decimal("0.00"))
+            self.assertEqual(result["card_total"], Decimal("0.00"))
+
+    def test_day_matches_sum_of_shifts(self):
+        expected = legacy_day_aggregate(self.sheet)
+        result = DayAggregationService().aggregate(self.sheet)
+        for key, value in expected.items():
+            self.assertEqual(result[key], value, key)
+        self.assertEqual(result["cash_total"], expected["net_total"])
+        self.assertEqual(result["expected_closing_cash"], expected["net_total"])
+
+    def test_day_query_count_is_constant(self):
+        with self.assertNumQueries(2):
+            DayAggregationService().aggregate(self.sheet)
+        for _ in range(5):
+            self.make_shift(self.users[2], timezone.now() - timedelta(days=2), timezone.now(), DaySheetShift.SHIFT_CLOSED)
+        with self.assertNumQueries(2):
+            DayAggregationService().aggregate(self.sheet)
+
+    def test_closed_shift_without_start_is_rejected(self):
+        self.make_shift(self.users[2], None, None, DaySheetShift.SHIFT_CLOSED)
+        with self.assertRaises(ValueError):
+            DayAggregationService().aggregate(self.sheet)
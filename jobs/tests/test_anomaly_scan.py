@@ -0,0 +1,119 @@
+# jobs/tests/test_anomaly_scan.py
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from jobs.anomaly_scan import AnomalyScanner
+from jobs.models import (
+    AnomalyFlag, CorrectionEntry, DaySheet, DaySheetShift, DomainEvent, Job, ShiftCloseSnapshot,
+)
+from jobs.services import anomaly_service
+from jobs.taskqueue import registry
+from jobs.tests.factories import make_branch, make_service, make_user
+
+
+class AnomalyScanTest(TestCase):
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.branch = make_branch()
+        self.user = make_user(branch=self.branch)
+        self.service = make_service(price="5.00")
+        self.sheet = DaySheet.objects.create(branch=self.branch, date=self.today)
+        self.scanner = AnomalyScanner()
+
+    def job(self, amount="5.00", sheet=None, at=None):
+        job = Job.objects.create(
+            branch=self.branch, service=self.service, daysheet=sheet or self.sheet,
+            customer_name="Walk-in", total_amount=None if amount is None else Decimal(amount),
+        )
+        if at is not None:
+            Job.objects.filter(pk=job.pk).update(created_at=at)
+        return job
+
+    def test_all_detectors_in_one_sweep(self):
+        now = timezone.now()
+        first = self.job(at=now - timedelta(hours=2))
+        dup = self.job(at=now - timedelta(hours=2) + timedelta(seconds=30))
+        self.job(at=now - timedelta(hours=1))            # same service and amount, outside the window
+        self.job(amount="0.00")
+        self.job(amount=None)                             # 2 free jobs out of 5
+
+        shift = DaySheetShift.objects.create(daysheet=self.sheet, user=self.user, closing_cash=Decimal("50.00"), status=DaySheetShift.SHIFT_CLOSED)
+        ShiftCloseSnapshot.objects.create(shift=shift, daysheet=self.sheet, cash_total=Decimal("20.00"), computed_at=now)
+        for _ in range(3):
+            CorrectionEntry.objects.create(daily_sheet=self.sheet, type=CorrectionEntry.TYPE_AMOUNT_CORRECTION)
+        CorrectionEntry.objects.create(daily_sheet=self.sheet, type=CorrectionEntry.TYPE_NOTE)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.scanner.scan(self.today, self.today)
+
+        self.assertEqual(result["sheets"], 1)
+        self.assertEqual(result["created"], {
+            AnomalyFlag.TYPE_DUPLICATE_JOBS: 1,
+            AnomalyFlag.TYPE_HIGH_FREE_JOBS: 1,
+            AnomalyFlag.TYPE_MISMATCH_CASH: 1,
+            AnomalyFlag.TYPE_REPEATED_CORRECTIONS: 1,
+        })
+        duplicate = AnomalyFlag.objects.get(flag_type=AnomalyFlag.TYPE_DUPLICATE_JOBS)
+        self.assertEqual(duplicate.description, f"Duplicate job detected: job {dup.pk} similar to {first.pk}")
+        self.assertEqual(AnomalyFlag.objects.get(flag_type=AnomalyFlag.TYPE_MISMATCH_CASH).shift, shift)
+        self.assertEqual(DomainEvent.objects.filter(event_type="ANOMALY_FLAGGED").count(), 4)
+
+        again = self.scanner.scan(self.today, self.today)
+        self.assertEqual(sum(again["found"].values()), 4)
+        self.assertEqual(sum(again["created"].values()), 0)
+        self.assertEqual(AnomalyFlag.objects.count(), 4)
+
+    def test_dedupes_against_online_detector(self):
+        self.job(amount="0.00")
+        self.sheet.total_jobs = 1
+        self.assertIsNotNone(anomaly_service.detect_high_free_jobs(self.sheet))
+        self.assertIsNotNone(anomaly_service.detect_high_free_jobs(self.sheet))  # same flag returned
+
+        result = self.scanner.scan(self.today, self.today, detectors=[AnomalyFlag.TYPE_HIGH_FREE_JOBS])
+
+        self.assertEqual(result["found"][AnomalyFlag.TYPE_HIGH_FREE_JOBS], 1)
+        self.assertEqual(result["created"][AnomalyFlag.TYPE_HIGH_FREE_JOBS], 0)
+        self.assertEqual(AnomalyFlag.objects.count(), 1)
+
+    def test_auto_close_reuses_a_flag_the_sweep_already_raised(self):
+        existing = AnomalyFlag.objects.create(
+            daily_sheet=self.sheet, flag_type=AnomalyFlag.TYPE_AUTO_CLOSE, description="swept",
+            fingerprint=AnomalyFlag.make_fingerprint(AnomalyFlag.TYPE_AUTO_CLOSE, "daysheet", self.sheet.pk),
+        )
+        _, flag = anomaly_service.auto_close_daysheet_if_needed(self.sheet)
+
+        self.assertEqual(flag, existing)
+        self.assertEqual(AnomalyFlag.objects.count(), 1)
+        self.sheet.refresh_from_db()
+        self.assertEqual(self.sheet.status, DaySheet.STATUS_AUTO_CLOSED)
+
+    def test_sweep_is_scheduled_nightly(self):
+        registry.discover()
+        self.assertEqual(registry.get("jobs.tasks.scan_anomalies").every, 86400)
+
+    def test_date_and_branch_scope(self):
+        old = DaySheet.objects.create(branch=self.branch, date=self.today - timedelta(days=10))
+        other = DaySheet.objects.create(branch=make_branch(), date=self.today)
+        self.job(amount="0.00", sheet=old)
+        self.job(amount="0.00", sheet=other)
+
+        result = self.scanner.scan(self.today - timedelta(days=1), self.today, branch_ids=[self.branch.pk])
+
+        self.assertEqual(result["sheets"], 1)
+        self.assertFalse(AnomalyFlag.objects.exists())
+
+    def test_command_dry_run(self):
+        self.job(amount="0.00")
+        out = StringIO()
+        call_command("scan_anomalies", dry_run=True, detector=[AnomalyFlag.TYPE_HIGH_FREE_JOBS], stdout=out)
+        self.assertIn("high_free_jobs: 1 found, would raise 1 new", out.getvalue())
+        self.assertFalse(AnomalyFlag.objects.exists())
+
+        call_command("scan_anomalies", stdout=StringIO())
+        self.assertEqual(AnomalyFlag.objects.count(), 1)
@@ -0,0 +1,133 @@
+# jobs/tests/test_audit_buffer.py
+from unittest import mock
+
+from django.db import DatabaseError, transaction
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+
+from Human_Resources.models.audit import AuditLog
+from jobs.audit_buffer import AuditBufferMiddleware, _write, audit_buffer, replay_spool, request_scope
+from jobs.models import AuditSpoolEntry, DomainEvent, StatusLog
+from jobs.services import job_service
+from jobs.tests.factories import make_branch, make_user, make_service
+
+
+def status_log(event="E"):
+    return StatusLog(entity_type="Job", entity_id="1", event=event)
+
+
+class AuditBufferTest(TestCase):
+
+    def test_rows_are_bulk_written_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                for i in range(3):
+                    audit_buffer.add(status_log(f"E{i}"))
+                audit_buffer.add(AuditLog(action="approve", details="x"))
+                self.assertFalse(StatusLog.objects.exists())
+
+        self.assertEqual(len(callbacks), 1)
+        with self.assertNumQueries(2):
+            callbacks[0]()
+        self.assertEqual(StatusLog.objects.count(), 3)
+        self.assertEqual(AuditLog.objects.count(), 1)
+
+    def test_rolled_back_savepoint_drops_its_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                audit_buffer.add(status_log("kept"))
+                try:
+                    with transaction.atomic():
+                        audit_buffer.add(status_log("dropped"))
+                        raise RuntimeError("boom")
+                except RuntimeError:
+                    pass
+                audit_buffer.add(status_log("kept-too"))
+
+        self.assertEqual(sorted(StatusLog.objects.values_list("event", flat=True)), ["kept", "kept-too"])
+
+    def test_rolled_back_transaction_writes_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    audit_buffer.add(status_log())
+                    raise RuntimeError("boom")
+            except RuntimeError:
+                pass
+            with transaction.atomic():
+                audit_buffer.add(status_log("after"))
+
+        self.assertEqual(list(StatusLog.objects.values_list("event", flat=True)), ["after"])
+
+    def test_immediate_opt_out(self):
+        with transaction.atomic():
+            row = audit_buffer.add(status_log(), immediate=True)
+            self.assertIsNotNone(row.pk)
+            with audit_buffer.immediate_writes():
+                self.assertIsNotNone(audit_buffer.add(status_log()).pk)
+        with override_settings(AUDIT_BUFFER_ENABLED=False), transaction.atomic():
+            self.assertIsNotNone(audit_buffer.add(status_log()).pk)
+
+    def test_failed_flush_is_spooled_and_replayed(self):
+        with mock.patch("jobs.audit_buffer._write", side_effect=DatabaseError("gone")), \
+                self.assertLogs("jobs.audit_buffer", "ERROR"), \
+                self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            audit_buffer.add(StatusLog(entity_type="Job", entity_id="9", event="E", payload={"a": [1]}))
+            audit_buffer.add(DomainEvent(aggregate_type="Job", aggregate_id="9", event_type="E"))
+
+        self.assertFalse(StatusLog.objects.exists())
+        self.assertEqual(AuditSpoolEntry.objects.count(), 2)
+
+        with mock.patch("jobs.audit_buffer._write", side_effect=DatabaseError("still gone")), \
+                self.assertLogs("jobs.audit_buffer", "ERROR"):
+            self.assertEqual(replay_spool()["failed"], 2)
+        self.assertEqual(list(AuditSpoolEntry.objects.values_list("attempts", flat=True)), [1, 1])
+
+        self.assertEqual(replay_spool(), {"entries": 2, "rows": 2, "failed": 0})
+        self.assertFalse(AuditSpoolEntry.objects.exists())
+        log = StatusLog.objects.get()
+        self.assertEqual((log.entity_id, log.payload), ("9", {"a": [1]}))
+        self.assertEqual(DomainEvent.objects.get().seq, 1)
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        def write(model, objs, using):
+            if any(obj.event == "bad" for obj in objs):
+                raise DatabaseError("bad row")
+            _write(model, objs, using)
+
+        with mock.patch("jobs.audit_buffer._write", side_effect=write), \
+                self.assertLogs("jobs.audit_buffer", "ERROR"), \
+                self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            for event in ("E1", "bad", "E2"):
+                audit_buffer.add(status_log(event))
+
+        self.assertEqual(sorted(StatusLog.objects.values_list("event", flat=True)), ["E1", "E2"])
+        entry = AuditSpoolEntry.objects.get()
+        self.assertEqual([row["event"] for row in entry.rows], ["bad"])
+
+    def test_instant_job_logs_are_batched(self):
+        branch = make_branch()
+        user = make_user(branch=branch)
+        service = make_service(price="5.00")
+
+        with request_scope() as stats, self.captureOnCommitCallbacks(execute=True):
+            job_service.create_instant_job(branch_id=branch.pk, service_id=service.pk, quantity=1, created_by=user)
+
+        # day sheet opened + job attached + job created, one INSERT
+        self.assertEqual(stats["records"], DomainEvent.objects.count())
+        self.assertGreaterEqual(stats["records"], 2)
+        self.assertEqual(stats["inserts"], 1)
+        self.assertTrue(
+            {"JOB_ATTACHED", "JOB_CREATED_INSTANT"} <= set(DomainEvent.objects.values_list("event_type", flat=True))
+        )
+
+    @override_settings(DEBUG=True)
+    def test_middleware_reports_saved_inserts(self):
+        def view(request):
+            with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+                for _ in range(4):
+                    audit_buffer.add(status_log())
+            return HttpResponse("ok")
+
+        response = AuditBufferMiddleware(view)(RequestFactory().get("/"))
+        self.assertEqual(response["X-Audit-Inserts-Saved"], "3")
@@ -0,0 +1,146 @@
+# jobs/tests/test_auto_close.py
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+
+import pytz
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from branches.models import Location
+from jobs.auto_close import AutoCloseScheduler, closes_at
+from jobs.daysheet_cache import daysheet_cache
+from jobs.models import (
+    AnomalyFlag, AutoCloseSweep, BackgroundTask, DaySheet, DaySheetShift, DomainEvent, ShiftCloseSnapshot,
+)
+from jobs.taskqueue import TaskWorker, registry
+from jobs.tests.factories import make_branch, make_user
+
+UTC = pytz.UTC
+HOURS = {"default": {"open": "08:00", "close": "18:00"}, "sun": None}
+MONDAY = date(2026, 8, 3)
+
+
+def at(day, hour, minute=0):
+    return UTC.localize(datetime.combine(day, time(hour, minute)))
+
+
+class OpeningHoursTest(TestCase):
+
+    def test_formats(self):
+        accra, lagos = pytz.timezone("Africa/Accra"), pytz.timezone("Africa/Lagos")
+        default = time(22, 0)
+        self.assertEqual(closes_at(HOURS, MONDAY, accra, default), at(MONDAY, 18))
+        self.assertEqual(closes_at(HOURS, MONDAY, lagos, default), at(MONDAY, 17))  # UTC+1
+        self.assertEqual(closes_at({"mon": ["09:00", "17:30"]}, MONDAY, accra, default), at(MONDAY, 17, 30))
+        self.assertEqual(closes_at({"Monday": "10:00-02:00"}, MONDAY, accra, default), at(MONDAY + timedelta(days=1), 2))
+        self.assertEqual(closes_at(HOURS, MONDAY - timedelta(days=1), accra, default), at(MONDAY, 0))  # closed Sunday
+        self.assertEqual(closes_at({}, MONDAY, accra, default), at(MONDAY, 22))
+        self.assertEqual(closes_at({"mon": {"open": "soon"}}, MONDAY, accra, default), at(MONDAY, 22))
+
+
+@override_settings(AUTO_CLOSE_GRACE_MINUTES=60, AUTO_CLOSE_SHIFT_MAX_HOURS=14)
+class AutoCloseSweepTest(TestCase):
+
+    def setUp(self):
+        daysheet_cache.clear()
+        self.branch = make_branch(opening_hours=HOURS)
+        self.user = make_user(branch=self.branch)
+        self.scheduler = AutoCloseScheduler()
+
+    def sheet(self, branch=None, day=MONDAY):
+        return DaySheet.objects.create(branch=branch or self.branch, date=day)
+
+    def shift(self, sheet, start):
+        return DaySheetShift.objects.create(daysheet=sheet, user=self.user, shift_start=start)
+
+    def test_closes_sheets_past_closing_plus_grace(self):
+        sheet = self.sheet()
+        shift = self.shift(sheet, at(MONDAY, 8))
+        lagos = make_branch(opening_hours=HOURS, location=Location.objects.create(name="Lagos", type="city", timezone="Africa/Lagos"))
+        lagos_sheet = self.sheet(branch=lagos)
+        later_sheet = self.sheet(branch=make_branch(opening_hours={"default": "08:00-23:00"}))
+
+        self.assertEqual(self.scheduler.sweep(now=at(MONDAY, 17, 30))["sheets_due"], 0)
+        self.assertEqual(self.scheduler.due_sheets(now=at(MONDAY, 18, 30))[0], {lagos_sheet.pk: lagos.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.scheduler.sweep(now=at(MONDAY, 19, 0))
+
+        self.assertEqual((result["sheets_due"], result["sheets_closed"], result["shifts_closed"]), (2, 2, 1))
+        sheet.refresh_from_db()
+        shift.refresh_from_db()
+        self.assertEqual(sheet.status, DaySheet.STATUS_AUTO_CLOSED)
+        self.assertEqual((shift.status, shift.shift_end), (DaySheetShift.SHIFT_AUTO_CLOSED, at(MONDAY, 19)))
+        self.assertTrue(ShiftCloseSnapshot.objects.filter(shift=shift).exists())
+        lagos_sheet.refresh_from_db()
+        self.assertEqual(lagos_sheet.status, DaySheet.STATUS_AUTO_CLOSED)
+        later_sheet.refresh_from_db()
+        self.assertEqual(later_sheet.status, DaySheet.STATUS_OPEN)
+
+        self.assertEqual(
+            set(AnomalyFlag.objects.values_list("fingerprint", flat=True)),
+            {f"auto_close:daysheet:{sheet.pk}", f"auto_close:daysheet:{lagos_sheet.pk}", f"auto_close:shift:{shift.pk}"},
+        )
+        self.assertEqual(DomainEvent.objects.filter(event_type="DAY_AUTO_CLOSED").count(), 2)
+        self.assertEqual(DomainEvent.objects.filter(event_type="SHIFT_AUTO_CLOSED").count(), 1)
+
+        again = self.scheduler.sweep(now=at(MONDAY, 19, 5))
+        self.assertEqual((again["sheets_closed"], again["shifts_closed"]), (0, 0))
+        self.assertEqual(AutoCloseSweep.objects.count(), 3)
+
+    def test_overlong_shift_closed_on_open_sheet(self):
+        sheet = self.sheet()
+        stale = self.shift(sheet, at(MONDAY, 8) - timedelta(hours=14))
+        fresh = self.shift(sheet, at(MONDAY, 8))
+
+        result = self.scheduler.sweep(now=at(MONDAY, 8, 30))
+
+        self.assertEqual((result["sheets_closed"], result["shifts_closed"]), (0, 1))
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.status, DaySheetShift.SHIFT_AUTO_CLOSED)
+        self.assertEqual(fresh.status, DaySheetShift.SHIFT_OPEN)
+        sheet.refresh_from_db()
+        self.assertEqual(sheet.status, DaySheet.STATUS_OPEN)
+
+    def test_command_dry_run_and_branch_scope(self):
+        sheet = self.sheet(day=date(2020, 1, 6))
+        other = self.sheet(branch=make_branch(), day=date(2020, 1, 6))
+
+        out = StringIO()
+        call_command("auto_close_stale", dry_run=True, branch=[self.branch.pk], stdout=out)
+        self.assertIn("1 sheet(s) due: would close 1 sheet(s)", out.getvalue())
+        self.assertFalse(AutoCloseSweep.objects.exists())
+
+        call_command("auto_close_stale", branch=[self.branch.pk], stdout=StringIO())
+        sheet.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((sheet.status, other.status), (DaySheet.STATUS_AUTO_CLOSED, DaySheet.STATUS_OPEN))
+
+    def test_metrics_api(self):
+        for ms in (10, 30, 20):
+            AutoCloseSweep.objects.create(started_at=at(MONDAY, 9) + timedelta(minutes=ms), duration_ms=ms)
+        client = APIClient()
+        client.force_authenticate(make_user(is_staff=True))
+
+        body = client.get("/api/jobs/hq/auto-close/").json()
+        self.assertEqual(body["duration_ms"], {"count": 3, "avg": 20, "p50": 20, "p95": 30, "max": 30})
+        self.assertEqual(body["sweeps"][0]["duration_ms"], 30)
+
+        client.force_authenticate(make_user())
+        self.assertEqual(client.get("/api/jobs/hq/auto-close/").status_code, 403)
+
+    def test_periodic_task_runs_once_per_slot(self):
+        registry.discover()
+        spec = registry.get("jobs.tasks.auto_close_stale")
+        self.assertTrue(spec.every)
+        now = at(MONDAY, 12)
+        periodic = len(registry.periodic())
+        self.assertEqual(TaskWorker().schedule_periodic(now=now), periodic)
+        self.assertEqual(TaskWorker().schedule_periodic(now=now + timedelta(seconds=1)), 0)  # another node, same slot
+
+        self.sheet(day=date(2020, 1, 6))
+        self.assertEqual(TaskWorker().drain(), periodic)
+        bg = BackgroundTask.objects.get(name=spec.name)
+        self.assertEqual((bg.status, bg.result["sheets_closed"]), (BackgroundTask.STATUS_SUCCEEDED, 1))
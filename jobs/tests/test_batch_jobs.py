@@ -0,0 +1,99 @@
+# jobs/tests/test_batch_jobs.py
+from decimal import Decimal
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from jobs.models import Job, JobRecord, DaySheet, DomainEvent, ShadowLogEvent
+from jobs.daysheet_cache import daysheet_cache
+from jobs.pricing import pricing_index
+from jobs.services import job_service
+from jobs.tests.factories import make_branch, make_user, make_service
+
+
+class InstantJobBatchServiceTest(TestCase):
+
+    def setUp(self):
+        pricing_index.invalidate()
+        daysheet_cache.clear()
+        self.branch = make_branch()
+        self.user = make_user(branch=self.branch)
+        self.svc_a = make_service(price="5.00")
+        self.svc_b = make_service(price="12.00")
+
+    def test_creates_jobs_records_and_single_daysheet_update(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs = job_service.create_instant_jobs_batch(
+                branch_id=self.branch.pk,
+                lines=[
+                    {"service_id": self.svc_a.pk, "quantity": 3},
+                    {"service_id": self.svc_b.pk, "quantity": 1, "deposit": "2.00"},
+                ],
+                created_by=self.user,
+                customer_name="Ama",
+            )
+        self.assertEqual(len(jobs), 2)
+        self.assertEqual(Job.objects.count(), 2)
+        self.assertEqual(JobRecord.objects.count(), 2)
+
+        sheet = DaySheet.objects.get(branch=self.branch)
+        self.assertEqual(sheet.total_jobs, 2)
+        self.assertEqual(sheet.total_amount, Decimal("25.00"))
+        self.assertTrue(all(j.daysheet_id == sheet.pk for j in Job.objects.all()))
+
+        self.assertEqual(DomainEvent.objects.filter(event_type="JOB_BATCH_CREATED_INSTANT").count(), 1)
+        self.assertEqual(ShadowLogEvent.objects.filter(event_type="JOB_BATCH_CREATED_INSTANT").count(), 1)
+
+    def test_unknown_service_writes_nothing(self):
+        with self.assertRaises(Exception):
+            job_service.create_instant_jobs_batch(
+                branch_id=self.branch.pk,
+                lines=[{"service_id": self.svc_a.pk}, {"service_id": 999999}],
+            )
+        self.assertEqual(Job.objects.count(), 0)
+
+    def test_shadow_event_is_written_with_the_jobs(self):
+        failing = mock.patch.object(job_service, "_create_shadow_event", side_effect=DatabaseError("outbox"))
+        for create in (
+            lambda: job_service.create_instant_job(branch_id=self.branch.pk, service_id=self.svc_a.pk, quantity=1, created_by=self.user),
+            lambda: job_service.create_instant_jobs_batch(
+                branch_id=self.branch.pk, lines=[{"service_id": self.svc_a.pk, "quantity": 1}], created_by=self.user,
+            ),
+        ):
+            with failing, self.assertRaises(DatabaseError):
+                create()
+            self.assertFalse(Job.objects.exists())
+            self.assertFalse(JobRecord.objects.exists())
+
+    def test_empty_batch_rejected(self):
+        with self.assertRaises(ValueError):
+            job_service.create_instant_jobs_batch(branch_id=self.branch.pk, lines=[])
+
+
+class InstantJobBatchAPITest(TestCase):
+
+    def setUp(self):
+        pricing_index.invalidate()
+        daysheet_cache.clear()
+        self.branch = make_branch()
+        self.user = make_user(branch=self.branch)
+        self.svc = make_service(price="4.00")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_batch_endpoint_uses_user_branch(self):
+        res = self.client.post(
+            "/api/jobs/jobs/batch/",
+            {"customer_name": "Kojo", "lines": [{"service": self.svc.pk, "quantity": 2}] * 3},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 201, res.content)
+        self.assertEqual(len(res.json()), 3)
+        self.assertEqual(DaySheet.objects.get(branch=self.branch).total_amount, Decimal("24.00"))
+
+    def test_batch_endpoint_requires_auth(self):
+        self.client.force_authenticate(None)
+        res = self.client.post("/api/jobs/jobs/batch/", {"lines": []}, format="json")
+        self.assertIn(res.status_code, (401, 403))
@@ -0,0 +1,97 @@
+# jobs/tests/test_counters.py
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from jobs import counters
+from jobs.models import AnomalyFlag, DaySheet, DaySheetCounterShard, Job
+from jobs.pricing import pricing_index
+from jobs.services import anomaly_service, job_service, manager_service
+from jobs.tests.factories import make_branch, make_user, make_service
+
+
+@override_settings(DAYSHEET_COUNTER_SHARDS=4)
+class ShardedCounterTest(TestCase):
+
+    def setUp(self):
+        pricing_index.invalidate()
+        self.branch = make_branch()
+        self.svc = make_service(price="5.00")
+        self.attendants = [make_user(branch=self.branch) for _ in range(3)]
+
+    def _record_jobs(self):
+        for user in self.attendants:
+            for _ in range(2):
+                job_service.create_instant_job(
+                    branch_id=self.branch.pk, service_id=self.svc.pk, quantity=1, created_by=user,
+                )
+
+    def test_increments_go_to_shards_not_parent(self):
+        self._record_jobs()
+        sheet = DaySheet.objects.get(branch=self.branch)
+        self.assertEqual(sheet.total_jobs, 0)
+        self.assertEqual(DaySheetCounterShard.objects.filter(daysheet=sheet).count(), 4)
+        self.assertEqual(counters.read_totals(sheet), (6, Decimal("30.00")))
+
+    def test_fold_moves_shards_into_parent(self):
+        self._record_jobs()
+        sheet = DaySheet.objects.get(branch=self.branch)
+        counters.fold(sheet)
+        sheet.refresh_from_db()
+        self.assertEqual((sheet.total_jobs, sheet.total_amount), (6, Decimal("30.00")))
+        self.assertEqual(counters.read_totals(sheet), (6, Decimal("30.00")))
+        # idempotent
+        counters.fold(sheet)
+        sheet.refresh_from_db()
+        self.assertEqual(sheet.total_jobs, 6)
+
+    def test_day_close_folds_counters(self):
+        self._record_jobs()
+        sheet = DaySheet.objects.get(branch=self.branch)
+
+        class _AnyPin:
+            def verify(self, user, pin):
+                return True
+
+        manager_service.pin_verifier, original = _AnyPin(), manager_service.pin_verifier
+        try:
+            manager_service.manager_close_day(sheet, self.attendants[0], pin="0000")
+            # a stale instance cannot close (and re-fold) the day twice
+            with self.assertRaisesMessage(ValueError, "already closed"):
+                manager_service.manager_close_day(sheet, self.attendants[0], pin="0000")
+        finally:
+            manager_service.pin_verifier = original
+        sheet.refresh_from_db()
+        self.assertEqual(sheet.total_jobs, 6)
+
+    def test_lock_sheet_skips_closed_sheets(self):
+        self._record_jobs()
+        sheet = DaySheet.objects.get(branch=self.branch)
+        open_sheets = DaySheet.objects.filter(pk=sheet.pk, status=DaySheet.STATUS_OPEN)
+        self.assertEqual(counters.lock_sheet(open_sheets), sheet)
+        DaySheet.objects.filter(pk=sheet.pk).update(status=DaySheet.STATUS_BRANCH_CLOSED)
+        self.assertIsNone(counters.lock_sheet(open_sheets))
+
+    def test_free_job_ratio_counts_unfolded_shards(self):
+        self._record_jobs()
+        sheet = DaySheet.objects.get(branch=self.branch)
+        Job.objects.filter(pk__in=Job.objects.filter(daysheet=sheet).values_list("pk", flat=True)[:2]).update(total_amount=0)
+
+        flag = anomaly_service.detect_high_free_jobs(sheet, free_ratio_threshold=0.3)
+        self.assertEqual(flag.flag_type, AnomalyFlag.TYPE_HIGH_FREE_JOBS)
+        self.assertIn("2/6", flag.description)
+
+
+@skipUnless(connection.features.has_select_for_update, "row-lock stress test needs MySQL/PostgreSQL")
+class CounterStressTest(TransactionTestCase):
+
+    def test_single_and_sharded_modes_stay_consistent_under_threads(self):
+        out = StringIO()
+        call_command("stress_daysheet_counters", threads=4, jobs_per_thread=10, shards=4, hold_ms=1, stdout=out)
+        lines = [l for l in out.getvalue().splitlines() if l.strip().startswith(("single", "sharded"))]
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(all(l.rstrip().endswith("True") for l in lines), out.getvalue())
@@ -0,0 +1,78 @@
+# jobs/tests/test_daysheet_cache.py
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from jobs.daysheet_cache import daysheet_cache, request_scope, tz_for_name
+from jobs.models import DaySheet, DaySheetShift, Job
+from jobs.pricing import pricing_index
+from jobs.services import job_service, daysheet_service, anomaly_service, shift_service
+from jobs.tests.factories import make_branch, make_user, make_service
+
+
+def _daysheet_selects(ctx):
+    table = DaySheet._meta.db_table
+    return [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT") and f'FROM "{table}"' in q["sql"]]
+
+
+class DaySheetResolutionCacheTest(TestCase):
+
+    def setUp(self):
+        pricing_index.invalidate()
+        daysheet_cache.clear()
+        self.branch = make_branch()
+        self.user = make_user(branch=self.branch)
+        self.svc = make_service(price="5.00")
+
+    def tearDown(self):
+        daysheet_cache.clear()
+
+    def _create_job(self):
+        return job_service.create_instant_job(
+            branch_id=self.branch.pk, service_id=self.svc.pk, quantity=1, created_by=self.user,
+        )
+
+    def test_hot_path_fetches_sheet_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            daysheet_service.get_or_create_daysheet_for_branch(self.branch, user=self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            job = self._create_job()
+        self.assertEqual(len(_daysheet_selects(ctx)), 1)
+        self.assertIsNotNone(Job.objects.get(pk=job.pk).daysheet_id)
+
+    def test_request_scope_serves_repeat_resolutions(self):
+        with request_scope():
+            with self.captureOnCommitCallbacks(execute=True):
+                first, _ = daysheet_service.get_or_create_daysheet_for_branch(self.branch)
+            with self.assertNumQueries(0):
+                second, created = daysheet_service.get_or_create_daysheet_for_branch(self.branch)
+        self.assertFalse(created)
+        self.assertEqual(first.pk, second.pk)
+
+    def test_auto_close_evicts_and_next_job_opens_fresh_path(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sheet, _ = daysheet_service.get_or_create_daysheet_for_branch(self.branch)
+            anomaly_service.auto_close_daysheet_if_needed(sheet)
+        self.assertIsNone(daysheet_cache.get(self.branch.pk, sheet.date))
+
+    def test_stale_closed_entry_is_not_used_for_attach(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sheet, _ = daysheet_service.get_or_create_daysheet_for_branch(self.branch)
+        # simulate another worker closing the sheet without this process noticing
+        DaySheet.objects.filter(pk=sheet.pk).update(status=DaySheet.STATUS_BRANCH_CLOSED)
+        with self.assertRaises(Exception):
+            self._create_job()
+        self.assertIsNone(daysheet_cache.get(self.branch.pk, sheet.date))
+
+    def test_stale_closed_entry_is_not_used_for_a_new_shift(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sheet, _ = daysheet_service.get_or_create_daysheet_for_branch(self.branch)
+        DaySheet.objects.filter(pk=sheet.pk).update(status=DaySheet.STATUS_BRANCH_CLOSED)
+        with self.assertRaises(Exception):
+            shift_service.start_shift(self.branch, self.user)
+        self.assertFalse(DaySheetShift.objects.filter(daysheet=sheet).exists())
+        self.assertIsNone(daysheet_cache.get(self.branch.pk, sheet.date))
+
+    def test_timezones_are_built_once(self):
+        self.assertIs(tz_for_name("Africa/Accra"), tz_for_name("Africa/Accra"))
+        self.assertIsNone(tz_for_name("Not/AZone"))
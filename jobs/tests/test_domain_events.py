@@ -0,0 +1,102 @@
+# jobs/tests/test_domain_events.py
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from jobs.audit_buffer import request_scope
+from jobs.domain_events import (
+    RECRUITMENT_TRANSITION, InvalidCursor, InvalidEventPayload, domain_events,
+)
+from jobs.models import DomainEvent
+from jobs.tests.factories import make_branch, make_user
+
+
+class DomainEventStoreTest(TestCase):
+
+    def setUp(self):
+        self.branch = make_branch()
+
+    def test_one_insert_per_transaction_with_per_aggregate_seq(self):
+        with request_scope() as stats, self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            for i in range(3):
+                domain_events.record("Job", 1, "JOB_UPDATED", {"i": i}, branch_id=self.branch.pk)
+            for i in range(2):
+                domain_events.record("Job", 2, "JOB_UPDATED", {"i": i}, branch_id=self.branch.pk)
+        self.assertEqual(stats, {"records": 5, "inserts": 1})
+
+        domain_events.record("Job", 1, "JOB_COMPLETED", immediate=True)
+        self.assertEqual([e.seq for e in domain_events.history("Job", 1)], [1, 2, 3, 4])
+        self.assertEqual([e.seq for e in domain_events.history("Job", 2)], [1, 2])
+        self.assertEqual([e.seq for e in domain_events.history("Job", 1, after_seq=2)], [3, 4])
+
+    def test_day_sheet_events_are_ordered_by_id(self):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            for i in range(3):
+                domain_events.record("DaySheet", 7, "JOB_ATTACHED", {"i": i}, branch_id=self.branch.pk)
+        events = domain_events.history("DaySheet", 7)
+        self.assertEqual([e.seq for e in events], [None, None, None])
+        self.assertEqual([e.payload["i"] for e in events], [0, 1, 2])
+        self.assertEqual(len(domain_events.history("DaySheet", 7, after_seq=events[0].pk)), 2)
+
+        page = domain_events.page(aggregate=("DaySheet", 7), limit=2)
+        rest = domain_events.page(aggregate=("DaySheet", 7), cursor=page.next_cursor)
+        self.assertEqual([e.pk for e in page.events + rest.events], [e.pk for e in events])
+
+    def test_registered_payloads_are_typed(self):
+        with self.assertRaises(InvalidEventPayload):
+            domain_events.record("RecruitmentApplication", 1, RECRUITMENT_TRANSITION, {"action": "approve"})
+        with self.assertRaises(InvalidEventPayload):
+            domain_events.record("Job", 1, RECRUITMENT_TRANSITION, self._transition("approve"))
+        self.assertFalse(DomainEvent.objects.exists())
+
+    def test_timeline_cursor_pagination(self):
+        now = timezone.now()
+        other = make_branch()
+        for i in range(5):
+            # two events share each timestamp, so the id tie-breaker is exercised
+            domain_events.record("DaySheet", 1, "E", {"i": i}, branch_id=self.branch.pk, occurred_at=now.replace(microsecond=0) + timedelta(seconds=i // 2), immediate=True)
+        domain_events.record("DaySheet", 2, "E", branch_id=other.pk, immediate=True)
+
+        seen, cursor = [], None
+        while True:
+            page = domain_events.page(branch_id=self.branch.pk, newest_first=True, cursor=cursor, limit=2)
+            seen.extend(e.payload["i"] for e in page.events)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(seen, [4, 3, 2, 1, 0])
+
+        first = domain_events.page(aggregate=("DaySheet", 1), limit=3)
+        rest = domain_events.page(aggregate=("DaySheet", 1), cursor=first.next_cursor, limit=3)
+        self.assertEqual([e.payload["i"] for e in first.events + rest.events], [0, 1, 2, 3, 4])
+        self.assertIsNone(rest.next_cursor)
+
+        with self.assertRaises(InvalidCursor):
+            domain_events.page(branch_id=self.branch.pk, cursor=first.next_cursor)
+        with self.assertRaises(InvalidCursor):
+            domain_events.page(cursor="not-a-cursor")
+
+    def test_transition_log_adapter(self):
+        reviewer = make_user(branch=self.branch)
+        application = SimpleNamespace(pk=7)
+        domain_events.record("RecruitmentApplication", 7, RECRUITMENT_TRANSITION, self._transition("start_screening"), actor={"user_id": reviewer.pk}, immediate=True)
+        domain_events.record("RecruitmentApplication", 7, RECRUITMENT_TRANSITION, self._transition("schedule_interview"), immediate=True)
+
+        logs = domain_events.transition_logs(application)
+        self.assertEqual([log.action for log in logs], ["start_screening", "schedule_interview"])
+        self.assertEqual(logs[0].performed_by, reviewer)
+        self.assertIsNone(logs[1].performed_by)
+        self.assertEqual(logs[0].new_stage, "screening")
+
+    def _transition(self, action):
+        return {
+            "action": action,
+            "previous_stage": "submitted",
+            "new_stage": "screening",
+            "previous_status": "active",
+            "new_status": "active",
+            "payload_snapshot": None,
+        }
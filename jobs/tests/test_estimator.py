@@ -0,0 +1,148 @@
+# jobs/tests/test_estimator.py
+from datetime import timedelta
+from io import StringIO
+import random
+import statistics
+
+from django.core.management import call_command
+from django.test import TestCase, SimpleTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from jobs.estimator import StreamingStats, ProductionTimeEstimator, production_estimator, META_KEY
+from jobs.models import Job, JobRecord, ServiceType
+from jobs.tests.factories import make_branch, make_user, make_service
+
+
+class StreamingStatsTest(SimpleTestCase):
+
+    def setUp(self):
+        rng = random.Random(3)
+        self.values = [rng.lognormvariate(1.5, 0.6) for _ in range(2000)]
+
+    def test_moments_match_exact(self):
+        stats = StreamingStats()
+        for v in self.values:
+            stats.add(v)
+        self.assertAlmostEqual(stats.mean, statistics.fmean(self.values), places=6)
+        self.assertAlmostEqual(stats.variance, statistics.variance(self.values), places=4)
+        self.assertEqual(stats.min, min(self.values))
+
+    def test_quantiles_within_relative_error(self):
+        stats = StreamingStats()
+        for v in self.values:
+            stats.add(v)
+        ordered = sorted(self.values)
+        for q in (0.5, 0.8, 0.9):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            self.assertLess(abs(stats.quantile(q) - exact) / exact, 0.05, q)
+
+    def test_merge_equals_single_stream(self):
+        whole, left, right = StreamingStats(), StreamingStats(), StreamingStats()
+        for i, v in enumerate(self.values):
+            whole.add(v)
+            (left if i % 3 else right).add(v)
+        left.merge(right)
+        self.assertEqual(left.count, whole.count)
+        self.assertAlmostEqual(left.mean, whole.mean, places=6)
+        self.assertAlmostEqual(left.variance, whole.variance, places=4)
+        self.assertEqual(left.buckets, whole.buckets)
+
+    def test_round_trip(self):
+        stats = StreamingStats()
+        for v in self.values[:50]:
+            stats.add(v)
+        again = StreamingStats.from_dict(stats.to_dict())
+        self.assertEqual(again.count, 50)
+        self.assertEqual(again.quantile(0.8), stats.quantile(0.8))
+
+
+class ProductionTimeEstimatorTest(TestCase):
+
+    def setUp(self):
+        production_estimator.reset()
+        self.branch = make_branch()
+        self.other_branch = make_branch()
+        self.user = make_user(branch=self.branch)
+        self.service = make_service(meta={"avg_minutes_per_unit": 30})
+
+    def test_needs_min_samples_then_prefers_branch(self):
+        est = ProductionTimeEstimator(flush_interval=3600, min_samples=3, quantile=0.5)
+        for _ in range(2):
+            est.observe(self.branch.pk, self.service.pk, 4.0)
+        self.assertIsNone(est.estimate(self.branch.pk, self.service.pk))
+
+        for _ in range(3):
+            est.observe(self.other_branch.pk, self.service.pk, 12.0)
+        # branch has 2 samples -> service-wide estimate (5 samples)
+        self.assertAlmostEqual(est.estimate(self.branch.pk, self.service.pk), 12.0, delta=0.6)
+
+        est.observe(self.branch.pk, self.service.pk, 4.0)
+        self.assertAlmostEqual(est.estimate(self.branch.pk, self.service.pk), 4.0, delta=0.2)
+
+    def test_flush_merges_workers(self):
+        a = ProductionTimeEstimator(flush_interval=3600, min_samples=1)
+        b = ProductionTimeEstimator(flush_interval=3600, min_samples=1)
+        for _ in range(4):
+            a.observe(self.branch.pk, self.service.pk, 5.0)
+        for _ in range(6):
+            b.observe(self.branch.pk, self.service.pk, 5.0)
+        self.assertEqual(a.flush(), 1)
+        self.assertEqual(b.flush(), 1)
+
+        meta = ServiceType.objects.get(pk=self.service.pk).meta
+        self.assertEqual(meta[META_KEY]["all"]["count"], 10)
+        self.assertEqual(meta[META_KEY]["branches"][str(self.branch.pk)]["count"], 10)
+        self.assertEqual(meta["avg_minutes_per_unit"], 30)
+
+        fresh = ProductionTimeEstimator(min_samples=1)
+        self.assertAlmostEqual(fresh.estimate(self.branch.pk, self.service.pk), 5.0, delta=0.2)
+
+    def test_closed_job_record_feeds_job_estimates(self):
+        job = Job.objects.create(branch=self.branch, service=self.service, customer_name="C", quantity=2)
+        self.assertEqual(job.compute_expected_minutes(), 30)
+
+        start = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                JobRecord.objects.create(
+                    job=job, performed_by=self.user, time_start=start,
+                    time_end=start + timedelta(minutes=16), quantity_produced=2,
+                )
+            # zero-length records (API "mark completed") are ignored
+            JobRecord.objects.create(job=job, time_start=start, time_end=start, quantity_produced=2)
+
+        self.assertEqual(production_estimator.stats(self.branch.pk, self.service.pk)["count"], 5)
+        self.assertEqual(job.compute_expected_minutes(), 8)
+
+    def test_start_then_complete_via_api_feeds_estimates(self):
+        job = Job.objects.create(branch=self.branch, service=self.service, customer_name="C", quantity=2)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        self.assertEqual(client.post(f"/api/jobs/jobs/{job.pk}/start/").status_code, 200)
+        job.refresh_from_db()
+        self.assertIsNotNone(job.started_at)
+        Job.objects.filter(pk=job.pk).update(started_at=job.started_at - timedelta(minutes=16))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.post(f"/api/jobs/jobs/{job.pk}/complete/").status_code, 200)
+
+        stats = production_estimator.stats(self.branch.pk, self.service.pk)
+        self.assertEqual(stats["count"], 1)
+        self.assertAlmostEqual(stats["mean"], 8.0, delta=0.1)
+
+    def test_backfill_command_rebuilds_from_history(self):
+        job = Job.objects.create(branch=self.branch, service=self.service, customer_name="C", quantity=1)
+        start = timezone.now() - timedelta(days=1)
+        JobRecord.objects.bulk_create([
+            JobRecord(job=job, time_start=start, time_end=start + timedelta(minutes=3 + i % 2), quantity_produced=1)
+            for i in range(20)
+        ])
+
+        call_command("backfill_production_estimates", stdout=StringIO())
+        call_command("backfill_production_estimates", stdout=StringIO())
+
+        meta = ServiceType.objects.get(pk=self.service.pk).meta
+        self.assertEqual(meta[META_KEY]["all"]["count"], 20)
+        self.assertAlmostEqual(meta[META_KEY]["all"]["mean"], 3.5, places=3)
@@ -0,0 +1,166 @@
+# jobs/tests/test_eventchain.py
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+import hashlib
+import math
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import TestCase, SimpleTestCase
+from django.utils import timezone
+
+from jobs.eventchain import (
+    GENESIS_HASH, SEAL_EVENT, event_chain, link, locate_divergence, merkle_levels, merkle_root,
+)
+from jobs.hq_ingest import ingest_batch
+from jobs.models import DaySheet, DaySheetChainSeal, EventChainHead, ShadowLogEvent
+from jobs.outbox import event_to_wire
+from jobs.services import BaseService, PINVerifier, anomaly_service
+from jobs.tests.factories import make_branch
+
+
+class MerkleTest(SimpleTestCase):
+
+    def setUp(self):
+        self.leaves = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(1001)]
+
+    def test_single_changed_leaf_is_found_in_log_n(self):
+        expected = merkle_levels(self.leaves)
+        for bad in (0, 500, 1000):
+            tampered = list(self.leaves)
+            tampered[bad] = "f" * 64
+            idx, comparisons = locate_divergence(expected, merkle_levels(tampered))
+            self.assertEqual(idx, bad)
+            self.assertLessEqual(comparisons, math.ceil(math.log2(len(self.leaves))) + 1)
+
+    def test_equal_trees(self):
+        levels = merkle_levels(self.leaves)
+        self.assertEqual(locate_divergence(levels, levels), (None, 1))
+        self.assertNotEqual(merkle_root(self.leaves), merkle_root(self.leaves[:-1]))
+
+
+class EventChainTest(TestCase):
+
+    def setUp(self):
+        self.branch = make_branch()
+        self.other = make_branch()
+        self.sheet = DaySheet.objects.create(branch=self.branch, date=timezone.localdate())
+        self.service = BaseService()
+
+    def emit(self, branch, n):
+        with self.captureOnCommitCallbacks(execute=True):
+            events = [
+                self.service._create_shadow_event("JOB_ATTACHED", branch.pk, actor={"user_id": 1}, payload={"seq": i, "amount": 2.5})
+                for i in range(n)
+            ]
+        return list(ShadowLogEvent.objects.filter(pk__in=[e.pk for e in events]).order_by("id"))
+
+    def test_events_are_linked_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                event = self.service._create_shadow_event("JOB_ATTACHED", self.branch.pk, actor={}, payload={})
+            self.assertFalse(EventChainHead.objects.exists())
+        event.refresh_from_db()
+        self.assertIsNone(event.chain_seq)
+        self.assertTrue(event.content_hash)
+
+        for callback in callbacks:
+            callback()
+        event.refresh_from_db()
+        self.assertEqual((event.chain_seq, event.prev_hash), (1, GENESIS_HASH))
+        self.assertEqual(event_chain.link_pending(), 0)
+
+    def test_events_are_chained_per_branch(self):
+        a = self.emit(self.branch, 3)
+        b = self.emit(self.other, 2)
+        self.assertEqual([e.chain_seq for e in a], [1, 2, 3])
+        self.assertEqual([e.chain_seq for e in b], [1, 2])
+        self.assertEqual(a[0].prev_hash, GENESIS_HASH)
+        self.assertEqual(a[1].prev_hash, a[0].chain_hash)
+        self.assertEqual(a[1].chain_hash, link(a[0].chain_hash, a[1].content_hash))
+
+    def test_sealed_day_verifies_with_one_root_comparison(self):
+        self.emit(self.branch, 7)
+        seal = event_chain.seal_daysheet(self.sheet)
+        self.assertEqual((seal.first_seq, seal.last_seq, seal.leaf_count), (1, 7, 7))
+        self.assertEqual(event_chain.seal_daysheet(self.sheet).pk, seal.pk)
+
+        with self.assertNumQueries(1):
+            result = event_chain.verify_seal(seal)
+        self.assertTrue(result["ok"])
+        self.assertEqual(result["comparisons"], 1)
+
+        # the next day starts after this seal
+        self.emit(self.branch, 2)
+        tomorrow = DaySheet.objects.create(branch=self.branch, date=timezone.localdate() + timedelta(days=1))
+        self.assertEqual(event_chain.seal_daysheet(tomorrow).first_seq, 8)
+
+    def test_tampered_record_is_located(self):
+        events = self.emit(self.branch, 20)
+        seal = event_chain.seal_daysheet(self.sheet)
+
+        ShadowLogEvent.objects.filter(pk=events[13].pk).update(payload={"seq": 13, "amount": 0})
+        result = event_chain.verify_seal(seal)
+        self.assertFalse(result["ok"])
+        self.assertEqual(result["reason"], "event content modified")
+        self.assertEqual(result["tampered_seq"], 14)
+        self.assertLessEqual(result["comparisons"], 7)
+
+        ShadowLogEvent.objects.filter(pk=events[13].pk).update(content_hash="0" * 64)
+        self.assertEqual(event_chain.verify_seal(seal)["reason"], "stored hashes rewritten")
+
+        ShadowLogEvent.objects.filter(pk=events[4].pk).delete()
+        result = event_chain.verify_seal(seal)
+        self.assertEqual((result["reason"], result["tampered_seq"]), ("missing or extra events", 5))
+
+    def test_day_close_seals_and_sends_root(self):
+        self.emit(self.branch, 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            anomaly_service.auto_close_daysheet_if_needed(self.sheet)
+
+        seal = DaySheetChainSeal.objects.get(daysheet=self.sheet)
+        sent = ShadowLogEvent.objects.get(event_type=SEAL_EVENT)
+        self.assertEqual(sent.payload["merkle_root"], seal.merkle_root)
+        # the DAY_AUTO_CLOSED event is inside the sealed range, the seal event after it
+        self.assertEqual(seal.last_seq, 4)
+        self.assertEqual(sent.chain_seq, 5)
+
+    def test_hq_copy_verifies_against_received_seal(self):
+        self.emit(self.branch, 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            anomaly_service.auto_close_daysheet_if_needed(self.sheet)
+        wire = [event_to_wire(e) for e in ShadowLogEvent.objects.order_by("id")]
+        self.assertTrue(all(a["ok"] for a in ingest_batch(wire, secret="")))
+
+        out = StringIO()
+        call_command("verify_event_chain", ingested=True, workers=1, stdout=out)
+        self.assertIn("1 sealed day(s) across 1 branch(es); 0 failed", out.getvalue())
+
+    def test_command_reports_tampering(self):
+        events = self.emit(self.branch, 4)
+        self.emit(self.other, 2)
+        event_chain.seal_daysheet(self.sheet)
+        event_chain.seal_daysheet(DaySheet.objects.create(branch=self.other, date=timezone.localdate()))
+
+        call_command("verify_event_chain", workers=1, stdout=StringIO())
+
+        ShadowLogEvent.objects.filter(pk=events[2].pk).update(event_type="JOB_DELETED")
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "1 failed"):
+            call_command("verify_event_chain", workers=1, stdout=out)
+        self.assertIn("first bad seq 3", out.getvalue())
+
+
+class PINHashTest(SimpleTestCase):
+
+    def test_django_hasher_pin_hash(self):
+        user = SimpleNamespace(pin_hash=make_password("4321"))
+        self.assertTrue(PINVerifier().verify(user, "4321"))
+        self.assertFalse(PINVerifier().verify(user, "1234"))
+
+    def test_legacy_sha256_still_accepted(self):
+        user = SimpleNamespace(pin_hash=hashlib.sha256(b"4321").hexdigest())
+        self.assertTrue(PINVerifier().verify(user, "4321"))
@@ -0,0 +1,110 @@
+# jobs/tests/test_heartbeats.py
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from jobs.heartbeats import HeartbeatBuffer, SilentTerminalDetector, heartbeats
+from jobs.models import AnomalyFlag, DaySheet, DaySheetShift, DomainEvent, TerminalHeartbeat
+from jobs.tests.factories import make_branch, make_user
+
+
+@override_settings(HEARTBEAT_FLUSH_SECONDS=3600, HEARTBEAT_MAX_PENDING=1000, HEARTBEAT_SILENCE_SECONDS=90)
+class HeartbeatTest(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.branch = make_branch()
+        self.alice = make_user(branch=self.branch)
+        self.bob = make_user(branch=self.branch)
+        self.buffer = HeartbeatBuffer()
+        self.detector = SilentTerminalDetector()
+        self.sheet = DaySheet.objects.create(branch=self.branch, date=timezone.localdate())
+
+    def shift(self, user, start):
+        return DaySheetShift.objects.create(daysheet=self.sheet, user=user, shift_start=start)
+
+    def test_pings_stay_in_memory_until_flush(self):
+        for seconds in (0, 5, 10):
+            self.assertFalse(self.buffer.ping(self.branch.pk, self.alice.pk, "till-1", at=self.now + timedelta(seconds=seconds)))
+        self.buffer.ping(self.branch.pk, self.bob.pk, "till-2", at=self.now)
+        self.assertFalse(TerminalHeartbeat.objects.exists())
+
+        with self.assertNumQueries(4):  # savepoint, insert, guarded update, release
+            self.assertEqual(self.buffer.flush(), 2)
+        row = TerminalHeartbeat.objects.get(user=self.alice)
+        self.assertEqual((row.first_seen, row.last_seen), (self.now, self.now + timedelta(seconds=10)))
+
+        self.buffer.ping(self.branch.pk, self.alice.pk, "till-1", at=self.now + timedelta(seconds=20))
+        self.buffer.flush()
+        row.refresh_from_db()
+        self.assertEqual((row.first_seen, row.last_seen), (self.now, self.now + timedelta(seconds=20)))
+        self.assertEqual(TerminalHeartbeat.objects.count(), 2)
+
+    def test_older_flush_never_moves_last_seen_back(self):
+        other_process = HeartbeatBuffer()
+        self.buffer.ping(self.branch.pk, self.alice.pk, "till-1", at=self.now + timedelta(seconds=30))
+        other_process.ping(self.branch.pk, self.alice.pk, "till-1", at=self.now)
+        self.buffer.flush()
+        other_process.flush()
+
+        row = TerminalHeartbeat.objects.get()
+        self.assertEqual(row.last_seen, self.now + timedelta(seconds=30))
+
+    def test_flush_when_interval_or_size_reached(self):
+        with override_settings(HEARTBEAT_MAX_PENDING=2):
+            self.assertFalse(self.buffer.ping(self.branch.pk, self.alice.pk, "a"))
+            self.assertTrue(self.buffer.ping(self.branch.pk, self.bob.pk, "b"))
+        self.assertEqual(self.buffer.pending(), 0)
+        with override_settings(HEARTBEAT_FLUSH_SECONDS=0):
+            self.assertTrue(self.buffer.ping(self.branch.pk, self.alice.pk, "a"))
+        self.assertEqual(TerminalHeartbeat.objects.count(), 2)
+
+    def test_detects_silent_terminals_once_per_episode(self):
+        self.shift(self.alice, self.now - timedelta(hours=2))
+        self.shift(self.bob, self.now - timedelta(hours=2))
+        self.shift(make_user(branch=self.branch), self.now - timedelta(hours=2))  # never pinged: not judged
+        self.buffer.ping(self.branch.pk, self.alice.pk, "till-1", at=self.now - timedelta(minutes=5))
+        self.buffer.ping(self.branch.pk, self.bob.pk, "till-2", at=self.now - timedelta(seconds=30))
+        self.buffer.flush()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.detector.detect(now=self.now)
+        self.assertEqual(result, {"open_shifts": 3, "monitored": 2, "silent": 1, "flagged": 1})
+        flag = AnomalyFlag.objects.get()
+        self.assertEqual((flag.flag_type, flag.severity), (AnomalyFlag.TYPE_TERMINAL_SILENT, AnomalyFlag.SEV_MEDIUM))
+        self.assertEqual(flag.shift.user, self.alice)
+        self.assertEqual(DomainEvent.objects.get(event_type="ANOMALY_FLAGGED").payload["source"], "heartbeat")
+
+        self.assertEqual(self.detector.detect(now=self.now + timedelta(seconds=30))["flagged"], 0)
+
+        later = self.now + timedelta(minutes=5)
+        result = self.detector.detect(now=later)  # bob went quiet too: whole branch dark
+        self.assertEqual(result["flagged"], 1)
+        self.assertEqual(AnomalyFlag.objects.latest("pk").severity, AnomalyFlag.SEV_HIGH)
+
+    def test_heartbeat_from_before_the_shift_is_ignored(self):
+        self.buffer.ping(self.branch.pk, self.alice.pk, "till-1", at=self.now - timedelta(hours=3))
+        self.buffer.flush()
+        self.shift(self.alice, self.now - timedelta(hours=1))
+        self.assertEqual(self.detector.detect(now=self.now)["monitored"], 0)
+        self.assertFalse(AnomalyFlag.objects.exists())
+
+    def test_endpoint(self):
+        heartbeats.clear()
+        self.addCleanup(heartbeats.clear)
+        client = APIClient()
+        client.force_authenticate(self.alice)
+
+        with self.assertNumQueries(0):
+            response = client.post("/api/jobs/heartbeat/", {"device_id": "till-1"}, format="json")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(heartbeats.pending(), 1)
+        heartbeats.flush()
+        self.assertEqual(TerminalHeartbeat.objects.get().device_id, "till-1")
+
+        client.force_authenticate(make_user())
+        self.assertEqual(client.post("/api/jobs/heartbeat/").status_code, 400)
+        client.force_authenticate(None)
+        self.assertIn(client.post("/api/jobs/heartbeat/").status_code, (401, 403))
@@ -0,0 +1,156 @@
+# jobs/tests/test_hq_ingest.py
+from io import StringIO
+import gzip
+import hashlib
+import hmac
+import uuid
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from jobs.models import IngestedShadowEvent, ShadowLogEvent
+from jobs.outbox import HttpHQClient, OutboxDispatcher, canonical_json, sign_payload, signing_secret
+from jobs.services import BaseService
+
+SECRET = "hq-secret"
+URL = "/api/jobs/hq/ingest/"
+BRANCH_KEYS = {str(b): f"key-{b}" for b in range(50)}
+
+
+def key(branch_id):
+    return BRANCH_KEYS[str(branch_id)]
+
+
+def make_event(branch_id="1", seq=0, secret=None, **overrides):
+    secret = key(branch_id) if secret is None else secret
+    payload = {"seq": seq}
+    event = {
+        "uuid": str(uuid.uuid4()),
+        "event_type": "SHIFT_STARTED",
+        "branch_id": branch_id,
+        "source": {},
+        "actor": {"user_id": 1},
+        "timestamp": timezone.now().isoformat(),
+        "payload": payload,
+        "signature": sign_payload(payload, secret),
+    }
+    event.update(overrides)
+    return event
+
+
+@override_settings(SHADOW_EVENT_SIGNING_SECRET=SECRET, SHADOW_EVENT_BRANCH_SECRETS=BRANCH_KEYS)
+class HQIngestEndpointTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def post(self, events, branch_id="1", secret=None):
+        raw = canonical_json({"events": events})
+        secret = key(branch_id) if secret is None else secret
+        return self.client.generic(
+            "POST", URL, gzip.compress(raw),
+            content_type="application/json",
+            HTTP_CONTENT_ENCODING="gzip",
+            HTTP_X_OCTOS_BRANCH=branch_id,
+            HTTP_X_OCTOS_SIGNATURE=hmac.new(secret.encode(), raw, hashlib.sha256).hexdigest(),
+        )
+
+    def test_batch_is_stored_and_acked(self):
+        events = [make_event("3", seq) for seq in range(5)]
+        res = self.post(events, branch_id="3")
+        self.assertEqual(res.status_code, 200, res.content)
+        acks = res.json()["acks"]
+        self.assertEqual([a["uuid"] for a in acks], [e["uuid"] for e in events])
+        self.assertTrue(all(a["ok"] and a["received_at"] and a["processed_at"] for a in acks))
+        self.assertEqual(IngestedShadowEvent.objects.count(), 5)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        counts = []
+        # 60 rows stay inside sqlite's bind-parameter limit (one INSERT)
+        for size in (5, 60):
+            events = [make_event("4", i) for i in range(size)]
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.post(events, branch_id="4").status_code, 200)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(IngestedShadowEvent.objects.count(), 65)
+
+    def test_a_branch_key_cannot_speak_for_another_branch(self):
+        forged = make_event("2", 0, secret=key("1"))
+        acks = self.post([make_event("1", 0), forged], branch_id="1").json()["acks"]
+        self.assertEqual([a["ok"] for a in acks], [True, False])
+        self.assertEqual(acks[1]["error"], "event branch does not match the signing branch")
+
+        # claiming to be branch 2 needs branch 2's key
+        self.assertEqual(self.post([forged], branch_id="2", secret=key("1")).status_code, 403)
+        self.assertEqual(self.post([make_event("1", 1)], branch_id="", secret=SECRET).status_code, 400)
+        self.assertEqual(self.post([make_event("99", 0, secret=SECRET)], branch_id="99", secret=SECRET).status_code, 403)
+        self.assertEqual(list(IngestedShadowEvent.objects.values_list("branch_id", flat=True)), ["1"])
+
+    def test_redelivery_is_deduplicated(self):
+        events = [make_event("1", i) for i in range(3)]
+        first = self.post(events).json()["acks"]
+        again = self.post(events).json()["acks"]
+        self.assertEqual(IngestedShadowEvent.objects.count(), 3)
+        self.assertTrue(all(a["ok"] and a.get("duplicate") for a in again))
+        self.assertEqual([a["received_at"] for a in again], [a["received_at"] for a in first])
+
+    def test_bad_event_signature_halts_the_branch(self):
+        events = [
+            make_event("1", 0),
+            make_event("1", 1, secret="wrong"),
+            make_event("1", 2),
+        ]
+        acks = self.post(events).json()["acks"]
+        self.assertEqual([a["ok"] for a in acks], [True, False, False])
+        self.assertEqual(acks[1]["error"], "bad signature")
+        self.assertEqual(list(IngestedShadowEvent.objects.values_list("branch_id", flat=True)), ["1"])
+
+    def test_bad_batch_signature_is_rejected(self):
+        res = self.post([make_event()], secret="nope")
+        self.assertEqual(res.status_code, 403)
+        self.assertFalse(IngestedShadowEvent.objects.exists())
+
+    @override_settings(SHADOW_EVENT_BRANCH_SECRETS={})
+    def test_requires_configured_branch_keys(self):
+        self.assertEqual(self.post([make_event()]).status_code, 503)
+
+    @override_settings(HQ_INGEST_MAX_BYTES=200)
+    def test_oversized_batch_is_rejected(self):
+        res = self.post([make_event(seq=i) for i in range(10)])
+        self.assertEqual(res.status_code, 413)
+
+    def test_outbox_round_trip(self):
+        test_client = self.client
+
+        class EndpointClient(HttpHQClient):
+            def _post(self, branch_id, events):
+                raw = canonical_json({"events": events})
+                return test_client.generic(
+                    "POST", URL, raw, content_type="application/json",
+                    HTTP_X_OCTOS_BRANCH=branch_id,
+                    HTTP_X_OCTOS_SIGNATURE=hmac.new(signing_secret(branch_id).encode(), raw, hashlib.sha256).hexdigest(),
+                ).json()
+
+        service = BaseService()
+        for i in range(4):
+            service._create_shadow_event("SHIFT_STARTED", 7, actor=None, payload={"seq": i})
+            service._create_shadow_event("SHIFT_STARTED", 8, actor=None, payload={"seq": i})
+
+        result = OutboxDispatcher(client=EndpointClient(url=URL)).dispatch_once()
+        self.assertEqual(result["delivered"], 8)
+        self.assertEqual(
+            set(IngestedShadowEvent.objects.values_list("uuid", flat=True)),
+            set(ShadowLogEvent.objects.values_list("uuid", flat=True)),
+        )
+
+    def test_load_test_command(self):
+        out = StringIO()
+        call_command("load_test_hq_ingest", events=300, branches=20, batch_size=50, redeliver=0.5, stdout=out)
+        self.assertIn("rows stored            300", out.getvalue())
+        self.assertIn("events acked           450", out.getvalue())
+        self.assertFalse(IngestedShadowEvent.objects.exists())
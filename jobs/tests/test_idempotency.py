@@ -0,0 +1,132 @@
+# jobs/tests/test_idempotency.py
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from jobs import idempotency
+from jobs.models import Job, JobRecord, DomainEvent, IdempotencyKey
+from jobs.daysheet_cache import daysheet_cache
+from jobs.pricing import pricing_index
+from jobs.services import job_service
+from jobs.tests.factories import make_branch, make_user, make_service
+
+
+class InstantJobIdempotencyTest(TestCase):
+
+    def setUp(self):
+        pricing_index.invalidate()
+        daysheet_cache.clear()
+        self.branch = make_branch()
+        self.user = make_user(branch=self.branch)
+        self.svc = make_service(price="5.00")
+
+    def _create(self, key, quantity=2):
+        return job_service.create_instant_job(
+            branch_id=self.branch.pk,
+            service_id=self.svc.pk,
+            quantity=quantity,
+            created_by=self.user,
+            idempotency_key=key,
+        )
+
+    def test_replay_returns_same_job_without_side_effects(self):
+        first = self._create("k-1")
+        logs_before = DomainEvent.objects.count()
+        with self.assertNumQueries(2):  # key lookup + job fetch
+            second = self._create("k-1")
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.count(), 1)
+        self.assertEqual(JobRecord.objects.count(), 1)
+        self.assertEqual(DomainEvent.objects.count(), logs_before)
+
+    def test_key_reused_with_different_payload_is_rejected(self):
+        self._create("k-2")
+        with self.assertRaises(idempotency.IdempotencyKeyReused):
+            self._create("k-2", quantity=5)
+
+    def test_expired_keys_are_purged_and_reusable(self):
+        self._create("k-3")
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(idempotency.purge_expired(), 1)
+        self._create("k-3")
+        self.assertEqual(Job.objects.count(), 2)
+
+
+class JobAPIIdempotencyTest(TestCase):
+
+    def setUp(self):
+        pricing_index.invalidate()
+        daysheet_cache.clear()
+        self.branch = make_branch()
+        self.user = make_user(branch=self.branch)
+        self.svc = make_service(price="5.00")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_create_replays_stored_response(self):
+        body = {"branch": self.branch.pk, "service": self.svc.pk, "quantity": 1, "type": "instant"}
+        r1 = self.client.post("/api/jobs/jobs/", body, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+        r2 = self.client.post("/api/jobs/jobs/", body, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertEqual(r1.status_code, 201, r1.content)
+        self.assertEqual(r2.status_code, 201)
+        self.assertEqual(r1.json()["id"], r2.json()["id"])
+        self.assertEqual(r2["Idempotent-Replayed"], "true")
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_complete_retry_is_not_an_error(self):
+        job = Job.objects.create(branch=self.branch, service=self.svc, customer_name="Esi", total_amount=5)
+        url = f"/api/jobs/jobs/{job.pk}/complete/"
+        r1 = self.client.post(url, HTTP_IDEMPOTENCY_KEY="c-1")
+        r2 = self.client.post(url, HTTP_IDEMPOTENCY_KEY="c-1")
+        self.assertEqual(r1.status_code, 200)
+        self.assertEqual(r2.status_code, 200)
+        self.assertEqual(JobRecord.objects.filter(job=job).count(), 1)
+
+    def test_key_in_flight_returns_conflict(self):
+        job = Job.objects.create(branch=self.branch, service=self.svc, customer_name="Esi")
+        idempotency.claim(f"job.start:{job.pk}", "busy", user=self.user)
+        res = self.client.post(f"/api/jobs/jobs/{job.pk}/start/", HTTP_IDEMPOTENCY_KEY="busy")
+        self.assertEqual(res.status_code, 409)
+
+    def test_abandoned_claim_is_taken_over_after_its_lease(self):
+        job = Job.objects.create(branch=self.branch, service=self.svc, customer_name="Esi")
+        stale, _ = idempotency.claim(f"job.start:{job.pk}", "lost", user=self.user)
+        IdempotencyKey.objects.filter(pk=stale.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        with self.assertLogs("jobs.idempotency", "WARNING"):
+            res = self.client.post(f"/api/jobs/jobs/{job.pk}/start/", HTTP_IDEMPOTENCY_KEY="lost")
+        self.assertEqual(res.status_code, 200, res.content)
+        self.assertEqual(IdempotencyKey.objects.get(pk=stale.pk).status, IdempotencyKey.STATUS_COMPLETED)
+
+        # the worker that lost the key cannot release the new owner's claim
+        idempotency.release(stale)
+        self.assertTrue(IdempotencyKey.objects.filter(pk=stale.pk).exists())
+
+    def test_failed_complete_rolls_back_the_view(self):
+        job = Job.objects.create(branch=self.branch, service=self.svc, customer_name="Esi")
+        with mock.patch("jobs.idempotency.complete", side_effect=RuntimeError("db gone")), \
+                self.assertLogs("django.request", "ERROR"):
+            with self.assertRaises(RuntimeError):
+                self.client.post(f"/api/jobs/jobs/{job.pk}/start/", HTTP_IDEMPOTENCY_KEY="rb")
+        job.refresh_from_db()
+        self.assertEqual(job.status, "queued")
+        self.assertFalse(IdempotencyKey.objects.filter(key="rb").exists())
+
+    def test_claim_taken_over_mid_request_is_rolled_back(self):
+        job = Job.objects.create(branch=self.branch, service=self.svc, customer_name="Esi")
+        real_complete = idempotency.complete
+
+        def lose_lease(record, **kwargs):
+            # a retry took the key over while this request was still running
+            IdempotencyKey.objects.filter(pk=record.pk).update(locked_until=timezone.now() + timedelta(minutes=5))
+            return real_complete(record, **kwargs)
+
+        with mock.patch("jobs.idempotency.complete", side_effect=lose_lease):
+            res = self.client.post(f"/api/jobs/jobs/{job.pk}/start/", HTTP_IDEMPOTENCY_KEY="slow")
+        self.assertEqual(res.status_code, 409)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "queued")
+        self.assertEqual(IdempotencyKey.objects.get(key="slow").status, IdempotencyKey.STATUS_IN_PROGRESS)
@@ -0,0 +1,219 @@
+# jobs/tests/test_outbox.py
+from datetime import timedelta
+from io import StringIO
+import hashlib
+import hmac
+import random
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import ShadowLogEvent
+from jobs.outbox import HttpHQClient, OutboxDispatcher, canonical_json, sign_payload
+from jobs.services import BaseService
+from jobs.tests.hq_standin import HQStandIn
+
+
+class OutboxFixtureMixin:
+
+    def setUp(self):
+        self.hq = HQStandIn().start()
+        self.addCleanup(self.hq.stop)
+        self.service = BaseService()
+        self.now = timezone.now()
+
+    def emit(self, branch_id, n=1, event_type="SHIFT_STARTED"):
+        return [
+            self.service._create_shadow_event(event_type, branch_id, actor={"user_id": 1}, payload={"seq": i})
+            for i in range(n)
+        ]
+
+    def dispatcher(self, **kwargs):
+        kwargs.setdefault("client", HttpHQClient(url=self.hq.url, secret=""))
+        kwargs.setdefault("rng", random.Random(1))
+        return OutboxDispatcher(**kwargs)
+
+
+class OutboxWriteTest(TestCase):
+
+    def test_event_is_written_pending_without_calling_hq(self):
+        class ExplodingClient:
+            def deliver(self, *a, **kw):
+                raise AssertionError("no inline delivery")
+
+        ev = BaseService(hq_client=ExplodingClient())._create_shadow_event("X", 3, None, {"a": 1})
+        self.assertEqual(ev.delivery_status, ShadowLogEvent.DELIVERY_PENDING)
+        self.assertIsNone(ev.sent_at)
+        self.assertEqual(ev.signature, "")
+
+    @override_settings(SHADOW_EVENT_SIGNING_SECRET="s3cret")
+    def test_payload_is_signed(self):
+        ev = BaseService()._create_shadow_event("X", 3, None, {"b": 2, "a": 1})
+        expected = hmac.new(b"s3cret", b'{"a":1,"b":2}', hashlib.sha256).hexdigest()
+        self.assertEqual(ev.signature, expected)
+        self.assertEqual(sign_payload({"a": 1, "b": 2}, "s3cret"), expected)
+
+
+class OutboxDispatcherTest(OutboxFixtureMixin, TestCase):
+
+    def test_batches_many_events_per_call(self):
+        self.emit("1", 30)
+        self.emit("2", 20)
+        result = self.dispatcher(batch_size=100).dispatch_once(now=self.now)
+
+        self.assertEqual(result["delivered"], 50)
+        # one request per branch, each signed with that branch's key
+        self.assertEqual(self.hq.calls, 2)
+        self.assertEqual(sorted(len(batch) for batch in self.hq.batches), [20, 30])
+        self.assertFalse(ShadowLogEvent.objects.exclude(delivery_status=ShadowLogEvent.DELIVERY_DELIVERED).exists())
+        self.assertFalse(ShadowLogEvent.objects.filter(sent_at__isnull=True).exists())
+
+    def test_batch_is_gzipped_and_signed(self):
+        self.emit("1", 2)
+        self.dispatcher(client=HttpHQClient(url=self.hq.url, secret="k")).dispatch_once(now=self.now)
+        headers = self.hq.headers[0]
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        raw = canonical_json({"events": self.hq.batches[0]})
+        self.assertEqual(headers["X-Octos-Signature"], hmac.new(b"k", raw, hashlib.sha256).hexdigest())
+
+    @override_settings(SHADOW_EVENT_SIGNING_SECRET="shared", SHADOW_EVENT_BRANCH_SECRETS={"1": "k1"})
+    def test_each_branch_signs_with_its_own_key(self):
+        self.emit("1", 1)
+        self.emit("2", 1)
+        self.dispatcher(client=HttpHQClient(url=self.hq.url)).dispatch_once(now=self.now)
+
+        for headers, batch in zip(self.hq.headers, self.hq.batches):
+            branch = headers["X-Octos-Branch"]
+            self.assertEqual([e["branch_id"] for e in batch], [branch])
+            expected_key = {"1": "k1", "2": "shared"}[branch]
+            raw = canonical_json({"events": batch})
+            self.assertEqual(headers["X-Octos-Signature"], hmac.new(expected_key.encode(), raw, hashlib.sha256).hexdigest())
+            self.assertEqual(batch[0]["signature"], sign_payload(batch[0]["payload"], expected_key))
+
+    def test_per_branch_order_is_kept(self):
+        a = self.emit("1", 3)
+        self.emit("2", 3)
+        dispatcher = self.dispatcher(batch_size=100)
+        self.hq.fail_uuids.add(str(a[1].uuid))
+
+        result = dispatcher.dispatch_once(now=self.now)
+        self.assertEqual((result["delivered"], result["retry"], result["deferred"]), (4, 1, 1))
+
+        statuses = {e.pk: (e.delivery_status, e.attempts) for e in ShadowLogEvent.objects.all()}
+        self.assertEqual(statuses[a[0].pk], ("delivered", 1))
+        self.assertEqual(statuses[a[1].pk], ("pending", 1))
+        self.assertEqual(statuses[a[2].pk], ("pending", 0))
+
+        # branch 1 is blocked until its oldest event is due again
+        self.assertEqual(dispatcher.dispatch_once(now=self.now)["claimed"], 0)
+
+        self.hq.fail_uuids.clear()
+        later = self.now + timedelta(hours=2)
+        self.assertEqual(dispatcher.dispatch_once(now=later)["delivered"], 2)
+        order = [e["payload"]["seq"] for e in self.hq.received.values() if e["branch_id"] == "1"]
+        self.assertEqual(order, [0, 1, 2])
+
+    def test_backing_off_branch_does_not_starve_others(self):
+        (head,) = self.emit("1")
+        self.emit("1", 20)
+        later = self.emit("2", 2)
+        dispatcher = self.dispatcher(batch_size=4)
+        ShadowLogEvent.objects.filter(pk=head.pk).update(attempts=1, next_attempt_at=self.now + timedelta(hours=1))
+
+        claimed = dispatcher.claim(now=self.now)
+        self.assertEqual([e.pk for e in claimed], [e.pk for e in later])
+
+    def test_failed_event_parks_its_branch_until_requeued(self):
+        a = self.emit("1", 2)
+        self.emit("2")
+        dispatcher = self.dispatcher(max_attempts=1)
+        self.hq.fail_uuids.add(str(a[0].uuid))
+
+        self.assertEqual(dispatcher.dispatch_once(now=self.now)["failed"], 1)
+        later = self.now + timedelta(hours=2)
+        self.assertEqual(dispatcher.dispatch_once(now=later)["claimed"], 0)
+        self.assertEqual(ShadowLogEvent.objects.get(pk=a[1].pk).delivery_status, "pending")
+
+        self.hq.fail_uuids.clear()
+        out = StringIO()
+        with override_settings(HQ_INGEST_URL=self.hq.url):
+            call_command("dispatch_shadow_events", "--requeue-failed", "1", stdout=out)
+        self.assertIn("Requeued 1 failed event(s).", out.getvalue())
+        order = [e["payload"]["seq"] for e in self.hq.received.values() if e["branch_id"] == "1"]
+        self.assertEqual(order, [0, 1])
+
+    def test_call_failure_backs_off_exponentially(self):
+        (ev,) = self.emit("1")
+        dispatcher = self.dispatcher(retry_base_seconds=10, retry_max_seconds=1000, max_attempts=3)
+        self.hq.fail_next_calls = 5
+
+        now = self.now
+        delays = []
+        for _ in range(2):
+            self.assertEqual(dispatcher.dispatch_once(now=now)["retry"], 1)
+            ev.refresh_from_db()
+            delays.append((ev.next_attempt_at - now).total_seconds())
+            self.assertIn("HTTPError", ev.last_error)
+            now = ev.next_attempt_at
+        self.assertTrue(5 <= delays[0] <= 10, delays)
+        self.assertTrue(10 <= delays[1] <= 20, delays)
+
+    def test_outage_never_fails_events(self):
+        (ev,) = self.emit("1")
+        dispatcher = self.dispatcher(retry_base_seconds=10, retry_max_seconds=60, max_attempts=3)
+        self.hq.fail_next_calls = 6
+
+        now = self.now
+        for _ in range(6):
+            self.assertEqual(dispatcher.dispatch_once(now=now)["retry"], 1)
+            ev.refresh_from_db()
+            self.assertLessEqual((ev.next_attempt_at - now).total_seconds(), 60)
+            now = ev.next_attempt_at
+        self.assertEqual((ev.delivery_status, ev.attempts), ("pending", 6))
+
+        self.assertEqual(dispatcher.dispatch_once(now=now)["delivered"], 1)
+
+    def test_rejected_branch_fails_alone(self):
+        (bad,) = self.emit("3")
+        good = self.emit("1", 2)
+        dispatcher = self.dispatcher(max_attempts=1)
+        self.hq.reject_branches.add("3")
+
+        result = dispatcher.dispatch_once(now=self.now)
+        self.assertEqual((result["delivered"], result["failed"]), (2, 1))
+        bad.refresh_from_db()
+        self.assertEqual(bad.delivery_status, "failed")
+        self.assertIn("HTTP 403", bad.last_error)
+        self.assertEqual(
+            set(ShadowLogEvent.objects.filter(pk__in=[e.pk for e in good]).values_list("delivery_status", flat=True)),
+            {"delivered"},
+        )
+
+    def test_leased_events_are_not_claimed_twice(self):
+        self.emit("1", 2)
+        self.emit("2", 2)
+        first = self.dispatcher(batch_size=100)
+        claimed = first.claim(now=self.now)
+        self.assertEqual(len(claimed), 4)
+        self.assertEqual(self.dispatcher().claim(now=self.now), [])
+
+        # an expired lease is claimable again
+        later = self.now + timedelta(seconds=first.lease_seconds + 1)
+        self.assertEqual(len(self.dispatcher().claim(now=later)), 4)
+
+    def test_latency_and_batches_via_command(self):
+        self.hq.latency = 0.02
+        self.emit("1", 7)
+        with override_settings(HQ_INGEST_URL=self.hq.url, SHADOW_OUTBOX_BATCH_SIZE=3):
+            out = StringIO()
+            call_command("dispatch_shadow_events", stdout=out)
+        self.assertEqual(self.hq.calls, 3)
+        self.assertEqual(len(self.hq.received), 7)
+        self.assertIn("Delivered 7", out.getvalue())
+
+    def test_stub_client_marks_delivered(self):
+        self.emit("1", 2)
+        result = OutboxDispatcher().dispatch_once(now=self.now)
+        self.assertEqual(result["delivered"], 2)
+        self.assertEqual(self.hq.calls, 0)
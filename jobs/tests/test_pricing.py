@@ -0,0 +1,91 @@
+# jobs/tests/test_pricing.py
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from jobs.models import CacheVersion
+from jobs.pricing import PricingIndex
+from jobs.services import job_service
+from jobs.tests.factories import make_service, make_rule
+
+A4_COLOR = dict(paper_size="A4", print_mode="printout", color_mode="color", side_mode="single")
+
+
+class PricingIndexTest(TestCase):
+
+    def setUp(self):
+        self.index = PricingIndex(check_interval=0)
+        self.print_svc = make_service(code="A4_PRINT", price="1.00")
+        make_rule(self.print_svc, "2.50", **A4_COLOR)
+        self.flat_svc = make_service(price="3.00")
+        make_rule(self.flat_svc, "20.00", pricing_type="flat")
+        self.plain_svc = make_service(price="7.00")
+
+    def test_resolution_order_matches_db_path(self):
+        self.assertEqual(self.index.resolve(service=self.print_svc, **A4_COLOR), Decimal("2.50"))
+        self.assertEqual(self.index.resolve(service=self.flat_svc), Decimal("20.00"))
+        self.assertEqual(self.index.resolve(service=self.plain_svc), Decimal("7.00"))
+        # unknown variant of a print service falls back to its base price
+        self.assertEqual(
+            self.index.resolve(service=self.print_svc, paper_size="A3", print_mode="printout", color_mode="bw", side_mode="single"),
+            Decimal("1.00"),
+        )
+
+    def test_lookups_do_not_hit_db_after_build(self):
+        self.index.resolve(service=self.plain_svc)
+        self.index._check_interval = 60
+        with self.assertNumQueries(0):
+            for _ in range(50):
+                self.index.resolve(service=self.print_svc, **A4_COLOR)
+
+    def test_counts_hits_and_misses(self):
+        self.index.resolve(service=self.print_svc, **A4_COLOR)
+        self.index.resolve(service=self.plain_svc)
+        stats = self.index.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["rebuilds"], 1)
+
+    def test_rule_save_bumps_shared_version(self):
+        self.index.resolve(service=self.print_svc, **A4_COLOR)
+        rule = self.print_svc.pricing_rules.get()
+        rule.unit_price = Decimal("3.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        # a second "worker" holding its own snapshot picks up the new token
+        self.assertEqual(self.index.resolve(service=self.print_svc, **A4_COLOR), Decimal("3.00"))
+        self.assertEqual(self.index.stats()["rebuilds"], 2)
+
+    def test_version_is_shared_through_the_database(self):
+        self.index.resolve(service=self.print_svc, **A4_COLOR)
+        other_worker = PricingIndex(check_interval=0)
+        other_worker.resolve(service=self.print_svc, **A4_COLOR)
+
+        # the per-process cache is not what carries the version
+        cache.clear()
+        self.print_svc.pricing_rules.update(unit_price=Decimal("4.00"))
+        other_worker.invalidate()
+        self.assertEqual(CacheVersion.objects.get().version, 1)
+        self.assertEqual(self.index.resolve(service=self.print_svc, **A4_COLOR), Decimal("4.00"))
+
+    def test_snapshot_is_rebuilt_after_max_age(self):
+        self.index._check_interval = 60
+        self.index.resolve(service=self.print_svc, **A4_COLOR)
+        self.print_svc.pricing_rules.update(unit_price=Decimal("5.00"))  # out of band: no bump
+        self.assertEqual(self.index.resolve(service=self.print_svc, **A4_COLOR), Decimal("2.50"))
+        with override_settings(PRICING_INDEX_MAX_AGE_SECONDS=0):
+            self.assertEqual(self.index.resolve(service=self.print_svc, **A4_COLOR), Decimal("5.00"))
+
+    def test_inactive_rules_are_ignored(self):
+        self.print_svc.pricing_rules.update(is_active=False)
+        self.index.invalidate()
+        self.assertEqual(self.index.resolve(service=self.print_svc, **A4_COLOR), Decimal("1.00"))
+
+    def test_job_service_exact_lookup_raises_on_miss(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_rule(self.plain_svc, "9.00", **A4_COLOR)
+        self.assertEqual(job_service.resolve_unit_price(service=self.plain_svc, **A4_COLOR), Decimal("9.00"))
+        with self.assertRaises(Exception):
+            job_service.resolve_unit_price(service=self.plain_svc)
+        self.assertEqual(job_service.resolve_unit_price_safe(service=self.plain_svc), Decimal("7.00"))
@@ -0,0 +1,155 @@
+# jobs/tests/test_projections.py
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from jobs.daysheet_cache import daysheet_cache
+from jobs.domain_events import domain_events
+from jobs.models import BranchSalesTotals, DailySale, DaySheet, DomainEvent, ProjectionCheckpoint
+from jobs.pricing import pricing_index
+from jobs.projections import SalesProjection, fold_sales_events
+from jobs.services import job_service
+from jobs.tests.factories import make_branch, make_service, make_user
+
+
+class FoldSalesEventsTest(TestCase):
+
+    def test_attached_and_batch_events(self):
+        totals = fold_sales_events([
+            ("1", "JOB_ATTACHED", {"total_amount": 5.5, "payment_type": "momo"}),
+            ("1", "JOB_BATCH_CREATED_INSTANT", {"job_count": 2, "total_amount": 10}),
+            ("2", "JOB_ATTACHED", {"total_amount": "1.25"}),
+            ("not-a-sheet", "JOB_ATTACHED", {"total_amount": 99}),
+        ])
+        self.assertEqual(set(totals), {1, 2})
+        self.assertEqual((totals[1].jobs, totals[1].amount), (3, Decimal("15.50")))
+        self.assertEqual(totals[1].breakdown(), {
+            "cash": {"jobs": 2, "amount": "10.00"},
+            "momo": {"jobs": 1, "amount": "5.50"},
+        })
+        self.assertEqual(totals[2].breakdown(), {"cash": {"jobs": 1, "amount": "1.25"}})
+
+
+class SalesProjectionTest(TestCase):
+
+    def setUp(self):
+        pricing_index.invalidate()
+        daysheet_cache.clear()
+        self.branch = make_branch()
+        self.user = make_user(branch=self.branch)
+        self.service = make_service(price="5.00")
+        self.projection = SalesProjection(overlap=0)
+
+    def sell(self, quantity=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            job_service.create_instant_jobs_batch(
+                branch_id=self.branch.pk,
+                lines=[{"service_id": self.service.pk, "quantity": quantity}],
+                created_by=self.user,
+            )
+        return DaySheet.objects.get(branch=self.branch)
+
+    def close(self, sheet, ago=timedelta(hours=1)):
+        DaySheet.objects.filter(pk=sheet.pk).update(
+            status=DaySheet.STATUS_BRANCH_CLOSED, closed_at=timezone.now() - ago,
+        )
+
+    def checkpoint(self):
+        return ProjectionCheckpoint.objects.get(name="sales", partition=str(self.branch.pk)).position
+
+    def test_open_sheet_is_deferred_and_checkpoint_held(self):
+        self.sell(quantity=2)
+        sheet = self.sell(quantity=1)
+        first = DomainEvent.objects.filter(event_type="JOB_BATCH_CREATED_INSTANT").earliest("id")
+
+        result = self.projection.project_branch(self.branch.pk)
+
+        self.assertEqual((result["events"], result["deferred"], result["repaired"]), (2, 1, 0))
+        self.assertEqual(self.checkpoint(), first.pk - 1)
+        totals = BranchSalesTotals.objects.get(branch=self.branch)
+        self.assertEqual((totals.total_jobs, totals.trading_days), (2, 1))
+
+        self.close(sheet)
+        result = self.projection.project_branch(self.branch.pk)
+        self.assertEqual((result["deferred"], result["repaired"]), (0, 0))
+        self.assertEqual(self.checkpoint(), DomainEvent.objects.latest("id").pk)
+        self.assertEqual(self.projection.project_branch(self.branch.pk)["events"], 0)
+
+    def test_recently_closed_sheet_waits_for_settle_delay(self):
+        sheet = self.sell(quantity=1)
+        self.close(sheet, ago=timedelta(seconds=5))
+        DaySheet.objects.filter(pk=sheet.pk).update(total_jobs=40)
+
+        self.assertEqual(self.projection.project_branch(self.branch.pk)["deferred"], 1)
+        sheet.refresh_from_db()
+        self.assertEqual(sheet.total_jobs, 40)
+
+    def test_lost_events_never_lower_committed_totals(self):
+        sheet = self.sell(quantity=2)
+        self.sell(quantity=1)
+        DomainEvent.objects.filter(event_type="JOB_BATCH_CREATED_INSTANT").latest("id").delete()  # lost at flush
+        self.close(sheet)
+
+        with self.assertLogs("jobs.projections", level="WARNING") as logs:
+            result = self.projection.project_branch(self.branch.pk)
+
+        self.assertEqual((result["event_gaps"], result["repaired"]), (1, 0))
+        self.assertIn("disagree with its jobs", logs.output[0])
+        sheet.refresh_from_db()
+        self.assertEqual((sheet.total_jobs, sheet.total_amount), (2, Decimal("15.00")))
+
+    def test_settled_sheet_repaired_from_jobs(self):
+        sheet = self.sell(quantity=1)
+        self.sell(quantity=1)
+        self.close(sheet)
+        DaySheet.objects.filter(pk=sheet.pk).update(total_jobs=40, total_amount=Decimal("1.00"))
+        DailySale.objects.filter(branch=self.branch).update(total_count=40)
+
+        with self.assertLogs("jobs.projections", level="WARNING"):
+            result = self.projection.project_branch(self.branch.pk)
+
+        self.assertEqual((result["repaired"], result["daily_sales"]), (1, 1))
+        sheet.refresh_from_db()
+        self.assertEqual((sheet.total_jobs, sheet.total_amount), (2, Decimal("10.00")))
+        sale = DailySale.objects.get(branch=self.branch)
+        self.assertEqual((sale.total_count, sale.total_amount), (2, Decimal("10.00")))
+        self.assertEqual(BranchSalesTotals.objects.get(branch=self.branch).total_jobs, 2)
+
+    def test_full_rebuild_ignores_checkpoint(self):
+        sheet = self.sell(quantity=3)
+        self.close(sheet)
+        self.projection.project_branch(self.branch.pk)
+        DaySheet.objects.filter(pk=sheet.pk).update(total_jobs=0)
+
+        self.assertEqual(self.projection.project_branch(self.branch.pk)["sheets"], 0)
+        with self.assertLogs("jobs.projections", level="WARNING"):
+            result = self.projection.project_branch(self.branch.pk, full=True)
+
+        self.assertEqual(result["repaired"], 1)
+        sheet.refresh_from_db()
+        self.assertEqual(sheet.total_jobs, 1)
+
+    def test_events_of_other_branches_are_not_projected(self):
+        other = make_branch()
+        domain_events.record(
+            "DaySheet", DaySheet.objects.create(branch=other, date=timezone.localdate()).pk, "JOB_ATTACHED",
+            {"total_amount": 3}, branch_id=other.pk, immediate=True,
+        )
+        self.sell(quantity=1)
+
+        summary = self.projection.run(branch_ids=[self.branch.pk])
+
+        self.assertEqual(summary["events"], 1)
+        self.assertTrue(BranchSalesTotals.objects.filter(branch=self.branch).exists())
+        self.assertFalse(BranchSalesTotals.objects.filter(branch=other).exists())
+
+    def test_command(self):
+        self.sell(quantity=1)
+        out = StringIO()
+        call_command("rebuild_projections", branch=[self.branch.pk], full=True, workers=1, stdout=out)
+        self.assertIn("1 branch", out.getvalue())
+        self.assertIn("1 not settled yet", out.getvalue())
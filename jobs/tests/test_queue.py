@@ -0,0 +1,244 @@
+# jobs/tests/test_queue.py
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from jobs.estimator import production_estimator
+from jobs.models import Job
+from jobs.queueing import queue_scheduler, BranchQueueScheduler
+from jobs.services import branch_service
+from jobs.tests.factories import make_branch, make_user, make_service
+
+
+class QueueFixtureMixin:
+
+    def setUp(self):
+        production_estimator.reset()
+        self.branch = make_branch()
+        self.user = make_user(branch=self.branch)
+        self.service = make_service(price="2.00", meta={"avg_minutes_per_unit": 10})
+        self.now = timezone.now().replace(microsecond=0)
+
+    def add_job(self, priority="normal", quantity=1, minutes_ago=0, enqueue=True):
+        job = Job.objects.create(
+            branch=self.branch,
+            service=self.service,
+            customer_name="Customer",
+            quantity=quantity,
+            priority=priority,
+            unit_price=Decimal("2.00"),
+        )
+        if minutes_ago:
+            Job.objects.filter(pk=job.pk).update(created_at=self.now - timedelta(minutes=minutes_ago))
+            job.refresh_from_db()
+        if enqueue:
+            queue_scheduler.enqueue(job, now=self.now)
+            job.refresh_from_db()
+        return job
+
+    def positions(self):
+        return list(
+            Job.objects.filter(branch=self.branch, queue_position__isnull=False)
+            .order_by("queue_position")
+            .values_list("pk", "queue_position", "expected_ready_at")
+        )
+
+
+# =========================================================
+# Scheduling
+# =========================================================
+class BranchQueueSchedulerTest(QueueFixtureMixin, TestCase):
+
+    def test_fifo_positions_and_cumulative_etas(self):
+        a = self.add_job(minutes_ago=3)
+        b = self.add_job(quantity=2, minutes_ago=2)
+        c = self.add_job(minutes_ago=1)
+
+        self.assertEqual(
+            self.positions(),
+            [
+                (a.pk, 1, self.now + timedelta(minutes=10)),
+                (b.pk, 2, self.now + timedelta(minutes=30)),
+                (c.pk, 3, self.now + timedelta(minutes=40)),
+            ],
+        )
+
+    def test_express_preempts_queued_but_not_in_progress(self):
+        a = self.add_job(minutes_ago=3)
+        b = self.add_job(minutes_ago=2)
+        queue_scheduler.start(a, now=self.now)
+
+        x = self.add_job(priority="express")
+        order = [pk for pk, _, _ in self.positions()]
+        self.assertEqual(order, [a.pk, x.pk, b.pk])
+
+    def test_append_writes_only_the_new_row(self):
+        self.add_job(minutes_ago=3)
+        self.add_job(minutes_ago=2)
+        job = self.add_job(enqueue=False)
+        self.assertEqual(queue_scheduler.enqueue(job, now=self.now), 1)
+        self.assertEqual(queue_scheduler.reschedule(self.branch.pk, now=self.now), 0)
+
+    def test_completion_shifts_the_suffix(self):
+        a = self.add_job(minutes_ago=3)
+        b = self.add_job(minutes_ago=2)
+        c = self.add_job(minutes_ago=1)
+
+        a.status = "completed"
+        a.save(update_fields=["status"])
+        queue_scheduler.job_changed(a, now=self.now)
+
+        a.refresh_from_db()
+        self.assertIsNone(a.queue_position)
+        self.assertEqual(
+            self.positions(),
+            [
+                (b.pk, 1, self.now + timedelta(minutes=10)),
+                (c.pk, 2, self.now + timedelta(minutes=20)),
+            ],
+        )
+
+    def test_in_progress_eta_is_kept(self):
+        a = self.add_job(quantity=3, minutes_ago=2)
+        b = self.add_job(minutes_ago=1)
+        queue_scheduler.start(a, now=self.now - timedelta(minutes=5))
+        a.refresh_from_db()
+        self.assertEqual(a.expected_ready_at, self.now + timedelta(minutes=25))
+        self.assertEqual(dict((pk, eta) for pk, _, eta in self.positions())[b.pk], self.now + timedelta(minutes=35))
+
+    def test_parallel_lanes(self):
+        scheduler = BranchQueueScheduler(lanes=2)
+        jobs = [self.add_job(minutes_ago=5 - i, enqueue=False) for i in range(3)]
+        scheduler.reschedule(self.branch.pk, now=self.now)
+        etas = [eta for _, _, eta in self.positions()]
+        self.assertEqual(etas, [self.now + timedelta(minutes=10)] * 2 + [self.now + timedelta(minutes=20)])
+        self.assertEqual(len(jobs), 3)
+
+    def test_instant_jobs_are_not_queued(self):
+        job = Job.objects.create(
+            branch=self.branch, service=self.service, customer_name="Walk-in",
+            type="instant", status="completed",
+        )
+        queue_scheduler.enqueue(job, now=self.now)
+        job.refresh_from_db()
+        self.assertIsNone(job.queue_position)
+
+
+# =========================================================
+# Read model + API
+# =========================================================
+class QueueReadModelTest(QueueFixtureMixin, TestCase):
+
+    def test_read_model_is_one_query(self):
+        self.add_job(minutes_ago=2)
+        self.add_job(priority="express", minutes_ago=1)
+        ready = self.add_job(enqueue=False)
+        Job.objects.filter(pk=ready.pk).update(status="ready")
+
+        with self.assertNumQueries(1):
+            rows = queue_scheduler.read_model(self.branch.pk)
+        self.assertEqual([r["queue_position"] for r in rows], [1, 2, None])
+        self.assertEqual(rows[0]["priority"], "express")
+        self.assertEqual(rows[0]["service_name"], self.service.name)
+
+    def test_api_start_and_complete_update_queue(self):
+        a = self.add_job(minutes_ago=2)
+        b = self.add_job(minutes_ago=1)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.post(f"/api/jobs/jobs/{a.pk}/start/")
+        self.assertEqual(res.status_code, 200, res.content)
+        res = client.post(f"/api/jobs/jobs/{a.pk}/complete/")
+        self.assertEqual(res.status_code, 200, res.content)
+
+        b.refresh_from_db()
+        self.assertEqual(b.queue_position, 1)
+
+        res = client.get(f"/api/jobs/jobs/queue/?branch={self.branch.pk}")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([row["id"] for row in res.json()], [b.pk])
+
+
+# =========================================================
+# BranchService.get_branch_queue_summary
+# =========================================================
+class QueueSummaryTest(QueueFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_single_query_then_cached(self):
+        for i in range(8):
+            job = self.add_job(priority="express" if i % 3 == 0 else "normal", minutes_ago=10 - i)
+            Job.objects.filter(pk=job.pk).update(created_by=self.user)
+        cache.clear()
+
+        with self.assertNumQueries(1):
+            rows = branch_service.get_branch_queue_summary(self.branch.pk)
+        self.assertEqual(len(rows), 8)
+        self.assertEqual([r["queue_position"] for r in rows], list(range(1, 9)))
+        self.assertEqual(rows[0]["priority"], "express")
+        self.assertEqual(rows[0]["service"], self.service.name)
+        self.assertEqual(rows[0]["created_by"], f"{self.user.first_name} {self.user.last_name}")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(branch_service.get_branch_queue_summary(self.branch.pk), rows)
+
+    def test_status_change_invalidates(self):
+        a = self.add_job(minutes_ago=2)
+        self.add_job(minutes_ago=1)
+        self.assertEqual(len(branch_service.get_branch_queue_summary(self.branch.pk)), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            a.status = "completed"
+            a.save(update_fields=["status"])
+            queue_scheduler.job_changed(a, now=self.now)
+
+        rows = branch_service.get_branch_queue_summary(self.branch.pk)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["queue_position"], 1)
+
+    def test_summary_and_queue_api_share_one_projection(self):
+        queued = self.add_job()
+        Job.objects.filter(pk=queued.pk).update(created_by=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            Job.objects.create(
+                branch=self.branch, service=self.service, customer_name="Walk-in",
+                type="instant", status="ready",
+            )
+
+        rows = branch_service.get_branch_queue_summary(self.branch.pk)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        api_rows = client.get(f"/api/jobs/jobs/queue/?branch={self.branch.pk}").json()
+
+        self.assertEqual([r["id"] for r in rows], [r["id"] for r in api_rows])
+        self.assertEqual([r["id"] for r in rows], [queued.pk])
+        self.assertEqual(rows[0]["created_by"], api_rows[0]["created_by"])
+        self.assertEqual(rows[0]["created_by_email"], api_rows[0]["created_by_email"])
+
+    def test_instant_sales_keep_the_summary_cached(self):
+        self.add_job()
+        branch_service.get_branch_queue_summary(self.branch.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Job.objects.create(
+                branch=self.branch, service=self.service, customer_name="Walk-in",
+                type="instant", status="completed",
+            )
+        with self.assertNumQueries(0):
+            branch_service.get_branch_queue_summary(self.branch.pk)
+
+    def test_other_branches_stay_cached(self):
+        self.add_job()
+        branch_service.get_branch_queue_summary(self.branch.pk)
+        other = make_branch()
+        with self.captureOnCommitCallbacks(execute=True):
+            Job.objects.create(branch=other, service=self.service, customer_name="X")
+        with self.assertNumQueries(0):
+            branch_service.get_branch_queue_summary(self.branch.pk)
@@ -0,0 +1,112 @@
+# jobs/tests/test_retention.py
+from datetime import timedelta
+from io import StringIO
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from Human_Resources.models import AuditLog
+from jobs.eventchain import event_chain
+from jobs.models import DaySheet, DomainEvent, ShadowLogEvent, StatusLog
+from jobs.retention import ArchiveReader, LogArchiver
+from jobs.services import BaseService
+from jobs.tests.factories import make_branch
+
+
+class RetentionTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        override = override_settings(RETENTION_ARCHIVE_DIR=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.now = timezone.now()
+        self.old = self.now - timedelta(days=120)
+        self.branch = make_branch()
+        self.archiver = LogArchiver(chunk_size=3)
+        self.reader = ArchiveReader()
+
+    def status_logs(self, n, when):
+        rows = StatusLog.objects.bulk_create([
+            StatusLog(entity_type="Job", entity_id=str(i), event="JOB_CREATED", payload={"i": i}) for i in range(n)
+        ])
+        StatusLog.objects.filter(pk__in=[r.pk for r in rows]).update(created_at=when)
+
+    def test_old_rows_move_to_archive_in_chunks(self):
+        self.status_logs(7, self.old)
+        self.status_logs(2, self.old + timedelta(days=1))
+        self.status_logs(4, self.now)
+
+        result = self.archiver.archive_table("status_log", now=self.now)
+
+        self.assertEqual(result["archived"], 9)
+        self.assertEqual(StatusLog.objects.count(), 4)
+        self.assertEqual(len(self.reader.partitions("status_log")), 4)  # 3 chunks, one spanning two days
+
+        archived = list(self.reader.rows("status_log"))
+        self.assertEqual(len(archived), 9)
+        self.assertEqual(archived[0]["payload"], {"i": 0})
+        self.assertEqual(archived[0]["created_at"], self.old)
+
+        # partitions outside the requested window are not opened
+        day_two = self.old + timedelta(days=1)
+        self.assertEqual(len(self.reader.partitions("status_log", since=day_two)), 1)
+        self.assertEqual(len(list(self.reader.rows("status_log", since=day_two, entity_id="1"))), 1)
+
+        self.assertEqual(self.archiver.archive_table("status_log", now=self.now)["archived"], 0)
+
+    def test_only_delivered_shadow_events_are_archived(self):
+        service = BaseService()
+        events = [service._create_shadow_event("JOB_CREATED", self.branch.pk, actor={}, payload={"i": i}) for i in range(4)]
+        ShadowLogEvent.objects.update(timestamp=self.old)
+        ShadowLogEvent.objects.filter(pk__in=[e.pk for e in events[:3]]).update(
+            delivery_status=ShadowLogEvent.DELIVERY_DELIVERED
+        )
+
+        self.archiver.archive_table("shadow_event", now=self.now)
+
+        self.assertEqual(list(ShadowLogEvent.objects.values_list("pk", flat=True)), [events[3].pk])
+        archived = list(self.reader.rows("shadow_event", branch_id=self.branch.pk))
+        self.assertEqual([r["uuid"] for r in archived], [str(e.uuid) for e in events[:3]])
+
+    def test_recruitment_events_are_never_archived(self):
+        DomainEvent.objects.bulk_create([
+            DomainEvent(aggregate_type="Job", aggregate_id="1", seq=1, event_type="JOB_CREATED"),
+            DomainEvent(aggregate_type="RecruitmentApplication", aggregate_id="1", seq=1, event_type="RECRUITMENT_TRANSITION"),
+        ])
+        DomainEvent.objects.update(occurred_at=self.now - timedelta(days=400))
+
+        self.assertEqual(self.archiver.archive_table("domain_event", now=self.now)["archived"], 1)
+        self.assertEqual(list(DomainEvent.objects.values_list("aggregate_type", flat=True)), ["RecruitmentApplication"])
+
+    def test_sealed_day_still_verifies_after_archiving(self):
+        service = BaseService()
+        for i in range(5):
+            service._create_shadow_event("JOB_CREATED", self.branch.pk, actor={}, payload={"i": i})
+        seal = event_chain.seal_daysheet(DaySheet.objects.create(branch=self.branch, date=timezone.localdate()))
+        # timestamps are part of the hashed content, so age the rows by moving "now" instead
+        ShadowLogEvent.objects.filter(chain_seq__lte=3).update(delivery_status=ShadowLogEvent.DELIVERY_DELIVERED)
+
+        self.archiver.archive_table("shadow_event", now=self.now + timedelta(days=120))
+
+        self.assertEqual(ShadowLogEvent.objects.count(), 2)
+        self.assertTrue(event_chain.verify_seal(seal)["ok"])
+
+    def test_command_archives_audit_log(self):
+        AuditLog.objects.create(action="LOGIN")
+        AuditLog.objects.create(action="LOGOUT")
+        AuditLog.objects.filter(action="LOGIN").update(timestamp=self.now - timedelta(days=400))
+
+        out = StringIO()
+        call_command("archive_old_logs", table=["audit_log"], dry_run=True, stdout=out)
+        self.assertIn("Would archive 1 audit_log row(s)", out.getvalue())
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+        call_command("archive_old_logs", table=["audit_log"], stdout=StringIO())
+        self.assertEqual(list(AuditLog.objects.values_list("action", flat=True)), ["LOGOUT"])
+        self.assertEqual([r["action"] for r in self.reader.rows("audit_log")], ["LOGIN"])
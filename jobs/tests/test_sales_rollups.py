@@ -0,0 +1,129 @@
+# jobs/tests/test_sales_rollups.py
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from branches.models import Region
+from Human_Resources.models import Belt
+from jobs.daysheet_cache import daysheet_cache
+from jobs.models import BeltDailySale, CountryDailySale, DailySale, DaySheet, RegionDailySale
+from jobs.pricing import pricing_index
+from jobs.sales_rollups import sales_rollups
+from jobs.services import job_service
+from jobs.tests.factories import make_branch, make_service, make_user
+
+
+class SalesRollupTest(TestCase):
+
+    def setUp(self):
+        pricing_index.invalidate()
+        daysheet_cache.clear()
+        self.south = Belt.objects.create(code="SOUTH", name="Southern Belt", order=1)
+        self.accra = make_branch()
+        Region.objects.filter(pk=self.accra.region_id).update(belt=self.south)
+        self.volta = make_branch()
+        self.volta.region = Region.objects.create(country=self.accra.country, name="Volta", belt=self.south)
+        self.volta.save(update_fields=["region"])
+        self.service = make_service(price="5.00")
+        self.today = timezone.localdate()
+
+    def sell(self, branch, quantity=1, lines=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            job_service.create_instant_jobs_batch(
+                branch_id=branch.pk,
+                lines=[{"service_id": self.service.pk, "quantity": quantity}] * lines,
+                created_by=make_user(branch=branch),
+            )
+
+    def test_sales_flow_into_daily_sale_and_rollups(self):
+        self.sell(self.accra, lines=2)
+        self.sell(self.accra, quantity=2)
+        self.sell(self.volta)
+
+        sale = DailySale.objects.get(branch=self.accra, date=self.today)
+        self.assertEqual((sale.total_count, sale.total_amount), (3, Decimal("20.00")))
+
+        region = RegionDailySale.objects.get(region_id=self.volta.region_id, date=self.today)
+        self.assertEqual((region.total_count, region.total_amount), (1, Decimal("5.00")))
+        belt = BeltDailySale.objects.get(belt=self.south, date=self.today)
+        self.assertEqual((belt.total_count, belt.total_amount), (4, Decimal("25.00")))
+        self.assertEqual(CountryDailySale.objects.get(country_id=self.accra.country_id).total_count, 4)
+
+        by_region = sales_rollups.last_days("region", 90)
+        self.assertEqual([r["name"] for r in by_region], ["Greater Accra", "Volta"])
+
+    def test_rolled_back_sale_is_not_counted(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            job_service.create_instant_jobs_batch(
+                branch_id=self.accra.pk, lines=[{"service_id": self.service.pk}],
+            )
+            raise RuntimeError("abort")
+
+        self.assertFalse(DailySale.objects.exists())
+        self.assertFalse(CountryDailySale.objects.exists())
+
+    def test_sale_is_applied_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            job_service.create_instant_jobs_batch(
+                branch_id=self.accra.pk, lines=[{"service_id": self.service.pk}], created_by=make_user(branch=self.accra),
+            )
+            self.assertFalse(DailySale.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(DailySale.objects.get(branch=self.accra).total_count, 1)
+        self.assertEqual(CountryDailySale.objects.get().total_count, 1)
+
+    def test_refresh_does_not_double_count_pending_hooks(self):
+        self.sell(self.accra)
+        with self.captureOnCommitCallbacks() as callbacks:
+            job_service.create_instant_jobs_batch(
+                branch_id=self.volta.pk, lines=[{"service_id": self.service.pk}], created_by=make_user(branch=self.volta),
+            )
+        # the refresh runs between the attach commit and its hook
+        sales_rollups.refresh_rollups(self.today, self.today)
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(BeltDailySale.objects.get(belt=self.south).total_count, 2)
+        self.assertEqual(RegionDailySale.objects.get(region_id=self.volta.region_id).total_count, 1)
+        self.assertEqual(sales_rollups.refresh_rollups(self.today, self.today)["belt"], 1)
+        self.assertEqual(BeltDailySale.objects.get(belt=self.south).total_count, 2)
+
+    def test_rebuild_repairs_from_daysheets(self):
+        self.sell(self.accra, lines=3)
+        self.sell(self.volta)
+        DailySale.objects.all().delete()
+        BeltDailySale.objects.update(total_count=99)
+        RegionDailySale.objects.filter(region_id=self.volta.region_id).delete()
+
+        out = StringIO()
+        call_command("rebuild_sales_rollups", days=7, stdout=out)
+
+        self.assertIn("2 daily sale row(s)", out.getvalue())
+        self.assertEqual(DailySale.objects.get(branch=self.accra).total_count, 3)
+        self.assertEqual(BeltDailySale.objects.get(belt=self.south).total_count, 4)
+        self.assertEqual(RegionDailySale.objects.get(region_id=self.volta.region_id).total_amount, Decimal("5.00"))
+        self.assertEqual(
+            DaySheet.objects.get(branch=self.accra).total_jobs,
+            DailySale.objects.get(branch=self.accra).total_count,
+        )
+
+    def test_hq_endpoint(self):
+        self.sell(self.volta)
+        client = APIClient()
+        client.force_authenticate(make_user(is_staff=True))
+
+        response = client.get("/api/jobs/hq/sales/", {"level": "belt", "days": 90})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [
+            {"id": self.south.pk, "name": "Southern Belt", "total_count": 1, "total_amount": "5.00"},
+        ])
+        self.assertEqual(client.get("/api/jobs/hq/sales/", {"level": "city"}).status_code, 400)
+
+        client.force_authenticate(make_user())
+        self.assertEqual(client.get("/api/jobs/hq/sales/").status_code, 403)
@@ -0,0 +1,141 @@
+# jobs/tests/test_shift_snapshots.py
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from jobs.models import Job, DaySheet, DaySheetShift, CorrectionEntry, ShiftCloseSnapshot, DomainEvent
+from jobs.daysheet_cache import daysheet_cache
+from jobs.pricing import pricing_index
+from jobs.services import (
+    shift_service,
+    manager_service,
+    correction_service,
+    shift_snapshot_service,
+    ShiftAggregationService,
+)
+from jobs.tests.factories import make_branch, make_user, make_service
+
+
+class ShiftSnapshotTest(TestCase):
+
+    def setUp(self):
+        pricing_index.invalidate()
+        daysheet_cache.clear()
+        self.branch = make_branch()
+        self.user = make_user(branch=self.branch)
+        self.user.pin = "1234"
+        self.manager = make_user(branch=self.branch)
+        self.manager.pin = "9999"
+        self.service = make_service(price="10.00")
+
+        self.shift = shift_service.start_shift(self.branch, self.user)
+        self.sheet = self.shift.daysheet
+        for qty in (1, 2, 3):
+            self.add_job(qty)
+
+    def add_job(self, quantity, deposit="0.00"):
+        return Job.objects.create(
+            branch=self.branch,
+            service=self.service,
+            daysheet=self.sheet,
+            customer_name="Walk-in",
+            quantity=quantity,
+            unit_price=Decimal("10.00"),
+            total_amount=Decimal("10.00") * quantity - Decimal(deposit),
+            deposit_amount=Decimal(deposit),
+            created_by=self.user,
+        )
+
+    def close(self, closing_cash="60.00"):
+        return shift_service.close_shift(self.shift, self.user, Decimal(closing_cash), "1234",
+                                         now=timezone.now() + timedelta(seconds=1))
+
+    def correction(self, **payload):
+        return CorrectionEntry.objects.create(
+            daily_sheet=self.sheet,
+            shift=payload.pop("shift", self.shift),
+            type=CorrectionEntry.TYPE_AMOUNT_CORRECTION,
+            payload=payload,
+        )
+
+    def test_close_shift_freezes_aggregate(self):
+        self.close()
+        snapshot = ShiftCloseSnapshot.objects.get(shift=self.shift)
+        live = ShiftAggregationService().aggregate(self.shift)
+        self.assertEqual(snapshot.job_count, 3)
+        self.assertEqual(snapshot.net_total, live["net_total"])
+        self.assertEqual(snapshot.gross_total, Decimal("60.00"))
+        self.assertEqual(snapshot.cash_total, Decimal("60.00"))
+
+    def test_freeze_is_idempotent(self):
+        self.close()
+        first = ShiftCloseSnapshot.objects.get(shift=self.shift)
+        self.assertEqual(shift_snapshot_service.freeze(self.shift).pk, first.pk)
+        self.assertEqual(ShiftCloseSnapshot.objects.count(), 1)
+
+    def test_day_close_reads_snapshots_not_jobs(self):
+        self.close()
+        # jobs edited after close do not change the frozen totals
+        Job.objects.filter(daysheet=self.sheet).update(total_amount=Decimal("999.00"))
+
+        with self.assertNumQueries(1):
+            totals = shift_snapshot_service.day_totals(self.sheet)
+        self.assertEqual(totals["net_total"], Decimal("60.00"))
+        self.assertEqual(totals["shift_count"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sheet = manager_service.manager_close_day(self.sheet, self.manager, "9999")
+        self.assertEqual(sheet.status, DaySheet.STATUS_BRANCH_CLOSED)
+        self.assertEqual(sheet.meta["final_aggregation"]["net_total"], "60.00")
+        self.assertTrue(DomainEvent.objects.filter(event_type="MANAGER_CLOSED", aggregate_id=str(sheet.pk)).exists())
+
+    def test_late_correction_applied_as_delta(self):
+        self.close()
+        ce = self.correction(amount_delta="-5.50")
+        correction_service.approve_correction(ce, self.manager)
+
+        snapshot = ShiftCloseSnapshot.objects.get(shift=self.shift)
+        self.assertEqual(snapshot.net_total, Decimal("54.50"))
+        self.assertEqual(snapshot.cash_total, Decimal("54.50"))
+        self.assertEqual(snapshot.adjustment_total, Decimal("-5.50"))
+        self.assertEqual(snapshot.corrections_applied, 1)
+        self.assertEqual(shift_snapshot_service.day_totals(self.sheet)["net_total"], Decimal("54.50"))
+
+        with self.assertRaises(ValueError):
+            correction_service.approve_correction(ce, self.manager)
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.corrections_applied, 1)
+
+    def test_correction_approved_while_open_is_included_at_freeze(self):
+        ce = self.correction(old_amount="10.00", new_amount="12.00")
+        correction_service.approve_correction(ce, self.manager)
+        self.close()
+        snapshot = ShiftCloseSnapshot.objects.get(shift=self.shift)
+        self.assertEqual(snapshot.net_total, Decimal("62.00"))
+        self.assertEqual(snapshot.adjustment_total, Decimal("2.00"))
+
+    def test_correction_resolves_shift_from_job(self):
+        job = self.add_job(1)
+        self.close()
+        ce = self.correction(shift=None, amount_delta="1.00")
+        ce.job = job
+        ce.save()
+        approved = correction_service.approve_correction(ce, self.manager)
+        self.assertEqual(approved.shift_id, self.shift.pk)
+        self.assertEqual(ShiftCloseSnapshot.objects.get(shift=self.shift).adjustment_total, Decimal("1.00"))
+
+    def test_note_corrections_do_not_touch_snapshot(self):
+        self.close()
+        ce = CorrectionEntry.objects.create(daily_sheet=self.sheet, shift=self.shift, payload={"amount_delta": "3"})
+        correction_service.approve_correction(ce, self.manager)
+        self.assertEqual(ShiftCloseSnapshot.objects.get(shift=self.shift).adjustment_total, Decimal("0.00"))
+
+    def test_shift_closed_without_snapshot_is_frozen_on_demand(self):
+        DaySheetShift.objects.filter(pk=self.shift.pk).update(
+            status=DaySheetShift.SHIFT_CLOSED, shift_end=timezone.now() + timedelta(seconds=1),
+        )
+        totals = shift_snapshot_service.day_totals(self.sheet)
+        self.assertEqual(totals["job_count"], 3)
+        self.assertTrue(ShiftCloseSnapshot.objects.filter(shift=self.shift).exists())
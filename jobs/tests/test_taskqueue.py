@@ -0,0 +1,213 @@
+# jobs/tests/test_taskqueue.py
+from datetime import timedelta
+import random
+
+from django.core import mail
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from jobs.models import BackgroundTask, Job
+from jobs.taskqueue import TaskWorker, registry, task
+from jobs.tests.factories import make_branch, make_service, make_user
+
+CALLS = []
+
+
+@task(name="tests.record")
+def record(value):
+    CALLS.append(value)
+    return {"seen": value}
+
+
+@task(name="tests.flaky", max_attempts=2)
+def flaky():
+    raise RuntimeError("boom")
+
+
+@task(name="tests.progress", bind=True)
+def report_progress(ctx, total):
+    for done in range(1, total + 1):
+        ctx.progress(done, total, message=f"{done}/{total}")
+    return ctx.attempt
+
+
+@task(name="tests.secret", sensitive=True)
+def secret(password):
+    return len(password)
+
+
+class TaskQueueTest(TestCase):
+
+    def setUp(self):
+        CALLS.clear()
+        self.worker = TaskWorker(retry_base_seconds=10, retry_max_seconds=60, rng=random.Random(1))
+
+    def test_priority_order_and_result(self):
+        record.delay("low")
+        record.enqueue(args=["high"], priority=9)
+        record.enqueue(args=["later"], run_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(self.worker.drain(), 2)
+
+        self.assertEqual(CALLS, ["high", "low"])
+        done = BackgroundTask.objects.filter(status=BackgroundTask.STATUS_SUCCEEDED).order_by("finished_at")
+        self.assertEqual([t.result for t in done], [{"seen": "high"}, {"seen": "low"}])
+        self.assertEqual(BackgroundTask.objects.get(status=BackgroundTask.STATUS_QUEUED).args, ["later"])
+
+    def test_queue_filter_and_unique_key(self):
+        first = record.enqueue(args=["a"], queue="email", unique_key="welcome:1")
+        self.assertEqual(record.enqueue(args=["b"], queue="email", unique_key="welcome:1"), first)
+
+        self.assertEqual(TaskWorker(queues=["default"]).drain(), 0)
+        self.assertEqual(TaskWorker(queues=["email"]).drain(), 1)
+        self.assertEqual(CALLS, ["a"])
+
+    def test_retry_with_backoff_then_fail(self):
+        bg = flaky.delay()
+        before = timezone.now()
+
+        with self.assertLogs("jobs.taskqueue", level="ERROR"):
+            self.assertEqual(self.worker.drain(), 1)
+        bg.refresh_from_db()
+        self.assertEqual((bg.status, bg.attempts), (BackgroundTask.STATUS_QUEUED, 1))
+        self.assertIn("RuntimeError: boom", bg.last_error)
+        self.assertGreaterEqual(bg.run_at, before + timedelta(seconds=5))  # half of the 10s base is fixed
+
+        self.assertFalse(self.worker.run_once())  # backing off
+        with self.assertLogs("jobs.taskqueue", level="ERROR"):
+            self.assertTrue(self.worker.run_once(now=bg.run_at))
+        bg.refresh_from_db()
+        self.assertEqual((bg.status, bg.attempts), (BackgroundTask.STATUS_FAILED, 2))
+        self.assertIsNotNone(bg.finished_at)
+
+    def test_backoff_is_capped(self):
+        delays = [self.worker.backoff(n) for n in (1, 2, 3, 10)]
+        self.assertTrue(5 <= delays[0] <= 10)
+        self.assertTrue(10 <= delays[1] <= 20)
+        self.assertTrue(30 <= delays[3] <= 60)
+
+    def test_progress_and_sensitive_args(self):
+        progress = report_progress.delay(4)
+        hidden = secret.delay("hunter22")
+
+        self.worker.drain()
+
+        progress.refresh_from_db()
+        self.assertEqual((progress.progress, progress.progress_message, progress.result), (1.0, "4/4", 1))
+        hidden.refresh_from_db()
+        self.assertEqual((hidden.result, hidden.args, hidden.kwargs), (8, [], {}))
+
+    def test_sensitive_args_are_scrubbed_when_the_lease_runs_out(self):
+        hidden = secret.delay("hunter22")
+        self.worker.claim()
+        BackgroundTask.objects.filter(pk=hidden.pk).update(attempts=hidden.max_attempts)
+
+        later = timezone.now() + timedelta(seconds=self.worker.lease_seconds + 1)
+        with self.assertLogs("jobs.taskqueue", level="WARNING"):
+            self.worker.requeue_expired(now=later)
+        hidden.refresh_from_db()
+        self.assertEqual((hidden.status, hidden.args, hidden.kwargs), (BackgroundTask.STATUS_FAILED, [], {}))
+
+    def test_welcome_email_task_issues_the_password(self):
+        employee = make_user(must_change_password=True)
+        bg = registry.get("employees.tasks.send_welcome_email").delay(employee.pk)
+        self.assertEqual((bg.args, bg.kwargs), ([employee.pk], {}))
+
+        self.worker.drain()
+        body = mail.outbox[0].body
+        temp_password = body.split("Temporary Password: ")[1].split("\n")[0]
+        employee.refresh_from_db()
+        self.assertTrue(employee.check_password(temp_password))
+        self.assertNotIn(temp_password, str(BackgroundTask.objects.values_list("args", "kwargs", "result").get()))
+
+        # once the employee has chosen a password a rerun leaves it alone
+        employee.must_change_password = False
+        employee.save(update_fields=["must_change_password"])
+        registry.get("employees.tasks.send_welcome_email").delay(employee.pk)
+        self.worker.drain()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_finished_periodic_slots_are_pruned(self):
+        registry.discover()
+        spec = registry.get("jobs.tasks.auto_close_stale")
+        now = timezone.now()
+        old = BackgroundTask.objects.create(
+            name=spec.name, unique_key=f"periodic:{spec.name}:1", status=BackgroundTask.STATUS_SUCCEEDED,
+            finished_at=now - timedelta(days=2),
+        )
+        recent = BackgroundTask.objects.create(
+            name=spec.name, unique_key=f"periodic:{spec.name}:2", status=BackgroundTask.STATUS_SUCCEEDED,
+            finished_at=now - timedelta(hours=1),
+        )
+        self.worker.schedule_periodic(now=now)
+
+        self.assertFalse(BackgroundTask.objects.filter(pk=old.pk).exists())
+        self.assertTrue(BackgroundTask.objects.filter(pk=recent.pk).exists())
+
+    def test_expired_lease_is_requeued(self):
+        bg = record.delay("x")
+        [claimed] = self.worker.claim()
+        self.assertEqual(claimed.status, BackgroundTask.STATUS_RUNNING)
+        self.assertEqual(self.worker.claim(), [])
+
+        later = timezone.now() + timedelta(seconds=self.worker.lease_seconds + 1)
+        self.assertEqual(self.worker.requeue_expired(now=later), 1)
+        self.assertTrue(self.worker.run_once(now=later))
+
+        bg.refresh_from_db()
+        self.assertEqual((bg.status, bg.attempts), (BackgroundTask.STATUS_SUCCEEDED, 2))
+        self.assertEqual(CALLS, ["x"])
+
+    def test_unregistered_task_fails(self):
+        BackgroundTask.objects.create(name="tests.missing")
+        with self.assertLogs("jobs.taskqueue", level="ERROR"):
+            self.worker.drain()
+        self.assertEqual(BackgroundTask.objects.get().status, BackgroundTask.STATUS_FAILED)
+
+    def test_app_tasks_are_discovered(self):
+        registry.discover()
+        for name in ("jobs.tasks.send_job_alerts", "jobs.tasks.scan_anomalies",
+                     "employees.tasks.send_welcome_email", "services.tasks.send_registration_link"):
+            self.assertIn(name, registry.names())
+        periodic = {spec.name for spec in registry.periodic()}
+        self.assertIn("jobs.tasks.dispatch_shadow_events", periodic)
+
+    def test_job_alerts_are_periodic_and_sent_once_per_job(self):
+        registry.discover()
+        spec = registry.get("jobs.tasks.send_job_alerts")
+        self.assertIn(spec, registry.periodic())
+
+        branch = make_branch(email="branch@example.com")
+        job = Job.objects.create(branch=branch, service=make_service(), customer_name="Kofi")
+        Job.objects.filter(pk=job.pk).update(expected_ready_at=timezone.now() + timedelta(minutes=5))
+
+        spec.delay()
+        spec.delay()
+        self.worker.drain()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["branch@example.com"])
+        self.assertIsNotNone(Job.objects.get(pk=job.pk).alert_sent_at)
+
+    def test_registration_link_task_sends_mail(self):
+        registry.get("services.tasks.send_registration_link").delay(
+            email="new@example.com", link="http://x/register/abc", first_name="Ama", last_name="Owusu",
+        )
+        self.worker.drain()
+        self.assertEqual(mail.outbox[0].to, ["new@example.com"])
+        self.assertIn("http://x/register/abc", mail.outbox[0].body)
+
+    def test_status_api(self):
+        bg = record.delay("api")
+        self.worker.drain()
+        client = APIClient()
+        client.force_authenticate(make_user(is_staff=True))
+
+        response = client.get(f"/api/jobs/tasks/{bg.uuid}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], BackgroundTask.STATUS_SUCCEEDED)
+        self.assertEqual(response.json()["result"], {"seen": "api"})
+        self.assertEqual(client.get("/api/jobs/tasks/00000000-0000-0000-0000-000000000000/").status_code, 404)
+
+        client.force_authenticate(make_user())
+        self.assertEqual(client.get(f"/api/jobs/tasks/{bg.uuid}/").status_code, 403)
@@ -1,56 +1,82 @@
-from django.utils import timezone
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions, status
 
+from notifications import counters, services
+from notifications.broker import get_broker
 from notifications.models import Notification
 
 
+def _etag(user, version):
+    return quote_etag(f"{user.pk}.{version}")
+
+
+def _with_etag(response, etag):
+    # private: per-user data; no-cache: always revalidate, which costs a 304
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _not_modified(request, etag):
+    tags = parse_etags(request.headers.get("If-None-Match", ""))
+    if etag in tags or "*" in tags:
+        return _with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+    return None
+
+
 class NotificationListAPI(APIView):
     """
     GET /notifications/api/
     Returns the latest 20 notifications for the logged-in user.
+    Digest rows sort by their last update and carry the folded event count.
+    Answers 304 while the user's counter version is unchanged.
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
+        _, version = counters.state(request.user)
+        etag = _etag(request.user, version)
+        cached = _not_modified(request, etag)
+        if cached is not None:
+            return cached
+
         notifications = (
             Notification.objects
             .filter(recipient=request.user)
             .select_related("actor")
-            .order_by("-created_at")[:20]
+            .order_by("-updated_at", "-pk")[:20]
         )
 
-        data = [
-            {
-                "id":         n.pk,
-                "verb":       n.verb,
-                "message":    n.message,
-                "link":       n.link,
-                "is_read":    n.is_read,
-                "created_at": n.created_at.strftime("%d %b %Y, %H:%M"),
-                "actor":      str(n.actor) if n.actor else None,
-            }
-            for n in notifications
-        ]
+        data = [n.as_dict() for n in notifications]
 
-        return Response(data)
+        return _with_etag(Response(data), etag)
 
 
 class NotificationUnreadCountAPI(APIView):
     """
     GET /notifications/api/unread-count/
-    Returns the unread notification count for the bell badge.
+    Returns the unread notification count for the bell badge, read from
+    the user's NotificationCounter. Answers 304 while it is unchanged.
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        count = Notification.objects.filter(
-            recipient=request.user,
-            is_read=False,
-        ).count()
+        count, version = counters.state(request.user)
+        etag = _etag(request.user, version)
+        cached = _not_modified(request, etag)
+        if cached is not None:
+            return cached
 
-        return Response({"unread": count})
+        return _with_etag(Response({"unread": count, "version": version}), etag)
 
 
 class NotificationMarkReadAPI(APIView):
@@ -61,18 +87,12 @@ class NotificationMarkReadAPI(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        try:
-            notification = Notification.objects.get(pk=pk, recipient=request.user)
-        except Notification.DoesNotExist:
+        if not services.mark_read(recipient=request.user, pk=pk):
             return Response(
                 {"error": "Notification not found."},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        notification.is_read = True
-        notification.read_at = timezone.now()
-        notification.save(update_fields=["is_read", "read_at"])
-
         return Response({"ok": True})
 
 
@@ -84,9 +104,57 @@ class NotificationMarkAllReadAPI(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        updated = Notification.objects.filter(
-            recipient=request.user,
-            is_read=False,
-        ).update(is_read=True, read_at=timezone.now())
+        updated = services.mark_all_read(recipient=request.user)
 
-        return Response({"ok": True, "marked": updated})
\ No newline at end of file
+        return Response({"ok": True, "marked": updated})
+
+
+# -------------------------------------------------
+# Push stream
+# -------------------------------------------------
+def _sse(event):
+    return f"id: {event['version']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def _stream(subscription, first):
+    keepalive = int(getattr(settings, "NOTIFY_STREAM_KEEPALIVE", 20))
+    loop = asyncio.get_running_loop()
+    # streams end now and then so the browser reconnects (through deploys, proxies)
+    deadline = loop.time() + int(getattr(settings, "NOTIFY_STREAM_MAX_SECONDS", 300))
+    try:
+        yield "retry: 3000\n\n" + _sse(first)
+        while (remaining := deadline - loop.time()) > 0:
+            event = await subscription.get(min(keepalive, remaining))
+            yield _sse(event) if event is not None else ": keepalive\n\n"
+    finally:
+        await subscription.close()
+
+
+async def notification_stream(request):
+    """
+    GET /notifications/api/stream/
+    Server-sent events for the bell: an "unread" event on connect, then
+    "notification" / "unread" events as they happen (see
+    notifications.broker). Needs the ASGI server: under WSGI it answers
+    204, which tells EventSource not to retry, and the page keeps polling.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    subscription = await get_broker().subscribe(user.pk)  # before the read, so nothing slips between
+    try:
+        unread, version = await sync_to_async(counters.state)(user)
+    except Exception:
+        await subscription.close()
+        raise
+
+    response = StreamingHttpResponse(
+        _stream(subscription, {"type": "unread", "unread": unread, "version": version}),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
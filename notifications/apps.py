@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notifications'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from notifications.directory import role_directory
+
+        # role changes must reach the cached fan-out directory
+        sender = "Human_Resources.AuthorityAssignment"
+        post_save.connect(role_directory.invalidate, sender=sender, dispatch_uid="notifications_directory_save")
+        post_delete.connect(role_directory.invalidate, sender=sender, dispatch_uid="notifications_directory_delete")
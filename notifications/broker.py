@@ -0,0 +1,167 @@
+"""
+notifications.broker
+====================
+Pub/sub between the code that writes notifications and the open bell
+streams (GET /notifications/api/stream/).
+
+Events are small dicts, published per recipient after the writing
+transaction commits:
+
+    {"type": "notification", "unread": 3, "version": 17, "notification": {...}}
+    {"type": "unread",       "unread": 0, "version": 18}
+
+NOTIFY_BROKER picks the implementation:
+
+    notifications.broker.InProcessBroker   (default) — delivers to streams
+        served by the same process; enough for a single ASGI worker.
+    notifications.broker.RedisBroker       — Redis pub/sub on channel
+        "notifications:<user_id>" (NOTIFY_REDIS_URL); needed once streams
+        and writers live in different processes. Requires `redis`.
+
+A subscriber that misses events (full queue, reconnect) loses nothing that
+matters: every event carries the absolute unread count and version.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessBroker:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, user_id, event):
+        """Thread-safe; callable from sync views, tasks and on_commit hooks."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.offer(event)
+
+    async def subscribe(self, user_id):
+        subscription = _LocalSubscription(self, user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def _discard(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self, user_id=None):
+        with self._lock:
+            if user_id is not None:
+                return len(self._subscribers.get(user_id, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+
+class _LocalSubscription:
+
+    def __init__(self, broker, user_id, loop):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=int(getattr(settings, "NOTIFY_STREAM_QUEUE", 100)))
+
+    def offer(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:  # loop already closed; the stream is gone
+            self.broker._discard(self)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.debug("Notification stream for user %s is behind; event dropped", self.user_id)
+
+    async def get(self, timeout):
+        """Next event, or None after `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker._discard(self)
+
+
+class RedisBroker:
+
+    def __init__(self, url=None):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError as exc:
+            raise ImproperlyConfigured("RedisBroker requires the `redis` package.") from exc
+        self.url = url or getattr(settings, "NOTIFY_REDIS_URL", "redis://localhost:6379/0")
+        self._redis = redis.Redis.from_url(self.url)
+        self._async = redis.asyncio
+
+    @staticmethod
+    def channel(user_id):
+        return f"notifications:{user_id}"
+
+    def publish(self, user_id, event):
+        self._redis.publish(self.channel(user_id), json.dumps(event))
+
+    async def subscribe(self, user_id):
+        client = self._async.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.channel(user_id))
+        return _RedisSubscription(client, pubsub)
+
+
+class _RedisSubscription:
+
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message["data"])
+
+    async def close(self):
+        await self.pubsub.unsubscribe()
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The process-wide broker named by NOTIFY_BROKER."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, "NOTIFY_BROKER", "notifications.broker.InProcessBroker")
+                _broker = import_string(path)()
+    return _broker
+
+
+def publish(user_id, event):
+    """Publish, logging instead of raising: a push failure never breaks a write."""
+    try:
+        get_broker().publish(user_id, event)
+    except Exception as exc:
+        logger.error("Failed to publish notification event for user %s: %s", user_id, exc)
@@ -0,0 +1,163 @@
+"""
+notifications.counters
+======================
+Denormalized unread counts for the notification bell.
+
+Every write that changes a recipient's notifications calls adjust() in the
+same transaction, so NotificationCounter.unread always matches
+COUNT(unread Notification) without the bell ever running that COUNT.
+`version` moves on every change (new rows, digest updates, reads) and is
+what the list and unread-count APIs put in their ETags.
+
+A user without a counter row is seeded from a real COUNT the first time
+anything touches it. When two writers seed the same user at once, only the
+one whose INSERT lands keeps its COUNT; the other applies its delta to the
+winner's row, since that COUNT could not see the loser's uncommitted rows. recount() (manage.py recount_notifications) repairs
+counters after out-of-band edits such as the admin or raw SQL.
+
+Usage
+-----
+    from notifications import counters
+
+    unread, version = counters.state(request.user)
+"""
+
+import logging
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _models():
+    # Late import to avoid circular imports
+    from notifications.models import Notification, NotificationCounter
+    return Notification, NotificationCounter
+
+
+def _unread_counts(user_ids):
+    Notification, _ = _models()
+    return dict(
+        Notification.objects
+        .filter(recipient_id__in=user_ids, is_read=False)
+        .values("recipient_id")
+        .annotate(n=Count("pk"))
+        .values_list("recipient_id", "n")
+    )
+
+
+def _seed(user_ids):
+    """
+    Create missing counters from a real COUNT. Returns the ids whose row this
+    call inserted; a row a concurrent call inserted first is not included.
+    """
+    _, NotificationCounter = _models()
+    existing = set(NotificationCounter.objects.filter(user_id__in=user_ids).values_list("user_id", flat=True))
+    missing = [pk for pk in user_ids if pk not in existing]
+    if not missing:
+        return set()
+    counts = _unread_counts(missing)
+    rows = [NotificationCounter(user_id=pk, unread=counts.get(pk, 0), version=1) for pk in missing]
+    try:
+        with transaction.atomic():
+            NotificationCounter.objects.bulk_create(rows)
+        return set(missing)
+    except IntegrityError:
+        pass
+
+    # lost a race for at least one row: find out which ones are ours
+    seeded = set()
+    for row in rows:
+        try:
+            with transaction.atomic():
+                row.save(force_insert=True)
+        except IntegrityError:
+            continue
+        seeded.add(row.user_id)
+    return seeded
+
+
+def adjust(user_ids, unread=0):
+    """
+    Add `unread` (negative to subtract) to each user's counter and bump its
+    version. Call after the notification write, inside its transaction.
+    Returns {user_id: (unread, version)}.
+    """
+    _, NotificationCounter = _models()
+    ids = list(dict.fromkeys(user_ids))
+    if not ids:
+        return {}
+
+    seeded = _seed(ids)  # inserted by this call: already exact, only the version moves
+    if unread > 0:
+        expr = F("unread") + unread
+    elif unread < 0:
+        # never below zero (and never a negative intermediate on unsigned columns)
+        drop = -unread
+        expr = Case(When(unread__gte=drop, then=F("unread") - drop), default=Value(0))
+    else:
+        expr = F("unread")
+    now = timezone.now()
+    rest = [pk for pk in ids if pk not in seeded]
+    if rest:
+        NotificationCounter.objects.filter(user_id__in=rest).update(unread=expr, version=F("version") + 1, updated_at=now)
+    if seeded:
+        NotificationCounter.objects.filter(user_id__in=seeded).update(version=F("version") + 1, updated_at=now)
+
+    return {
+        user_id: (count, version)
+        for user_id, count, version in NotificationCounter.objects
+        .filter(user_id__in=ids)
+        .values_list("user_id", "unread", "version")
+    }
+
+
+def state(user):
+    """(unread, version) for a user or user id — one primary-key lookup."""
+    _, NotificationCounter = _models()
+    user_id = getattr(user, "pk", user)
+    row = NotificationCounter.objects.filter(user_id=user_id).values_list("unread", "version").first()
+    if row is None:
+        with transaction.atomic():
+            _seed([user_id])
+        row = NotificationCounter.objects.filter(user_id=user_id).values_list("unread", "version").first()
+    return row
+
+
+def recount(user_ids=None):
+    """
+    Rebuild counters from the Notification table (all users with a counter
+    or an unread notification when `user_ids` is None). Returns the number
+    of counters corrected.
+    """
+    Notification, NotificationCounter = _models()
+    if user_ids is None:
+        ids = set(NotificationCounter.objects.values_list("user_id", flat=True))
+        ids |= set(Notification.objects.filter(is_read=False).values_list("recipient_id", flat=True).distinct())
+    else:
+        ids = set(getattr(u, "pk", u) for u in user_ids)
+
+    fixed = 0
+    ids = sorted(ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        with transaction.atomic():
+            seeded = _seed(chunk)
+            counts = _unread_counts(chunk)
+            stored = (
+                NotificationCounter.objects
+                .select_for_update()
+                .filter(user_id__in=chunk)
+                .exclude(user_id__in=seeded)
+                .values_list("user_id", "unread")
+            )
+            for user_id, unread in stored:
+                actual = counts.get(user_id, 0)
+                if unread != actual:
+                    NotificationCounter.objects.filter(user_id=user_id).update(
+                        unread=actual, version=F("version") + 1, updated_at=timezone.now(),
+                    )
+                    logger.warning("Notification counter for user %s drifted: %s -> %s", user_id, unread, actual)
+                    fixed += 1
+    return fixed
@@ -0,0 +1,69 @@
+"""
+notifications.directory
+=======================
+Cached role -> recipient lookup for notification fan-out.
+
+One query loads every active authority assignment of an active user into
+{role_code: [user_id, ...]}, cached under a single key for
+NOTIFY_DIRECTORY_TTL seconds. Saving or deleting an AuthorityAssignment
+drops the key (see NotificationsConfig.ready); with a per-process cache
+other processes pick the change up when the TTL runs out.
+
+Usage
+-----
+    from notifications.directory import role_directory
+
+    role_directory.user_ids(["HR_ADMIN", "BELT_HR_OVERSEER"], excluding=request.user)
+"""
+
+import logging
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "notifications:role-directory"
+
+
+class RoleDirectory:
+
+    def snapshot(self):
+        """{role_code: [user_id, ...]} — cached."""
+        directory = cache.get(CACHE_KEY)
+        if directory is None:
+            directory = self._load()
+            cache.set(CACHE_KEY, directory, int(getattr(settings, "NOTIFY_DIRECTORY_TTL", 300)))
+        return directory
+
+    def _load(self):
+        AuthorityAssignment = apps.get_model("Human_Resources", "AuthorityAssignment")
+        directory = {}
+        rows = (
+            AuthorityAssignment.objects
+            .filter(is_active=True, user__is_active=True)
+            .order_by("user_id")
+            .values_list("role__code", "user_id")
+        )
+        for code, user_id in rows:
+            ids = directory.setdefault(code, [])
+            if user_id not in ids:
+                ids.append(user_id)
+        return directory
+
+    def user_ids(self, role_codes, excluding=None):
+        """Distinct user ids holding any of `role_codes`, minus `excluding` (user or id)."""
+        directory = self.snapshot()
+        skip = getattr(excluding, "pk", excluding)
+        ids = []
+        for code in role_codes:
+            for user_id in directory.get(code, []):
+                if user_id != skip and user_id not in ids:
+                    ids.append(user_id)
+        return ids
+
+    def invalidate(self, **kwargs):
+        cache.delete(CACHE_KEY)
+
+
+role_directory = RoleDirectory()
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from notifications import counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the denormalized unread notification counters from the Notification table. "
+        "Only needed after notifications were changed outside notifications.services "
+        "(admin edits, raw SQL, restores)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", type=int, default=[], help="User id (repeatable; default all)")
+
+    def handle(self, *args, **options):
+        fixed = counters.recount(options["user"] or None)
+        self.stdout.write(self.style.SUCCESS(f"{fixed} counter(s) corrected."))
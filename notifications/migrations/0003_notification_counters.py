@@ -0,0 +1,42 @@
+# Generated by Django 5.1.3 on 2026-10-17 09:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_counters(apps, schema_editor):
+    Notification = apps.get_model('notifications', 'Notification')
+    NotificationCounter = apps.get_model('notifications', 'NotificationCounter')
+    rows = (
+        Notification.objects.filter(is_read=False)
+        .values('recipient_id')
+        .annotate(n=Count('pk'))
+        .values_list('recipient_id', 'n')
+    )
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id, unread=n, version=1) for user_id, n in rows],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0004_add_rfid_card_fields_clean_model'),
+        ('notifications', '0002_notification_digests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
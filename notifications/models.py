@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class NotificationVerb(models.TextChoices):
@@ -51,7 +52,13 @@ class Notification(models.Model):
 
     is_read = models.BooleanField(default=False, db_index=True)
 
+    # Digest rows: notify_many folds a burst of the same group into one
+    # unread row per recipient ("5 applications moved to Interview")
+    group_key   = models.CharField(max_length=128, blank=True, default="")
+    group_count = models.PositiveIntegerField(default=1)
+
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(default=timezone.now, help_text="Last time a digest absorbed an event")
     read_at    = models.DateTimeField(null=True, blank=True)
 
     class Meta:
@@ -59,7 +66,43 @@ class Notification(models.Model):
         indexes  = [
             models.Index(fields=["recipient", "is_read"]),
             models.Index(fields=["recipient", "created_at"]),
+            models.Index(fields=["recipient", "group_key", "is_read", "updated_at"], name="notif_digest_idx"),
         ]
 
     def __str__(self):
-        return f"→ {self.recipient} | {self.verb} | {'read' if self.is_read else 'unread'}"
\ No newline at end of file
+        return f"→ {self.recipient} | {self.verb} | {'read' if self.is_read else 'unread'}"
+
+    def as_dict(self):
+        """Payload shared by the list API and the push stream."""
+        return {
+            "id":         self.pk,
+            "verb":       self.verb,
+            "message":    self.message,
+            "link":       self.link,
+            "is_read":    self.is_read,
+            "count":      self.group_count,
+            "created_at": self.created_at.strftime("%d %b %Y, %H:%M"),
+            "actor":      str(self.actor) if self.actor else None,
+        }
+
+
+class NotificationCounter(models.Model):
+    """
+    Denormalized unread count per recipient, kept in step with Notification
+    by notifications.counters. `version` moves on every change to the
+    recipient's notifications and backs the ETags of the polling APIs.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="notification_counter",
+    )
+    unread     = models.PositiveIntegerField(default=0)
+    version    = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} | {self.unread} unread (v{self.version})"
+
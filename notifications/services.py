@@ -26,13 +26,50 @@ Bulk notify (multiple recipients at once)
         link       = "/hr/applications/7/",
         actor      = request.user,
     )
+
+notify_many writes every new row with one bulk_create. Recipients may be
+users or user ids (e.g. from notifications.directory.role_directory).
+A recipient who still has an unread row of the same group (verb, or
+verb + `group`) touched within NOTIFY_COALESCE_SECONDS gets that row
+turned into a digest instead of a new row:
+
+    notify_many(
+        recipients = role_directory.user_ids(["HR_ADMIN"]),
+        verb       = "stage_changed",
+        group      = "interview",
+        message    = "Benjamin Adu's application moved to Interview.",
+        digest     = "{count} applications moved to Interview",
+        digest_link= "/hr/applications/?stage=interview",
+    )
+
+Every write here also moves the recipient's NotificationCounter
+(notifications.counters) in the same transaction and, once committed,
+pushes the new count to open bell streams (notifications.broker). Mark
+notifications read through mark_read / mark_all_read for the same reason.
 """
 
 import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 
+from notifications import broker, counters
+
 logger = logging.getLogger(__name__)
 
+# Digest wording per verb; "{count}" is the number of events folded in
+DIGEST_MESSAGES = {
+    "recommendation_submitted": "{count} new candidate recommendations",
+    "stage_changed":            "{count} applications changed stage",
+    "offer_extended":           "{count} offers extended",
+    "employee_approved":        "{count} employees approved",
+    "onboarding_completed":     "{count} onboardings completed",
+}
+
 
 def notify(*, recipient, verb, message, link="", actor=None):
     """
@@ -54,13 +91,17 @@ def notify(*, recipient, verb, message, link="", actor=None):
     from notifications.models import Notification
 
     try:
-        notification = Notification.objects.create(
-            recipient=recipient,
-            actor=actor,
-            verb=verb,
-            message=message,
-            link=link,
-        )
+        with transaction.atomic():
+            notification = Notification.objects.create(
+                recipient=recipient,
+                actor=actor,
+                verb=verb,
+                message=message,
+                link=link,
+                group_key=verb,
+            )
+            states = counters.adjust([recipient.pk], unread=1)
+        _announce(states, {recipient.pk: notification})
         logger.debug(
             "Notification created: verb=%s recipient=%s",
             verb,
@@ -73,21 +114,170 @@ def notify(*, recipient, verb, message, link="", actor=None):
         return None
 
 
-def notify_many(*, recipients, verb, message, link="", actor=None):
+def notify_many(*, recipients, verb, message, link="", actor=None, group="", digest=None, digest_link=None):
     """
-    Create the same notification for multiple recipients.
-    Skips None entries silently.
+    Create the same notification for multiple recipients, coalescing
+    bursts into digest rows. Skips None entries and duplicates silently.
+
+    Parameters (besides those of notify)
+    ----------
+    recipients  : iterable of User instances or user ids
+    group       : str  — narrows coalescing to verb + group (e.g. a stage)
+    digest      : str  — digest wording with "{count}"; default per verb
+    digest_link : str  — link for digest rows (default: keep the first link)
+
+    Returns the new and the updated digest notifications. On backends that
+    do not return ids from bulk inserts (MySQL) the new ones have no pk.
     """
-    created = []
+    from notifications.models import Notification
+
+    ids = []
     for recipient in recipients:
-        if recipient is not None:
-            n = notify(
-                recipient=recipient,
-                verb=verb,
-                message=message,
-                link=link,
-                actor=actor,
-            )
-            if n:
-                created.append(n)
-    return created
\ No newline at end of file
+        if recipient is None:
+            continue
+        pk = getattr(recipient, "pk", recipient)
+        if pk not in ids:
+            ids.append(pk)
+    if not ids:
+        return []
+
+    group_key = f"{verb}:{group}"[:128] if group else verb
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            digests = _coalesce(ids, group_key, verb, digest, digest_link, actor, now)
+            created = Notification.objects.bulk_create([
+                Notification(
+                    recipient_id=pk,
+                    actor=actor,
+                    verb=verb,
+                    message=message,
+                    link=link,
+                    group_key=group_key,
+                    created_at=now,
+                    updated_at=now,
+                )
+                for pk in ids
+                if pk not in digests
+            ])
+            states = counters.adjust([pk for pk in ids if pk not in digests], unread=1)
+            if digests:
+                updated = list(Notification.objects.select_related("actor").filter(pk__in=digests.values()))
+                states.update(counters.adjust(digests, unread=0))
+            else:
+                updated = []
+        _announce(states, {n.recipient_id: n for n in created + updated})
+    except Exception as exc:
+        # Never let a notification failure crash the main request
+        logger.error("Failed to create notifications for %s recipient(s): %s", len(ids), exc)
+        return []
+
+    logger.debug(
+        "Notifications fanned out: verb=%s created=%s coalesced=%s",
+        verb,
+        len(created),
+        len(digests),
+    )
+    return created + updated
+
+
+def _coalesce(ids, group_key, verb, digest, digest_link, actor, now):
+    """
+    Fold this event into each recipient's open digest row, if any.
+    Returns {recipient_id: notification_id} of the rows updated.
+    """
+    from notifications.models import Notification
+
+    window = int(getattr(settings, "NOTIFY_COALESCE_SECONDS", 300))
+    if window <= 0:
+        return {}
+
+    rows = (
+        Notification.objects
+        .select_for_update()
+        .filter(
+            recipient_id__in=ids,
+            group_key=group_key,
+            is_read=False,
+            updated_at__gte=now - timedelta(seconds=window),
+        )
+        .order_by("recipient_id", "-updated_at")
+        .values_list("pk", "recipient_id", "group_count")
+    )
+    latest = {}
+    for pk, recipient_id, count in rows:
+        latest.setdefault(recipient_id, (pk, count))
+    if not latest:
+        return {}
+
+    # one UPDATE per resulting count: rows with the same count share the wording
+    template = digest or DIGEST_MESSAGES.get(verb, "{count} new notifications")
+    by_count = defaultdict(list)
+    for pk, count in latest.values():
+        by_count[count + 1].append(pk)
+    for count, pks in by_count.items():
+        fields = {
+            "group_count": F("group_count") + 1,
+            "message": template.format(count=count)[:512],
+            "actor": actor,
+            "updated_at": now,
+        }
+        if digest_link is not None:
+            fields["link"] = digest_link
+        Notification.objects.filter(pk__in=pks).update(**fields)
+    return {recipient_id: pk for recipient_id, (pk, _) in latest.items()}
+
+
+def mark_read(*, recipient, pk):
+    """
+    Mark one of the recipient's notifications read.
+    Returns False when it does not exist or belongs to someone else.
+    """
+    from notifications.models import Notification
+
+    with transaction.atomic():
+        updated = (
+            Notification.objects
+            .filter(pk=pk, recipient=recipient, is_read=False)
+            .update(is_read=True, read_at=timezone.now())
+        )
+        if not updated:
+            return Notification.objects.filter(pk=pk, recipient=recipient).exists()
+        states = counters.adjust([recipient.pk], unread=-1)
+    _announce(states)
+    return True
+
+
+def mark_all_read(*, recipient):
+    """Mark every unread notification of the recipient read. Returns how many."""
+    from notifications.models import Notification
+
+    with transaction.atomic():
+        updated = (
+            Notification.objects
+            .filter(recipient=recipient, is_read=False)
+            .update(is_read=True, read_at=timezone.now())
+        )
+        if not updated:
+            return 0
+        states = counters.adjust([recipient.pk], unread=-updated)
+    _announce(states)
+    return updated
+
+
+def _announce(states, notifications=None):
+    """After commit, push each recipient's new count (and notification) to open streams."""
+    events = {}
+    for user_id, (unread, version) in states.items():
+        event = {"type": "unread", "unread": unread, "version": version}
+        notification = (notifications or {}).get(user_id)
+        if notification is not None:
+            event["type"] = "notification"
+            event["notification"] = notification.as_dict()
+        events[user_id] = event
+
+    def send():
+        for user_id, event in events.items():
+            broker.publish(user_id, event)
+
+    transaction.on_commit(send)
@@ -10,15 +10,27 @@ Covers:
   4. API endpoints — auth, correctness, ownership enforcement
   5. All 5 trigger integrations (via direct view calls)
   6. Edge cases — no HR managers, no branch manager, self-exclusion
+  7. Bulk fan-out — single insert, digest coalescing, cached role directory
+  8. Unread counters, ETags and the push stream
 """
 
-from django.test import TestCase, Client
+import asyncio
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
-from notifications.models import Notification, NotificationVerb
-from notifications.services import notify, notify_many
+from notifications.broker import InProcessBroker, get_broker
+from notifications.models import Notification, NotificationCounter, NotificationVerb
+from notifications import counters
+from notifications.directory import CACHE_KEY as DIRECTORY_KEY, role_directory
+from notifications.services import mark_all_read, mark_read, notify, notify_many
 
 User = get_user_model()
 
@@ -299,8 +311,7 @@ class NotificationUnreadCountAPITest(TestCase):
 
     def test_does_not_count_read_notifications(self):
         n = notify(recipient=self.user, verb="stage_changed", message="Read me.")
-        n.is_read = True
-        n.save()
+        mark_read(recipient=self.user, pk=n.pk)
 
         notify(recipient=self.user, verb="offer_extended", message="Unread.")
 
@@ -462,4 +473,285 @@ def test_self_exclusion_works_in_get_hr_managers(self):
 
         managers_including = get_hr_managers()
         pks_all = [m.pk for m in managers_including]
-        self.assertIn(self.user.pk, pks_all)
\ No newline at end of file
+        self.assertIn(self.user.pk, pks_all)
+
+
+# ================================================================
+# 7. BULK FAN-OUT
+# ================================================================
+
+@override_settings(NOTIFY_COALESCE_SECONDS=300)
+class NotifyManyFanOutTest(TestCase):
+
+    def setUp(self):
+        self.users = [make_employee(f"fan{i}@test.com", "Fan", f"Out{i}") for i in range(5)]
+        self.actor = make_employee("fanactor@test.com", "Kojo", "Asante")
+
+    def stage(self, recipients, group="schedule_interview", **kwargs):
+        return notify_many(
+            recipients=recipients,
+            verb="stage_changed",
+            group=group,
+            message=kwargs.pop("message", "Ama Mensah has been scheduled for Interview."),
+            digest="{count} applications scheduled for Interview",
+            actor=self.actor,
+            **kwargs,
+        )
+
+    def test_single_insert_for_all_recipients(self):
+        for user in self.users:
+            counters.state(user)
+        # savepoint, digest lookup, insert, counter check, counter update, counter read, release
+        with self.assertNumQueries(7):
+            created = self.stage(self.users + [self.users[0].pk])
+        self.assertEqual(len(created), 5)
+        self.assertEqual(Notification.objects.count(), 5)
+
+    def test_burst_coalesces_into_digest(self):
+        self.stage(self.users[:2])
+        self.stage([u.pk for u in self.users[:3]], message="Kofi Boateng has been scheduled for Interview.")
+        self.stage(self.users[:1])
+
+        self.assertEqual(Notification.objects.count(), 3)
+        first = Notification.objects.get(recipient=self.users[0])
+        self.assertEqual(first.group_count, 3)
+        self.assertEqual(first.message, "3 applications scheduled for Interview")
+        self.assertEqual(Notification.objects.get(recipient=self.users[1]).group_count, 2)
+        self.assertEqual(Notification.objects.get(recipient=self.users[2]).message, "Kofi Boateng has been scheduled for Interview.")
+
+    def test_digest_link_replaces_the_first_events_link(self):
+        list_link = "/hr/api/applications/?status=interview"
+        self.stage(self.users[:1], link="/hr/api/applications/1/", digest_link=list_link)
+        self.assertEqual(Notification.objects.get().link, "/hr/api/applications/1/")
+
+        self.stage(self.users[:1], link="/hr/api/applications/2/", digest_link=list_link)
+        self.assertEqual(Notification.objects.get().link, list_link)
+
+    def test_no_coalescing_across_groups_read_rows_or_window(self):
+        self.stage(self.users[:1])
+        self.stage(self.users[:1], group="reject")
+        self.assertEqual(Notification.objects.count(), 2)
+
+        Notification.objects.update(is_read=True)
+        self.stage(self.users[:1])
+        self.assertEqual(Notification.objects.count(), 3)
+
+        Notification.objects.update(updated_at=timezone.now() - timedelta(minutes=10))
+        self.stage(self.users[:1])
+        self.assertEqual(Notification.objects.count(), 4)
+
+        with override_settings(NOTIFY_COALESCE_SECONDS=0):
+            self.stage(self.users[:1])
+        self.assertEqual(Notification.objects.count(), 5)
+
+    def test_digest_floats_to_the_top_of_the_list(self):
+        self.stage(self.users[:1])
+        notify(recipient=self.users[0], verb="offer_extended", message="Offer.")
+        self.stage(self.users[:1])
+
+        client = Client()
+        client.force_login(self.users[0])
+        data = client.get("/notifications/api/").json()
+        self.assertEqual(data[0]["message"], "2 applications scheduled for Interview")
+        self.assertEqual(data[0]["count"], 2)
+
+
+class RoleDirectoryTest(TestCase):
+
+    def setUp(self):
+        cache.delete(DIRECTORY_KEY)
+        self.addCleanup(cache.delete, DIRECTORY_KEY)
+        from Human_Resources.models.authority import AuthorityRole
+        self.role, _ = AuthorityRole.objects.get_or_create(
+            code="HR_ADMIN",
+            defaults={"name": "HR Administrator", "allowed_scopes": ["GLOBAL", "REGION"]},
+        )
+
+    def assign(self, user):
+        from Human_Resources.models.authority import AuthorityAssignment
+        return AuthorityAssignment.objects.create(user=user, role=self.role, scope_type="GLOBAL", is_active=True)
+
+    def test_cached_and_invalidated_on_assignment_change(self):
+        from Human_Resources.api.views._notify_helpers import hr_manager_ids
+        hr = make_employee("dirhr@test.com", "Hr", "One")
+        self.assign(hr)
+
+        self.assertEqual(hr_manager_ids(), [hr.pk])
+        with self.assertNumQueries(0):
+            self.assertEqual(hr_manager_ids(excluding=hr), [])
+
+        second = make_employee("dirhr2@test.com", "Hr", "Two")
+        assignment = self.assign(second)
+        self.assertEqual(hr_manager_ids(), [hr.pk, second.pk])
+
+        assignment.delete()
+        self.assertEqual(role_directory.user_ids(["HR_ADMIN"]), [hr.pk])
+
+
+# ================================================================
+# 8. UNREAD COUNTERS, ETAGS AND THE PUSH STREAM
+# ================================================================
+
+class UnreadCounterTest(TestCase):
+
+    def setUp(self):
+        self.user  = make_employee("counter@test.com", "Abena", "Owusu")
+        self.other = make_employee("counter2@test.com", "Yaw", "Darko")
+
+    def actual(self, user):
+        return Notification.objects.filter(recipient=user, is_read=False).count()
+
+    def test_counter_follows_every_write(self):
+        first = notify(recipient=self.user, verb="offer_extended", message="Offer 1.")
+        notify_many(recipients=[self.user, self.other], verb="stage_changed", group="reject", message="Rejected.")
+        _, version = counters.state(self.user)
+        notify_many(recipients=[self.user], verb="stage_changed", group="reject", message="Rejected.")  # digest
+
+        unread, digest_version = counters.state(self.user)
+        self.assertEqual(unread, 2)
+        self.assertEqual(digest_version, version + 1)
+        self.assertEqual(counters.state(self.other)[0], 1)
+
+        self.assertTrue(mark_read(recipient=self.user, pk=first.pk))
+        self.assertTrue(mark_read(recipient=self.user, pk=first.pk))  # already read: no double count
+        self.assertFalse(mark_read(recipient=self.other, pk=first.pk))
+        self.assertEqual(counters.state(self.user)[0], self.actual(self.user))
+
+        self.assertEqual(mark_all_read(recipient=self.user), 1)
+        self.assertEqual(counters.state(self.user)[0], 0)
+        self.assertEqual(counters.state(self.other)[0], 1)
+
+    def test_missing_counter_seeded_from_count_and_recount(self):
+        for i in range(3):
+            Notification.objects.create(recipient=self.user, verb="offer_extended", message=f"Legacy {i}.")
+        self.assertFalse(NotificationCounter.objects.exists())
+
+        notify(recipient=self.user, verb="offer_extended", message="New.")
+        self.assertEqual(counters.state(self.user)[0], 4)
+
+        Notification.objects.filter(recipient=self.user).update(is_read=True)  # out of band
+        out = StringIO()
+        with self.assertLogs("notifications.counters", "WARNING"):
+            call_command("recount_notifications", stdout=out)
+        self.assertIn("1 counter(s) corrected.", out.getvalue())
+        self.assertEqual(counters.state(self.user)[0], 0)
+
+    def test_losing_a_seed_race_still_applies_the_delta(self):
+        real_counts = counters._unread_counts
+
+        def concurrent_seed(user_ids):
+            # another writer seeds first; its COUNT cannot see our uncommitted row
+            NotificationCounter.objects.create(user_id=self.user.pk, unread=0, version=1)
+            return real_counts(user_ids)
+
+        with patch("notifications.counters._unread_counts", side_effect=concurrent_seed):
+            notify(recipient=self.user, verb="offer_extended", message="New.")
+        self.assertEqual(counters.state(self.user)[0], 1)
+
+    def test_unread_count_api_skips_the_count(self):
+        notify(recipient=self.user, verb="offer_extended", message="Offer.")
+        client = Client()
+        client.force_login(self.user)
+        with patch("notifications.counters._unread_counts") as recount:
+            self.assertEqual(client.get("/notifications/api/unread-count/").json()["unread"], 1)
+        recount.assert_not_called()
+
+
+class NotificationETagTest(TestCase):
+
+    def setUp(self):
+        self.user   = make_employee("etag@test.com", "Esi", "Quaye")
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_unread_count_and_list_answer_304_until_something_changes(self):
+        notify(recipient=self.user, verb="offer_extended", message="Offer.")
+
+        for url in ("/notifications/api/unread-count/", "/notifications/api/"):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            etag = first["ETag"]
+            self.assertEqual(first["Cache-Control"], "private, no-cache")
+
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(again.status_code, 304)
+            self.assertEqual(again.content, b"")
+
+        notify(recipient=self.user, verb="offer_extended", message="Another offer.")
+        changed = self.client.get("/notifications/api/unread-count/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()["unread"], 2)
+
+    def test_etags_are_per_user(self):
+        etag = self.client.get("/notifications/api/unread-count/")["ETag"]
+        other = Client()
+        other.force_login(make_employee("etag2@test.com", "Kwesi", "Arthur"))
+        self.assertEqual(other.get("/notifications/api/unread-count/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class NotificationPushTest(TestCase):
+
+    def setUp(self):
+        self.user = make_employee("push@test.com", "Akua", "Sarpong")
+
+    def test_events_published_after_commit_only(self):
+        with patch("notifications.broker.publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                n = notify(recipient=self.user, verb="offer_extended", message="Offer.")
+                publish.assert_not_called()
+            self.assertEqual(len(callbacks), 1)
+            user_id, event = publish.call_args.args
+            self.assertEqual(user_id, self.user.pk)
+            self.assertEqual(event["type"], "notification")
+            self.assertEqual(event["unread"], 1)
+            self.assertEqual(event["notification"]["id"], n.pk)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                mark_read(recipient=self.user, pk=n.pk)
+            self.assertEqual(publish.call_args.args[1], {"type": "unread", "unread": 0, "version": event["version"] + 1})
+
+    def test_in_process_broker_delivers_across_threads(self):
+        broker = InProcessBroker()
+
+        async def scenario():
+            subscription = await broker.subscribe(7)
+            await asyncio.get_running_loop().run_in_executor(None, broker.publish, 7, {"type": "unread", "unread": 1})
+            broker.publish(8, {"type": "unread", "unread": 9})
+            received = [await subscription.get(1), await subscription.get(0.05)]
+            await subscription.close()
+            return received
+
+        first, second = asyncio.run(scenario())
+        self.assertEqual(first, {"type": "unread", "unread": 1})
+        self.assertIsNone(second)
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    async def test_stream_sends_state_then_events(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get("/notifications/api/stream/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        chunks = response.streaming_content
+        first = (await anext(chunks)).decode()
+        self.assertIn("event: unread", first)
+        self.assertIn('"unread": 0', first)
+
+        get_broker().publish(self.user.pk, {"type": "unread", "unread": 5, "version": 9})
+        second = (await anext(chunks)).decode()
+        self.assertEqual(second, 'id: 9\nevent: unread\ndata: {"type": "unread", "unread": 5, "version": 9}\n\n')
+
+        # a client disconnect cancels the pending read; the subscription goes with it
+        pending = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertEqual(get_broker().subscriber_count(self.user.pk), 0)
+
+    def test_stream_refused_outside_asgi(self):
+        client = Client()
+        self.assertEqual(client.get("/notifications/api/stream/").status_code, 401)
+        client.force_login(self.user)
+        self.assertEqual(client.get("/notifications/api/stream/").status_code, 204)
+
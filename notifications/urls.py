@@ -4,6 +4,7 @@ from notifications.api_views import (
     NotificationUnreadCountAPI,
     NotificationMarkReadAPI,
     NotificationMarkAllReadAPI,
+    notification_stream,
 )
 
 app_name = "notifications"
@@ -12,5 +13,6 @@ urlpatterns = [
     path("",                  NotificationListAPI.as_view(),        name="list"),
     path("unread-count/",     NotificationUnreadCountAPI.as_view(), name="unread-count"),
     path("mark-all-read/",    NotificationMarkAllReadAPI.as_view(), name="mark-all-read"),
+    path("stream/",           notification_stream,                  name="stream"),
     path("<int:pk>/read/",    NotificationMarkReadAPI.as_view(),    name="mark-read"),
 ]
\ No newline at end of file
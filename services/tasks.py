@@ -0,0 +1,11 @@
+# services/tasks.py
+from jobs.taskqueue import task
+
+
+@task(queue="email", priority=5, max_attempts=5)
+def send_registration_link(email, link, first_name, last_name):
+    """Registration link for an approved recommendation."""
+    from services.services import EmployeeService
+
+    if not EmployeeService().send_registration_link(email=email, link=link, first_name=first_name, last_name=last_name):
+        raise RuntimeError(f"registration link to {email} was not sent")